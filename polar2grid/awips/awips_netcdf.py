@@ -223,8 +223,8 @@ class Backend(roles.BackendRole):
         # Create the netcdf file
         try:
             LOG.debug("Scaling %s data to fit in netcdf file...", gridded_product["product_name"])
-            data = self.rescaler.rescale_product(gridded_product, data_type,
-                                                 inc_by_one=inc_by_one, fill_value=fill_value, clip_zero=True)
+            data = self.rescaler.rescale_product_to_data_type(gridded_product, data_type, inc_by_one=inc_by_one,
+                                                              fill_value=fill_value, clip_zero=True)
 
             LOG.info("Writing product %s to AWIPS NetCDF file", gridded_product["product_name"])
             create_awips2_netcdf3(output_filename, data, gridded_product["begin_time"], **awips_info)
@@ -41,8 +41,8 @@ import os
 import shutil
 
 from polar2grid.core import roles
-from polar2grid.core.dtype import str_to_dtype, clip_to_data_type
-from polar2grid.core.rescale import Rescaler, DEFAULT_RCONFIG
+from polar2grid.core.dtype import str_to_dtype
+from polar2grid.core.rescale import Rescaler, DEFAULT_RCONFIG, DEFAULT_BLOCK_ROWS, mask_helper
 
 LOG = logging.getLogger(__name__)
 DEFAULT_OUTPUT_PATTERN = "{satellite}_{instrument}_{product_name}_{begin_time}_{grid_name}.dat"
@@ -94,27 +94,40 @@ class Backend(roles.BackendRole):
         # if we have a floating point data type, then scaling doesn't make much sense
         if data_type == gridded_product["data_type"] and same_fill:
             LOG.info("Saving product %s to binary file %s", gridded_product["product_name"], output_filename)
-            shutil.copyfile(gridded_product["grid_data"], output_filename)
+            if isinstance(gridded_product["grid_data"], (str, unicode)):
+                shutil.copyfile(gridded_product["grid_data"], output_filename)
+            else:
+                # data was kept in memory instead of written to an intermediate file
+                gridded_product["grid_data"].tofile(output_filename)
             return output_filename
         elif numpy.issubclass_(data_type, numpy.floating):
             # we didn't rescale any data, but we need to convert it
+            LOG.info("Saving product %s to binary file %s", gridded_product["product_name"], output_filename)
             data = gridded_product.get_data_array()
-        else:
-            try:
-                LOG.debug("Scaling %s data to fit data type", gridded_product["product_name"])
-                data = self.rescaler.rescale_product(gridded_product, data_type,
-                                                     inc_by_one=inc_by_one, fill_value=fill_value)
-                data = clip_to_data_type(data, data_type)
-            except StandardError:
-                if not self.keep_intermediate and os.path.isfile(output_filename):
-                    os.remove(output_filename)
-                raise
+            out = numpy.memmap(output_filename, dtype=data_type, mode="w+", shape=data.shape)
+            for start_row in range(0, data.shape[-2], DEFAULT_BLOCK_ROWS):
+                block = data[..., start_row:start_row + DEFAULT_BLOCK_ROWS, :]
+                block_out = out[..., start_row:start_row + DEFAULT_BLOCK_ROWS, :]
+                block_out[...] = block
+                block_out[mask_helper(block, gridded_product["fill_value"])] = fill_value
+            out.flush()
+            del out
+            return output_filename
 
         LOG.info("Saving product %s to binary file %s", gridded_product["product_name"], output_filename)
-        data = data.astype(data_type)
-        fill_mask = gridded_product.get_data_mask()
-        data[fill_mask] = fill_value
-        data.tofile(output_filename)
+        try:
+            LOG.debug("Scaling %s data to fit data type", gridded_product["product_name"])
+            # rescale straight in to the output file a block at a time
+            out = numpy.memmap(output_filename, dtype=data_type, mode="w+",
+                               shape=gridded_product.get_data_array().shape)
+            self.rescaler.rescale_product_to_data_type(gridded_product, data_type, inc_by_one=inc_by_one,
+                                                       fill_value=fill_value, out=out, output_fill=fill_value)
+            out.flush()
+            del out
+        except StandardError:
+            if not self.keep_intermediate and os.path.isfile(output_filename):
+                os.remove(output_filename)
+            raise
 
         return output_filename
 
@@ -43,10 +43,10 @@ import sys
 
 import logging
 import os
-import pkg_resources
 from ConfigParser import SafeConfigParser, Error as ConfigParserError
 from StringIO import StringIO
-from pkg_resources import resource_string as get_resource_string
+
+from polar2grid.core.entry_points import entry_points, load_entry_point, get_resource_string
 
 LOG = logging.getLogger(__name__)
 
@@ -148,7 +148,7 @@ class CompositorManager(dict):
 def available_compositors(entry_point=P2G_COMP_CLS_EP):
     """Don't load this unless it needs to be used (via main or via glue.py).
     """
-    return {frontend_ep.name: frontend_ep.dist for frontend_ep in pkg_resources.iter_entry_points(entry_point)}
+    return entry_points(entry_point)
 
 
 def get_compositor_class(compositors, name):
@@ -157,7 +157,7 @@ def get_compositor_class(compositors, name):
     :param compositors: dictionary returned by `available_compositors`
     :param name: name of the compositor as defined in the entry point
     """
-    return pkg_resources.load_entry_point(compositors[name], P2G_COMP_CLS_EP, name)
+    return load_entry_point(P2G_COMP_CLS_EP, name)
 
 
 def main(argv=sys.argv[1:]):
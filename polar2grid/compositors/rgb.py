@@ -95,6 +95,7 @@ import numpy as np
 import os
 
 from polar2grid.core import roles
+from polar2grid.core.containers import intermediate_arrays
 
 LOG = logging.getLogger(__name__)
 
@@ -244,9 +245,9 @@ class RGBCompositor(roles.CompositorRole):
             if self.share_mask:
                 comp_data[:, self.shared_mask(gridded_scene, self.composite_products)] = fill_value
 
-            comp_data.tofile(fn)
+            grid_data = intermediate_arrays.store(fn, comp_data)
             base_product = gridded_scene[self.composite_products[0]]
-            gridded_scene[self.composite_name] = self._create_gridded_product(self.composite_name, fn, base_product=base_product,
+            gridded_scene[self.composite_name] = self._create_gridded_product(self.composite_name, grid_data, base_product=base_product,
                                                                               data_kind=self.composite_data_kind)
         except StandardError:
             LOG.error("Could not create composite product with name '%s'", self.composite_name)
@@ -335,10 +336,10 @@ class TrueColorCompositor(RGBCompositor):
                 comp_data[:, self.shared_mask(gridded_scene, all_products)] = fill_value
 
             LOG.debug("True color array has shape %r", comp_data.shape)
-            LOG.info("Saving true color image to filename '%s'", fn)
-            comp_data.tofile(fn)
+            LOG.info("Saving true color image to '%s' unless it can be kept in memory", fn)
+            grid_data = intermediate_arrays.store(fn, comp_data)
             base_product = gridded_scene[all_products[0]]
-            gridded_scene[self.composite_name] = self._create_gridded_product(self.composite_name, fn,
+            gridded_scene[self.composite_name] = self._create_gridded_product(self.composite_name, grid_data,
                                                                               base_product=base_product,
                                                                               data_kind=self.composite_data_kind)
         except StandardError:
@@ -396,10 +397,10 @@ class FalseColorCompositor(TrueColorCompositor):
                 comp_data[:, self.shared_mask(gridded_scene, all_products)] = fill_value
 
             LOG.debug("False color array has shape %r", comp_data.shape)
-            LOG.info("Saving false color image to filename '%s'", fn)
-            comp_data.tofile(fn)
+            LOG.info("Saving false color image to '%s' unless it can be kept in memory", fn)
+            grid_data = intermediate_arrays.store(fn, comp_data)
             base_product = gridded_scene[all_products[0]]
-            gridded_scene[self.composite_name] = self._create_gridded_product(self.composite_name, fn,
+            gridded_scene[self.composite_name] = self._create_gridded_product(self.composite_name, grid_data,
                                                                               base_product=base_product,
                                                                               data_kind=self.composite_data_kind)
         except StandardError:
@@ -40,10 +40,16 @@
 __docformat__ = "restructuredtext en"
 
 import os
+import re
 import sys
 import json
+import errno
+import atexit
 import shutil
 import logging
+import threading
+import weakref
+from collections import deque
 from datetime import datetime
 
 import numpy
@@ -56,6 +62,186 @@ from polar2grid.core.proj import Proj
 LOG = logging.getLogger(__name__)
 
 
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        # EPERM means the process exists but belongs to someone else
+        return e.errno != errno.ESRCH
+    return True
+
+
+class IntermediateArrays(object):
+    """Create the arrays handed from one processing step to the next (swath data, ll2cr results, gridded data).
+
+    By default every array is a memory mapped flat binary file on disk. If a memory budget is set, arrays are kept in
+    memory and stored in products in place of a filename until the in-memory arrays still being used would exceed the
+    budget. Anything after that spills to disk as a flat binary file like before.
+
+    With `shared_memory` the arrays kept in memory are flat binary files in a directory for this process under
+    `shared_memory_dir` (a POSIX shared memory tmpfs). Products store these filenames like any other file so they are
+    removed by the normal `cleanup` of products that aren't persisted, and other processes can memory map them
+    without copying. Anything left in the directory is removed when the process exits (see `remove_shared`).
+    Directories left behind by processes that were killed before they could clean up are removed the next time a
+    process creates its directory.
+
+    :param memory_budget: bytes of intermediate arrays that can be kept in memory (0 to always use files)
+    :param shared_memory: keep in-memory arrays in shared memory so other processes can use them
+    :param shared_memory_dir: tmpfs directory backed by shared memory
+    """
+    def __init__(self, memory_budget=0, shared_memory=False, shared_memory_dir="/dev/shm"):
+        self.memory_budget = memory_budget
+        self.memory_used = 0
+        self.shared_memory = shared_memory
+        self.shared_memory_dir = shared_memory_dir
+        self._lock = threading.Lock()
+        self._refs = {}
+        # arrays that were garbage collected, their memory is given back the next time the lock is held
+        self._released = deque()
+        atexit.register(self.remove_shared)
+
+    @property
+    def in_memory(self):
+        return self.memory_budget > 0
+
+    @property
+    def shared_dir(self):
+        """Directory holding the shared memory arrays created by this process."""
+        return os.path.join(self.shared_memory_dir, "polar2grid_%d" % (os.getpid(),))
+
+    def _reserve(self, nbytes):
+        with self._lock:
+            self._drain_released()
+            if self.memory_used + nbytes > self.memory_budget:
+                return False
+            self.memory_used += nbytes
+            return True
+
+    def _release(self, ref):
+        # weakref callbacks can run during garbage collection on a thread that already holds the lock so this must
+        # not take it, deque.append is atomic
+        self._released.append(ref)
+
+    def _drain_released(self):
+        # must be called with the lock held
+        while self._released:
+            self.memory_used -= self._refs.pop(self._released.popleft())
+
+    def _track(self, arr, nbytes):
+        # memory is given back to the budget when the array (and any views of it) are garbage collected
+        with self._lock:
+            self._refs[weakref.ref(arr, self._release)] = nbytes
+
+    def _reserve_shared(self, filename, nbytes):
+        """Get the shared memory filename to use for `filename` if it fits in the budget, None otherwise."""
+        shared_dir = self.shared_dir
+        with self._lock:
+            if not os.path.isdir(shared_dir):
+                self._remove_stale_shared()
+                os.makedirs(shared_dir)
+            shared_fn = os.path.join(shared_dir, os.path.basename(filename))
+            # files removed by product cleanup no longer count against the budget
+            used = sum(os.path.getsize(os.path.join(shared_dir, fn)) for fn in os.listdir(shared_dir)
+                       if fn != os.path.basename(shared_fn))
+            if used + nbytes > self.memory_budget:
+                return None
+            # claim the space before the file is written
+            with open(shared_fn, "wb") as shared_file:
+                shared_file.truncate(nbytes)
+            return shared_fn
+
+    def worker_budget(self, num_workers):
+        """Get the memory budget for each of `num_workers` processes forked from this one.
+
+        What is left of this process's budget is split between the workers so together they stay within it. Arrays
+        this process already keeps in memory are shared with the workers and are only counted once.
+        """
+        with self._lock:
+            if self.shared_memory:
+                # workers only count the files in their own shared memory directory
+                shared_dir = self.shared_dir
+                used = sum(os.path.getsize(os.path.join(shared_dir, fn)) for fn in os.listdir(shared_dir)) \
+                    if os.path.isdir(shared_dir) else 0
+                inherited = 0
+            else:
+                # workers start with this process's usage
+                self._drain_released()
+                used = inherited = self.memory_used
+        return inherited + max(self.memory_budget - used, 0) // num_workers
+
+    def _remove_stale_shared(self):
+        """Remove shared memory directories of processes that are no longer running."""
+        try:
+            dir_names = os.listdir(self.shared_memory_dir)
+        except OSError:
+            return
+        for dir_name in dir_names:
+            match = re.match(r"^polar2grid_(\d+)$", dir_name)
+            if match is None or _pid_alive(int(match.group(1))):
+                continue
+            stale_dir = os.path.join(self.shared_memory_dir, dir_name)
+            LOG.debug("Removing stale shared memory arrays in '%s'", stale_dir)
+            shutil.rmtree(stale_dir, ignore_errors=True)
+
+    def remove_shared(self):
+        """Remove any shared memory arrays created by this process."""
+        shared_dir = self.shared_dir
+        if os.path.isdir(shared_dir):
+            LOG.debug("Removing shared memory arrays in '%s'", shared_dir)
+            shutil.rmtree(shared_dir, ignore_errors=True)
+
+    def _check_existing(self, filename, overwrite_existing, description):
+        if os.path.isfile(filename):
+            if not overwrite_existing:
+                LOG.error("%s already exists: %s" % (description, filename))
+                raise RuntimeError("%s already exists: %s" % (description, filename))
+            else:
+                LOG.warning("%s already exists, will overwrite: %s", description, filename)
+
+    def create(self, filename, shape, dtype, overwrite_existing=True, description="Binary file"):
+        """Create an empty intermediate array.
+
+        :param filename: flat binary file to use if the array can't be kept in memory
+        :returns: (array, data) where `data` is what a product should store, the array itself or a filename
+        """
+        nbytes = int(numpy.prod(shape)) * numpy.dtype(dtype).itemsize
+        if self.in_memory and self.shared_memory:
+            shared_fn = self._reserve_shared(filename, nbytes)
+            if shared_fn is not None:
+                return numpy.memmap(shared_fn, mode="r+", dtype=dtype, shape=shape), shared_fn
+            LOG.debug("Intermediate memory budget exceeded, writing '%s' to disk", filename)
+        elif self.in_memory:
+            if self._reserve(nbytes):
+                arr = numpy.empty(shape, dtype=dtype)
+                self._track(arr, nbytes)
+                return arr, arr
+            LOG.debug("Intermediate memory budget exceeded, writing '%s' to disk", filename)
+        self._check_existing(filename, overwrite_existing, description)
+        return numpy.memmap(filename, mode="w+", dtype=dtype, shape=shape), filename
+
+    def store(self, filename, arr, overwrite_existing=True, description="Binary file"):
+        """Keep an existing array as an intermediate array, writing it to `filename` if it can't be kept in memory.
+
+        :returns: what a product should store, the array itself or a filename
+        """
+        if self.in_memory and self.shared_memory:
+            shared_fn = self._reserve_shared(filename, arr.nbytes)
+            if shared_fn is not None:
+                arr.tofile(shared_fn)
+                return shared_fn
+        elif self.in_memory and self._reserve(arr.nbytes):
+            self._track(arr, arr.nbytes)
+            return arr
+        self._check_existing(filename, overwrite_existing, description)
+        arr.tofile(filename)
+        return filename
+
+
+# arrays are only kept in memory when asked to (megabytes)
+intermediate_arrays = IntermediateArrays(int(float(os.environ.get("P2G_MEMORY_BUDGET", 0)) * 1024 ** 2),
+                                         shared_memory=bool(os.environ.get("P2G_SHARED_MEMORY")))
+
+
 # FUTURE: Add a register function to register custom P2G objects so no imports and short __class__ names
 # FUTURE: Handling duplicate sub-objects better (ex. geolocation)
 class P2GJSONDecoder(json.JSONDecoder):
@@ -408,7 +594,7 @@ class BaseProduct(BaseP2GObject):
         else:
             if filename:
                 data.tofile(filename)
-                return self._memmap(data, dtype, rows, cols, mode)
+                return self._memmap(filename, dtype, rows, cols, mode)
             return data.copy()
 
 
@@ -540,6 +726,9 @@ class GridDefinition(GeographicDefinition):
     def __init__(self, *args, **kwargs):
         # pyproj.Proj object if needed
         self.p = None
+        # dynamic grid parameters already computed for a geolocation (see `polar2grid.remap.ll2cr.ll2cr`)
+        # shared between copies of this grid definition
+        self.dynamic_extents = {}
         if "proj4_definition" in kwargs:
             # pyproj doesn't like unicode
             kwargs["proj4_definition"] = str(kwargs["proj4_definition"])
@@ -555,6 +744,12 @@ class GridDefinition(GeographicDefinition):
         keys.insert(0, keys.pop(keys.index("grid_name")))
         return "\n".join("%s: %s" % (k, self[k]) for k in keys)
 
+    def copy(self, as_dict=False):
+        new_obj = super(GridDefinition, self).copy(as_dict=as_dict)
+        if not as_dict:
+            new_obj.dynamic_extents = self.dynamic_extents
+        return new_obj
+
     @property
     def proj(self):
         if self.p is None:
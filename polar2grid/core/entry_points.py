@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Find and load polar2grid entry points (frontends, backends, compositors) without scanning every installed package.
+
+Importing `pkg_resources` and iterating over entry points reads the metadata of every installed distribution which
+takes a noticeable part of the startup time of every polar2grid script. The polar2grid entry points found the first
+time are saved to a JSON cache file (``$P2G_ENTRY_POINT_CACHE``, default
+``~/.cache/polar2grid/entry_points.json``, empty to disable) along with the modification times of the
+``sys.path`` directories and ``entry_points.txt`` files they came from. Later runs use the cache until a package
+is installed, removed, or its entry points change.
+
+:license:      GNU GPLv3
+"""
+__docformat__ = "restructuredtext en"
+
+import os
+import sys
+import json
+import logging
+import pkgutil
+
+LOG = logging.getLogger(__name__)
+
+ENTRY_POINT_GROUP_PREFIX = "polar2grid."
+ENTRY_POINT_CACHE = os.environ.get("P2G_ENTRY_POINT_CACHE",
+                                   os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+                                                "polar2grid", "entry_points.json"))
+
+# entry point group -> {name: "module:attribute"}, loaded once per process
+_entry_points = None
+
+
+def _mtimes(paths):
+    mtimes = {}
+    for path in paths:
+        try:
+            mtimes[path] = os.stat(path).st_mtime
+        except OSError:
+            mtimes[path] = None
+    return mtimes
+
+
+def _scan_entry_points():
+    """Find every polar2grid entry point with `pkg_resources`.
+
+    :returns: dictionary of entry points by group and the metadata files they were found in
+    """
+    import pkg_resources
+    groups = {}
+    metadata_files = []
+    for dist in pkg_resources.working_set:
+        found = False
+        for group, eps in dist.get_entry_map().items():
+            if not group.startswith(ENTRY_POINT_GROUP_PREFIX):
+                continue
+            found = True
+            for name, ep in eps.items():
+                groups.setdefault(group, {})[name] = "%s:%s" % (ep.module_name, ".".join(ep.attrs))
+        egg_info = getattr(dist, "egg_info", None)
+        if found and egg_info:
+            metadata_files.append(os.path.join(egg_info, "entry_points.txt"))
+    return groups, metadata_files
+
+
+def _load_cache(cache_file):
+    try:
+        with open(cache_file, "r") as f:
+            cache = json.load(f)
+    except (IOError, ValueError):
+        return None
+    if cache.get("sys_path") != sys.path:
+        return None
+    for key in ("sys_path", "metadata_files"):
+        if cache.get(key + "_mtimes") != _mtimes(cache.get(key, [])):
+            return None
+    return cache["entry_points"]
+
+
+def _save_cache(cache_file, groups, metadata_files):
+    cache = {
+        "entry_points": groups,
+        "sys_path": sys.path,
+        "sys_path_mtimes": _mtimes(sys.path),
+        "metadata_files": metadata_files,
+        "metadata_files_mtimes": _mtimes(metadata_files),
+    }
+    # write to a temporary file first so other processes never read a partial cache
+    tmp_file = "%s.%d" % (cache_file, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(cache_file)):
+            os.makedirs(os.path.dirname(cache_file))
+        with open(tmp_file, "w") as f:
+            json.dump(cache, f)
+        os.rename(tmp_file, cache_file)
+    except (IOError, OSError):
+        LOG.debug("Could not save entry point cache '%s'", cache_file, exc_info=True)
+
+
+def entry_points(group, cache_file=None):
+    """Get the entry points in `group`.
+
+    :returns: dictionary of entry point name to the 'module:attribute' it refers to
+    """
+    global _entry_points
+    if _entry_points is None:
+        cache_file = ENTRY_POINT_CACHE if cache_file is None else cache_file
+        groups = _load_cache(cache_file) if cache_file else None
+        if groups is None:
+            LOG.debug("Searching installed packages for polar2grid entry points")
+            groups, metadata_files = _scan_entry_points()
+            if cache_file:
+                _save_cache(cache_file, groups, metadata_files)
+        _entry_points = groups
+    return dict(_entry_points.get(group, {}))
+
+
+def load_entry_point(group, name):
+    """Import the object the named entry point in `group` refers to."""
+    try:
+        module_name, attrs = entry_points(group)[name].split(":")
+    except KeyError:
+        raise KeyError("Unknown '%s' entry point '%s'" % (group, name))
+    obj = __import__(module_name, fromlist=["__name__"])
+    for attr in attrs.split("."):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def get_resource_string(package, resource):
+    """Read a resource file (ex. a configuration file) installed with `package`.
+
+    Same as `pkg_resources.resource_string` without importing `pkg_resources`, which alone takes a noticeable part
+    of the startup time because it reads the metadata of every installed distribution when it is imported.
+    """
+    return pkgutil.get_data(package, resource)
@@ -27,6 +27,37 @@ import numpy
 
 log = logging.getLogger(__name__)
 
+# rows of data handled at a time when equalizing data that doesn't fit in memory
+DEFAULT_ROWS_PER_CHUNK = 1024
+
+def row_chunks (total_rows, rows_per_chunk) :
+    """
+    generate slices covering total_rows rows, rows_per_chunk rows at a time
+    """
+    for start_row in range(0, total_rows, rows_per_chunk) :
+        yield slice(start_row, min(start_row + rows_per_chunk, total_rows))
+
+class RowMask (object) :
+    """
+    a boolean mask that is only calculated for the rows asked for (mask[start:end]) so the whole mask never has to
+    be in memory, func is called with a slice of rows and returns the mask for those rows
+
+    the equalization functions only index their masks by rows when data is processed in chunks
+    """
+
+    def __init__(self, shape, func, rows_per_chunk=DEFAULT_ROWS_PER_CHUNK):
+        self.shape = shape
+        self.func = func
+        self.rows_per_chunk = rows_per_chunk
+
+    def __getitem__(self, rows):
+        if not isinstance(rows, slice):
+            raise TypeError("RowMask can only be indexed by a slice of rows")
+        return self.func(rows)
+
+    def any(self):
+        return any(self.func(rows).any() for rows in row_chunks(self.shape[0], self.rows_per_chunk))
+
 def histogram_equalization (data, mask_to_equalize,
                             number_of_bins=1000,
                             std_mult_cutoff=4.0,
@@ -41,7 +72,8 @@ def histogram_equalization (data, mask_to_equalize,
                             do_log_scale=False,
                             log_offset=None,
                             local_radius_px=None,
-                            out=None) :
+                            out=None,
+                            rows_per_chunk=None) :
     """
     Perform a histogram equalization on the data selected by mask_to_equalize.
     The data will be separated into number_of_bins levels for equalization and
@@ -51,10 +83,17 @@ def histogram_equalization (data, mask_to_equalize,
     will be returned in the 0 to 1 range. Otherwise the data selected by
     mask_to_equalize will be returned in the 0 to number_of_bins range.
     
+    If rows_per_chunk is provided the data is equalized that many rows at a time so that data and out
+    (ex. memory mapped files) and the masks (see `RowMask`) don't have to fit in memory.
+    
     Note: the data will be changed in place.
     """
 
     out = out if out is not None else data.copy()
+    if rows_per_chunk is not None :
+        return _histogram_equalization_chunked(data, mask_to_equalize, out, number_of_bins, std_mult_cutoff,
+                                               do_zerotoone_normalization, valid_data_mask, clip_limit, slope_limit,
+                                               rows_per_chunk)
     mask_to_use = mask_to_equalize if valid_data_mask is None else valid_data_mask
     
     log.debug("    determining DNB data range for histogram equalization")
@@ -75,6 +114,75 @@ def histogram_equalization (data, mask_to_equalize,
     
     return out
 
+def _histogram_equalization_chunked (data, mask_to_equalize, out, number_of_bins, std_mult_cutoff,
+                                     do_zerotoone_normalization, valid_data_mask, clip_limit, slope_limit,
+                                     rows_per_chunk) :
+    """
+    `histogram_equalization` done rows_per_chunk rows at a time
+
+    the data is read once to get its average and standard deviation, once to get the range of the data inside the
+    cutoff, once to build the histogram, and once more to apply the equalization, the masks are only sliced by rows
+    """
+
+    mask_to_use = mask_to_equalize if valid_data_mask is None else valid_data_mask
+    chunks = list(row_chunks(data.shape[0], rows_per_chunk))
+
+    log.debug("    determining DNB data range for histogram equalization")
+    # combine the average and sum of squared differences of each chunk
+    count, avg, squared_diff_sum = 0, 0.0, 0.0
+    for rows in chunks :
+        chunk_data = data[rows][mask_to_use[rows]].astype(numpy.float64)
+        if not chunk_data.size :
+            continue
+        chunk_avg = chunk_data.mean()
+        delta = chunk_avg - avg
+        total = count + chunk_data.size
+        avg += delta * chunk_data.size / total
+        squared_diff_sum += ((chunk_data - chunk_avg) ** 2).sum() + delta * delta * count * chunk_data.size / total
+        count = total
+    std = numpy.sqrt(squared_diff_sum / count) if count else numpy.nan
+
+    def _concervative_data(rows):
+        chunk_data = data[rows][mask_to_use[rows]]
+        # limit our range to +/- std_mult_cutoff*std; e.g. the default std_mult_cutoff is 4.0 so about 99.8% of the data
+        if std_mult_cutoff is not None :
+            chunk_data = chunk_data[(chunk_data < (avg + std*std_mult_cutoff)) & (chunk_data > (avg - std*std_mult_cutoff))]
+        return chunk_data
+
+    # the histogram range has to be known before any chunk is binned
+    first_edge, last_edge = None, None
+    for rows in chunks :
+        chunk_data = _concervative_data(rows)
+        if chunk_data.size :
+            first_edge = chunk_data.min() if first_edge is None else min(first_edge, chunk_data.min())
+            last_edge = chunk_data.max() if last_edge is None else max(last_edge, chunk_data.max())
+    # numpy.histogram's range for no data
+    histogram_range = (0, 1) if first_edge is None else (first_edge, last_edge)
+
+    log.debug("    running histogram equalization")
+    temp_histogram = numpy.zeros((number_of_bins,), dtype=numpy.int64)
+    temp_bins = None
+    num_values = 0
+    for rows in chunks :
+        chunk_data = _concervative_data(rows)
+        chunk_histogram, temp_bins = numpy.histogram(chunk_data, number_of_bins, range=histogram_range)
+        temp_histogram += chunk_histogram
+        num_values += chunk_data.size
+    cumulative_dist_function = _cumulative_dist_functions(temp_histogram[None, :], numpy.array([num_values]),
+                                                          number_of_bins, clip_limit=clip_limit,
+                                                          slope_limit=slope_limit)[0]
+
+    # linearly interpolate using the distribution function to get the new values
+    for rows in chunks :
+        chunk_mask = mask_to_equalize[rows]
+        chunk_out = out[rows]
+        chunk_out[chunk_mask] = numpy.interp(data[rows][chunk_mask], temp_bins[:-1], cumulative_dist_function)
+        # if we were asked to, normalize our data to be between zero and one, rather than zero and number_of_bins
+        if do_zerotoone_normalization :
+            _linear_normalization_from_0to1 (chunk_out, chunk_mask, number_of_bins)
+
+    return out
+
 def local_histogram_equalization (data, mask_to_equalize, valid_data_mask=None, number_of_bins=1000,
                                   std_mult_cutoff=3.0,
                                   do_zerotoone_normalization=True,
@@ -90,6 +198,242 @@ def local_histogram_equalization (data, mask_to_equalize, valid_data_mask=None,
     tiles of width/height (2 * local_radius_px + 1) will be calculated and results for each pixel will be bilinerarly interpolated from the nearest 4 tiles
     when pixels fall near the edge of the image (there is no adjacent tile) the resultant interpolated sum from the available tiles will be multipled to
     account for the weight of any missing tiles (pixel total interpolated value = pixel available interpolated value / (1 - missing interpolation weight))
+
+    if do_zerotoone_normalization is True the data will be scaled so that all data in the mask_to_equalize falls between 0 and 1; otherwise the data
+    in mask_to_equalize will all fall between 0 and number_of_bins
+
+    the work is done one row of tiles at a time with every tile in the row handled by the same numpy operations,
+    the results match `_local_histogram_equalization_loop` (the original tile by tile version) to within float32
+    rounding. the masks are only sliced by rows (see `RowMask`) and data and out can be memory mapped files so
+    only a few rows of tiles are in memory at once
+
+    returns the equalized data
+    """
+
+    out = out if out is not None else numpy.zeros_like(data)
+    # if we don't have a valid mask, use the mask of what we should be equalizing
+    if valid_data_mask is None:
+        valid_data_mask = mask_to_equalize
+
+    # calculate some useful numbers for our tile math
+    total_rows = data.shape[0]
+    total_cols = data.shape[1]
+    tile_size = int((local_radius_px * 2.0) + 1.0)
+    row_tiles = int(total_rows / tile_size) if (total_rows % tile_size is 0) else int(total_rows / tile_size) + 1
+    col_tiles = int(total_cols / tile_size) if (total_cols % tile_size is 0) else int(total_cols / tile_size) + 1
+
+    # histogram every tile, one row of tiles at a time
+    histograms = numpy.zeros((row_tiles * col_tiles, number_of_bins), dtype=numpy.int64)
+    bin_edges = numpy.zeros((row_tiles * col_tiles, number_of_bins + 1), dtype=numpy.float64)
+    counts = numpy.zeros((row_tiles * col_tiles,), dtype=numpy.int64)
+    for num_row_tile in range(row_tiles) :
+        min_row = num_row_tile * tile_size
+        max_row = min_row + tile_size
+        tiles = slice(num_row_tile * col_tiles, (num_row_tile + 1) * col_tiles)
+        histograms[tiles], bin_edges[tiles], counts[tiles] = _tile_histograms(data[min_row:max_row],
+                                                                              valid_data_mask[min_row:max_row],
+                                                                              tile_size, col_tiles, number_of_bins,
+                                                                              std_mult_cutoff=std_mult_cutoff,
+                                                                              do_log_scale=do_log_scale,
+                                                                              log_offset=log_offset)
+
+    # tiles without any valid data don't have an equalization, their weight is made up for by the other tiles
+    has_cdf = counts > 0
+    cumulative_dist_functions = numpy.zeros(histograms.shape, dtype=numpy.float64)
+    if has_cdf.any():
+        cumulative_dist_functions[has_cdf] = _cumulative_dist_functions(histograms[has_cdf], counts[has_cdf],
+                                                                        number_of_bins, clip_limit=clip_limit,
+                                                                        slope_limit=slope_limit)
+
+    # get the tile weight array so we can use it to interpolate our data
+    tile_weights = _get_tile_weights(tile_size)
+
+    # interpolate the equalized data one row of tiles at a time
+    for num_row_tile in range(row_tiles) :
+        min_row = num_row_tile * tile_size
+        max_row = min_row + tile_size
+        rows, cols = numpy.nonzero(mask_to_equalize[min_row:max_row])
+        if not rows.size:
+            continue
+
+        data_to_equalize = data[min_row:max_row][rows, cols]
+        if do_log_scale:
+            with numpy.errstate(invalid="ignore", divide="ignore"):
+                data_to_equalize = numpy.log(data_to_equalize + log_offset)
+        tile_cols = cols // tile_size
+        tile_pixel_cols = cols % tile_size
+
+        # the weighted sum of the equalizations from the surrounding tiles and the weight of the missing tiles
+        weighted_sum = numpy.zeros(data_to_equalize.shape, dtype=numpy.float64)
+        unused_weight = numpy.zeros(data_to_equalize.shape, dtype=tile_weights.dtype)
+
+        for weight_row in range(3):
+            calculated_row = num_row_tile - 1 + weight_row
+            for weight_col in range(3):
+                weights = tile_weights[weight_row, weight_col][rows, tile_pixel_cols]
+                calculated_cols = tile_cols - 1 + weight_col
+                tile_exists = (calculated_row >= 0) & (calculated_row < row_tiles) & \
+                              (calculated_cols >= 0) & (calculated_cols < col_tiles)
+                calculated_tiles = numpy.where(tile_exists, calculated_row * col_tiles + calculated_cols, 0)
+                tile_exists &= has_cdf[calculated_tiles]
+                unused_weight[~tile_exists] -= weights[~tile_exists]
+
+                # only interpolate the pixels this tile has a weight for
+                use_tile = tile_exists & (weights != 0)
+                if use_tile.any():
+                    weighted_sum[use_tile] += weights[use_tile] * _interpolate_tiles(data_to_equalize[use_tile],
+                                                                                     calculated_tiles[use_tile],
+                                                                                     bin_edges,
+                                                                                     cumulative_dist_functions)
+
+        # scale our values to correct for any unused weight
+        # TODO, if the mask masks everything out this will be a zero!
+        weighted_sum /= unused_weight + 1
+        out_rows = out[min_row:max_row]
+        out_rows[rows, cols] = weighted_sum
+
+        # if we were asked to, normalize our data to be between zero and one, rather than zero and number_of_bins
+        if do_zerotoone_normalization :
+            out_rows[rows, cols] /= number_of_bins
+
+    return out
+
+def _tile_histograms (data, valid_data_mask, tile_size, col_tiles, number_of_bins,
+                      std_mult_cutoff=None, do_log_scale=False, log_offset=None) :
+    """
+    histogram the valid data in each tile of one row of tiles (data and valid_data_mask are that row's rows)
+    the data is selected and histogrammed the same way as `_local_histogram_equalization_loop` does for each tile
+
+    returns the histograms, bin edges, and the number of pixels histogrammed with one row per tile
+    """
+
+    # rearrange the tiles so each tile's pixels are contiguous, the padding is never valid
+    tile_data = numpy.zeros((tile_size, col_tiles * tile_size), dtype=data.dtype)
+    tile_data[:data.shape[0], :data.shape[1]] = data
+    tile_data = tile_data.reshape(tile_size, col_tiles, tile_size).swapaxes(0, 1)
+    tile_mask = numpy.zeros((tile_size, col_tiles * tile_size), dtype=numpy.bool_)
+    tile_mask[:data.shape[0], :data.shape[1]] = valid_data_mask
+    tile_mask = tile_mask.reshape(tile_size, col_tiles, tile_size).swapaxes(0, 1)
+
+    tile_mask &= tile_data >= 0 # TEMP, testing to see if negative data is messing everything up
+    tile_ids = numpy.nonzero(tile_mask)[0]
+    valid_data = tile_data[tile_mask]
+
+    # limit the contrast by only considering data within a certain range of each tile's average
+    if std_mult_cutoff is not None :
+        counts = numpy.maximum(numpy.bincount(tile_ids, minlength=col_tiles), 1)
+        avg = numpy.bincount(tile_ids, weights=valid_data, minlength=col_tiles) / counts
+        deviation = valid_data - avg[tile_ids]
+        std = numpy.sqrt(numpy.bincount(tile_ids, weights=deviation * deviation, minlength=col_tiles) / counts)
+        concervative_mask = (valid_data < (avg + std * std_mult_cutoff)[tile_ids]) & \
+                            (valid_data > (avg - std * std_mult_cutoff)[tile_ids])
+        valid_data = valid_data[concervative_mask]
+        tile_ids = tile_ids[concervative_mask]
+
+    # if we are taking the log of our data, do so now
+    if do_log_scale :
+        valid_data = numpy.log(valid_data + log_offset)
+    valid_data = valid_data.astype(numpy.float64)
+
+    # the range of each tile's histogram (the data is still grouped by tile)
+    counts = numpy.bincount(tile_ids, minlength=col_tiles)
+    has_data = counts > 0
+    first_edge = numpy.zeros((col_tiles,), dtype=numpy.float64)
+    last_edge = numpy.zeros((col_tiles,), dtype=numpy.float64)
+    if has_data.any():
+        tile_starts = (numpy.cumsum(counts) - counts)[has_data]
+        first_edge[has_data] = numpy.minimum.reduceat(valid_data, tile_starts)
+        last_edge[has_data] = numpy.maximum.reduceat(valid_data, tile_starts)
+    single_value = first_edge == last_edge
+    first_edge[single_value] -= 0.5
+    last_edge[single_value] += 0.5
+    bin_width = (last_edge - first_edge) / number_of_bins
+    bin_edges = first_edge[:, None] + numpy.arange(number_of_bins + 1) * bin_width[:, None]
+    bin_edges[:, -1] = last_edge
+
+    # bin the data the same way numpy.histogram does for evenly spaced bins
+    norm = number_of_bins / (last_edge - first_edge)
+    bin_index = ((valid_data - first_edge[tile_ids]) * norm[tile_ids]).astype(numpy.intp)
+    bin_index[bin_index == number_of_bins] -= 1
+    bin_index[valid_data < bin_edges[tile_ids, bin_index]] -= 1
+    bin_index[(valid_data >= bin_edges[tile_ids, bin_index + 1]) & (bin_index != number_of_bins - 1)] += 1
+    histograms = numpy.bincount(tile_ids * number_of_bins + bin_index, minlength=col_tiles * number_of_bins)
+
+    return histograms.reshape(col_tiles, number_of_bins), bin_edges, counts
+
+def _cumulative_dist_functions (histograms, counts, number_of_bins, clip_limit=None, slope_limit=None) :
+    """
+    calculate the cumulative distribution function for every histogram (one per row) at once
+    this is the same calculation as `_histogram_equalization_helper`, counts are the number of values in each histogram
+
+    returns the cumulative distribution functions
+    """
+
+    counts = counts.astype(numpy.float64)
+
+    # clip our histograms
+    if (clip_limit is not None) :
+        pixels_to_clip_at = (clip_limit * (counts / float(number_of_bins))).astype(histograms.dtype)[:, None]
+        histograms = numpy.where(histograms > pixels_to_clip_at, pixels_to_clip_at, histograms)
+
+    cumulative_dist_functions = histograms.cumsum(axis=1)
+
+    # clip our cdfs
+    if (slope_limit is not None) :
+        pixel_height_limit = (slope_limit * (counts / float(number_of_bins))).astype(histograms.dtype)
+        cumulative_dist_functions = limit_cdf_slope(cumulative_dist_functions, pixel_height_limit[:, None])
+
+    # now normalize the overall distribution functions
+    return (number_of_bins - 1) * cumulative_dist_functions / cumulative_dist_functions[:, -1:]
+
+def _interpolate_tiles (data, tile_ids, bin_edges, cumulative_dist_functions) :
+    """
+    equalize each value of data with the equalization of the tile in tile_ids for that value, this is
+    numpy.interp(data, bin_edges[tile][:-1], cumulative_dist_functions[tile]) for each value's tile
+
+    returns the equalized data
+    """
+
+    number_of_bins = cumulative_dist_functions.shape[1]
+    first_edge = bin_edges[tile_ids, 0]
+    last_edge = bin_edges[tile_ids, -2]
+
+    # the bins are evenly spaced so the interval for each value can be calculated instead of searched for
+    with numpy.errstate(invalid="ignore"):
+        index = (data - first_edge) * (number_of_bins / (bin_edges[tile_ids, -1] - first_edge))
+    index = numpy.clip(numpy.nan_to_num(index), 0, number_of_bins - 2).astype(numpy.intp)
+    index[(data < bin_edges[tile_ids, index]) & (index > 0)] -= 1
+    index[(data >= bin_edges[tile_ids, index + 1]) & (index < number_of_bins - 2)] += 1
+
+    left_edge = bin_edges[tile_ids, index]
+    left_cdf = cumulative_dist_functions[tile_ids, index]
+    slope = (cumulative_dist_functions[tile_ids, index + 1] - left_cdf) / (bin_edges[tile_ids, index + 1] - left_edge)
+    equalized_data = slope * (data - left_edge) + left_cdf
+
+    # values outside of the bins get the first or last value of the cdf
+    with numpy.errstate(invalid="ignore"):
+        equalized_data[data < first_edge] = cumulative_dist_functions[tile_ids, 0][data < first_edge]
+        equalized_data[data >= last_edge] = cumulative_dist_functions[tile_ids, -1][data >= last_edge]
+    return equalized_data
+
+def _local_histogram_equalization_loop (data, mask_to_equalize, valid_data_mask=None, number_of_bins=1000,
+                                  std_mult_cutoff=3.0,
+                                  do_zerotoone_normalization=True,
+                                  local_radius_px=300,
+                                  clip_limit=60.0, #20.0,
+                                  slope_limit=3.0, #0.5,
+                                  do_log_scale=True,
+                                  log_offset=0.00001, # can't take the log of zero, so the offset may be needed; pass 0.0 if your data doesn't need it
+                                  out=None
+                                  ) :
+    """
+    tile by tile version of `local_histogram_equalization`, kept as a reference to test and benchmark the
+    vectorized version against
+
+    equalize the provided data (in the mask_to_equalize) using adaptive histogram equalization
+    tiles of width/height (2 * local_radius_px + 1) will be calculated and results for each pixel will be bilinerarly interpolated from the nearest 4 tiles
+    when pixels fall near the edge of the image (there is no adjacent tile) the resultant interpolated sum from the available tiles will be multipled to
+    account for the weight of any missing tiles (pixel total interpolated value = pixel available interpolated value / (1 - missing interpolation weight))
     
     if do_zerotoone_normalization is True the data will be scaled so that all data in the mask_to_equalize falls between 0 and 1; otherwise the data
     in mask_to_equalize will all fall between 0 and number_of_bins
@@ -164,7 +508,7 @@ def local_histogram_equalization (data, mask_to_equalize, valid_data_mask=None,
             all_bin_information          [num_row_tile].append(temp_bins)
     
     # get the tile weight array so we can use it to interpolate our data
-    tile_weights = _calculate_weights(tile_size)
+    tile_weights = _get_tile_weights(tile_size)
     
     # now loop through our tiles and linearly interpolate the equalized versions of the data
     for num_row_tile in range(row_tiles) :
@@ -255,36 +599,17 @@ def _histogram_equalization_helper (valid_data, number_of_bins, clip_limit=None,
     # if we have a clip limit and we should do our clipping before building the cumulative distribution function, clip off our histogram
     if (clip_limit is not None) :
         
-        # clip our histogram and remember how much we removed
+        # clip our histogram
         pixels_to_clip_at            = int(clip_limit * (valid_data.size / float(number_of_bins)))
-        mask_to_clip                 = temp_histogram > clip_limit
-        num_bins_clipped             = sum(mask_to_clip)
-        num_pixels_clipped           = sum(temp_histogram[mask_to_clip]) - (num_bins_clipped * pixels_to_clip_at)
-        temp_histogram[mask_to_clip] = pixels_to_clip_at
+        temp_histogram[temp_histogram > pixels_to_clip_at] = pixels_to_clip_at
     
     # calculate the cumulative distribution function
     cumulative_dist_function  = temp_histogram.cumsum()
     
-    # if we have a clip limit and we should do our clipping after building the cumulative distribution function, clip off our cdf
+    # if we have a slope limit, clip off our cdf
     if (slope_limit is not None) :
-        
-        # clip our cdf and remember how much we removed
         pixel_height_limit       = int(slope_limit * (valid_data.size / float(number_of_bins)))
-        cumulative_excess_height = 0
-        num_clipped_pixels       = 0
-        weight_metric            = numpy.zeros(cumulative_dist_function.shape, dtype=float)
-        
-        for pixel_index in range(1, cumulative_dist_function.size) :
-            
-            current_pixel_count = cumulative_dist_function[pixel_index]
-            
-            diff_from_acceptable      = (current_pixel_count - cumulative_dist_function[pixel_index-1] -
-                                              pixel_height_limit - cumulative_excess_height)
-            if diff_from_acceptable < 0:
-                weight_metric[pixel_index] = abs(diff_from_acceptable)
-            cumulative_excess_height += max( diff_from_acceptable, 0)
-            cumulative_dist_function[pixel_index] = current_pixel_count - cumulative_excess_height
-            num_clipped_pixels = num_clipped_pixels + cumulative_excess_height
+        cumulative_dist_function = limit_cdf_slope(cumulative_dist_function, pixel_height_limit)
     
     # now normalize the overall distribution function
     cumulative_dist_function  = (number_of_bins - 1) * cumulative_dist_function / cumulative_dist_function[-1]
@@ -292,6 +617,23 @@ def _histogram_equalization_helper (valid_data, number_of_bins, clip_limit=None,
     # return what someone else will need in order to apply the equalization later
     return cumulative_dist_function, temp_bins
 
+def limit_cdf_slope (cumulative_dist_function, pixel_height_limit) :
+    """
+    limit the increase from one bin to the next of a cumulative distribution function to pixel_height_limit
+    the excess above the limit is removed from that bin and every bin after it, the first bin is not limited
+
+    the last axis is the bins so several distribution functions can be limited at once by passing a 2D array
+    and a pixel_height_limit for each one (shaped (N, 1))
+
+    returns a new limited cumulative distribution function
+    """
+
+    cumulative_dist_function = numpy.asarray(cumulative_dist_function)
+    excess = numpy.maximum(numpy.diff(cumulative_dist_function, axis=-1) - pixel_height_limit, 0)
+    limited_cdf = cumulative_dist_function.copy()
+    limited_cdf[..., 1:] -= excess.cumsum(axis=-1).astype(limited_cdf.dtype)
+    return limited_cdf
+
 def _calculate_weights (tile_size) :
     """
     calculate a weight array that will be used to quickly bilinearly-interpolate the histogram equalizations
@@ -385,6 +727,17 @@ def _calculate_weights (tile_size) :
     # return the weights for an ideal center tile
     return template_tile
 
+# the tile weights only depend on the tile size and are slow to calculate
+_tile_weights_cache = {}
+
+def _get_tile_weights (tile_size) :
+    """
+    get the weight array from `_calculate_weights` for this tile size, calculating it only once per tile size
+    """
+    if tile_size not in _tile_weights_cache :
+        _tile_weights_cache[tile_size] = _calculate_weights(tile_size)
+    return _tile_weights_cache[tile_size]
+
 def _linear_normalization_from_0to1 (data, mask, theoretical_max, theoretical_min=0, message="    normalizing equalized data to fit in 0 to 1 range") :
                                                                                             #"    normalizing DNB data into 0 to 1 range") :
     """
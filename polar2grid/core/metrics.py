@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Record the time and resources used by each stage of a polar2grid run.
+
+Stages are recorded with the module wide `metrics` object::
+
+    with metrics.stage("ll2cr", swath_name=geo_id, grid_name=grid_name):
+        ...
+
+Each stage records its wall time, CPU time, the process's peak resident memory (RSS) at the end of the stage, and
+the bytes read from and written to storage during the stage (from ``/proc/self/io`` when available). CPU time and
+I/O are counted for the whole process so stages running at the same time in different threads (background
+writing) include each other's usage.
+
+:license:      GNU GPLv3
+"""
+__docformat__ = "restructuredtext en"
+
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+LOG = logging.getLogger(__name__)
+
+
+def _proc_io():
+    try:
+        with open("/proc/self/io", "r") as f:
+            fields = dict(line.split(":") for line in f if ":" in line)
+        return int(fields["read_bytes"]), int(fields["write_bytes"])
+    except (IOError, KeyError, ValueError):
+        return None, None
+
+
+def resource_usage():
+    """Get the CPU time, peak RSS in bytes, and bytes read and written by this process so far.
+
+    Values that can't be determined on this platform are None.
+    """
+    cpu_time = peak_rss = None
+    if resource is not None:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_time = usage.ru_utime + usage.ru_stime
+        # kilobytes on Linux, bytes on Mac OSX
+        peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    read_bytes, write_bytes = _proc_io()
+    return cpu_time, peak_rss, read_bytes, write_bytes
+
+
+def _diff(end, start):
+    return None if end is None or start is None else end - start
+
+
+class StageMetrics(object):
+    """Collection of measured stages for one polar2grid run."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget recorded stages and start timing a new run."""
+        with self._lock:
+            self.stages = []
+        self.start_time = time.time()
+        self.start_usage = resource_usage()
+        # set by scripts that want the stages saved to a JSON file (see `finish`)
+        self.filename = None
+
+    @contextmanager
+    def stage(self, name, **info):
+        """Measure the code run in this context as stage `name`.
+
+        :param info: extra information to include in the stage's record (product names, grid name, etc.)
+        """
+        start_time = time.time()
+        start_cpu, _, start_read, start_write = resource_usage()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            end_cpu, peak_rss, end_read, end_write = resource_usage()
+            record = OrderedDict([
+                ("name", name),
+                ("start_time", start_time),
+                ("wall_time", time.time() - start_time),
+                ("cpu_time", _diff(end_cpu, start_cpu)),
+                ("peak_rss", peak_rss),
+                ("read_bytes", _diff(end_read, start_read)),
+                ("write_bytes", _diff(end_write, start_write)),
+                ("pid", os.getpid()),
+                ("failed", failed),
+            ])
+            record.update(info)
+            self.add_stages([record])
+
+    def add_stages(self, stages):
+        """Add stages recorded somewhere else (ex. a worker process)."""
+        with self._lock:
+            self.stages.extend(stages)
+
+    def summary(self):
+        """Total the recorded stages with the same name.
+
+        :returns: list of dictionaries in the order each stage was first recorded
+        """
+        totals = OrderedDict()
+        for record in self.stages:
+            total = totals.setdefault(record["name"], OrderedDict([
+                ("name", record["name"]), ("count", 0), ("wall_time", 0.), ("cpu_time", 0.), ("peak_rss", 0),
+                ("read_bytes", 0), ("write_bytes", 0)]))
+            total["count"] += 1
+            for key in ("wall_time", "cpu_time", "read_bytes", "write_bytes"):
+                if record[key] is None or total[key] is None:
+                    total[key] = None
+                else:
+                    total[key] += record[key]
+            total["peak_rss"] = max(total["peak_rss"], record["peak_rss"] or 0)
+        return totals.values()
+
+    def totals(self):
+        """Wall time, CPU time, and I/O since `reset` and the peak RSS of any recorded stage."""
+        end_cpu, peak_rss, end_read, end_write = resource_usage()
+        start_cpu, _, start_read, start_write = self.start_usage
+        # worker processes have their own CPU time and memory
+        worker_stages = [s for s in self.stages if s["pid"] != os.getpid()]
+        cpu_time = _diff(end_cpu, start_cpu)
+        if cpu_time is not None:
+            cpu_time += sum(s["cpu_time"] or 0. for s in worker_stages)
+        peak_rss = max([peak_rss or 0] + [s["peak_rss"] or 0 for s in self.stages])
+        return OrderedDict([
+            ("wall_time", time.time() - self.start_time),
+            ("cpu_time", cpu_time),
+            ("peak_rss", peak_rss),
+            ("read_bytes", _diff(end_read, start_read)),
+            ("write_bytes", _diff(end_write, start_write)),
+        ])
+
+    def log_summary(self, logger=LOG):
+        def _mb(num_bytes):
+            return "-" if num_bytes is None else "%0.1f" % (num_bytes / 1024. ** 2,)
+
+        def _sec(seconds):
+            return "-" if seconds is None else "%0.3f" % (seconds,)
+
+        logger.info("%-20s %6s %10s %10s %10s %10s %10s", "stage", "count", "wall (s)", "cpu (s)", "rss (MB)",
+                    "read (MB)", "write (MB)")
+        for total in self.summary() + [dict(self.totals(), name="total", count=1)]:
+            logger.info("%-20s %6d %10s %10s %10s %10s %10s", total["name"], total["count"],
+                        _sec(total["wall_time"]), _sec(total["cpu_time"]), _mb(total["peak_rss"]),
+                        _mb(total["read_bytes"]), _mb(total["write_bytes"]))
+
+    def save(self, filename, **info):
+        """Save the recorded stages, their summary, and the run's totals to a JSON file.
+
+        :param info: extra information about the run to include in the file
+        """
+        report = OrderedDict(info)
+        report["start_time"] = self.start_time
+        report["totals"] = self.totals()
+        report["summary"] = self.summary()
+        report["stages"] = self.stages
+        with open(filename, "w") as f:
+            json.dump(report, f, indent=2)
+
+    def finish(self, logger=LOG, **info):
+        """Log the summary of the recorded stages and save them if a `filename` was set."""
+        if not self.stages:
+            return
+        self.log_summary(logger)
+        if self.filename:
+            try:
+                self.save(self.filename, **info)
+            except (IOError, OSError):
+                logger.error("Could not write metrics file '%s'", self.filename)
+                logger.debug("Metrics file exception: ", exc_info=True)
+
+
+# stages recorded by the current run
+metrics = StageMetrics()
@@ -53,11 +53,13 @@ import sys
 import logging
 import numpy
 
-from polar2grid.core.dtype import dtype_to_str, dtype2range
+from polar2grid.core.dtype import dtype_to_str, dtype2range, str2dtype
 from . import roles
 
 LOG = logging.getLogger(__name__)
 DEFAULT_RCONFIG = "polar2grid.core:rescale_configs/rescale.ini"
+# rows of a grid rescaled at a time by `Rescaler.rescale_product_to_data_type`, small enough to stay in the CPU cache
+DEFAULT_BLOCK_ROWS = 64
 
 
 def mask_helper(img, fill_value):
@@ -273,10 +275,13 @@ def linear_brightness_temperature_scale(img, min_out, max_out, min_in=None, max_
     """Linearly scale brightness temperatures.
 
     :param units: If 'celsius', convert 'in' parameters from kelvin to degrees celsius before performing calculations.
+                  Parameters that aren't provided are computed from the data which is already in celsius.
     """
     if units == "celsius":
-        min_in -= 273.15
-        max_in -= 273.15
+        if min_in is not None:
+            min_in -= 273.15
+        if max_in is not None:
+            max_in -= 273.15
     return linear_flexible_scale(img, min_out, max_out, min_in, max_in, flip=flip, **kwargs)
 
 
@@ -383,6 +388,27 @@ class Rescaler(roles.INIConfigReader):
         'lookup': lookup_scale,
         'debug': debug_scale,
     }
+    # methods where each output pixel only depends on the input pixel so a grid can be rescaled a block at a time
+    blockwise_methods = {
+        'linear',
+        'linear_basic',
+        'brightness_temperature',
+        'linear_brightness_temperature',
+        'sqrt',
+        'temperature_difference',
+        'raw',
+        'lst',
+        'ctt',
+        'ndvi',
+        'unlinear',
+        'lookup',
+        'debug',
+    }
+    # blockwise methods that use the range of the whole grid when `min_in` or `max_in` aren't configured
+    grid_range_methods = {
+        'linear',
+        'linear_brightness_temperature',
+    }
 
     def __init__(self, *rescale_configs, **kwargs):
         kwargs["section_prefix"] = kwargs.get("section_prefix", "rescale:")
@@ -416,6 +442,8 @@ class Rescaler(roles.INIConfigReader):
 
     def register_rescale_method(self, name, func, **kwargs):
         self.rescale_methods[name] = (func, kwargs)
+        # we don't know if the new method can be done a block at a time
+        self.blockwise_methods = self.blockwise_methods - {name}
 
     def _rescale_data(self, method, data, good_data_mask, rescale_options, fill_value, clip=True, mask_clip=None, inc_by_one=False,
                       clip_zero=False):
@@ -476,13 +504,20 @@ class Rescaler(roles.INIConfigReader):
         return rescale_options
 
     def rescale_product(self, gridded_product, data_type, inc_by_one=False, fill_value=None, rescale_options=None,
-                        clip_zero=False):
+                        clip_zero=False, out=None, block_rows=DEFAULT_BLOCK_ROWS):
         """Rescale a gridded product based on how the rescaler is configured.
 
         The caller should know if it wants to increment the output data by 1 (`inc_by_one` keyword).
 
+        If `out` is provided the grid is rescaled `block_rows` rows at a time straight from the product's grid file
+        into `out` (ex. the backend's output buffer or a memory mapped file) so the whole grid is never copied into
+        memory. Methods that can't be done a block at a time (see `blockwise_methods`) are still rescaled as a whole
+        grid and copied to `out`.
+
         :param data_type: Desired data type of the output data
         :param inc_by_one: After rescaling should 1 be added to all data values to leave the minumum value as the fill
+        :param out: Array to write the rescaled data to
+        :returns: rescaled data (`out` if provided)
 
         FUTURE: dec_by_one (mutually exclusive to inc_by_one)
 
@@ -490,6 +525,10 @@ class Rescaler(roles.INIConfigReader):
         if rescale_options is None:
             rescale_options = self.get_rescale_options(gridded_product, data_type, inc_by_one, fill_value)
 
+        if out is not None and self._rescale_blocks(gridded_product, rescale_options, fill_value, out,
+                                                    clip_zero=clip_zero, block_rows=block_rows) is not None:
+            return out
+
         method = rescale_options.pop("method")
         # if the configuration file didn't force these then provide a logical default
         clip = rescale_options.pop("clip", True)
@@ -499,11 +538,10 @@ class Rescaler(roles.INIConfigReader):
         data = gridded_product.copy_array(read_only=False)
         good_data_mask = ~gridded_product.get_data_mask()
         if rescale_options.get("separate_rgb", True) and data.ndim == 3:
-            data = numpy.concatenate((
-                [self._rescale_data(method, data[0], good_data_mask[0], rescale_options, fill_value, clip=clip, mask_clip=mask_clip, inc_by_one=inc_by_one, clip_zero=clip_zero)],
-                [self._rescale_data(method, data[1], good_data_mask[1], rescale_options, fill_value, clip=clip, mask_clip=mask_clip, inc_by_one=inc_by_one, clip_zero=clip_zero)],
-                [self._rescale_data(method, data[2], good_data_mask[2], rescale_options, fill_value, clip=clip, mask_clip=mask_clip, inc_by_one=inc_by_one, clip_zero=clip_zero)],
-            ))
+            # each band is rescaled in place
+            for band_data, band_mask in zip(data, good_data_mask):
+                self._rescale_data(method, band_data, band_mask, rescale_options, fill_value, clip=clip,
+                                   mask_clip=mask_clip, inc_by_one=inc_by_one, clip_zero=clip_zero)
         else:
             data = self._rescale_data(method, data, good_data_mask, rescale_options, fill_value,
                                       clip=clip, mask_clip=mask_clip, inc_by_one=inc_by_one, clip_zero=clip_zero)
@@ -517,8 +555,124 @@ class Rescaler(roles.INIConfigReader):
             except StandardError:
                 LOG.debug("Couldn't get min/max values for %s (all fill data?)", gridded_product["product_name"])
 
+        if out is not None:
+            out[...] = data
+            return out
         return data
 
+    def _grid_range(self, data, fill_value, block_rows):
+        """Get the minimum and maximum valid value of a grid a block of rows at a time.
+
+        :returns: (min, max) or (None, None) if there is no valid data
+        """
+        min_in, max_in = None, None
+        for start_row in range(0, data.shape[-2], block_rows):
+            block = data[..., start_row:start_row + block_rows, :]
+            good_data = block[~mask_helper(block, fill_value)]
+            if good_data.size:
+                min_in = numpy.nanmin(good_data) if min_in is None else min(min_in, numpy.nanmin(good_data))
+                max_in = numpy.nanmax(good_data) if max_in is None else max(max_in, numpy.nanmax(good_data))
+        return min_in, max_in
+
+    def _rescale_blocks(self, gridded_product, rescale_options, fill_value, out, clip_zero=False,
+                        block_rows=DEFAULT_BLOCK_ROWS, data_range=None, output_fill=None):
+        """Rescale a gridded product `block_rows` rows at a time into `out`.
+
+        RGB (3 dimensional) products are rescaled a band at a time unless 'separate_rgb' is configured as False.
+        Methods in `grid_range_methods` without a configured `min_in` or `max_in` get them from an extra pass over
+        the grid (or band) before it is rescaled.
+
+        :param data_range: (min, max) to clip the rescaled data to before it is written to `out`
+        :param output_fill: value written to `out` where the gridded product is fill after everything else
+        :returns: `out` or None if the product has to be rescaled as a whole grid
+        """
+        rescale_options = rescale_options.copy()
+        method = rescale_options.pop("method")
+        if method not in self.blockwise_methods:
+            return None
+        clip = rescale_options.pop("clip", True)
+        mask_clip = rescale_options.pop("mask_clip", None)
+        inc_by_one = rescale_options.pop("inc_by_one")
+
+        data = gridded_product.get_data_array()
+        grid_fill = gridded_product["fill_value"]
+        if data.ndim == 3 and rescale_options.get("separate_rgb", True):
+            bands = [(idx,) for idx in range(data.shape[0])]
+        else:
+            bands = [()]
+
+        for band in bands:
+            band_data = data[band]
+            band_out = out[band]
+            band_options = rescale_options
+            if method in self.grid_range_methods and (rescale_options.get("min_in") is None or
+                                                      rescale_options.get("max_in") is None):
+                min_in, max_in = self._grid_range(band_data, grid_fill, block_rows)
+                if min_in is None:
+                    # no valid data, let the whole grid rescaling handle it
+                    return None
+                band_options = rescale_options.copy()
+                if method == "linear_brightness_temperature" and band_options.get("units") == "celsius":
+                    # configured limits are in kelvin, limits from the grid are already in celsius
+                    for key in ("min_in", "max_in"):
+                        if band_options.get(key) is not None:
+                            band_options[key] -= 273.15
+                    band_options["units"] = "kelvin"
+                if band_options.get("min_in") is None:
+                    band_options["min_in"] = min_in
+                if band_options.get("max_in") is None:
+                    band_options["max_in"] = max_in
+
+            LOG.debug("Rescaling %s %d rows at a time", gridded_product["product_name"], block_rows)
+            for start_row in range(0, band_data.shape[-2], block_rows):
+                rows = slice(start_row, start_row + block_rows)
+                block = numpy.array(band_data[..., rows, :])
+                fill_mask = mask_helper(block, grid_fill)
+                block = self._rescale_data(method, block, ~fill_mask, band_options, fill_value, clip=clip,
+                                           mask_clip=mask_clip, inc_by_one=inc_by_one, clip_zero=clip_zero)
+                if data_range is not None:
+                    numpy.clip(block, data_range[0], data_range[1], out=block)
+                block_out = band_out[..., rows, :]
+                block_out[...] = block
+                if output_fill is not None:
+                    block_out[fill_mask] = output_fill
+        return out
+
+    def rescale_product_to_data_type(self, gridded_product, data_type, inc_by_one=False, fill_value=None,
+                                     rescale_options=None, clip_zero=False, out=None,
+                                     block_rows=DEFAULT_BLOCK_ROWS, output_fill=None):
+        """Rescale a gridded product and convert it to `data_type`.
+
+        Produces the same result as `rescale_product` followed by `polar2grid.core.dtype.clip_to_data_type`, but
+        one block of rows at a time. Each block is read from the grid file, rescaled, clipped to the data type's range,
+        and written to `out` while it is still in memory. The whole grid is never copied or passed over once per step.
+
+        Methods not in `blockwise_methods` are rescaled with the whole grid in memory.
+
+        :param out: Array to write the output to (ex. a memory mapped output file), created if not provided
+        :param output_fill: if provided, written to `out` where the gridded product is fill after clipping
+        :returns: `out`
+        """
+        if rescale_options is None:
+            rescale_options = self.get_rescale_options(gridded_product, data_type, inc_by_one, fill_value)
+        if not isinstance(data_type, (str, unicode)):
+            data_type = dtype_to_str(data_type)
+        rmin, rmax = dtype2range[data_type]
+        if out is None:
+            out = numpy.empty(gridded_product.get_data_array().shape, dtype=str2dtype[data_type])
+
+        if self._rescale_blocks(gridded_product, rescale_options, fill_value, out, clip_zero=clip_zero,
+                                block_rows=block_rows, data_range=(rmin, rmax), output_fill=output_fill) is None:
+            LOG.debug("Rescaling %s as a whole grid", gridded_product["product_name"])
+            rescaled_data = self.rescale_product(gridded_product, data_type, inc_by_one=inc_by_one,
+                                                 fill_value=fill_value, rescale_options=rescale_options,
+                                                 clip_zero=clip_zero)
+            numpy.clip(rescaled_data, rmin, rmax, out=rescaled_data)
+            out[...] = rescaled_data
+            if output_fill is not None:
+                out[gridded_product.get_data_mask()] = output_fill
+        return out
+
 
 def main():
     from argparse import ArgumentParser
@@ -40,6 +40,7 @@
 __docformat__ = "restructuredtext en"
 
 from polar2grid.core.dtype import dtype_to_str
+from polar2grid.core.metrics import metrics
 
 import os
 import sys
@@ -50,11 +51,7 @@ from StringIO import StringIO
 from ConfigParser import SafeConfigParser, Error as ConfigParserError
 from abc import ABCMeta, abstractmethod, abstractproperty
 
-try:
-    # try getting setuptools/distribute's version of resource retrieval first
-    from pkg_resources import resource_string as get_resource_string
-except ImportError:
-    from pkgutil import get_data as get_resource_string
+from polar2grid.core.entry_points import get_resource_string
 
 LOG = logging.getLogger(__name__)
 
@@ -488,6 +485,9 @@ class BackendRole(object):
     to a file format on disk.
     """
     __metaclass__ = ABCMeta
+    # backends that write every product of a gridded scene to the same output file set this to True so the scene
+    # isn't written by more than one process at a time
+    scene_per_file = False
 
     def __init__(self, overwrite_existing=False, keep_intermediate=False, exit_on_error=True, **kwargs):
         self.overwrite_existing = overwrite_existing
@@ -745,7 +745,8 @@ class BackendRole(object):
         output_filenames = []
         for product_name, gridded_product in gridded_scene.items():
             try:
-                output_fn = self.create_output_from_product(gridded_product, **kwargs)
+                with metrics.stage("backend_product", product_name=product_name):
+                    output_fn = self.create_output_from_product(gridded_product, **kwargs)
                 output_filenames.append(output_fn)
             except StandardError:
                 LOG.error("Could not create output for '%s'", product_name)
@@ -130,6 +130,123 @@ def rename_log_file(new_filename):
     LOG.debug("Log renamed from '%s' to '%s'", fn, new_filename)
 
 
+def get_log_filename():
+    """Return the filename of the current log file or None if there isn't one.
+    """
+    traceback_log = logging.getLogger('traceback')
+    if not traceback_log.handlers:
+        return None
+    return traceback_log.handlers[0].baseFilename
+
+
+def redirect_log_file(new_filename):
+    """Send log file messages to a new file leaving the current log file as is.
+
+    Used by worker processes so their messages can be added to the main log file later (see `merge_log_file`).
+    """
+    traceback_log = logging.getLogger('traceback')
+    if not traceback_log.handlers:
+        LOG.error("Tried to change the log filename, but no log file was configured")
+        raise RuntimeError("Tried to change the log filename, but no log file was configured")
+
+    h = traceback_log.handlers[0]
+    root_logger = logging.getLogger('')
+    root_logger.removeHandler(h)
+    traceback_log.removeHandler(h)
+    # the stream may be shared with another process, don't flush anything else to it
+    h.stream = None
+
+    file_handler = logging.FileHandler(new_filename, mode="w")
+    file_handler.setFormatter(h.formatter)
+    file_handler.setLevel(h.level)
+    root_logger.addHandler(file_handler)
+    traceback_log.addHandler(file_handler)
+
+
+def merge_log_file(filename):
+    """Append the contents of another log file to the current log file and remove it.
+    """
+    traceback_log = logging.getLogger('traceback')
+    if not traceback_log.handlers:
+        LOG.error("Tried to merge log files, but no log file was configured")
+        raise RuntimeError("Tried to merge log files, but no log file was configured")
+
+    h = traceback_log.handlers[0]
+    h.acquire()
+    try:
+        h.flush()
+        with open(filename, 'r') as other_file:
+            h.stream.write(other_file.read())
+        h.flush()
+    finally:
+        h.release()
+    os.remove(filename)
+
+
+def reset_logging():
+    """Remove and close the handlers added by `setup_logging` so it can be called again in the same process.
+    """
+    root_logger = logging.getLogger('')
+    traceback_log = logging.getLogger('traceback')
+    for logger in (root_logger, traceback_log):
+        for h in list(logger.handlers):
+            logger.removeHandler(h)
+            h.close()
+
+
+class ImportProfiler(object):
+    """Measure how long modules take to import while a script is starting up (``--profile-startup``).
+
+    Every import statement is timed while the profiler is started. Time spent importing other modules from inside a
+    module is counted in that module's total time, but not its own time.
+    """
+    def __init__(self):
+        import time
+        self._time = time.time
+        self.start_time = self._time()
+        self.import_times = {}
+        self._child_times = []
+        self._orig_import = None
+
+    def start(self):
+        import __builtin__
+        self._orig_import = __builtin__.__import__
+        __builtin__.__import__ = self._import
+
+    def stop(self):
+        import __builtin__
+        if self._orig_import is not None:
+            __builtin__.__import__ = self._orig_import
+            self._orig_import = None
+
+    def _import(self, name, *args, **kwargs):
+        num_modules = len(sys.modules)
+        self._child_times.append(0.)
+        start = self._time()
+        try:
+            return self._orig_import(name, *args, **kwargs)
+        finally:
+            elapsed = self._time() - start
+            child_time = self._child_times.pop()
+            if self._child_times:
+                self._child_times[-1] += elapsed
+            if len(sys.modules) > num_modules:
+                # something was actually imported, not just found in `sys.modules`
+                total_time, own_time = self.import_times.get(name, (0., 0.))
+                self.import_times[name] = (total_time + elapsed, own_time + elapsed - child_time)
+
+    def report(self, logger, limit=20):
+        """Log the total startup time and the modules that took the longest to import."""
+        elapsed = self._time() - self.start_time
+        import_time = sum(own_time for _, own_time in self.import_times.values())
+        logger.info("Startup took %0.3fs, %0.3fs of it importing %d modules", elapsed, import_time,
+                    len(self.import_times))
+        logger.info("%8s %8s  %s", "total", "self", "module")
+        slowest = sorted(self.import_times.items(), key=lambda x: x[1][0], reverse=True)
+        for name, (total_time, own_time) in slowest[:limit]:
+            logger.info("%7.3fs %7.3fs  %s", total_time, own_time, name)
+
+
 def create_exc_handler(glue_name):
     def exc_handler(exc_type, exc_value, traceback):
         """An execption handler/hook that will only be called if an exception
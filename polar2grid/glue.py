@@ -42,12 +42,14 @@ __docformat__ = "restructuredtext en"
 import sys
 
 import logging
-import numpy as np
-import pkg_resources
+import multiprocessing
+import os
 from polar2grid.readers import ReaderWrapper, convert_satpy_to_p2g_swath, convert_satpy_to_p2g_gridded
 from polar2grid.readers import dataset_to_gridded_product
 from polar2grid.remap import Remapper, add_remap_argument_groups, SATPY_RESAMPLERS
-from satpy import Scene, DatasetID, Dataset
+from polar2grid.core.containers import intermediate_arrays
+from polar2grid.core.metrics import metrics
+from polar2grid.core.entry_points import entry_points, load_entry_point
 
 ### Return Status Values ###
 STATUS_SUCCESS = 0
@@ -72,27 +74,35 @@ P2G_BACKEND_ARGS_EP = "polar2grid.backend_arguments"
 
 
 def available_frontends(entry_point=P2G_FRONTEND_CLS_EP):
-    return {frontend_ep.name: frontend_ep.dist for frontend_ep in pkg_resources.iter_entry_points(entry_point)}
+    return entry_points(entry_point)
 
 
 def available_backends(entry_point=P2G_BACKEND_CLS_EP):
-    return {backend_ep.name: backend_ep.dist for backend_ep in pkg_resources.iter_entry_points(entry_point)}
+    return entry_points(entry_point)
 
 
 def get_frontend_argument_func(frontends, name, entry_point=P2G_FRONTEND_ARGS_EP):
-    return pkg_resources.load_entry_point(frontends[name], entry_point, name)
+    return load_entry_point(entry_point, name)
 
 
 def get_frontend_class(frontends, name, entry_point=P2G_FRONTEND_CLS_EP):
-    return pkg_resources.load_entry_point(frontends[name], entry_point, name)
+    return load_entry_point(entry_point, name)
 
 
 def get_backend_argument_func(backends, name, entry_point=P2G_BACKEND_ARGS_EP):
-    return pkg_resources.load_entry_point(backends[name], entry_point, name)
+    return load_entry_point(entry_point, name)
 
 
 def get_backend_class(backends, name, entry_point=P2G_BACKEND_CLS_EP):
-    return pkg_resources.load_entry_point(backends[name], entry_point, name)
+    return load_entry_point(entry_point, name)
+
+
+def _is_satpy_scene(obj):
+    # SatPy is only imported by SatPy readers, nothing can be a SatPy Scene if it hasn't been
+    if "satpy" not in sys.modules:
+        return False
+    from satpy import Scene
+    return isinstance(obj, Scene)
 
 
 def main_frontend(argv=sys.argv[1:]):
@@ -187,11 +197,361 @@ def main_backend(argv=sys.argv[1:]):
     return 0
 
 
-def main(argv=sys.argv[1:]):
+class OutputWriter(object):
+    """Write gridded scenes with the backend in a separate thread so the next scene can be remapped at the same time.
+
+    At most `queue_size` scenes wait to be written before `put` blocks so remapping can't get too far ahead of the
+    backend.
+    """
+    def __init__(self, backend, output_kwargs, queue_size=1, glue_name=__name__):
+        import threading
+        from Queue import Queue
+        self.backend = backend
+        self.output_kwargs = output_kwargs
+        self.log = logging.getLogger(glue_name)
+        self._queue = Queue(maxsize=max(1, queue_size))
+        self._failures = []
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="OutputWriter")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            grid_name, gridded_scene = task
+            try:
+                self.log.info("Creating output from data mapped to grid %s", grid_name)
+                with metrics.stage("backend", grid_name=grid_name):
+                    self.backend.create_output_from_scene(gridded_scene, **self.output_kwargs)
+            except StandardError:
+                self.log.debug("Writer output creation exception: ", exc_info=True)
+                self.log.error("Writer output creation failed (see log for details)")
+                with self._lock:
+                    if grid_name not in self._failures:
+                        self._failures.append(grid_name)
+
+    def put(self, grid_name, gridded_scene):
+        """Add a gridded scene to be written, waiting if too many scenes are already waiting."""
+        self._queue.put((grid_name, gridded_scene))
+
+    def pop_failures(self):
+        """Get the grids that failed to be written since the last call."""
+        with self._lock:
+            failures = self._failures
+            self._failures = []
+        return failures
+
+    def close(self):
+        """Wait for every scene to be written.
+
+        :returns: grids that failed to be written and weren't returned by `pop_failures` yet
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        return self.pop_failures()
+
+
+def _can_write_groups(scene, f, compositor_objects, backend, args):
+    """Check if remapped product groups can be written before the rest of the grid is remapped.
+
+    Compositors, intermediate files, composites created by SatPy after remapping, and backends that write the
+    whole scene to one file need the whole gridded scene.
+    """
+    if compositor_objects or args.keep_intermediate or _is_satpy_scene(scene) or backend.scene_per_file:
+        return False
+    if isinstance(f, ReaderWrapper):
+        from satpy import DatasetID
+        if any(not isinstance(x, DatasetID) for x in f.wishlist):
+            return False
+        if any(product_name[-5:] in ("rgb_0", "rgb_1", "rgb_2") for product_name in scene.keys()):
+            return False
+    return True
+
+
+def process_grid(grid_name, scene, f, remapper, remap_kwargs, compositor_objects, backend, args, glue_name,
+                 writer=None):
+    """Remap a scene to one grid, run it through the compositors, and write it with the backend.
+
+    If an `OutputWriter` is provided the output is written in the background and write failures are reported by the
+    writer. When nothing needs the whole gridded scene each group of products is given to the writer as soon as it
+    is remapped.
+
+    :returns: status bits for anything that failed (`STATUS_SUCCESS` if nothing did)
+    """
+    LOG = logging.getLogger(glue_name)
+    LOG.info("Remapping to grid %s", grid_name)
+    if writer is not None and _can_write_groups(scene, f, compositor_objects, backend, args):
+        try:
+            for gridded_scene in remapper.iter_remap_scene(scene, grid_name, **remap_kwargs):
+                writer.put(grid_name, gridded_scene)
+        except StandardError:
+            LOG.debug("Remapping data exception: ", exc_info=True)
+            LOG.error("Remapping data failed")
+            return STATUS_REMAP_FAIL
+        LOG.info("Remapping data for grid %s complete", grid_name)
+        return STATUS_SUCCESS
+
+    try:
+        gridded_scene = remapper.remap_scene(scene, grid_name, **remap_kwargs)
+        if args.keep_intermediate:
+            filename = glue_name + "_gridded_scene_" + grid_name + ".json"
+            LOG.debug("saving intermediate gridded scene as '%s'", filename)
+            gridded_scene.save(filename)
+    except StandardError:
+        LOG.debug("Remapping data exception: ", exc_info=True)
+        LOG.error("Remapping data failed")
+        return STATUS_REMAP_FAIL
+
+    if not _is_satpy_scene(scene):
+        # Composition
+        for c, comp in compositor_objects.items():
+            try:
+                LOG.info("Running gridded scene through '%s' compositor", c)
+                with metrics.stage("compositor", compositor=c, grid_name=grid_name):
+                    gridded_scene = comp.modify_scene(gridded_scene, **args.subgroup_args[c + " Modification"])
+                if args.keep_intermediate:
+                    filename = glue_name + "_gridded_scene_" + grid_name + ".json"
+                    LOG.debug("Updating saved intermediate gridded scene (%s) after compositor", filename)
+                    gridded_scene.save(filename)
+            except StandardError:
+                LOG.debug("Compositor Error: ", exc_info=True)
+                LOG.error("Could not properly modify scene using compositor '%s'" % (c,))
+                if args.exit_on_error:
+                    raise RuntimeError("Could not properly modify scene using compositor '%s'" % (c,))
+
+    if isinstance(f, ReaderWrapper) and not _is_satpy_scene(gridded_scene):
+        from satpy import Scene, DatasetID, Dataset
+        this_grid_definition = None
+        # HACK: Create SatPy composites that were either separated before
+        # resampling or needed resampling to be created
+        rgbs = {}
+        for product_name in gridded_scene.keys():
+            rgb_name = product_name[:-6]
+            # Keep track of one of the grid definitions
+            if this_grid_definition is None:
+                this_grid_definition = gridded_scene[product_name]["grid_definition"]
+
+            if product_name.endswith("rgb_0") or product_name.endswith("rgb_1") or product_name.endswith("rgb_2"):
+                if rgb_name not in rgbs:
+                    rgbs[rgb_name] = [None, None, None]
+                chn_idx = int(product_name[-1])
+                rgbs[rgb_name][chn_idx] = product_name
+        LOG.debug("Putting RGBs back together again")
+        for rgb_name, v in rgbs.items():
+            r = gridded_scene.pop(v[0])
+            g = gridded_scene.pop(v[1])
+            b = gridded_scene.pop(v[2])
+            new_info = r.copy()
+            filename = new_info["grid_data"].replace(v[0], rgb_name) if isinstance(new_info["grid_data"], (str, unicode)) else rgb_name + ".dat"
+            new_info["product_name"] = rgb_name
+            data, new_info["grid_data"] = intermediate_arrays.create(
+                filename, (3, new_info["grid_definition"]["height"], new_info["grid_definition"]["width"]),
+                new_info["data_type"])
+            data[0] = r.get_data_array()[:]
+            data[1] = g.get_data_array()[:]
+            data[2] = b.get_data_array()[:]
+            gridded_scene[rgb_name] = new_info
+
+        # Create composites that satpy couldn't complete until after remapping
+        composite_names = [x for x in f.wishlist if not isinstance(x, DatasetID)]
+        if composite_names:
+            tmp_scene = Scene()
+            for k, v in gridded_scene.items():
+                if not isinstance(v["sensor"], set):
+                    v["sensor"] = set([v["sensor"]])  # turn sensor back in to a set to match satpy usage
+                tmp_scene[v["id"]] = Dataset(v.get_data_array(), **v)
+                tmp_scene[v["id"]].info["area"] = this_grid_definition.to_satpy_area()
+                # tmp_scene[v["id"]].info = {}
+                if v["sensor"] not in tmp_scene.info["sensor"]:
+                    tmp_scene.info["sensor"].extend(v["sensor"])
+            # Overwrite the wishlist that will include the above assigned datasets
+            tmp_scene.wishlist = f.wishlist
+            for cname in composite_names:
+                tmp_scene.compositors[cname] = tmp_scene.cpl.load_compositor(cname, tmp_scene.info["sensor"])
+            tmp_scene.compute()
+            tmp_scene.unload()
+            # Add any new Datasets to our P2G Scene if SatPy created them
+            for ds in tmp_scene:
+                if ds.info["id"].name not in gridded_scene:
+                    LOG.debug("Adding Dataset from SatPy Commpositing: %s", ds.info["id"])
+                    gridded_scene[ds.info["id"].name] = dataset_to_gridded_product(ds)
+                    gridded_scene[ds.info["id"].name]["grid_definition"] = this_grid_definition
+            # Remove any Products from P2G Scene that SatPy decided it didn't need anymore
+            for k, v in list(gridded_scene.items()):
+                if v["id"].name not in tmp_scene:
+                    LOG.debug("Removing Dataset that is no longer used: %s", k)
+                    del gridded_scene[k]
+
+    if _is_satpy_scene(gridded_scene):
+        LOG.debug("Converting satpy Scene to P2G Gridded Scene")
+        # Convert it to P2G Gridded Scene
+        gridded_scene = convert_satpy_to_p2g_gridded(f, gridded_scene)
+
+    # Writer
+    if writer is not None:
+        writer.put(grid_name, gridded_scene)
+        LOG.info("Remapping data for grid %s complete", grid_name)
+        return STATUS_SUCCESS
+    try:
+        LOG.info("Creating output from data mapped to grid %s", grid_name)
+        with metrics.stage("backend", grid_name=grid_name):
+            backend.create_output_from_scene(gridded_scene, **args.subgroup_args["Backend Output Creation"])
+    except StandardError:
+        LOG.debug("Writer output creation exception: ", exc_info=True)
+        LOG.error("Writer output creation failed (see log for details)")
+        return STATUS_BACKEND_FAIL
+
+    LOG.info("Processing data for grid %s complete", grid_name)
+    return STATUS_SUCCESS
+
+
+# objects needed by `process_grid`, set before worker processes are forked so they don't have to be pickled
+_grid_worker_args = None
+_grid_worker_queue_size = 0
+
+
+def _create_writer(write_queue_size, process_args):
+    """Create the `OutputWriter` for the backend in `process_args` or None if writing shouldn't be overlapped."""
+    if write_queue_size <= 0:
+        return None
+    backend, args, glue_name = process_args[5:8]
+    return OutputWriter(backend, args.subgroup_args["Backend Output Creation"], write_queue_size, glue_name)
+
+
+def _grid_worker(task):
+    """Run `process_grid` in a worker process with log file messages going to a separate file for this grid.
+
+    :returns: status and the stages recorded in `metrics` by this worker
+    """
+    from polar2grid.core.script_utils import redirect_log_file
+    grid_name, grid_log_fn = task
+    if grid_log_fn is not None:
+        redirect_log_file(grid_log_fn)
+    # don't send back the stages recorded by the main process before this worker was forked
+    metrics.stages = []
+    writer = _create_writer(_grid_worker_queue_size, _grid_worker_args)
+    try:
+        if writer is None:
+            return process_grid(grid_name, *_grid_worker_args), metrics.stages
+        try:
+            status = process_grid(grid_name, *_grid_worker_args, writer=writer)
+        finally:
+            failures = writer.close()
+        return (status | STATUS_BACKEND_FAIL if failures else status), metrics.stages
+    finally:
+        # pool workers don't run exit handlers, remove this worker's shared memory arrays now
+        intermediate_arrays.remove_shared()
+
+
+def process_grids(grids, num_workers, write_queue_size, *process_args):
+    """Run `process_grid` for every grid, splitting the grids between `num_workers` processes.
+
+    Each worker logs to its own file which is appended to the main log file in grid order. If `write_queue_size` is
+    positive, output is written in a separate thread while the next product group or grid is remapped with at most
+    `write_queue_size` gridded scenes waiting to be written. A grid whose output fails to be written in the
+    background may be reported a second time with `STATUS_BACKEND_FAIL` after its remapping status.
+
+    :param process_args: arguments to `process_grid` after the grid name
+    :returns: generator of (grid_name, status) in grid order
+    """
+    global _grid_worker_args, _grid_worker_queue_size
+    if num_workers <= 1 or len(grids) <= 1:
+        writer = _create_writer(write_queue_size, process_args)
+        if writer is None:
+            for grid_name in grids:
+                yield grid_name, process_grid(grid_name, *process_args)
+            return
+        # one writer for every grid so the first products of a grid are remapped while the last grid is written
+        try:
+            for grid_name in grids:
+                yield grid_name, process_grid(grid_name, *process_args, writer=writer)
+                for failed_grid in writer.pop_failures():
+                    yield failed_grid, STATUS_BACKEND_FAIL
+        except:
+            # stopped early, still finish writing what was already remapped
+            writer.close()
+            raise
+        for failed_grid in writer.close():
+            yield failed_grid, STATUS_BACKEND_FAIL
+        return
+
+    from multiprocessing import Pool
+    from polar2grid.core.script_utils import get_log_filename, merge_log_file
+    log_fn = get_log_filename()
+    tasks = [(grid_name, "%s.%s" % (log_fn, grid_name) if log_fn else None) for grid_name in grids]
+    _grid_worker_args = process_args
+    _grid_worker_queue_size = write_queue_size
+    num_workers = min(num_workers, len(grids))
+    # the memory budget is for the whole run, not each worker
+    memory_budget = intermediate_arrays.memory_budget
+    if intermediate_arrays.in_memory:
+        intermediate_arrays.memory_budget = intermediate_arrays.worker_budget(num_workers)
+    # one grid per worker process so memory used for one grid is given back before the next
+    pool = Pool(num_workers, maxtasksperchild=1)
+    try:
+        results = pool.imap(_grid_worker, tasks)
+        for grid_name, grid_log_fn in tasks:
+            status, stages = results.next()
+            metrics.add_stages(stages)
+            if grid_log_fn is not None:
+                merge_log_file(grid_log_fn)
+            yield grid_name, status
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        intermediate_arrays.memory_budget = memory_budget
+        _grid_worker_args = None
+        _grid_worker_queue_size = 0
+        # keep what was logged by grids that didn't finish
+        for _, grid_log_fn in tasks:
+            if grid_log_fn is not None and os.path.isfile(grid_log_fn):
+                merge_log_file(grid_log_fn)
+
+
+def _cached(cache, key, func, *args, **kwargs):
+    """Call `func` or reuse what it returned for `key` last time if a `cache` dictionary is provided.
+
+    Used by `main` to keep configuration and other objects that are slow to create between jobs when running in a
+    long running process (see `polar2grid.server`).
+    """
+    if cache is None:
+        return func(*args, **kwargs)
+    if key not in cache:
+        cache[key] = func(*args, **kwargs)
+    return cache[key]
+
+
+def _cache_key(name, kwargs):
+    return (name,) + tuple(sorted((k, repr(v)) for k, v in kwargs.items()))
+
+
+def main(argv=sys.argv[1:], cache=None):
+    metrics.reset()
+    profiler = None
+    if "--profile-startup" in argv:
+        # started before anything else so the frontend, backend, and their dependencies are included
+        from polar2grid.core.script_utils import ImportProfiler
+        profiler = ImportProfiler()
+        profiler.start()
+    try:
+        return _main(argv, cache=cache, profiler=profiler)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+        metrics.finish(argv=argv)
+
+
+def _main(argv, cache=None, profiler=None):
     from polar2grid.core.script_utils import setup_logging, create_basic_parser, create_exc_handler, rename_log_file, ExtendAction
     from polar2grid.compositors import CompositorManager
-    frontends = available_frontends()
-    backends = available_backends()
+    from polar2grid.grids import GridManager
+    frontends = _cached(cache, "frontends", available_frontends)
+    backends = _cached(cache, "backends", available_backends)
     parser = create_basic_parser(description="Extract swath data, remap it, and write it to a new file format")
     parser.add_argument("frontend", choices=sorted(frontends.keys()),
                         help="Specify the swath extractor to use to read data (additional arguments are determined after this is specified)")
@@ -206,7 +566,8 @@ def main(argv=sys.argv[1:]):
     LOG = logging.getLogger(glue_name)
 
     # Load compositor information (we can't know the compositor choices until we've loaded the configuration)
-    compositor_manager = CompositorManager(config_files=args.compositor_configs)
+    compositor_manager = _cached(cache, ("compositor_manager", tuple(args.compositor_configs or ())),
+                                 CompositorManager, config_files=args.compositor_configs)
     # Hack: argparse doesn't let you use choices and nargs=* on a positional argument
     parser.add_argument("compositors", choices=compositor_manager.keys() + [[]], nargs="*",
                         help="Specify the compositors to apply to the provided scene (additional arguments are determined after this is specified)")
@@ -227,6 +588,23 @@ def main(argv=sys.argv[1:]):
                         help="List of files or directories to extract data from")
     parser.add_argument('-d', dest='data_files', nargs="+", default=[], action=ExtendAction,
                         help="Data directories to look for input data files (equivalent to -f)")
+    parser.add_argument('--grid-workers', dest='grid_workers', type=int, default=1,
+                        help="Number of grids to remap and write at the same time in separate processes (default 1)")
+    parser.add_argument('--write-queue-size', dest='write_queue_size', type=int, default=0,
+                        help="Write output in the background while the next products are remapped with at most this "
+                             "many product groups waiting to be written (default 0, write before remapping more)")
+    parser.add_argument('--memory-budget', dest='memory_budget', type=float, default=None,
+                        help="Keep intermediate arrays in memory instead of writing flat binary files until this many "
+                             "megabytes are used, then write the rest to disk (default 0, or $P2G_MEMORY_BUDGET). "
+                             "The budget is split between grid workers")
+    parser.add_argument('--shared-memory', dest='shared_memory', action='store_true', default=None,
+                        help="Keep in-memory intermediate arrays in POSIX shared memory (/dev/shm) so grid worker "
+                             "processes use them without copying (requires --memory-budget)")
+    parser.add_argument('--profile-startup', dest='profile_startup', action='store_true',
+                        help="Log how long startup took and which modules took the longest to import")
+    parser.add_argument('--metrics-file', dest='metrics_file', default=None,
+                        help="Save the wall time, CPU time, peak memory, and I/O of each processing stage to this "
+                             "JSON file (a summary is always logged at INFO level)")
     global_keywords = ("keep_intermediate", "overwrite_existing", "exit_on_error")
     args = parser.parse_args(argv, global_keywords=global_keywords, subgroup_titles=subgroup_titles)
 
@@ -244,6 +622,22 @@ def main(argv=sys.argv[1:]):
     setup_logging(console_level=levels[min(3, args.verbosity)], log_filename=args.log_fn)
     sys.excepthook = create_exc_handler(LOG.name)
     LOG.debug("Starting script with arguments: %s", " ".join(sys.argv))
+    metrics.filename = args.metrics_file
+
+    if args.memory_budget is not None:
+        intermediate_arrays.memory_budget = int(args.memory_budget * 1024 ** 2)
+    if args.shared_memory is not None:
+        intermediate_arrays.shared_memory = args.shared_memory
+    if intermediate_arrays.shared_memory and not os.path.isdir(intermediate_arrays.shared_memory_dir):
+        LOG.warning("Shared memory directory '%s' does not exist, intermediate arrays will not be shared",
+                    intermediate_arrays.shared_memory_dir)
+        intermediate_arrays.shared_memory = False
+    if args.keep_intermediate and intermediate_arrays.in_memory:
+        # intermediate files are what the saved JSON scenes point to
+        LOG.warning("Intermediate files are being kept, ignoring memory budget for intermediate arrays")
+        intermediate_arrays.memory_budget = 0
+    elif intermediate_arrays.in_memory:
+        LOG.debug("Keeping up to %d bytes of intermediate arrays in memory", intermediate_arrays.memory_budget)
 
     # Keep track of things going wrong to tell the user what went wrong (we want to create as much as possible)
     status_to_return = STATUS_SUCCESS
@@ -277,7 +671,8 @@ def main(argv=sys.argv[1:]):
     try:
         LOG.info("Initializing reader...")
         list_products = args.subgroup_args["Frontend Initialization"].pop("list_products")
-        f = fcls(search_paths=args.data_files, **args.subgroup_args["Frontend Initialization"])
+        with metrics.stage("frontend_init", frontend=args.frontend):
+            f = fcls(search_paths=args.data_files, **args.subgroup_args["Frontend Initialization"])
     except StandardError:
         LOG.debug("Frontend exception: ", exc_info=True)
         LOG.error("%s frontend failed to load and sort data files (see log for details)", args.frontend)
@@ -293,7 +688,11 @@ def main(argv=sys.argv[1:]):
 
     try:
         LOG.info("Initializing remapping...")
-        remapper = Remapper(**args.subgroup_args["Remapping Initialization"])
+        remap_init_kwargs = args.subgroup_args["Remapping Initialization"]
+        grid_configs = tuple(remap_init_kwargs.get("grid_configs", ()))
+        # the remapper keeps track of files for one job, but the grids it was configured with can be reused
+        grid_manager = _cached(cache, ("grid_manager", grid_configs), GridManager, *grid_configs)
+        remapper = Remapper(grid_manager=grid_manager, **remap_init_kwargs)
         remap_kwargs = args.subgroup_args["Remapping"]
     except StandardError:
         LOG.debug("Remapping initialization exception: ", exc_info=True)
@@ -302,7 +701,8 @@ def main(argv=sys.argv[1:]):
 
     try:
         LOG.info("Initializing backend...")
-        backend = bcls(**args.subgroup_args["Backend Initialization"])
+        backend_kwargs = args.subgroup_args["Backend Initialization"]
+        backend = _cached(cache, _cache_key(("backend", args.backend), backend_kwargs), bcls, **backend_kwargs)
     except StandardError:
         LOG.debug("Writer initialization exception: ", exc_info=True)
         LOG.error("Writer initialization failed (see log for details)")
@@ -312,34 +712,40 @@ def main(argv=sys.argv[1:]):
         LOG.info("Initializing compositor objects...")
         compositor_objects = {}
         for c in args.compositors:
-            compositor_objects[c] = compositor_manager.get_compositor(c, **args.global_kwargs)
+            compositor_objects[c] = _cached(cache, _cache_key(("compositor", tuple(args.compositor_configs or ()), c),
+                                                              args.global_kwargs),
+                                            compositor_manager.get_compositor, c, **args.global_kwargs)
     except StandardError:
         LOG.debug("Compositor initialization exception: ", exc_info=True)
         LOG.error("Compositor initialization failed (see log for details)")
         return STATUS_COMP_FAIL
 
+    if profiler is not None:
+        profiler.report(LOG)
+
     try:
         LOG.info("Extracting swaths from data files available...")
-        scene = f.create_scene(**args.subgroup_args["Frontend Swath Extraction"])
+        with metrics.stage("create_scene", frontend=args.frontend):
+            scene = f.create_scene(**args.subgroup_args["Frontend Swath Extraction"])
 
         # Determine if we have a satpy scene if we should convert it to
         # a P2G Scene to continue processing
         resample_method = args.subgroup_args["Remapping"].get("remap_method")
         is_satpy_resample_method = resample_method in SATPY_RESAMPLERS
-        if is_satpy_resample_method and not isinstance(scene, Scene):
+        if is_satpy_resample_method and not _is_satpy_scene(scene):
             raise RuntimeError("Resampling method '{}' only supports 'satpy' readers".format(resample_method))
-        elif not is_satpy_resample_method and isinstance(scene, Scene):
+        elif not is_satpy_resample_method and _is_satpy_scene(scene):
             # convert satpy scene to P2G Scene to be compatible with old P2G resamplers
             scene = convert_satpy_to_p2g_swath(f, scene)
 
-        if isinstance(scene, Scene):
+        if _is_satpy_scene(scene):
             if not scene.datasets:
                 LOG.error("No products were returned by the frontend")
                 raise RuntimeError("No products were returned by the frontend")
             if args.keep_intermediate:
                 raise RuntimeError("satpy readers do not currently support saving intermediate files")
         else:
-            if (isinstance(scene, Scene) and not scene.datasets) or not scene:
+            if (_is_satpy_scene(scene) and not scene.datasets) or not scene:
                 LOG.error("No products were returned by the frontend")
                 raise RuntimeError("No products were returned by the frontend")
             if args.keep_intermediate:
@@ -374,120 +780,21 @@ def main(argv=sys.argv[1:]):
             return STATUS_GDETER_FAIL
     LOG.debug("Grids that will be mapped to: %r", grids)
 
-    # Remap
-    gridded_scenes = {}
-    for grid_name in grids:
-        LOG.info("Remapping to grid %s", grid_name)
-        try:
-            gridded_scene = remapper.remap_scene(scene, grid_name, **remap_kwargs)
-            gridded_scenes[grid_name] = gridded_scene
-            if args.keep_intermediate:
-                filename = glue_name + "_gridded_scene_" + grid_name + ".json"
-                LOG.debug("saving intermediate gridded scene as '%s'", filename)
-                gridded_scene.save(filename)
-        except StandardError:
-            LOG.debug("Remapping data exception: ", exc_info=True)
-            LOG.error("Remapping data failed")
-            status_to_return |= STATUS_REMAP_FAIL
-            if args.exit_on_error:
-                return status_to_return
-            continue
-
-        if not isinstance(scene, Scene):
-            # Composition
-            for c, comp in compositor_objects.items():
-                try:
-                    LOG.info("Running gridded scene through '%s' compositor", c)
-                    gridded_scene = comp.modify_scene(gridded_scene, **args.subgroup_args[c + " Modification"])
-                    if args.keep_intermediate:
-                        filename = glue_name + "_gridded_scene_" + grid_name + ".json"
-                        LOG.debug("Updating saved intermediate gridded scene (%s) after compositor", filename)
-                        gridded_scene.save(filename)
-                except StandardError:
-                    LOG.debug("Compositor Error: ", exc_info=True)
-                    LOG.error("Could not properly modify scene using compositor '%s'" % (c,))
-                    if args.exit_on_error:
-                        raise RuntimeError("Could not properly modify scene using compositor '%s'" % (c,))
-
-        if isinstance(f, ReaderWrapper) and not isinstance(gridded_scene, Scene):
-            this_grid_definition = None
-            # HACK: Create SatPy composites that were either separated before
-            # resampling or needed resampling to be created
-            rgbs = {}
-            for product_name in gridded_scene.keys():
-                rgb_name = product_name[:-6]
-                # Keep track of one of the grid definitions
-                if this_grid_definition is None:
-                    this_grid_definition = gridded_scene[product_name]["grid_definition"]
-
-                if product_name.endswith("rgb_0") or product_name.endswith("rgb_1") or product_name.endswith("rgb_2"):
-                    if rgb_name not in rgbs:
-                        rgbs[rgb_name] = [None, None, None]
-                    chn_idx = int(product_name[-1])
-                    rgbs[rgb_name][chn_idx] = product_name
-            LOG.debug("Putting RGBs back together again")
-            for rgb_name, v in rgbs.items():
-                r = gridded_scene.pop(v[0])
-                g = gridded_scene.pop(v[1])
-                b = gridded_scene.pop(v[2])
-                new_info = r.copy()
-                new_info["grid_data"] = new_info["grid_data"].replace(v[0], rgb_name)
-                new_info["product_name"] = rgb_name
-                data = np.memmap(new_info["grid_data"], dtype=new_info["data_type"],
-                                 mode="w+", shape=(3, new_info["grid_definition"]["height"], new_info["grid_definition"]["width"]))
-                data[0] = r.get_data_array()[:]
-                data[1] = g.get_data_array()[:]
-                data[2] = b.get_data_array()[:]
-                gridded_scene[rgb_name] = new_info
-
-            # Create composites that satpy couldn't complete until after remapping
-            composite_names = [x for x in f.wishlist if not isinstance(x, DatasetID)]
-            if composite_names:
-                tmp_scene = Scene()
-                for k, v in gridded_scene.items():
-                    if not isinstance(v["sensor"], set):
-                        v["sensor"] = set([v["sensor"]])  # turn sensor back in to a set to match satpy usage
-                    tmp_scene[v["id"]] = Dataset(v.get_data_array(), **v)
-                    tmp_scene[v["id"]].info["area"] = this_grid_definition.to_satpy_area()
-                    # tmp_scene[v["id"]].info = {}
-                    if v["sensor"] not in tmp_scene.info["sensor"]:
-                        tmp_scene.info["sensor"].extend(v["sensor"])
-                # Overwrite the wishlist that will include the above assigned datasets
-                tmp_scene.wishlist = f.wishlist
-                for cname in composite_names:
-                    tmp_scene.compositors[cname] = tmp_scene.cpl.load_compositor(cname, tmp_scene.info["sensor"])
-                tmp_scene.compute()
-                tmp_scene.unload()
-                # Add any new Datasets to our P2G Scene if SatPy created them
-                for ds in tmp_scene:
-                    if ds.info["id"].name not in gridded_scene:
-                        LOG.debug("Adding Dataset from SatPy Commpositing: %s", ds.info["id"])
-                        gridded_scene[ds.info["id"].name] = dataset_to_gridded_product(ds)
-                        gridded_scene[ds.info["id"].name]["grid_definition"] = this_grid_definition
-                # Remove any Products from P2G Scene that SatPy decided it didn't need anymore
-                for k, v in list(gridded_scene.items()):
-                    if v["id"].name not in tmp_scene:
-                        LOG.debug("Removing Dataset that is no longer used: %s", k)
-                        del gridded_scene[k]
-
-        if isinstance(gridded_scene, Scene):
-            LOG.debug("Converting satpy Scene to P2G Gridded Scene")
-            # Convert it to P2G Gridded Scene
-            gridded_scene = convert_satpy_to_p2g_gridded(f, gridded_scene)
-
-        # Writer
-        try:
-            LOG.info("Creating output from data mapped to grid %s", grid_name)
-            backend.create_output_from_scene(gridded_scene, **args.subgroup_args["Backend Output Creation"])
-        except StandardError:
-            LOG.debug("Writer output creation exception: ", exc_info=True)
-            LOG.error("Writer output creation failed (see log for details)")
-            status_to_return |= STATUS_BACKEND_FAIL
-            if args.exit_on_error:
-                return status_to_return
-            continue
-
-        LOG.info("Processing data for grid %s complete", grid_name)
+    # Remap, composite, and write each grid
+    if args.grid_workers > 1 and multiprocessing.current_process().daemon:
+        # ex. a polar2grid server job, daemonic processes can't start their own worker processes
+        LOG.warning("Can't start grid worker processes from a daemon process, processing one grid at a time")
+        args.grid_workers = 1
+    if args.grid_workers > 1 and backend.scene_per_file:
+        LOG.warning("%s backend writes every grid to the same file, processing one grid at a time", args.backend)
+        args.grid_workers = 1
+    if args.grid_workers > 1:
+        LOG.info("Processing up to %d grids at a time", args.grid_workers)
+    process_args = (scene, f, remapper, remap_kwargs, compositor_objects, backend, args, glue_name)
+    for grid_name, grid_status in process_grids(grids, args.grid_workers, args.write_queue_size, *process_args):
+        status_to_return |= grid_status
+        if grid_status != STATUS_SUCCESS and args.exit_on_error:
+            return status_to_return
 
     return status_to_return
 
@@ -44,14 +44,9 @@ import logging
 import os
 
 from polar2grid.core import roles
+from polar2grid.core.entry_points import get_resource_string
 from polar2grid.core.proj import Proj
 
-try:
-    # try getting setuptools/distribute's version of resource retrieval first
-    from pkg_resources import resource_string as get_resource_string
-except ImportError:
-    from pkgutil import get_data as get_resource_string
-
 LOG = logging.getLogger(__name__)
 
 script_dir = os.path.dirname(os.path.realpath(__file__))
@@ -283,6 +278,8 @@ class GridManager(roles.CartographerRole):
 
     def __init__(self, *grid_configs, **kwargs):
         load_defaults = not kwargs.pop("no_defaults", False)
+        # dynamic grid parameters computed by ll2cr for each grid, shared by every GridDefinition we create
+        self.dynamic_extents = {}
 
         if len(grid_configs) == 0 and load_defaults:
             LOG.debug("Using default grid configuration: '%s' " % (GRIDS_CONFIG_FILEPATH,))
@@ -299,10 +296,14 @@ class GridManager(roles.CartographerRole):
         """
         grid_information = read_grids_config(grid_config_filename)
         self.grid_information.update(**grid_information)
+        for grid_name in grid_information:
+            self.dynamic_extents.pop(grid_name, None)
 
     def add_grid_config_str(self, grid_config_line):
         grid_information = read_grids_config_str(grid_config_line)
         self.grid_information.update(**grid_information)
+        for grid_name in grid_information:
+            self.dynamic_extents.pop(grid_name, None)
 
     def add_proj4_grid_info(self, grid_name, proj4_str,
                             width, height, cell_width, cell_height, origin_x, origin_y):
@@ -320,7 +321,7 @@ class GridManager(roles.CartographerRole):
         """
         from polar2grid.core.containers import GridDefinition
         grid_info = self.get_grid_info(grid_name)
-        return GridDefinition(
+        grid_def = GridDefinition(
             grid_name=grid_name,
             proj4_definition=grid_info["proj4_str"],
             height=grid_info["grid_height"],
@@ -330,6 +331,8 @@ class GridManager(roles.CartographerRole):
             origin_x=grid_info["grid_origin_x"],
             origin_y=grid_info["grid_origin_y"]
         )
+        grid_def.dynamic_extents = self.dynamic_extents.setdefault(grid_name, {})
+        return grid_def
 
     def get_grid_info(self, grid_name):
         """Return a grid information dictionary about the ``grid_name`` specified.
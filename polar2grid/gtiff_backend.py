@@ -35,12 +35,10 @@ can be described by PROJ.4 and understand by GeoTIFF.
 __docformat__ = "restructuredtext en"
 
 import sys
-from osgeo import gdal
 
 import logging
 import numpy as np
 import os
-import osr
 
 from polar2grid.core import roles
 from polar2grid.core.dtype import clip_to_data_type, str_to_dtype
@@ -48,8 +46,6 @@ from polar2grid.core.rescale import Rescaler, DEFAULT_RCONFIG
 
 LOG = logging.getLogger(__name__)
 
-gtiff_driver = gdal.GetDriverByName("GTIFF")
-
 DEFAULT_OUTPUT_PATTERN = "{satellite}_{instrument}_{product_name}_{begin_time}_{grid_name}.tif"
 
 
@@ -59,6 +55,7 @@ def _proj4_to_srs(proj4_str):
     so if used multiple times it only has to be changed
     once for special cases.
     """
+    from osgeo import osr
     try:
         srs = osr.SpatialReference()
         # GDAL doesn't like unicode
@@ -75,10 +72,17 @@ def _proj4_to_srs(proj4_str):
     return srs
 
 
-def create_geotiff(data, output_filename, proj4_str, geotransform, etype=gdal.GDT_UInt16, compress=None,
+def create_geotiff(data, output_filename, proj4_str, geotransform, etype=None, compress=None,
                    quicklook=False, tiled=False, blockxsize=None, blockysize=None, **kwargs):
     """Function that creates a geotiff from the information provided.
+
+    :param etype: GDAL data type of the bands (default `gdal.GDT_UInt16`)
     """
+    # GDAL is only imported when a geotiff is created so other backends don't wait for it to load
+    from osgeo import gdal
+    if etype is None:
+        etype = gdal.GDT_UInt16
+    gtiff_driver = gdal.GetDriverByName("GTIFF")
     log_level = logging.getLogger('').handlers[0].level or 0
     LOG.info("Creating geotiff '%s'" % (output_filename,))
 
@@ -159,11 +163,14 @@ def create_geotiff(data, output_filename, proj4_str, geotransform, etype=gdal.GD
     return gtiff
 
 
-np2etype = {
-    np.uint16: gdal.GDT_UInt16,
-    np.uint8: gdal.GDT_Byte,
-    np.float32: gdal.GDT_Float32,
-}
+def np2etype(data_type):
+    """Get the GDAL data type for a numpy data type."""
+    from osgeo import gdal
+    return {
+        np.uint16: gdal.GDT_UInt16,
+        np.uint8: gdal.GDT_Byte,
+        np.float32: gdal.GDT_Float32,
+    }[data_type]
 
 
 class Backend(roles.BackendRole):
@@ -181,7 +188,7 @@ class Backend(roles.BackendRole):
                                    data_type=None, inc_by_one=None, fill_value=0,
                                    tiled=False, blockxsize=None, blockysize=None, **kwargs):
         data_type = data_type or np.uint8
-        etype = np2etype[data_type]
+        etype = np2etype(data_type)
         inc_by_one = inc_by_one or False
         grid_def = gridded_product["grid_definition"]
         if not output_pattern:
@@ -216,7 +223,8 @@ class Backend(roles.BackendRole):
                                                                     data_type,
                                                                     inc_by_one=inc_by_one,
                                                                     fill_value=fill_value)
-                data = self.rescaler.rescale_product(gridded_product, data_type, rescale_options=rescale_options.copy())
+                data = self.rescaler.rescale_product_to_data_type(gridded_product, data_type,
+                                                                  rescale_options=rescale_options.copy())
 
             # Create the geotiff
             # X and Y rotation are 0 in most cases so we just hard-code it
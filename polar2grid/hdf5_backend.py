@@ -52,6 +52,8 @@ DEFAULT_OUTPUT_PATTERN = "{satellite}_{instrument}_{begin_time}.h5"
 
 
 class Backend(roles.BackendRole):
+    scene_per_file = True
+
     def __init__(self, rescale_configs=None, **kwargs):
         self.rescale_configs = rescale_configs or [DEFAULT_RCONFIG]
         self.rescaler = Rescaler(*self.rescale_configs)
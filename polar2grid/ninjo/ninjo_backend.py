@@ -241,8 +241,8 @@ class Backend(roles.BackendRole):
 
         try:
             LOG.debug("Scaling %s data to fit in ninjotiff...", gridded_product["product_name"])
-            data = self.rescaler.rescale_product(gridded_product, data_type,
-                                                 inc_by_one=inc_by_one, fill_value=fill_value)
+            data = self.rescaler.rescale_product_to_data_type(gridded_product, data_type,
+                                                              inc_by_one=inc_by_one, fill_value=fill_value)
 
             # Create the geotiff
             save(data, grid_def, output_filename,
@@ -43,8 +43,6 @@ import sys
 import logging
 import numpy as np
 import os
-from pyresample.geometry import AreaDefinition
-from satpy.scene import Scene
 
 from polar2grid.core import containers, roles
 
@@ -72,33 +70,22 @@ def area_to_swath_def(area, overwrite_existing=False):
     if hasattr(area, "info"):
         info.update(area.info)
 
-    # Write lons to disk
-    filename = info["longitude"]
-    if os.path.isfile(filename):
-        if not overwrite_existing:
-            LOG.error("Binary file already exists: %s" % (filename,))
-            raise RuntimeError("Binary file already exists: %s" % (filename,))
-        else:
-            LOG.warning("Binary file already exists, will overwrite: %s", filename)
-    lon_arr = np.memmap(filename, mode="w+", dtype=lons.dtype, shape=lons.shape)
+    # Write lons to disk (or keep them in memory)
+    lon_arr, info["longitude"] = containers.intermediate_arrays.create(info["longitude"], lons.shape, lons.dtype,
+                                                                        overwrite_existing=overwrite_existing)
     lon_arr[:] = lons.data
     lon_arr[lons.mask] = np.nan
 
-    # Write lats to disk
-    filename = info["latitude"]
-    if os.path.isfile(filename):
-        if not overwrite_existing:
-            LOG.error("Binary file already exists: %s" % (filename,))
-            raise RuntimeError("Binary file already exists: %s" % (filename,))
-        else:
-            LOG.warning("Binary file already exists, will overwrite: %s", filename)
-    lat_arr = np.memmap(filename, mode="w+", dtype=lats.dtype, shape=lats.shape)
+    # Write lats to disk (or keep them in memory)
+    lat_arr, info["latitude"] = containers.intermediate_arrays.create(info["latitude"], lats.shape, lats.dtype,
+                                                                       overwrite_existing=overwrite_existing)
     lat_arr[:] = lats.data
     lat_arr[lats.mask] = np.nan
     return containers.SwathDefinition(**info)
 
 
 def area_to_grid_definition(area, overwrite_existing=False):
+    from pyresample.geometry import AreaDefinition
     if isinstance(area, AreaDefinition):
         return containers.GridDefinition(
             grid_name=area.name,
@@ -164,14 +151,8 @@ def dataset_to_swath_product(ds, swath_def, overwrite_existing=False):
 
     if channels == 1:
         filename = info["name"] + ".dat"
-        info["swath_data"] = filename
-        if os.path.isfile(filename):
-            if not overwrite_existing:
-                LOG.error("Binary file already exists: %s" % (filename,))
-                raise RuntimeError("Binary file already exists: %s" % (filename,))
-            else:
-                LOG.warning("Binary file already exists, will overwrite: %s", filename)
-        p2g_arr = np.memmap(filename, mode="w+", dtype=ds.dtype, shape=ds.shape)
+        p2g_arr, info["swath_data"] = containers.intermediate_arrays.create(filename, ds.shape, ds.dtype,
+                                                                             overwrite_existing=overwrite_existing)
         p2g_arr[:] = ds.data
         p2g_arr[ds.mask] = np.nan
         yield containers.SwathProduct(**info)
@@ -180,15 +161,8 @@ def dataset_to_swath_product(ds, swath_def, overwrite_existing=False):
             tmp_info = info.copy()
             tmp_info["product_name"] = info["product_name"] + "_rgb_{:d}".format(chn_idx)
             filename = tmp_info["product_name"] + ".dat"
-            tmp_info["swath_data"] = filename
-            if os.path.isfile(filename):
-                if not overwrite_existing:
-                    LOG.error("Binary file already exists: %s" % (filename,))
-                    raise RuntimeError("Binary file already exists: %s" % (filename,))
-                else:
-                    LOG.warning("Binary file already exists, will overwrite: %s", filename)
-
-            p2g_arr = np.memmap(filename, mode="w+", dtype=ds.dtype, shape=ds.shape[-2:])
+            p2g_arr, tmp_info["swath_data"] = containers.intermediate_arrays.create(
+                filename, ds.shape[-2:], ds.dtype, overwrite_existing=overwrite_existing)
             p2g_arr[:] = ds.data[chn_idx]
             p2g_arr[ds.mask[chn_idx]] = np.nan
             yield containers.SwathProduct(**tmp_info)
@@ -231,14 +205,8 @@ def dataset_to_gridded_product(ds, grid_def, overwrite_existing=False):
     info.update(p2g_metadata)
 
     filename = info["name"] + ".dat"
-    info["grid_data"] = filename
-    if os.path.isfile(filename):
-        if not overwrite_existing:
-            LOG.error("Binary file already exists: %s" % (filename,))
-            raise RuntimeError("Binary file already exists: %s" % (filename,))
-        else:
-            LOG.warning("Binary file already exists, will overwrite: %s", filename)
-    p2g_arr = np.memmap(filename, mode="w+", dtype=ds.dtype, shape=ds.shape)
+    p2g_arr, info["grid_data"] = containers.intermediate_arrays.create(filename, ds.shape, ds.dtype,
+                                                                        overwrite_existing=overwrite_existing)
     p2g_arr[:] = ds.filled(np.nan).astype(np.float32)
     return containers.GriddedProduct(**info)
 
@@ -293,6 +261,8 @@ class ReaderWrapper(roles.FrontendRole):
     PRIMARY_FILE_TYPE = None
 
     def __init__(self, **kwargs):
+        # SatPy is only imported when a SatPy reader is used so legacy frontends don't wait for it to load
+        from satpy.scene import Scene
         self.reader = kwargs.pop("reader", self.DEFAULT_READER_NAME)
         super(ReaderWrapper, self).__init__(**kwargs)
         pathnames = self.find_files_with_extensions()
@@ -4,9 +4,11 @@ import numpy
 cimport numpy
 cimport cpython
 from libc.stdlib cimport calloc, malloc, free
+from libc.string cimport memcpy
 from libc.math cimport log, exp, sqrt, isnan, NAN
+from cython.parallel cimport prange, threadid
 
-cdef extern from "_fornav_templates.h":
+cdef extern from "_fornav_templates.h" nogil:
     ctypedef float weight_type
     ctypedef float ewa_param_type
     ctypedef float accum_type
@@ -24,6 +26,18 @@ cdef extern from "_fornav_templates.h":
         ewa_param_type u_del
         ewa_param_type v_del
 
+    cdef int EWA_FLOAT32
+    cdef int EWA_FLOAT64
+    cdef int EWA_INT8
+
+    ctypedef struct ewa_channel:
+        int data_type
+        void *image
+        void *output_image
+        double image_fill
+        double output_fill
+        int maximum_weight_mode
+
     ctypedef struct ewa_weight:
         int count
         weight_type min
@@ -41,15 +55,19 @@ cdef extern from "_fornav_templates.h":
     cdef accum_type **initialize_grid_accums(size_t chan_count, size_t grid_cols, size_t grid_rows)
     cdef weight_type **initialize_grid_weights(size_t chan_count, size_t grid_cols, size_t grid_rows)
     cdef void deinitialize_grids(size_t chan_count, void **grids)
+    cdef void merge_grids(size_t chan_count, ewa_channel *channels, size_t grid_cols, size_t grid_rows,
+        accum_type **grid_accums, weight_type **grid_weights,
+        accum_type **other_accums, weight_type **other_weights)
+    cdef size_t footprint_size(weight_type weight_delta_max)
 
     cdef int compute_ewa_parameters[CR_TYPE](size_t swath_cols, size_t swath_rows,
         CR_TYPE *uimg, CR_TYPE *vimg, ewa_weight *ewaw, ewa_parameters *ewap)
 
-    cdef int compute_ewa[CR_TYPE, IMAGE_TYPE](size_t chan_count, bint maximum_weight_mode,
+    cdef int compute_ewa[CR_TYPE](size_t chan_count, ewa_channel *channels, size_t image_offset,
         size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows,
         CR_TYPE *uimg, CR_TYPE *vimg,
-        IMAGE_TYPE **images, IMAGE_TYPE img_fill, accum_type **grid_accums, weight_type **grid_weights,
-        ewa_weight *ewaw, ewa_parameters *ewap)
+        accum_type **grid_accums, weight_type **grid_weights,
+        ewa_weight *ewaw, ewa_parameters *ewap, unsigned int *cell_offsets, weight_type *cell_weights)
 
     # For some reason cython can't deduce the type when using the template
     #cdef int write_grid_image[GRID_TYPE](GRID_TYPE *output_image, GRID_TYPE fill, size_t grid_cols, size_t grid_rows,
@@ -64,44 +82,88 @@ cdef extern from "_fornav_templates.h":
     cdef unsigned int write_grid_image(numpy.int8_t *output_image, numpy.int8_t fill, size_t grid_cols, size_t grid_rows,
         accum_type *grid_accum, weight_type *grid_weights,
         int maximum_weight_mode, weight_type weight_sum_min)
+    cdef unsigned int write_channel_image(ewa_channel *channel, size_t grid_cols, size_t grid_rows,
+        accum_type *grid_accum, weight_type *grid_weights, weight_type weight_sum_min)
+
+    ctypedef struct ewa_footprints:
+        size_t size
+        size_t capacity
+        unsigned int *cell_offsets
+        weight_type *cell_weights
+
+    cdef int initialize_footprints(ewa_footprints *footprints, size_t capacity)
+    cdef void deinitialize_footprints(ewa_footprints *footprints)
+    cdef int compute_footprints[CR_TYPE](size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows,
+        CR_TYPE *uimg, CR_TYPE *vimg, ewa_weight *ewaw, ewa_parameters *ewap,
+        ewa_footprints *footprints, numpy.int64_t *pixel_ends)
+    cdef void apply_footprints(size_t chan_count, ewa_channel *channels, size_t pixel_start, size_t pixel_end,
+        numpy.int64_t *pixel_ptr, unsigned int *cell_offsets, weight_type *cell_weights,
+        accum_type **grid_accums, weight_type **grid_weights)
 
 ctypedef fused cr_dtype:
     numpy.float32_t
     numpy.float64_t
 
 # FUTURE: Add other types, but for now these are the basics
-ctypedef fused image_dtype:
-    numpy.float32_t
-    numpy.float64_t
-    numpy.int8_t
-
-ctypedef fused grid_dtype:
-    numpy.float32_t
-    numpy.float64_t
-    numpy.int8_t
+EWA_DATA_TYPES = {
+    numpy.dtype(numpy.float32): EWA_FLOAT32,
+    numpy.dtype(numpy.float64): EWA_FLOAT64,
+    numpy.dtype(numpy.int8): EWA_INT8,
+}
+
+cdef void free_thread_grids(unsigned int num_threads, size_t chan_count,
+                           accum_type ***thread_accums, weight_type ***thread_weights):
+    cdef unsigned int thread_idx
+    for thread_idx in range(num_threads):
+        if thread_accums[thread_idx] is not NULL:
+            deinitialize_grids(chan_count, <void **>thread_accums[thread_idx])
+        if thread_weights[thread_idx] is not NULL:
+            deinitialize_grids(chan_count, <void **>thread_weights[thread_idx])
+    free(thread_accums)
+    free(thread_weights)
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-cdef int fornav(unsigned int *valid_list, size_t chan_count, size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows,
-            cr_dtype *cols_pointer, cr_dtype *rows_pointer,
-           image_dtype **input_arrays, grid_dtype **output_arrays,
-           image_dtype input_fill, grid_dtype output_fill, size_t rows_per_scan,
+@cython.cdivision(True)
+cdef int fornav(unsigned int *valid_list, size_t chan_count, ewa_channel *channels,
+           size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows,
+           cr_dtype *cols_pointer, cr_dtype *rows_pointer, size_t rows_per_scan,
            unsigned int weight_count, weight_type weight_min, weight_type weight_distance_max, weight_type weight_delta_max,
-           weight_type weight_sum_min, bint maximum_weight_mode) except -1:
-    cdef unsigned int row_idx
+           weight_type weight_sum_min, unsigned int num_threads,
+           numpy.uint8_t *scan_mask,
+           accum_type **out_accums, weight_type **out_weights) except -1:
+    """Resample every channel to the grid.
+
+    If `out_accums` and `out_weights` are provided the accumulated values and weights are added to them instead of
+    being written to the output images. Returns whether any swath pixels touched the grid in that case.
+    """
+    cdef Py_ssize_t scan_idx
+    cdef Py_ssize_t scan_count = swath_rows / rows_per_scan
+    cdef size_t row_idx
     cdef unsigned int idx
-    cdef bint got_point = 0
-    cdef bint tmp_got_point
+    cdef unsigned int thread_idx
+    cdef int worker_idx
+    cdef int got_point = 0
     cdef int func_result
     cdef cr_dtype *tmp_cols_pointer
     cdef cr_dtype *tmp_rows_pointer
-    cdef image_dtype **input_images
     cdef ewa_weight ewaw
     cdef ewa_parameters *ewap
+    cdef ewa_parameters *thread_ewap
+    cdef size_t cells_per_pixel = footprint_size(weight_delta_max)
+    cdef unsigned int *cell_offsets
+    cdef weight_type *cell_weights
+    cdef accum_type ***thread_accums
+    cdef weight_type ***thread_weights
 
     # other defaults
     if weight_sum_min == -1.0:
         weight_sum_min = weight_min
+    # every worker needs at least one scan to work on
+    if num_threads < 1:
+        num_threads = 1
+    if num_threads > scan_count:
+        num_threads = scan_count
 
     func_result = initialize_weight(chan_count, weight_count, weight_min, weight_distance_max, weight_delta_max,
                       weight_sum_min, &ewaw)
@@ -109,66 +171,149 @@ cdef int fornav(unsigned int *valid_list, size_t chan_count, size_t swath_cols,
         raise RuntimeError("Could not initialize weight structure for EWA resampling")
 
     # Allocate location for storing the sum of all of the pixels involved in each grid cell
+    # Each worker thread gets its own set of grids so they never write to the same memory
     # XXX: Do these need to be initialized to a fill value?
-    cdef accum_type **grid_accums = initialize_grid_accums(chan_count, grid_cols, grid_rows)
-    if grid_accums is NULL:
-        raise MemoryError()
-    cdef weight_type **grid_weights = initialize_grid_weights(chan_count, grid_cols, grid_rows)
-    if grid_weights is NULL:
-        raise MemoryError()
-    # Allocate memory for the parameters specific to each column
-    ewap = <ewa_parameters *>malloc(swath_cols * sizeof(ewa_parameters))
-    if ewap is NULL:
+    thread_accums = <accum_type ***>calloc(num_threads, sizeof(accum_type **))
+    thread_weights = <weight_type ***>calloc(num_threads, sizeof(weight_type **))
+    if thread_accums is NULL or thread_weights is NULL:
+        free(thread_accums)
+        free(thread_weights)
+        deinitialize_weight(&ewaw)
         raise MemoryError()
-    # Allocate pointers to the correct portion of the data arrays that we will use
-    input_images = <image_dtype **>malloc(chan_count * sizeof(image_dtype *))
-    if input_images is NULL:
+    for thread_idx in range(num_threads):
+        thread_accums[thread_idx] = initialize_grid_accums(chan_count, grid_cols, grid_rows)
+        thread_weights[thread_idx] = initialize_grid_weights(chan_count, grid_cols, grid_rows)
+        if thread_accums[thread_idx] is NULL or thread_weights[thread_idx] is NULL:
+            free_thread_grids(num_threads, chan_count, thread_accums, thread_weights)
+            deinitialize_weight(&ewaw)
+            raise MemoryError()
+    # Allocate memory for the parameters specific to each column (one set per thread)
+    ewap = <ewa_parameters *>malloc(num_threads * swath_cols * sizeof(ewa_parameters))
+    # Allocate memory for the weights of a single pixel's footprint so they can be shared between channels (one set per thread)
+    cell_offsets = <unsigned int *>malloc(num_threads * cells_per_pixel * sizeof(unsigned int))
+    cell_weights = <weight_type *>malloc(num_threads * cells_per_pixel * sizeof(weight_type))
+    if ewap is NULL or cell_offsets is NULL or cell_weights is NULL:
+        free(ewap)
+        free(cell_offsets)
+        free(cell_weights)
+        free_thread_grids(num_threads, chan_count, thread_accums, thread_weights)
+        deinitialize_weight(&ewaw)
         raise MemoryError()
 
-
-    # NOTE: Have to use old school pyrex for loop because cython only supports compile-time known steps
-    for row_idx from 0 <= row_idx < swath_rows by rows_per_scan:
-        tmp_cols_pointer = &cols_pointer[row_idx * swath_cols]
-        tmp_rows_pointer = &rows_pointer[row_idx * swath_cols]
-        # print "Current cols pointer: %d" % (<int>tmp_cols_pointer,)
-
-        # Assign the python/numpy array objects to a pointer location for the rest of the functions
-        for idx in range(chan_count):
-            input_images[idx] = &input_arrays[idx][row_idx * swath_cols]
-        # print "Current input 0 pointer: %d" % (<int>input_images[idx],)
-
-        # Calculate EWA parameters for each column index
-        func_result = compute_ewa_parameters(swath_cols, rows_per_scan, tmp_cols_pointer, tmp_rows_pointer, &ewaw, ewap)
-        if func_result < 0:
-            got_point = got_point or 0
-            # raise RuntimeError("Could compute EWA parameters for EWA resampling")
-            continue
-
-        # NOTE: In the C version this is where the image array data is loaded
-        tmp_got_point = compute_ewa(chan_count, maximum_weight_mode,
-                    swath_cols, rows_per_scan, grid_cols, grid_rows,
-                    tmp_cols_pointer, tmp_rows_pointer,
-                    input_images, input_fill, grid_accums, grid_weights, &ewaw, ewap)
-
-        got_point = got_point or tmp_got_point
-
-    free(input_images)
+    # Scans are independent of each other so they are split between the worker threads. A static schedule gives each
+    # thread a contiguous block of scans so merging the grids in thread order matches the serial scan order.
+    with nogil:
+        for scan_idx in prange(scan_count, num_threads=num_threads, schedule='static'):
+            # Skip scans that were determined to never touch the grid
+            if scan_mask is not NULL and not scan_mask[scan_idx]:
+                continue
+            worker_idx = threadid()
+            thread_ewap = &ewap[worker_idx * swath_cols]
+            row_idx = scan_idx * rows_per_scan
+            tmp_cols_pointer = &cols_pointer[row_idx * swath_cols]
+            tmp_rows_pointer = &rows_pointer[row_idx * swath_cols]
+
+            # Calculate EWA parameters for each column index
+            func_result = compute_ewa_parameters(swath_cols, rows_per_scan, tmp_cols_pointer, tmp_rows_pointer, &ewaw, thread_ewap)
+            if func_result < 0:
+                # raise RuntimeError("Could compute EWA parameters for EWA resampling")
+                continue
+
+            # NOTE: In the C version this is where the image array data is loaded
+            got_point |= compute_ewa(chan_count, channels, row_idx * swath_cols,
+                        swath_cols, rows_per_scan, grid_cols, grid_rows,
+                        tmp_cols_pointer, tmp_rows_pointer,
+                        thread_accums[worker_idx], thread_weights[worker_idx],
+                        &ewaw, thread_ewap,
+                        &cell_offsets[worker_idx * cells_per_pixel], &cell_weights[worker_idx * cells_per_pixel])
+
+        # Combine every worker's partial grids in to the first worker's grids
+        for thread_idx in range(1, num_threads):
+            merge_grids(chan_count, channels, grid_cols, grid_rows,
+                        thread_accums[0], thread_weights[0], thread_accums[thread_idx], thread_weights[thread_idx])
+
+    free(cell_offsets)
+    free(cell_weights)
     free(ewap)
 
+    if out_accums is not NULL:
+        # add to grids that are kept between calls
+        if got_point:
+            with nogil:
+                merge_grids(chan_count, channels, grid_cols, grid_rows,
+                            out_accums, out_weights, thread_accums[0], thread_weights[0])
+        deinitialize_weight(&ewaw)
+        free_thread_grids(num_threads, chan_count, thread_accums, thread_weights)
+        return got_point
+
     if not got_point:
+        free_thread_grids(num_threads, chan_count, thread_accums, thread_weights)
+        deinitialize_weight(&ewaw)
         raise RuntimeError("EWA Resampling: No swath pixels found inside grid to be resampled")
 
     for idx in range(chan_count):
-        valid_list[idx] = write_grid_image(output_arrays[idx], output_fill, grid_cols, grid_rows,
-                                          grid_accums[idx], grid_weights[idx], maximum_weight_mode, weight_sum_min)
+        valid_list[idx] = write_channel_image(&channels[idx], grid_cols, grid_rows,
+                                              thread_accums[0][idx], thread_weights[0][idx], weight_sum_min)
 
-    # free(grid_accums)
     deinitialize_weight(&ewaw)
-    deinitialize_grids(chan_count, <void **>grid_accums)
-    deinitialize_grids(chan_count, <void **>grid_weights)
+    free_thread_grids(num_threads, chan_count, thread_accums, thread_weights)
 
     return 0
 
+def _per_channel(value, size_t num_items, name):
+    """Repeat a scalar parameter for every channel or verify there is one value per channel."""
+    if isinstance(value, (list, tuple)):
+        if len(value) != num_items:
+            raise ValueError("Must provide one '%s' per input array" % (name,))
+        return list(value)
+    return [value] * num_items
+
+def _check_channel_arrays(tuple input_arrays, tuple output_arrays, size_t swath_rows, size_t swath_cols):
+    """Verify that input and output arrays can be handed to the C++ EWA code."""
+    cdef size_t grid_rows = output_arrays[0].shape[0]
+    cdef size_t grid_cols = output_arrays[0].shape[1]
+    for input_array, output_array in zip(input_arrays, output_arrays):
+        if input_array.dtype != output_array.dtype:
+            raise ValueError("Input and Output must be of the same type")
+        if input_array.dtype not in EWA_DATA_TYPES:
+            raise ValueError("Unknown input and output data type: %s" % (input_array.dtype,))
+        if input_array.shape[0] != swath_rows or input_array.shape[1] != swath_cols or not input_array.flags.c_contiguous:
+            raise ValueError("Input arrays must be C-contiguous and the same shape as the column and row arrays")
+        if output_array.shape[0] != grid_rows or output_array.shape[1] != grid_cols or not output_array.flags.c_contiguous:
+            raise ValueError("Output arrays must be C-contiguous and all the same shape")
+        if not output_array.flags.writeable:
+            raise ValueError("Output arrays must be writeable")
+
+cdef int _init_channels(ewa_channel *channels, tuple input_arrays, tuple output_arrays,
+                        input_fill, output_fill, maximum_weight_mode) except -1:
+    """Fill in the channel descriptions for already validated input and output arrays.
+
+    Either `input_arrays` or `output_arrays` may be None when only accumulating or only writing grid images.
+    """
+    cdef size_t num_items = len(input_arrays if input_arrays is not None else output_arrays)
+    cdef unsigned int i
+    cdef numpy.ndarray tmp_arr
+    input_fills = _per_channel(input_fill, num_items, "input_fill")
+    output_fills = _per_channel(output_fill, num_items, "output_fill")
+    mwm_list = _per_channel(maximum_weight_mode, num_items, "maximum_weight_mode")
+    for i in range(num_items):
+        channels[i].image = NULL
+        channels[i].output_image = NULL
+        if input_arrays is not None:
+            tmp_arr = input_arrays[i]
+            channels[i].data_type = EWA_DATA_TYPES[tmp_arr.dtype]
+            channels[i].image = numpy.PyArray_DATA(tmp_arr)
+        if output_arrays is not None:
+            tmp_arr = output_arrays[i]
+            channels[i].data_type = EWA_DATA_TYPES[tmp_arr.dtype]
+            channels[i].output_image = numpy.PyArray_DATA(tmp_arr)
+        if channels[i].data_type == EWA_INT8 and (numpy.isnan(input_fills[i]) or numpy.isnan(output_fills[i])):
+            raise ValueError("Integer arrays must have integer fill values")
+        channels[i].image_fill = <double>input_fills[i]
+        channels[i].output_fill = <double>output_fills[i]
+        channels[i].maximum_weight_mode = <bint>mwm_list[i]
+    return 0
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 def fornav_wrapper(numpy.ndarray[cr_dtype, ndim=2, mode='c'] cols_array,
@@ -176,7 +321,14 @@ def fornav_wrapper(numpy.ndarray[cr_dtype, ndim=2, mode='c'] cols_array,
            tuple input_arrays, tuple output_arrays, input_fill, output_fill,
            size_t rows_per_scan,
            unsigned int weight_count=10000, weight_type weight_min=0.01, weight_type weight_distance_max=1.0, weight_type weight_delta_max=10.0, weight_type weight_sum_min=-1.0,
-           cpython.bool maximum_weight_mode=False):
+           maximum_weight_mode=False, unsigned int num_threads=1, scan_mask=None):
+    """Resample multiple swath arrays sharing the same column and row arrays to a grid.
+
+    Each input array may have a different data type (32-bit float, 64-bit float, or 8-bit signed integer), but its
+    output array must have the same type. `input_fill`, `output_fill`, and `maximum_weight_mode` may be a single value
+    for all arrays or a sequence with one value per array. The EWA footprint of every swath pixel is computed once
+    and applied to every array.
+    """
     cdef size_t num_items = len(input_arrays)
     cdef size_t num_outputs = len(output_arrays)
     cdef size_t swath_cols = cols_array.shape[1]
@@ -191,70 +343,314 @@ def fornav_wrapper(numpy.ndarray[cr_dtype, ndim=2, mode='c'] cols_array,
     if rows_per_scan < 2 or swath_rows % rows_per_scan != 0:
         raise ValueError("EWA requires 2 or more rows_per_scan and must be a factor of the total number of input rows")
 
-    cdef numpy.dtype in_type = input_arrays[0].dtype
-    cdef numpy.dtype out_type = output_arrays[0].dtype
-    if in_type != out_type:
-        raise ValueError("Input and Output must be of the same type")
-    if not all(input_array.dtype == in_type for input_array in input_arrays):
-        raise ValueError("Input arrays must all be of the same data type")
-    if not all(output_array.dtype == out_type for output_array in output_arrays):
-        raise ValueError("Input arrays must all be of the same data type")
-
-    cdef void **input_pointer = <void **>malloc(num_items * sizeof(void *))
-    if not input_pointer:
-        raise MemoryError()
-    cdef void **output_pointer = <void **>malloc(num_items * sizeof(void *))
-    if not output_pointer:
+    cdef numpy.ndarray[numpy.uint8_t, ndim=1, mode='c'] scan_mask_array
+    cdef numpy.uint8_t *scan_mask_pointer = NULL
+    if scan_mask is not None:
+        if scan_mask.shape[0] != swath_rows / rows_per_scan:
+            raise ValueError("Scan mask must have one element per scan")
+        scan_mask_array = numpy.ascontiguousarray(scan_mask, dtype=numpy.uint8)
+        scan_mask_pointer = &scan_mask_array[0]
+
+    _check_channel_arrays(input_arrays, output_arrays, swath_rows, swath_cols)
+    cdef ewa_channel *channels = <ewa_channel *>malloc(num_items * sizeof(ewa_channel))
+    if not channels:
         raise MemoryError()
     cdef unsigned int *valid_arr = <unsigned int *>malloc(num_items * sizeof(unsigned int))
+    if not valid_arr:
+        free(channels)
+        raise MemoryError()
     valid_list = []
-    cdef numpy.ndarray[numpy.float32_t, ndim=2] tmp_arr_f32
-    cdef numpy.ndarray[numpy.float64_t, ndim=2] tmp_arr_f64
-    cdef numpy.ndarray[numpy.int8_t, ndim=2] tmp_arr_i8
     cdef cr_dtype *cols_pointer = &cols_array[0, 0]
     cdef cr_dtype *rows_pointer = &rows_array[0, 0]
     cdef int func_result
 
-    if in_type == numpy.float32:
-        for i in range(num_items):
-            tmp_arr_f32 = input_arrays[i]
-            input_pointer[i] = &tmp_arr_f32[0, 0]
-            tmp_arr_f32 = output_arrays[i]
-            output_pointer[i] = &tmp_arr_f32[0, 0]
-        func_result = fornav(valid_arr, num_items, swath_cols, swath_rows, grid_cols, grid_rows, cols_pointer, rows_pointer,
-                     <numpy.float32_t **>input_pointer, <numpy.float32_t **>output_pointer,
-                     <numpy.float32_t>input_fill, <numpy.float32_t>output_fill, rows_per_scan,
-                     weight_count, weight_min, weight_distance_max, weight_delta_max, weight_sum_min,
-                     <bint>maximum_weight_mode)
-    elif in_type == numpy.float64:
+    try:
+        _init_channels(channels, input_arrays, output_arrays, input_fill, output_fill, maximum_weight_mode)
+        func_result = fornav(valid_arr, num_items, channels, swath_cols, swath_rows, grid_cols, grid_rows,
+                             cols_pointer, rows_pointer, rows_per_scan,
+                             weight_count, weight_min, weight_distance_max, weight_delta_max, weight_sum_min,
+                             num_threads, scan_mask_pointer, NULL, NULL)
+
         for i in range(num_items):
-            tmp_arr_f64 = input_arrays[i]
-            input_pointer[i] = &tmp_arr_f64[0, 0]
-            tmp_arr_f64 = output_arrays[i]
-            output_pointer[i] = &tmp_arr_f64[0, 0]
-        func_result = fornav(valid_arr, num_items, swath_cols, swath_rows, grid_cols, grid_rows, cols_pointer, rows_pointer,
-                     <numpy.float64_t **>input_pointer, <numpy.float64_t **>output_pointer,
-                     <numpy.float64_t>input_fill, <numpy.float64_t>output_fill, rows_per_scan,
-                     weight_count, weight_min, weight_distance_max, weight_delta_max, weight_sum_min,
-                     <bint>maximum_weight_mode)
-    elif in_type == numpy.int8:
+            valid_list.append(valid_arr[i])
+    finally:
+        free(channels)
+        free(valid_arr)
+
+    return valid_list
+
+
+def _check_grid_arrays(tuple grid_accums, tuple grid_weights, size_t num_items):
+    """Verify that accumulation and weight grids can be handed to the C++ EWA code."""
+    if len(grid_accums) != num_items or len(grid_weights) != num_items:
+        raise ValueError("Must have one accumulation and one weight grid per array")
+    grid_shape = grid_accums[0].shape
+    for grid_arr in grid_accums + grid_weights:
+        if grid_arr.dtype != numpy.float32:
+            raise ValueError("Accumulation and weight grids must be 32-bit floats")
+        if grid_arr.shape != grid_shape or grid_arr.ndim != 2 or not grid_arr.flags.c_contiguous:
+            raise ValueError("Accumulation and weight grids must be C-contiguous and all the same shape")
+
+cdef void **_grid_pointers(tuple grid_arrays) except NULL:
+    cdef void **pointers = <void **>malloc(len(grid_arrays) * sizeof(void *))
+    cdef numpy.ndarray tmp_arr
+    if pointers is NULL:
+        raise MemoryError()
+    for i in range(len(grid_arrays)):
+        tmp_arr = grid_arrays[i]
+        pointers[i] = numpy.PyArray_DATA(tmp_arr)
+    return pointers
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def fornav_accumulate_wrapper(numpy.ndarray[cr_dtype, ndim=2, mode='c'] cols_array,
+           numpy.ndarray[cr_dtype, ndim=2, mode='c'] rows_array,
+           tuple input_arrays, tuple grid_accums, tuple grid_weights, input_fill,
+           size_t rows_per_scan,
+           unsigned int weight_count=10000, weight_type weight_min=0.01, weight_type weight_distance_max=1.0, weight_type weight_delta_max=10.0,
+           maximum_weight_mode=False, unsigned int num_threads=1, scan_mask=None):
+    """Add the EWA weighted values and weights of multiple swath arrays to accumulation and weight grids.
+
+    The grids (32-bit floats, zeros to start) are kept between calls so swaths, for example granules of a pass, can
+    be added one at a time. `write_grid_images_wrapper` turns them in to the same images `fornav_wrapper` would make
+    from all of the swaths at once.
+
+    :returns: True if any swath pixels touched the grid
+    """
+    cdef size_t num_items = len(input_arrays)
+    cdef size_t swath_cols = cols_array.shape[1]
+    cdef size_t swath_rows = cols_array.shape[0]
+    if num_items <= 0:
+        raise ValueError("No input arrays given")
+    if rows_per_scan < 2 or swath_rows % rows_per_scan != 0:
+        raise ValueError("EWA requires 2 or more rows_per_scan and must be a factor of the total number of input rows")
+    _check_grid_arrays(grid_accums, grid_weights, num_items)
+    cdef size_t grid_cols = grid_accums[0].shape[1]
+    cdef size_t grid_rows = grid_accums[0].shape[0]
+    for input_array in input_arrays:
+        if input_array.dtype not in EWA_DATA_TYPES:
+            raise ValueError("Unknown input data type: %s" % (input_array.dtype,))
+        if input_array.shape[0] != swath_rows or input_array.shape[1] != swath_cols or not input_array.flags.c_contiguous:
+            raise ValueError("Input arrays must be C-contiguous and the same shape as the column and row arrays")
+
+    cdef numpy.ndarray[numpy.uint8_t, ndim=1, mode='c'] scan_mask_array
+    cdef numpy.uint8_t *scan_mask_pointer = NULL
+    if scan_mask is not None:
+        if scan_mask.shape[0] != swath_rows / rows_per_scan:
+            raise ValueError("Scan mask must have one element per scan")
+        scan_mask_array = numpy.ascontiguousarray(scan_mask, dtype=numpy.uint8)
+        scan_mask_pointer = &scan_mask_array[0]
+
+    cdef ewa_channel *channels = <ewa_channel *>malloc(num_items * sizeof(ewa_channel))
+    cdef accum_type **accum_pointers = NULL
+    cdef weight_type **weight_pointers = NULL
+    cdef int got_point
+    if not channels:
+        raise MemoryError()
+    try:
+        accum_pointers = <accum_type **>_grid_pointers(grid_accums)
+        weight_pointers = <weight_type **>_grid_pointers(grid_weights)
+        _init_channels(channels, input_arrays, None, input_fill, 0, maximum_weight_mode)
+        got_point = fornav(NULL, num_items, channels, swath_cols, swath_rows, grid_cols, grid_rows,
+                           &cols_array[0, 0], &rows_array[0, 0], rows_per_scan,
+                           weight_count, weight_min, weight_distance_max, weight_delta_max, -1.0,
+                           num_threads, scan_mask_pointer, accum_pointers, weight_pointers)
+    finally:
+        free(channels)
+        free(accum_pointers)
+        free(weight_pointers)
+
+    return bool(got_point)
+
+
+def write_grid_images_wrapper(tuple grid_accums, tuple grid_weights, tuple output_arrays, output_fill,
+           weight_type weight_min=0.01, weight_type weight_sum_min=-1.0, maximum_weight_mode=False):
+    """Write images from the accumulation and weight grids made by `fornav_accumulate_wrapper`.
+
+    The grids are not modified so images can be written again after more swaths are added.
+
+    :returns: list of the number of valid grid cells written for each output array
+    """
+    cdef size_t num_items = len(output_arrays)
+    cdef unsigned int i
+    if num_items <= 0:
+        raise ValueError("No output arrays given")
+    _check_grid_arrays(grid_accums, grid_weights, num_items)
+    cdef size_t grid_cols = grid_accums[0].shape[1]
+    cdef size_t grid_rows = grid_accums[0].shape[0]
+    for output_array in output_arrays:
+        if output_array.dtype not in EWA_DATA_TYPES:
+            raise ValueError("Unknown output data type: %s" % (output_array.dtype,))
+        if output_array.shape[0] != grid_rows or output_array.shape[1] != grid_cols or not output_array.flags.c_contiguous:
+            raise ValueError("Output arrays must be C-contiguous and the same shape as the grids")
+        if not output_array.flags.writeable:
+            raise ValueError("Output arrays must be writeable")
+    if weight_sum_min == -1.0:
+        weight_sum_min = weight_min
+
+    cdef ewa_channel *channels = <ewa_channel *>malloc(num_items * sizeof(ewa_channel))
+    cdef numpy.ndarray accum_arr
+    cdef numpy.ndarray weight_arr
+    valid_list = []
+    if not channels:
+        raise MemoryError()
+    try:
+        _init_channels(channels, None, output_arrays, 0, output_fill, maximum_weight_mode)
         for i in range(num_items):
-            tmp_arr_i8 = input_arrays[i]
-            input_pointer[i] = &tmp_arr_i8[0, 0]
-            tmp_arr_i8 = output_arrays[i]
-            output_pointer[i] = &tmp_arr_i8[0, 0]
-        func_result = fornav(valid_arr, num_items, swath_cols, swath_rows, grid_cols, grid_rows, cols_pointer, rows_pointer,
-                     <numpy.int8_t **>input_pointer, <numpy.int8_t **>output_pointer,
-                     <numpy.int8_t>input_fill, <numpy.int8_t>output_fill, rows_per_scan,
-                     weight_count, weight_min, weight_distance_max, weight_delta_max, weight_sum_min,
-                     <bint>maximum_weight_mode)
-    else:
-        raise ValueError("Unknown input and output data type")
+            accum_arr = grid_accums[i]
+            weight_arr = grid_weights[i]
+            valid_list.append(write_channel_image(&channels[i], grid_cols, grid_rows,
+                                                  <accum_type *>numpy.PyArray_DATA(accum_arr),
+                                                  <weight_type *>numpy.PyArray_DATA(weight_arr), weight_sum_min))
+    finally:
+        free(channels)
 
-    for i in range(num_items):
-        valid_list.append(valid_arr[i])
+    return valid_list
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def compute_footprints_wrapper(numpy.ndarray[cr_dtype, ndim=2, mode='c'] cols_array,
+           numpy.ndarray[cr_dtype, ndim=2, mode='c'] rows_array,
+           size_t rows_per_scan, size_t grid_cols, size_t grid_rows,
+           unsigned int weight_count=10000, weight_type weight_min=0.01, weight_type weight_distance_max=1.0, weight_type weight_delta_max=10.0,
+           scan_mask=None):
+    """Compute the grid cells and weights covered by the EWA footprint of every swath pixel.
+
+    The result is a CSR-style sparse matrix with one row per swath pixel (in C order): the grid cells (flattened grid
+    indexes) covered by pixel ``i`` are ``cell_offsets[pixel_ptr[i]:pixel_ptr[i + 1]]`` with weights
+    ``cell_weights[pixel_ptr[i]:pixel_ptr[i + 1]]``. These can be used by `fornav_footprints_wrapper` to resample any
+    number of products with the same columns and rows without recomputing the footprints.
+
+    :returns: (pixel_ptr, cell_offsets, cell_weights) arrays of type int64, uint32, and float32
+    """
+    cdef size_t swath_cols = cols_array.shape[1]
+    cdef size_t swath_rows = cols_array.shape[0]
+    cdef size_t scan_count
+    cdef size_t scan_idx
+    cdef size_t row_idx
+    cdef size_t pixel_idx
+    cdef size_t pixels_per_scan = rows_per_scan * swath_cols
+    cdef int func_result = 0
+    cdef int got_point = 0
+    cdef ewa_weight ewaw
+    cdef ewa_parameters *ewap
+    cdef ewa_footprints footprints
+    if rows_per_scan < 2 or swath_rows % rows_per_scan != 0:
+        raise ValueError("EWA requires 2 or more rows_per_scan and must be a factor of the total number of input rows")
+    if grid_cols * grid_rows > 0xFFFFFFFF:
+        raise ValueError("Grid is too large to store footprints for")
+    scan_count = swath_rows / rows_per_scan
+
+    cdef numpy.ndarray[numpy.uint8_t, ndim=1, mode='c'] scan_mask_array
+    cdef numpy.uint8_t *scan_mask_pointer = NULL
+    if scan_mask is not None:
+        if scan_mask.shape[0] != scan_count:
+            raise ValueError("Scan mask must have one element per scan")
+        scan_mask_array = numpy.ascontiguousarray(scan_mask, dtype=numpy.uint8)
+        scan_mask_pointer = &scan_mask_array[0]
+
+    cdef numpy.ndarray[numpy.int64_t, ndim=1, mode='c'] pixel_ptr = numpy.zeros(swath_rows * swath_cols + 1, dtype=numpy.int64)
+    cdef numpy.int64_t *pixel_ends = &pixel_ptr[1]
+
+    if initialize_weight(1, weight_count, weight_min, weight_distance_max, weight_delta_max, weight_min, &ewaw) < 0:
+        deinitialize_weight(&ewaw)
+        raise RuntimeError("Could not initialize weight structure for EWA resampling")
+    ewap = <ewa_parameters *>malloc(swath_cols * sizeof(ewa_parameters))
+    # start with enough room for a couple cells per pixel, the storage grows as needed
+    if ewap is NULL or initialize_footprints(&footprints, 4 * pixels_per_scan) < 0:
+        free(ewap)
+        deinitialize_weight(&ewaw)
+        raise MemoryError()
+
+    try:
+        with nogil:
+            for scan_idx in range(scan_count):
+                row_idx = scan_idx * rows_per_scan
+                if (scan_mask_pointer is not NULL and not scan_mask_pointer[scan_idx]) or \
+                        compute_ewa_parameters(swath_cols, rows_per_scan, &cols_array[row_idx, 0], &rows_array[row_idx, 0], &ewaw, ewap) < 0:
+                    # this scan doesn't cover any grid cells
+                    for pixel_idx in range(row_idx * swath_cols, row_idx * swath_cols + pixels_per_scan):
+                        pixel_ends[pixel_idx] = footprints.size
+                    continue
+                func_result = compute_footprints(swath_cols, rows_per_scan, grid_cols, grid_rows,
+                                                 &cols_array[row_idx, 0], &rows_array[row_idx, 0], &ewaw, ewap,
+                                                 &footprints, &pixel_ends[row_idx * swath_cols])
+                if func_result < 0:
+                    break
+                got_point |= func_result
+        if func_result < 0:
+            raise MemoryError()
+        if not got_point:
+            raise RuntimeError("EWA Resampling: No swath pixels found inside grid to be resampled")
+
+        cell_offsets = numpy.empty(footprints.size, dtype=numpy.uint32)
+        cell_weights = numpy.empty(footprints.size, dtype=numpy.float32)
+        if footprints.size:
+            memcpy(numpy.PyArray_DATA(cell_offsets), footprints.cell_offsets, footprints.size * sizeof(unsigned int))
+            memcpy(numpy.PyArray_DATA(cell_weights), footprints.cell_weights, footprints.size * sizeof(weight_type))
+    finally:
+        free(ewap)
+        deinitialize_footprints(&footprints)
+        deinitialize_weight(&ewaw)
+
+    return pixel_ptr, cell_offsets, cell_weights
+
+
+def fornav_footprints_wrapper(numpy.ndarray pixel_ptr, numpy.ndarray cell_offsets, numpy.ndarray cell_weights,
+           tuple input_arrays, tuple output_arrays, input_fill, output_fill,
+           weight_type weight_min=0.01, weight_type weight_sum_min=-1.0, maximum_weight_mode=False):
+    """Resample multiple swath arrays to a grid using footprints from `compute_footprints_wrapper`.
 
-    free(input_pointer)
-    free(output_pointer)
+    This produces the same result as `fornav_wrapper` with the column and row arrays and weight parameters that were
+    used to compute the footprints. The footprint arrays may be read-only (ex. memory mapped cache files).
+    """
+    cdef size_t num_items = len(input_arrays)
+    cdef size_t grid_cols
+    cdef size_t grid_rows
+    cdef size_t swath_size
+    cdef unsigned int i
+    if num_items != len(output_arrays):
+        raise ValueError("Must have same number of inputs and outputs")
+    if num_items <= 0:
+        raise ValueError("No input arrays given")
+    swath_size = input_arrays[0].size
+    grid_rows = output_arrays[0].shape[0]
+    grid_cols = output_arrays[0].shape[1]
+    if pixel_ptr.dtype != numpy.int64 or cell_offsets.dtype != numpy.uint32 or cell_weights.dtype != numpy.float32:
+        raise ValueError("Footprint arrays must be of type int64, uint32, and float32")
+    if not (pixel_ptr.flags.c_contiguous and cell_offsets.flags.c_contiguous and cell_weights.flags.c_contiguous):
+        raise ValueError("Footprint arrays must be C-contiguous")
+    if pixel_ptr.shape[0] != swath_size + 1 or pixel_ptr[-1] != cell_offsets.shape[0] or cell_offsets.shape[0] != cell_weights.shape[0]:
+        raise ValueError("Footprints do not match the shape of the input arrays")
+    if cell_offsets.shape[0] and cell_offsets.max() >= grid_cols * grid_rows:
+        raise ValueError("Footprints do not match the shape of the output arrays")
+    _check_channel_arrays(input_arrays, output_arrays, input_arrays[0].shape[0], input_arrays[0].shape[1])
+    if weight_sum_min == -1.0:
+        weight_sum_min = weight_min
+
+    cdef numpy.int64_t *pixel_ptr_pointer = <numpy.int64_t *>numpy.PyArray_DATA(pixel_ptr)
+    cdef unsigned int *cell_offsets_pointer = <unsigned int *>numpy.PyArray_DATA(cell_offsets)
+    cdef weight_type *cell_weights_pointer = <weight_type *>numpy.PyArray_DATA(cell_weights)
+    cdef accum_type **grid_accums = initialize_grid_accums(num_items, grid_cols, grid_rows)
+    cdef weight_type **grid_weights = initialize_grid_weights(num_items, grid_cols, grid_rows)
+    cdef ewa_channel *channels = <ewa_channel *>malloc(num_items * sizeof(ewa_channel))
+    valid_list = []
+    try:
+        if grid_accums is NULL or grid_weights is NULL or channels is NULL:
+            raise MemoryError()
+        _init_channels(channels, input_arrays, output_arrays, input_fill, output_fill, maximum_weight_mode)
+        with nogil:
+            apply_footprints(num_items, channels, 0, swath_size, pixel_ptr_pointer,
+                             cell_offsets_pointer, cell_weights_pointer, grid_accums, grid_weights)
+        for i in range(num_items):
+            valid_list.append(write_channel_image(&channels[i], grid_cols, grid_rows,
+                                                  grid_accums[i], grid_weights[i], weight_sum_min))
+    finally:
+        free(channels)
+        if grid_accums is not NULL:
+            deinitialize_grids(num_items, <void **>grid_accums)
+        if grid_weights is not NULL:
+            deinitialize_grids(num_items, <void **>grid_weights)
 
     return valid_list
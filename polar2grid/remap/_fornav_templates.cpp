@@ -94,6 +94,38 @@ void deinitialize_grids(size_t chan_count, void **grids) {
   free(grids);
 }
 
+void merge_grids(size_t chan_count, ewa_channel *channels, size_t grid_cols, size_t grid_rows,
+        accum_type **grid_accums, weight_type **grid_weights,
+        accum_type **other_accums, weight_type **other_weights) {
+  // Combine the partial accumulation and weight grids of another worker in to the primary grids
+  size_t grid_size = grid_cols * grid_rows;
+  size_t i;
+  size_t chan;
+  accum_type *this_accum;
+  weight_type *this_weight;
+  accum_type *other_accum;
+  weight_type *other_weight;
+
+  for (chan = 0; chan < chan_count; chan++) {
+    this_accum = grid_accums[chan];
+    this_weight = grid_weights[chan];
+    other_accum = other_accums[chan];
+    other_weight = other_weights[chan];
+    for (i = 0; i < grid_size; i++) {
+      if (channels[chan].maximum_weight_mode) {
+        // only replace the current value if the other worker found a heavier pixel (same as compute_ewa)
+        if (other_weight[i] > this_weight[i]) {
+          this_weight[i] = other_weight[i];
+          this_accum[i] = other_accum[i];
+        }
+      } else {
+        this_weight[i] += other_weight[i];
+        this_accum[i] += other_accum[i];
+      }
+    }
+  }
+}
+
 template <typename CR_TYPE>
 int compute_ewa_parameters(size_t swath_cols, size_t swath_rows, CR_TYPE *uimg, CR_TYPE *vimg, ewa_weight *ewaw, ewa_parameters *ewap) {
   ewa_param_type ux;
@@ -170,23 +202,85 @@ int compute_ewa_parameters(size_t swath_cols, size_t swath_rows, CR_TYPE *uimg,
   return 0;
 }
 
-template<typename CR_TYPE, typename IMAGE_TYPE>
-int compute_ewa(size_t chan_count, int maximum_weight_mode,
-        size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows, CR_TYPE *uimg, CR_TYPE *vimg,
-        IMAGE_TYPE **images, IMAGE_TYPE img_fill, accum_type **grid_accums, weight_type **grid_weights, ewa_weight *ewaw, ewa_parameters *ewap) {
+size_t footprint_size(weight_type weight_delta_max) {
+  // Maximum number of grid cells a single swath pixel's ellipse can cover (u_del and v_del are limited by delta_max)
+  size_t cells_per_side = 2 * (size_t)ceil(weight_delta_max) + 2;
+  return cells_per_side * cells_per_side;
+}
+
+template<typename IMAGE_TYPE>
+inline void accumulate_channel(IMAGE_TYPE this_val, IMAGE_TYPE img_fill, int maximum_weight_mode,
+        size_t cell_count, unsigned int *cell_offsets, weight_type *cell_weights,
+        accum_type *grid_accum, weight_type *grid_weight) {
+  size_t cell;
+  size_t grid_offset;
+  weight_type weight;
+  int is_fill = (this_val == img_fill) || (isnan(this_val));
+
+  if (maximum_weight_mode) {
+    for (cell = 0; cell < cell_count; cell++) {
+      grid_offset = cell_offsets[cell];
+      weight = cell_weights[cell];
+      if (weight > grid_weight[grid_offset]) {
+        grid_weight[grid_offset] = weight;
+        if (is_fill) {
+          grid_accum[grid_offset] = (accum_type)NAN;
+        } else {
+          grid_accum[grid_offset] = (accum_type)this_val;
+        }
+      }
+    }
+  } else if (!is_fill) {
+    for (cell = 0; cell < cell_count; cell++) {
+      grid_offset = cell_offsets[cell];
+      weight = cell_weights[cell];
+      grid_weight[grid_offset] += weight;
+      grid_accum[grid_offset] += (accum_type)this_val * weight;
+    }
+  }
+}
+
+inline void accumulate_channels(size_t chan_count, ewa_channel *channels, size_t image_idx,
+        size_t cell_count, unsigned int *cell_offsets, weight_type *cell_weights,
+        accum_type **grid_accums, weight_type **grid_weights) {
+  // Apply one swath pixel's footprint to every channel based on that channel's data type
+  size_t chan;
+  ewa_channel *channel;
+
+  for (chan = 0, channel = channels; chan < chan_count; chan+=1, channel++) {
+    switch (channel->data_type) {
+      case EWA_FLOAT32:
+        accumulate_channel(((npy_float32 *)channel->image)[image_idx], (npy_float32)channel->image_fill,
+                           channel->maximum_weight_mode, cell_count, cell_offsets, cell_weights,
+                           grid_accums[chan], grid_weights[chan]);
+        break;
+      case EWA_FLOAT64:
+        accumulate_channel(((npy_float64 *)channel->image)[image_idx], (npy_float64)channel->image_fill,
+                           channel->maximum_weight_mode, cell_count, cell_offsets, cell_weights,
+                           grid_accums[chan], grid_weights[chan]);
+        break;
+      case EWA_INT8:
+        accumulate_channel(((npy_int8 *)channel->image)[image_idx], (npy_int8)channel->image_fill,
+                           channel->maximum_weight_mode, cell_count, cell_offsets, cell_weights,
+                           grid_accums[chan], grid_weights[chan]);
+        break;
+    }
+  }
+}
+
+template<typename CR_TYPE>
+inline int compute_pixel_footprint(CR_TYPE u0, CR_TYPE v0, size_t grid_cols, size_t grid_rows,
+        ewa_weight *ewaw, ewa_parameters *this_ewap,
+        unsigned int *cell_offsets, weight_type *cell_weights, size_t *cell_count) {
   // This was originally copied from a cython C file for 32-bit float inputs (that explains some of the weird parens and other syntax
-  int got_point;
-  unsigned int row;
-  unsigned int col;
-  ewa_parameters *this_ewap;
+  // Store the grid cell offsets and weights covered by one swath pixel's ellipse (at most `footprint_size` cells).
+  // Returns 1 if the ellipse's bounding box touches the grid, 0 otherwise.
   int iu1;
   int iu2;
   int iv1;
   int iv2;
   int iu;
   int iv;
-  CR_TYPE u0;
-  CR_TYPE v0;
   weight_type ddq;
   weight_type dq;
   weight_type q;
@@ -212,92 +306,191 @@ int compute_ewa(size_t chan_count, int maximum_weight_mode,
 //  double qfactor;
 
   int iw;
-  IMAGE_TYPE this_val;
+
+  *cell_count = 0;
+  if (u0 < 0.0 || v0 < 0.0 || isnan(u0) || isnan(v0)) {
+    return 0;
+  }
+
+  iu1 = ((int)(u0 - this_ewap->u_del));
+  iu2 = ((int)(u0 + this_ewap->u_del));
+  iv1 = ((int)(v0 - this_ewap->v_del));
+  iv2 = ((int)(v0 + this_ewap->v_del));
+
+  if (iu1 < 0) {
+    iu1 = 0;
+  }
+  if (iu2 >= grid_cols) {
+    iu2 = (grid_cols - 1);
+  }
+  if (iv1 < 0) {
+    iv1 = 0;
+  }
+  if (iv2 >= grid_rows) {
+    iv2 = (grid_rows - 1);
+  }
+
+  if (!(iu1 < grid_cols && iu2 >= 0 && iv1 < grid_rows && iv2 >= 0)) {
+    return 0;
+  }
+
+  ddq = 2.0 * this_ewap->a;
+
+  u = (iu1 - u0);
+  a2up1 = (this_ewap->a * ((2.0 * u) + 1.0));
+  bu = this_ewap->b * u;
+  au2 = this_ewap->a * u * u;
+
+  for (iv = iv1; iv <= iv2; iv++) {
+    v = (iv - v0);
+    dq = (a2up1 + (this_ewap->b * v));
+    q = ((((this_ewap->c * v) + bu) * v) + au2);
+    for (iu = iu1; iu <= iu2; iu++) {
+      if ((q >= 0.0) && (q < this_ewap->f)) {
+        iw = ((int)(q * ewaw->qfactor));
+        if (iw >= ewaw->count) {
+          iw = (ewaw->count - 1);
+        }
+        weight = (ewaw->wtab[iw]);
+        cell_offsets[*cell_count] = ((iv * grid_cols) + iu);
+        cell_weights[*cell_count] = weight;
+        (*cell_count)++;
+      }
+      q += dq;
+      dq += ddq;
+    }
+  }
+
+  return 1;
+}
+
+template<typename CR_TYPE>
+int compute_ewa(size_t chan_count, ewa_channel *channels, size_t image_offset,
+        size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows, CR_TYPE *uimg, CR_TYPE *vimg,
+        accum_type **grid_accums, weight_type **grid_weights, ewa_weight *ewaw, ewa_parameters *ewap,
+        unsigned int *cell_offsets, weight_type *cell_weights) {
+  // The weights of each pixel's footprint are computed once and stored in `cell_offsets`/`cell_weights` (must hold
+  // `footprint_size` elements) then applied to every channel based on that channel's data type.
+  int got_point;
+  unsigned int row;
+  unsigned int col;
+  ewa_parameters *this_ewap;
   unsigned int swath_offset;
-  unsigned int grid_offset;
-  size_t chan;
+  size_t cell_count;
 
   got_point = 0;
   for (row = 0, swath_offset=0; row < swath_rows; row+=1) {
     for (col = 0, this_ewap = ewap; col < swath_cols; col++, this_ewap++, swath_offset++) {
-      u0 = uimg[swath_offset];
-      v0 = vimg[swath_offset];
-
-      if (u0 < 0.0 || v0 < 0.0 || isnan(u0) || isnan(v0)) {
-        continue;
+      if (compute_pixel_footprint(uimg[swath_offset], vimg[swath_offset], grid_cols, grid_rows, ewaw, this_ewap,
+                                  cell_offsets, cell_weights, &cell_count)) {
+        got_point = 1;
+        accumulate_channels(chan_count, channels, image_offset + swath_offset,
+                            cell_count, cell_offsets, cell_weights, grid_accums, grid_weights);
       }
+    }
+  }
 
-      iu1 = ((int)(u0 - this_ewap->u_del));
-      iu2 = ((int)(u0 + this_ewap->u_del));
-      iv1 = ((int)(v0 - this_ewap->v_del));
-      iv2 = ((int)(v0 + this_ewap->v_del));
+  /* function exit code */
+  return got_point;
+}
 
-      if (iu1 < 0) {
-        iu1 = 0;
-      }
-      if (iu2 >= grid_cols) {
-        iu2 = (grid_cols - 1);
-      }
-      if (iv1 < 0) {
-        iv1 = 0;
-      }
-      if (iv2 >= grid_rows) {
-        iv2 = (grid_rows - 1);
-      }
+int initialize_footprints(ewa_footprints *footprints, size_t capacity) {
+  footprints->size = 0;
+  footprints->capacity = capacity;
+  footprints->cell_offsets = (unsigned int *)malloc(capacity * sizeof(unsigned int));
+  footprints->cell_weights = (weight_type *)malloc(capacity * sizeof(weight_type));
+  if (!footprints->cell_offsets || !footprints->cell_weights) {
+    deinitialize_footprints(footprints);
+    return -1;
+  }
+  return 0;
+}
 
-      if (iu1 < grid_cols && iu2 >= 0 && iv1 < grid_rows && iv2 >= 0) {
-        got_point = 1;
-        ddq = 2.0 * this_ewap->a;
-
-        u = (iu1 - u0);
-        a2up1 = (this_ewap->a * ((2.0 * u) + 1.0));
-        bu = this_ewap->b * u;
-        au2 = this_ewap->a * u * u;
-
-        for (iv = iv1; iv <= iv2; iv++) {
-          v = (iv - v0);
-          dq = (a2up1 + (this_ewap->b * v));
-          q = ((((this_ewap->c * v) + bu) * v) + au2);
-          for (iu = iu1; iu <= iu2; iu++) {
-            if ((q >= 0.0) && (q < this_ewap->f)) {
-              iw = ((int)(q * ewaw->qfactor));
-              if (iw >= ewaw->count) {
-                iw = (ewaw->count - 1);
-              }
-              weight = (ewaw->wtab[iw]);
-              grid_offset = ((iv * grid_cols) + iu);
-
-              for (chan = 0; chan < chan_count; chan+=1) {
-                this_val = ((images[chan])[swath_offset]);
-                if (maximum_weight_mode) {
-                  if (weight > grid_weights[chan][grid_offset]) {
-                    ((grid_weights[chan])[grid_offset]) = weight;
-                    if ((this_val == img_fill) || (isnan(this_val))) {
-                      ((grid_accums[chan])[grid_offset]) = (accum_type)NAN;
-                    } else {
-                      ((grid_accums[chan])[grid_offset]) = (accum_type)this_val;
-                    }
-                  }
-                } else {
-                  if ((this_val != img_fill) && !(isnan(this_val))) {
-                    ((grid_weights[chan])[grid_offset]) += weight;
-                    ((grid_accums[chan])[grid_offset]) += (accum_type)this_val * weight;
-                  }
-                }
-              }
-            }
-            q += dq;
-            dq += ddq;
-          }
-        }
+void deinitialize_footprints(ewa_footprints *footprints) {
+  free(footprints->cell_offsets);
+  free(footprints->cell_weights);
+  footprints->cell_offsets = NULL;
+  footprints->cell_weights = NULL;
+  footprints->size = 0;
+  footprints->capacity = 0;
+}
+
+static int reserve_footprints(ewa_footprints *footprints, size_t needed) {
+  // Grow the footprint storage (doubling) so at least `needed` more cells can be added
+  size_t new_capacity = footprints->capacity;
+  unsigned int *new_offsets;
+  weight_type *new_weights;
+
+  if (footprints->size + needed <= footprints->capacity) {
+    return 0;
+  }
+  while (footprints->size + needed > new_capacity) {
+    new_capacity = new_capacity * 2 + needed;
+  }
+  new_offsets = (unsigned int *)realloc(footprints->cell_offsets, new_capacity * sizeof(unsigned int));
+  if (!new_offsets) {
+    return -1;
+  }
+  footprints->cell_offsets = new_offsets;
+  new_weights = (weight_type *)realloc(footprints->cell_weights, new_capacity * sizeof(weight_type));
+  if (!new_weights) {
+    return -1;
+  }
+  footprints->cell_weights = new_weights;
+  footprints->capacity = new_capacity;
+  return 0;
+}
+
+template<typename CR_TYPE>
+int compute_footprints(size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows,
+        CR_TYPE *uimg, CR_TYPE *vimg, ewa_weight *ewaw, ewa_parameters *ewap,
+        ewa_footprints *footprints, npy_int64 *pixel_ends) {
+  // Same as `compute_ewa`, but instead of applying each pixel's footprint to image data the footprints are appended
+  // to `footprints`. `pixel_ends[i]` is set to the end of pixel `i`'s cells (CSR-style row pointers).
+  // Returns -1 if memory could not be allocated, otherwise 1 if any pixel touched the grid, 0 if not.
+  int got_point = 0;
+  unsigned int row;
+  unsigned int col;
+  ewa_parameters *this_ewap;
+  unsigned int swath_offset;
+  size_t cells_per_pixel = footprint_size(ewaw->delta_max);
+  size_t cell_count;
+
+  for (row = 0, swath_offset=0; row < swath_rows; row+=1) {
+    for (col = 0, this_ewap = ewap; col < swath_cols; col++, this_ewap++, swath_offset++) {
+      if (reserve_footprints(footprints, cells_per_pixel) < 0) {
+        return -1;
       }
+      got_point |= compute_pixel_footprint(uimg[swath_offset], vimg[swath_offset], grid_cols, grid_rows, ewaw, this_ewap,
+                                           &footprints->cell_offsets[footprints->size],
+                                           &footprints->cell_weights[footprints->size], &cell_count);
+      footprints->size += cell_count;
+      pixel_ends[swath_offset] = footprints->size;
     }
   }
 
-  /* function exit code */
   return got_point;
 }
 
+void apply_footprints(size_t chan_count, ewa_channel *channels, size_t pixel_start, size_t pixel_end,
+        npy_int64 *pixel_ptr, unsigned int *cell_offsets, weight_type *cell_weights,
+        accum_type **grid_accums, weight_type **grid_weights) {
+  // Resample swath pixels `pixel_start` to `pixel_end` using footprints previously made by `compute_footprints`
+  // This is the same as a sparse (CSR) matrix-vector product for every channel.
+  size_t pixel;
+  npy_int64 cell_start;
+  npy_int64 cell_end;
+
+  for (pixel = pixel_start; pixel < pixel_end; pixel++) {
+    cell_start = pixel_ptr[pixel];
+    cell_end = pixel_ptr[pixel + 1];
+    if (cell_end > cell_start) {
+      accumulate_channels(chan_count, channels, pixel, cell_end - cell_start,
+                          &cell_offsets[cell_start], &cell_weights[cell_start], grid_accums, grid_weights);
+    }
+  }
+}
+
 // Overloaded functions for specific types for `write_grid_image`
 //static void write_grid_pixel(npy_uint8 *output_image, accum_type chanf) {
 //  if (chanf < 0.0) {
@@ -421,18 +614,34 @@ unsigned int write_grid_image(GRID_TYPE *output_image, GRID_TYPE fill, size_t gr
 }
 
 
+unsigned int write_channel_image(ewa_channel *channel, size_t grid_cols, size_t grid_rows,
+        accum_type *grid_accum, weight_type *grid_weights, weight_type weight_sum_min) {
+  switch (channel->data_type) {
+    case EWA_FLOAT32:
+      return write_grid_image((npy_float32 *)channel->output_image, (npy_float32)channel->output_fill,
+                              grid_cols, grid_rows, grid_accum, grid_weights,
+                              channel->maximum_weight_mode, weight_sum_min);
+    case EWA_FLOAT64:
+      return write_grid_image((npy_float64 *)channel->output_image, (npy_float64)channel->output_fill,
+                              grid_cols, grid_rows, grid_accum, grid_weights,
+                              channel->maximum_weight_mode, weight_sum_min);
+    case EWA_INT8:
+      return write_grid_image((npy_int8 *)channel->output_image, (npy_int8)channel->output_fill,
+                              grid_cols, grid_rows, grid_accum, grid_weights,
+                              channel->maximum_weight_mode, weight_sum_min);
+  }
+  return 0;
+}
 
 // Col/Row as 32-bit floats
 template int compute_ewa_parameters<npy_float32>(size_t, size_t, npy_float32*, npy_float32*, ewa_weight*, ewa_parameters*);
-template int compute_ewa<npy_float32, npy_float32>(size_t, int, size_t, size_t, size_t, size_t, npy_float32*, npy_float32*, npy_float32**, npy_float32, accum_type**, weight_type**, ewa_weight*, ewa_parameters*);
-template int compute_ewa<npy_float32, npy_float64>(size_t, int, size_t, size_t, size_t, size_t, npy_float32*, npy_float32*, npy_float64**, npy_float64, accum_type**, weight_type**, ewa_weight*, ewa_parameters*);
-template int compute_ewa<npy_float32, npy_int8>(size_t, int, size_t, size_t, size_t, size_t, npy_float32*, npy_float32*, npy_int8**, npy_int8, accum_type**, weight_type**, ewa_weight*, ewa_parameters*);
+template int compute_ewa<npy_float32>(size_t, ewa_channel*, size_t, size_t, size_t, size_t, size_t, npy_float32*, npy_float32*, accum_type**, weight_type**, ewa_weight*, ewa_parameters*, unsigned int*, weight_type*);
+template int compute_footprints<npy_float32>(size_t, size_t, size_t, size_t, npy_float32*, npy_float32*, ewa_weight*, ewa_parameters*, ewa_footprints*, npy_int64*);
 
 // Col/Row as 64-bit floats
 template int compute_ewa_parameters<npy_float64>(size_t, size_t, npy_float64*, npy_float64*, ewa_weight*, ewa_parameters*);
-template int compute_ewa<npy_float64, npy_float32>(size_t, int, size_t, size_t, size_t, size_t, npy_float64*, npy_float64*, npy_float32**, npy_float32, accum_type**, weight_type**, ewa_weight*, ewa_parameters*);
-template int compute_ewa<npy_float64, npy_float64>(size_t, int, size_t, size_t, size_t, size_t, npy_float64*, npy_float64*, npy_float64**, npy_float64, accum_type**, weight_type**, ewa_weight*, ewa_parameters*);
-template int compute_ewa<npy_float64, npy_int8>(size_t, int, size_t, size_t, size_t, size_t, npy_float64*, npy_float64*, npy_int8**, npy_int8, accum_type**, weight_type**, ewa_weight*, ewa_parameters*);
+template int compute_ewa<npy_float64>(size_t, ewa_channel*, size_t, size_t, size_t, size_t, size_t, npy_float64*, npy_float64*, accum_type**, weight_type**, ewa_weight*, ewa_parameters*, unsigned int*, weight_type*);
+template int compute_footprints<npy_float64>(size_t, size_t, size_t, size_t, npy_float64*, npy_float64*, ewa_weight*, ewa_parameters*, ewa_footprints*, npy_int64*);
 
 // Output Grid types
 template unsigned int write_grid_image<npy_float32>(npy_float32*, npy_float32, size_t, size_t, accum_type*, weight_type*, int, weight_type);
@@ -34,6 +34,29 @@ typedef struct {
     weight_type *wtab;
 } ewa_weight;
 
+// Data types supported for input swath images and output grid images
+#define EWA_FLOAT32 0
+#define EWA_FLOAT64 1
+#define EWA_INT8 2
+
+// Description of one channel being resampled, channels resampled together can have different types and fills
+typedef struct {
+    int data_type;  // data type of both the input image and output image (EWA_*)
+    void *image;  // swath image data
+    void *output_image;  // grid image data
+    double image_fill;
+    double output_fill;
+    int maximum_weight_mode;
+} ewa_channel;
+
+// Grid cells and weights covered by swath pixels, stored one pixel after another (CSR-style)
+typedef struct {
+    size_t size;
+    size_t capacity;
+    unsigned int *cell_offsets;
+    weight_type *cell_weights;
+} ewa_footprints;
+
 int initialize_weight(size_t chan_count, unsigned int weight_count, weight_type weight_min, weight_type weight_distance_max,
         weight_type weight_delta_max, weight_type weight_sum_min, ewa_weight *ewaw);
 
@@ -44,19 +67,40 @@ accum_type **initialize_grid_accums(size_t chan_count, size_t grid_cols, size_t
 weight_type **initialize_grid_weights(size_t chan_count, size_t grid_cols, size_t grid_rows);
 void deinitialize_grids(size_t chan_count, void **grids);
 
+void merge_grids(size_t chan_count, ewa_channel *channels, size_t grid_cols, size_t grid_rows,
+        accum_type **grid_accums, weight_type **grid_weights,
+        accum_type **other_accums, weight_type **other_weights);
+
 template<typename CR_TYPE>
 int compute_ewa_parameters(size_t swath_cols, size_t swath_rows, CR_TYPE *uimg, CR_TYPE *vimg, ewa_weight *ewaw, ewa_parameters *ewap);
 
-template<typename CR_TYPE, typename IMAGE_TYPE>
-extern int compute_ewa(size_t chan_count, int maximum_weight_mode,
+size_t footprint_size(weight_type weight_delta_max);
+
+template<typename CR_TYPE>
+extern int compute_ewa(size_t chan_count, ewa_channel *channels, size_t image_offset,
         size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows,
         CR_TYPE *uimg, CR_TYPE *vimg,
-        IMAGE_TYPE **images, IMAGE_TYPE img_fill, accum_type **grid_accums, weight_type **grid_weights,
-        ewa_weight *ewaw, ewa_parameters *ewap);
+        accum_type **grid_accums, weight_type **grid_weights,
+        ewa_weight *ewaw, ewa_parameters *ewap, unsigned int *cell_offsets, weight_type *cell_weights);
+
+int initialize_footprints(ewa_footprints *footprints, size_t capacity);
+void deinitialize_footprints(ewa_footprints *footprints);
+
+template<typename CR_TYPE>
+extern int compute_footprints(size_t swath_cols, size_t swath_rows, size_t grid_cols, size_t grid_rows,
+        CR_TYPE *uimg, CR_TYPE *vimg, ewa_weight *ewaw, ewa_parameters *ewap,
+        ewa_footprints *footprints, npy_int64 *pixel_ends);
+
+void apply_footprints(size_t chan_count, ewa_channel *channels, size_t pixel_start, size_t pixel_end,
+        npy_int64 *pixel_ptr, unsigned int *cell_offsets, weight_type *cell_weights,
+        accum_type **grid_accums, weight_type **grid_weights);
 
 template<typename GRID_TYPE> unsigned int write_grid_image(GRID_TYPE *output_image, GRID_TYPE fill,
         size_t grid_cols, size_t grid_rows,
         accum_type *grid_accum, weight_type *grid_weights,
         int maximum_weight_mode, weight_type weight_sum_min);
 
+unsigned int write_channel_image(ewa_channel *channel, size_t grid_cols, size_t grid_rows,
+        accum_type *grid_accum, weight_type *grid_weights, weight_type weight_sum_min);
+
 #endif
\ No newline at end of file
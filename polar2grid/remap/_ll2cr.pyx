@@ -47,18 +47,19 @@ import numpy
 cimport cython
 from cpython cimport bool
 cimport numpy
-from libc.math cimport isnan
+from libc.math cimport fabs, INFINITY
 
 # DTYPE = numpy.float32
 # DTYPE = numpy.float64
 # ctypedef numpy.float32_t DTYPE_t
 
-# column and rows can only be doubles for now until the PROJ.4 is linked directly so float->double casting can be done
-# inside the loop
 ctypedef fused cr_dtype:
-    # numpy.float32_t
+    numpy.float32_t
     numpy.float64_t
 
+# rows of longitude and latitude to project at a time (64-bit copies are made of this many rows for 32-bit input)
+DEFAULT_ROWS_PER_CHUNK = 256
+
 # @cython.boundscheck(False)
 # @cython.wraparound(False)
 # def minmax_float32(numpy.ndarray[DTYPE_t, ndim=2] arr):
@@ -122,21 +123,202 @@ def projection_circumference(p):
         return 0.0
     return abs(x1 - x0) * 2
 
+# pyproj sets X and Y to HUGE_VAL for points that can't be projected
+cdef double PROJ_FILL = 1e30
+
+# how X coordinates are moved across the antimeridian of cylindrical projections
+cdef enum:
+    WRAP_NONE = 0
+    # static grids: points more than 75% of the projection away from the grid origin
+    WRAP_STATIC = 1
+    # dynamic grids crossing the antimeridian: all negative points
+    WRAP_NEGATIVE = 2
+
+
+def _map_row_chunks(func, size_t num_rows, size_t rows_per_chunk, int num_threads):
+    """Call `func(row_start, row_end)` for every chunk of rows, splitting the chunks between `num_threads` threads.
+
+    :returns: list of results in chunk order
+    """
+    chunks = [(row_start, min(row_start + rows_per_chunk, num_rows))
+              for row_start in range(0, num_rows, max(rows_per_chunk, 1))]
+    if num_threads <= 1 or len(chunks) <= 1:
+        return [func(row_start, row_end) for row_start, row_end in chunks]
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(num_threads, len(chunks)))
+    try:
+        return pool.map(lambda chunk: func(*chunk), chunks)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def _project_rows(p, lon_rows, lat_rows):
+    """Project longitude and latitude rows to 64-bit float X and Y arrays.
+
+    64-bit float arrays are projected in place, anything else is projected from a 64-bit copy of just these rows.
+    """
+    if lon_rows.dtype != numpy.float64:
+        lon_rows = lon_rows.astype(numpy.float64)
+        lat_rows = lat_rows.astype(numpy.float64)
+    return p(lon_rows, lat_rows)
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef void _update_bounds(double[:, ::1] x_arr, double[:, ::1] y_arr, double *bounds) nogil:
+    """Update the bounds of the valid projected points.
+
+    The bounds are xmin, xmax, ymin, ymax, minimum non-negative X, and maximum negative X. The last two are needed
+    to find the X bounds after wrapping around the antimeridian without looking at every point again.
+    """
+    cdef size_t row
+    cdef size_t col
+    cdef double x_tmp
+    cdef double y_tmp
+    for row in range(x_arr.shape[0]):
+        for col in range(x_arr.shape[1]):
+            x_tmp = x_arr[row, col]
+            # skips NaNs too
+            if not x_tmp < PROJ_FILL:
+                continue
+            y_tmp = y_arr[row, col]
+            if x_tmp < bounds[0]:
+                bounds[0] = x_tmp
+            if x_tmp > bounds[1]:
+                bounds[1] = x_tmp
+            if y_tmp < bounds[2]:
+                bounds[2] = y_tmp
+            if y_tmp > bounds[3]:
+                bounds[3] = y_tmp
+            if x_tmp >= 0:
+                if x_tmp < bounds[4]:
+                    bounds[4] = x_tmp
+            elif x_tmp > bounds[5]:
+                bounds[5] = x_tmp
+
+
 @cython.boundscheck(False)
 @cython.wraparound(False)
 @cython.cdivision(True)
-def ll2cr_dynamic(numpy.ndarray[cr_dtype, ndim=2] lon_arr, numpy.ndarray[cr_dtype, ndim=2] lat_arr,
-                  cr_dtype fill_in, str proj4_definition,
+cdef unsigned int _convert_rows(double[:, ::1] x_arr, double[:, ::1] y_arr,
+                                cr_dtype[:, ::1] cols_out, cr_dtype[:, ::1] rows_out, cr_dtype fill_in,
+                                int wrap_mode, double proj_circum, double origin_x, double origin_y,
+                                double cell_width, double cell_height, unsigned int width, unsigned int height) nogil:
+    """Convert projected X and Y points to columns and rows of the grid.
+
+    The output arrays may be the same arrays as the input X and Y arrays.
+
+    :returns: number of points that fall in the grid
+    """
+    cdef size_t row
+    cdef size_t col
+    cdef double x_tmp
+    cdef double y_tmp
+    cdef unsigned int points_in_grid = 0
+    for row in range(x_arr.shape[0]):
+        for col in range(x_arr.shape[1]):
+            x_tmp = x_arr[row, col]
+            y_tmp = y_arr[row, col]
+            if x_tmp >= PROJ_FILL:
+                cols_out[row, col] = fill_in
+                rows_out[row, col] = fill_in
+                continue
+            elif wrap_mode == WRAP_STATIC and fabs(x_tmp - origin_x) >= (0.75 * proj_circum):
+                # if x is more than 75% around the projection space, it is probably crossing the anti-meridian
+                x_tmp += proj_circum
+            elif wrap_mode == WRAP_NEGATIVE and x_tmp < 0:
+                x_tmp += proj_circum
+
+            x_tmp = (x_tmp - origin_x) / cell_width
+            y_tmp = (y_tmp - origin_y) / cell_height
+            if x_tmp >= -1 and x_tmp <= width + 1 and y_tmp >= -1 and y_tmp <= height + 1:
+                points_in_grid += 1
+            cols_out[row, col] = <cr_dtype>x_tmp
+            rows_out[row, col] = <cr_dtype>y_tmp
+    return points_in_grid
+
+
+def _chunk_bounds(p, numpy.ndarray x_arr, numpy.ndarray y_arr, size_t row_start, size_t row_end):
+    """Project a chunk of rows of 64-bit longitudes and latitudes in place and return their bounds (see
+    `_update_bounds`).
+    """
+    cdef double bounds[6]
+    bounds[:] = [INFINITY, -INFINITY, INFINITY, -INFINITY, INFINITY, -INFINITY]
+    x_rows, y_rows = _project_rows(p, x_arr[row_start:row_end], y_arr[row_start:row_end])
+    cdef double[:, ::1] x_view = x_rows
+    cdef double[:, ::1] y_view = y_rows
+    with nogil:
+        _update_bounds(x_view, y_view, bounds)
+    return bounds
+
+
+def _chunk_ll2cr(p, numpy.ndarray lon_arr, numpy.ndarray lat_arr, x_arr, y_arr, size_t row_start, size_t row_end,
+                 double fill_in, int wrap_mode, double proj_circum, double origin_x, double origin_y,
+                 double cell_width, double cell_height, unsigned int width, unsigned int height):
+    """Project a chunk of rows and replace them with grid columns and rows.
+
+    If `x_arr` and `y_arr` are provided they hold the already projected points (see `_chunk_bounds`) and the chunk
+    is not projected again.
+
+    :returns: number of points in the chunk that fall in the grid
+    """
+    lon_rows = lon_arr[row_start:row_end]
+    lat_rows = lat_arr[row_start:row_end]
+    if x_arr is not None:
+        x_rows, y_rows = x_arr[row_start:row_end], y_arr[row_start:row_end]
+    else:
+        x_rows, y_rows = _project_rows(p, lon_rows, lat_rows)
+    cdef double[:, ::1] x_view = x_rows
+    cdef double[:, ::1] y_view = y_rows
+    cdef numpy.float32_t[:, ::1] cols32
+    cdef numpy.float32_t[:, ::1] rows32
+    cdef numpy.float64_t[:, ::1] cols64
+    cdef numpy.float64_t[:, ::1] rows64
+    cdef unsigned int points_in_grid
+    if lon_arr.dtype == numpy.float32:
+        cols32 = lon_rows
+        rows32 = lat_rows
+        with nogil:
+            points_in_grid = _convert_rows(x_view, y_view, cols32, rows32, <numpy.float32_t>fill_in, wrap_mode,
+                                           proj_circum, origin_x, origin_y, cell_width, cell_height, width, height)
+    else:
+        cols64 = lon_rows
+        rows64 = lat_rows
+        with nogil:
+            points_in_grid = _convert_rows(x_view, y_view, cols64, rows64, <numpy.float64_t>fill_in, wrap_mode,
+                                           proj_circum, origin_x, origin_y, cell_width, cell_height, width, height)
+    return points_in_grid
+
+
+def _check_arrays(numpy.ndarray lon_arr, numpy.ndarray lat_arr):
+    if lon_arr.dtype not in (numpy.float32, numpy.float64) or lat_arr.dtype != lon_arr.dtype:
+        raise ValueError("Longitude and latitude arrays must both be 32-bit or both be 64-bit floats")
+    if lon_arr.ndim != 2 or lat_arr.ndim != 2 or lon_arr.shape[0] != lat_arr.shape[0] or \
+            lon_arr.shape[1] != lat_arr.shape[1]:
+        raise ValueError("Longitude and latitude arrays must be 2D and the same shape")
+    if not (lon_arr.flags.c_contiguous and lat_arr.flags.c_contiguous and
+            lon_arr.flags.writeable and lat_arr.flags.writeable):
+        raise ValueError("Longitude and latitude arrays must be C contiguous and writeable")
+
+
+def ll2cr_dynamic(numpy.ndarray lon_arr, numpy.ndarray lat_arr,
+                  double fill_in, str proj4_definition,
                   double cell_width, double cell_height,
                   width=None, height=None,
-                  origin_x=None, origin_y=None):
+                  origin_x=None, origin_y=None, crosses_antimeridian=None,
+                  size_t rows_per_chunk=DEFAULT_ROWS_PER_CHUNK, int num_threads=1):
     """Project longitude and latitude points to column rows in the specified grid in place
 
-    :param lon_arr: Numpy array of longitude floats
-    :param lat_arr: Numpy array of latitude floats
+    :param lon_arr: Numpy array of longitude floats (32-bit or 64-bit)
+    :param lat_arr: Numpy array of latitude floats (32-bit or 64-bit)
     :param grid_info: dictionary of grid information (see below)
     :param fill_in: Fill value for input longitude and latitude arrays and used for output
-    :returns: tuple(points_in_grid, cols_out, rows_out)
+    :param crosses_antimeridian: Whether the data crosses the antimeridian of the projection, if provided along with
+                                 all of the grid parameters the bounds do not need to be found (step 1 is skipped)
+    :param rows_per_chunk: Number of rows to project at a time
+    :param num_threads: Number of threads to split chunks of rows between
+    :returns: tuple(points_in_grid, cols_out, rows_out, origin_x, origin_y, width, height, crosses_antimeridian)
 
     The provided grid info must have the following parameters (optional grids mean dynamic):
 
@@ -150,79 +332,60 @@ def ll2cr_dynamic(numpy.ndarray[cr_dtype, ndim=2] lon_arr, numpy.ndarray[cr_dtyp
 
     Steps taken in this function:
 
-        1. Convert (lon, lat) points to (X, Y) points in the projection space
-        2. If grid is missing some parameters (dynamic grid), then fill them in
+        1. Convert (lon, lat) points to (X, Y) points in the projection space and find their bounds
+        2. If grid is missing some parameters (dynamic grid), then fill them in from the bounds
         3. Convert (X, Y) points to (column, row) points in the grid space
+
+    Points are only projected once. 64-bit float arrays are projected in place in step 1. 32-bit float arrays are
+    copied to 64-bit arrays that are projected in step 1 and reused by step 3. If step 1 is skipped, 32-bit float
+    arrays are projected one chunk of rows at a time in step 3 so a 64-bit copy of the entire array is not needed.
     """
-    # pure python stuff for now
+    _check_arrays(lon_arr, lat_arr)
     p = MyProj(proj4_definition)
-    # when we update this to not make copies we can probably just make this a view
-    # rows_arr = numpy.empty_like(lat_arr)
-    # cols_arr = numpy.empty_like(lon_arr)
-
-    # Pyproj currently makes a copy so we don't have to do anything special here
-    cdef tuple projected_tuple = p(lon_arr, lat_arr)
-    cdef cr_dtype [:, ::1] rows_out = projected_tuple[1]
-    cdef cr_dtype [:, ::1] cols_out = projected_tuple[0]
     cdef double proj_circum = projection_circumference(p)
+    # projected X and Y points from step 1
+    x_arr = None
+    y_arr = None
+    cdef unsigned int num_rows = lon_arr.shape[0]
     cdef unsigned int w
     cdef unsigned int h
     cdef double ox
     cdef double oy
 
-    # indexes
-    cdef unsigned int row
-    cdef unsigned int col
-    # index bounds
-    cdef unsigned int num_rows = lon_arr.shape[0]
-    cdef unsigned int num_cols = lon_arr.shape[1]
-    cdef cr_dtype xmin = cols_out[0, 0]
-    cdef cr_dtype xmax = cols_out[0, 0]
-    cdef cr_dtype ymin = rows_out[0, 0]
-    cdef cr_dtype ymax = rows_out[0, 0]
-    cdef cr_dtype x_tmp
-    cdef cr_dtype y_tmp
-    cdef unsigned int points_in_grid = 0
-    for row in range(num_rows):
-        for col in range(num_cols):
-            x_tmp = cols_out[row, col]
-            y_tmp = rows_out[row, col]
-
-            if x_tmp >= 1e30:
-                # pyproj library should have set both x and y to the fill value
-                # we technically don't ever check for the fill value, but if fill values are valid lon/lats then WTF
-                continue
-            elif x_tmp < xmin or isnan(xmin):
-                xmin = x_tmp
-            elif x_tmp > xmax or isnan(xmax) or xmax == 1e30:
-                # Note: technically 2 valid points are required to get here if there are a lot of NaNs
-                xmax = x_tmp
-
-            if y_tmp < ymin or isnan(ymin):
-                ymin = y_tmp
-            elif y_tmp > ymax or isnan(ymax) or ymax == 1e30:
-                # Note: technically 2 valid points are required to get here if there are a lot of NaNs
-                ymax = y_tmp
-
-    # Check if we cross the antimeridian
-    if proj_circum != 0 and xmax - xmin >= proj_circum * .75:
-        # xmax will increase, but we need to reset xmin so that it gets properly detected
-        if xmin < 0:
-            xmin = xmax
-        for row in range(num_rows):
-            for col in range(num_cols):
-                x_tmp = cols_out[row, col]
-                if x_tmp < 0:
-                    x_tmp += proj_circum
-                    cols_out[row, col] = x_tmp
-                    # xmax won't increase unless we've added the circumference
-                    if x_tmp > xmax:
-                        xmax = x_tmp
-                elif x_tmp >= 1e30:
-                    continue
-                elif x_tmp < xmin:
-                    # xmin could change with any of the remaining entries
-                    xmin = x_tmp
+    cdef double xmin = 0
+    cdef double xmax = 0
+    cdef double ymin = 0
+    cdef double ymax = 0
+    cdef int wrap_mode = WRAP_NONE
+    if crosses_antimeridian is not None and None not in (width, height, origin_x, origin_y):
+        # everything the bounds would be used for is already known
+        if crosses_antimeridian:
+            wrap_mode = WRAP_NEGATIVE
+    else:
+        if lon_arr.dtype == numpy.float64:
+            x_arr, y_arr = lon_arr, lat_arr
+        else:
+            x_arr = lon_arr.astype(numpy.float64)
+            y_arr = lat_arr.astype(numpy.float64)
+        chunk_bounds = _map_row_chunks(
+            lambda row_start, row_end: _chunk_bounds(p, x_arr, y_arr, row_start, row_end),
+            num_rows, rows_per_chunk, num_threads)
+        xmin = min([b[0] for b in chunk_bounds] or [INFINITY])
+        xmax = max([b[1] for b in chunk_bounds] or [-INFINITY])
+        ymin = min([b[2] for b in chunk_bounds] or [INFINITY])
+        ymax = max([b[3] for b in chunk_bounds] or [-INFINITY])
+        if xmin > xmax:
+            # no valid points
+            xmin = xmax = ymin = ymax = 0
+
+        # Check if we cross the antimeridian
+        if proj_circum != 0 and xmax - xmin >= proj_circum * .75:
+            wrap_mode = WRAP_NEGATIVE
+            # negative points get the circumference added so they are now on the "east" side of the positive points
+            if xmin < 0:
+                xmin = xmax
+            xmin = min([xmin] + [b[4] for b in chunk_bounds])
+            xmax = max([xmax] + [b[5] + proj_circum for b in chunk_bounds])
 
     if origin_x is None:
         # upper-left corner
@@ -239,89 +402,49 @@ def ll2cr_dynamic(numpy.ndarray[cr_dtype, ndim=2] lon_arr, numpy.ndarray[cr_dtyp
         w = width
         h = height
 
-    for row in range(num_rows):
-        for col in range(num_cols):
-            x_tmp = cols_out[row, col]
-            y_tmp = rows_out[row, col]
-            if x_tmp >= 1e30:
-                cols_out[row, col] = fill_in
-                rows_out[row, col] = fill_in
-                continue
-
-            x_tmp = (x_tmp - ox) / cell_width
-            y_tmp = (y_tmp - oy) / cell_height
-            if x_tmp >= -1 and x_tmp <= w + 1 and y_tmp >= -1 and y_tmp <= h + 1:
-                points_in_grid += 1
-            cols_out[row, col] = x_tmp
-            rows_out[row, col] = y_tmp
+    points_in_grid = sum(_map_row_chunks(
+        lambda row_start, row_end: _chunk_ll2cr(p, lon_arr, lat_arr, x_arr, y_arr, row_start, row_end, fill_in,
+                                                wrap_mode, proj_circum, ox, oy, cell_width, cell_height, w, h),
+        num_rows, rows_per_chunk, num_threads))
 
     # return points_in_grid, x_arr, y_arr
-    return points_in_grid, lon_arr, lat_arr, ox, oy, w, h
+    return points_in_grid, lon_arr, lat_arr, ox, oy, w, h, wrap_mode == WRAP_NEGATIVE
 
 
-@cython.boundscheck(False)
-@cython.wraparound(False)
-@cython.cdivision(True)
-def ll2cr_static(numpy.ndarray[cr_dtype, ndim=2] lon_arr, numpy.ndarray[cr_dtype, ndim=2] lat_arr,
-                      cr_dtype fill_in, str proj4_definition,
-                      double cell_width, double cell_height,
-                      unsigned int width, unsigned int height,
-                      double origin_x, double origin_y):
+def ll2cr_static(numpy.ndarray lon_arr, numpy.ndarray lat_arr,
+                 double fill_in, str proj4_definition,
+                 double cell_width, double cell_height,
+                 unsigned int width, unsigned int height,
+                 double origin_x, double origin_y,
+                 size_t rows_per_chunk=DEFAULT_ROWS_PER_CHUNK, int num_threads=1):
     """Project longitude and latitude points to column rows in the specified grid in place
 
-    :param lon_arr: Numpy array of longitude floats
-    :param lat_arr: Numpy array of latitude floats
+    :param lon_arr: Numpy array of longitude floats (32-bit or 64-bit)
+    :param lat_arr: Numpy array of latitude floats (32-bit or 64-bit)
     :param fill_in: Fill value for input longitude and latitude arrays and used for output
     :param cell_width: Pixel resolution in the X direction in projection space
     :param cell_height: Pixel resolution in the Y direction in projection space
     :param width: Number of pixels in the X direction in the final output grid
     :param height: Number of pixels in the Y direction in the final output grid
     :param origin_x:
+    :param rows_per_chunk: Number of rows to project at a time
+    :param num_threads: Number of threads to split chunks of rows between
     :returns: tuple(points_in_grid, cols_out, rows_out)
 
-    Steps taken in this function:
+    Steps taken in this function for each chunk of rows:
 
         1. Convert (lon, lat) points to (X, Y) points in the projection space
         2. Convert (X, Y) points to (column, row) points in the grid space
 
     """
-    # pure python stuff for now
+    _check_arrays(lon_arr, lat_arr)
     p = MyProj(proj4_definition)
-
-    # Pyproj currently makes a copy so we don't have to do anything special here
-    cdef tuple projected_tuple = p(lon_arr, lat_arr)
-    cdef cr_dtype [:, ::1] rows_out = projected_tuple[1]
-    cdef cr_dtype [:, ::1] cols_out = projected_tuple[0]
     cdef double proj_circum = projection_circumference(p)
-
-    # indexes
-    cdef unsigned int row
-    cdef unsigned int col
-    # index bounds
-    cdef unsigned int num_rows = lon_arr.shape[0]
-    cdef unsigned int num_cols = lon_arr.shape[1]
-    cdef cr_dtype x_tmp
-    cdef cr_dtype y_tmp
-    cdef unsigned int points_in_grid = 0
-
-    for row in range(num_rows):
-        for col in range(num_cols):
-            x_tmp = cols_out[row, col]
-            y_tmp = rows_out[row, col]
-            if x_tmp >= 1e30:
-                cols_out[row, col] = fill_in
-                rows_out[row, col] = fill_in
-                continue
-            elif proj_circum != 0 and abs(x_tmp - origin_x) >= (0.75 * proj_circum):
-                # if x is more than 75% around the projection space, it is probably crossing the anti-meridian
-                x_tmp += proj_circum
-
-            x_tmp = (x_tmp - origin_x) / cell_width
-            y_tmp = (y_tmp - origin_y) / cell_height
-            if x_tmp >= -1 and x_tmp <= width + 1 and y_tmp >= -1 and y_tmp <= height + 1:
-                points_in_grid += 1
-            cols_out[row, col] = x_tmp
-            rows_out[row, col] = y_tmp
+    cdef int wrap_mode = WRAP_STATIC if proj_circum != 0 else WRAP_NONE
 
     # return points_in_grid, x_arr, y_arr
-    return points_in_grid
+    return sum(_map_row_chunks(
+        lambda row_start, row_end: _chunk_ll2cr(p, lon_arr, lat_arr, None, None, row_start, row_end, fill_in,
+                                                wrap_mode, proj_circum, origin_x, origin_y,
+                                                cell_width, cell_height, width, height),
+        lon_arr.shape[0], rows_per_chunk, num_threads))
@@ -0,0 +1,119 @@
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Nearest neighbor resampling of swath pixels to grid cells using columns and rows from ll2cr.
+
+:license:      GNU GPLv3
+"""
+__docformat__ = "restructuredtext en"
+
+import numpy
+cimport cython
+cimport numpy
+from libc.math cimport floor, ceil, INFINITY
+
+ctypedef fused cr_dtype:
+    numpy.float32_t
+    numpy.float64_t
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def nearest_index(numpy.ndarray[cr_dtype, ndim=1] cols_array, numpy.ndarray[cr_dtype, ndim=1] rows_array,
+                  numpy.ndarray[numpy.uint8_t, ndim=1, cast=True] valid_mask,
+                  size_t grid_cols, size_t grid_rows, double distance_upper_bound, bint fill_holes=True,
+                  size_t row_start=0, row_end=None, out=None):
+    """Find the nearest swath pixel to every grid cell.
+
+    Instead of searching for every grid cell, each valid swath pixel is binned in to the grid cell it falls in
+    (cell centers are at integer columns and rows). If `fill_holes` is True each pixel is also considered for every
+    grid cell within `distance_upper_bound` of it, which fills the cells between pixels when the grid has a higher
+    resolution than the swath. With `fill_holes` the result is the same as a KDTree query of every grid cell limited
+    to `distance_upper_bound` (ties go to the first pixel in the swath). Work is proportional to the number of swath
+    pixels instead of the number of grid cells.
+
+    Only grid rows `row_start` to `row_end` (exclusive, default all rows) are computed so large grids can be
+    processed in blocks of rows to limit memory usage. Results can be written to `out` (ex. a slice of a memory
+    mapped file) instead of a new array.
+
+    :param valid_mask: boolean array, True for swath pixels that should be used
+    :returns: (row_end - row_start, grid_cols) int32 array of swath pixel indexes, -1 for grid cells without a neighbor
+    """
+    cdef size_t num_pixels = cols_array.shape[0]
+    if rows_array.shape[0] != num_pixels or valid_mask.shape[0] != num_pixels:
+        raise ValueError("Columns, rows, and valid mask must all be the same size")
+    if num_pixels > 0x7FFFFFFF:
+        raise ValueError("Too many swath pixels for nearest neighbor resampling")
+    cdef size_t block_row_end = grid_rows if row_end is None else row_end
+    if block_row_end > grid_rows or row_start >= block_row_end:
+        raise ValueError("Invalid block of grid rows: %d to %d" % (row_start, block_row_end))
+    cdef size_t block_rows = block_row_end - row_start
+    cdef numpy.ndarray[numpy.int32_t, ndim=2, mode='c'] index
+    if out is None:
+        index = numpy.empty((block_rows, grid_cols), dtype=numpy.int32)
+    elif out.shape != (block_rows, grid_cols):
+        raise ValueError("Output index array must be (%d, %d)" % (block_rows, grid_cols))
+    else:
+        index = out
+    cdef numpy.ndarray[numpy.float64_t, ndim=2] best_dist = numpy.empty((block_rows, grid_cols), dtype=numpy.float64)
+    index.fill(-1)
+    best_dist.fill(INFINITY)
+
+    cdef int search_radius = <int>ceil(distance_upper_bound) if fill_holes else 0
+    cdef double max_dist2 = distance_upper_bound * distance_upper_bound
+    cdef size_t pixel
+    cdef double col
+    cdef double row
+    cdef double dcol
+    cdef double drow
+    cdef double dist2
+    cdef long center_col
+    cdef long center_row
+    cdef long col_start
+    cdef long col_end
+    cdef long pixel_row_start
+    cdef long pixel_row_end
+    cdef long grid_col
+    cdef long grid_row
+
+    with nogil:
+        for pixel in range(num_pixels):
+            if not valid_mask[pixel]:
+                continue
+            col = cols_array[pixel]
+            row = rows_array[pixel]
+            # also skips NaNs, checked before converting to integers so huge values can't overflow
+            if not (-search_radius - 1 < col < <double>grid_cols + search_radius + 1 and
+                    <double>row_start - search_radius - 1 < row < <double>block_row_end + search_radius + 1):
+                continue
+            # nearest grid cell to this pixel and the cells around it that could be within the search distance
+            center_col = <long>floor(col + 0.5)
+            center_row = <long>floor(row + 0.5)
+            col_start = max(center_col - search_radius, 0)
+            col_end = min(center_col + search_radius, <long>grid_cols - 1)
+            pixel_row_start = max(center_row - search_radius, <long>row_start)
+            pixel_row_end = min(center_row + search_radius, <long>block_row_end - 1)
+            for grid_row in range(pixel_row_start, pixel_row_end + 1):
+                drow = row - grid_row
+                for grid_col in range(col_start, col_end + 1):
+                    dcol = col - grid_col
+                    dist2 = dcol * dcol + drow * drow
+                    if dist2 < max_dist2 and dist2 < best_dist[grid_row - row_start, grid_col]:
+                        best_dist[grid_row - row_start, grid_col] = dist2
+                        index[grid_row - row_start, grid_col] = <numpy.int32_t>pixel
+    return index
@@ -41,9 +41,14 @@ __docformat__ = "restructuredtext en"
 
 import sys
 
+import json
 import logging
 import numpy
 import os
+import shutil
+import tempfile
+import zlib
+from collections import namedtuple
 
 import _fornav
 from polar2grid.remap import ms2gt
@@ -92,20 +97,22 @@ def calculate_group_size(swath_cols, swath_rows, grid_cols, grid_rows, default_g
 def group_iter(input_arrays, swath_cols, swath_rows, input_dtype, output_arrays, grid_cols, grid_rows, group_size):
     ret_input_arrays = []
     ret_output_arrays = []
+    if not isinstance(input_dtype, (list, tuple)):
+        input_dtype = [input_dtype] * len(input_arrays)
 
-    for idx, (ia, oa) in enumerate(zip(input_arrays, output_arrays)):
+    for idx, (ia, oa, in_dtype) in enumerate(zip(input_arrays, output_arrays, input_dtype)):
         if isinstance(ia, (str, unicode)):
-            ret_input_arrays.append(numpy.memmap(ia, shape=(swath_rows, swath_cols), dtype=input_dtype, mode='r'))
+            ret_input_arrays.append(numpy.memmap(ia, shape=(swath_rows, swath_cols), dtype=in_dtype, mode='r'))
         else:
             ret_input_arrays.append(ia)
 
         # We iterate over this so that we only create output arrays when they are used
         if oa is None:
-            ret_output_arrays.append(numpy.empty((grid_rows, grid_cols), dtype=ia.dtype))
+            ret_output_arrays.append(numpy.empty((grid_rows, grid_cols), dtype=ret_input_arrays[-1].dtype))
             # we should return the numpy arrays in the main function since the user didn't provide any
             output_arrays[idx] = ret_output_arrays[-1]
         elif isinstance(oa, (str, unicode)):
-            ret_output_arrays.append(numpy.memmap(oa, shape=(grid_rows, grid_cols), dtype=input_dtype, mode='w+'))
+            ret_output_arrays.append(numpy.memmap(oa, shape=(grid_rows, grid_cols), dtype=in_dtype, mode='w+'))
         else:
             ret_output_arrays.append(oa)
 
@@ -120,10 +127,383 @@ def group_iter(input_arrays, swath_cols, swath_rows, input_dtype, output_arrays,
         yield tuple(ret_input_arrays), tuple(ret_output_arrays)
 
 
+def scan_bounds(cols_array, rows_array, rows_per_scan):
+    """Get the minimum and maximum column and row for every scan of a swath.
+
+    Pixels are considered valid the same way that the EWA algorithm considers them valid (non-NaN and non-negative).
+    Scans without any valid pixels have NaN bounds.
+
+    :returns: (scan_count, 4) array of (col_min, col_max, row_min, row_max) for each scan
+    """
+    scan_count = cols_array.shape[0] // rows_per_scan
+    bounds = numpy.empty((scan_count, 4), dtype=numpy.float64)
+    bounds[:] = numpy.nan
+    for scan_idx in range(scan_count):
+        scan_slice = slice(scan_idx * rows_per_scan, (scan_idx + 1) * rows_per_scan)
+        scan_cols = cols_array[scan_slice]
+        scan_rows = rows_array[scan_slice]
+        valid_mask = (scan_cols >= 0) & (scan_rows >= 0)
+        if not valid_mask.any():
+            continue
+        scan_cols = scan_cols[valid_mask]
+        scan_rows = scan_rows[valid_mask]
+        bounds[scan_idx] = (scan_cols.min(), scan_cols.max(), scan_rows.min(), scan_rows.max())
+    return bounds
+
+
+def scan_grid_mask(bounds, grid_cols, grid_rows, weight_delta_max=10.0):
+    """Get a boolean mask of the scans that could contribute to a grid of the provided size.
+
+    Valid pixels always have non-negative columns and rows so only the minimum of each scan has to be compared to the
+    grid size. Every pixel's footprint can extend at most `weight_delta_max` grid cells from its center.
+
+    :param bounds: per-scan bounds from `scan_bounds`
+    :returns: boolean array with one element per scan, True if the scan should be resampled
+    """
+    margin = numpy.ceil(weight_delta_max) + 1
+    # NaN bounds (scans with no valid pixels) are always False
+    with numpy.errstate(invalid="ignore"):
+        return (bounds[:, 0] - margin < grid_cols) & (bounds[:, 2] - margin < grid_rows)
+
+
+def _count_valid(arr, fill):
+    if numpy.isnan(fill):
+        return numpy.count_nonzero(~numpy.isnan(arr))
+    return numpy.count_nonzero(arr != fill)
+
+
+def fornav_tiled(cols_array, rows_array, rows_per_scan, input_arrays, output_arrays, input_fill, output_fill,
+                 tile_size, bounds=None, weight_delta_max=10.0, **kwargs):
+    """Run EWA resampling one output grid tile at a time.
+
+    Only the scans whose bounding box (plus the maximum footprint size `weight_delta_max`) overlaps a tile are
+    resampled for that tile. Accumulation and weight grids are only allocated for the tile and a small border around
+    it so peak memory usage is bounded by `tile_size` instead of the size of the grid. Results are written directly
+    to `output_arrays` (usually memory mapped files) as each tile is finished.
+
+    Results match the non-tiled version within floating point precision.
+
+    :param output_fill: fill value for all output arrays or a list with one fill value per output array
+    :param tile_size: (rows, cols) of each tile or an integer for square tiles
+    :param bounds: per-scan bounds from `scan_bounds`, computed if not provided
+    :returns: list of the number of valid grid pixels for each output array
+    """
+    if isinstance(tile_size, (int, long)):
+        tile_size = (tile_size, tile_size)
+    tile_rows, tile_cols = tile_size
+    grid_rows, grid_cols = output_arrays[0].shape
+    if bounds is None:
+        bounds = scan_bounds(cols_array, rows_array, rows_per_scan)
+    # pixels further than this from a tile can't contribute to it
+    margin = int(numpy.ceil(weight_delta_max)) + 1
+    valid_list = [0] * len(input_arrays)
+    output_fills = output_fill if isinstance(output_fill, (list, tuple)) else [output_fill] * len(output_arrays)
+    got_point = False
+    for row_start in range(0, grid_rows, tile_rows):
+        row_end = min(row_start + tile_rows, grid_rows)
+        buf_row_start = max(row_start - margin, 0)
+        buf_row_end = min(row_end + margin, grid_rows)
+        for col_start in range(0, grid_cols, tile_cols):
+            col_end = min(col_start + tile_cols, grid_cols)
+            buf_col_start = max(col_start - margin, 0)
+            buf_col_end = min(col_end + margin, grid_cols)
+            tile_slice = (slice(row_start, row_end), slice(col_start, col_end))
+            buf_slice = (slice(row_start - buf_row_start, row_end - buf_row_start),
+                         slice(col_start - buf_col_start, col_end - buf_col_start))
+
+            # NaN bounds (scans with no valid pixels) never overlap
+            with numpy.errstate(invalid="ignore"):
+                scan_overlaps = ((bounds[:, 0] < buf_col_end) & (bounds[:, 1] >= buf_col_start) &
+                                 (bounds[:, 2] < buf_row_end) & (bounds[:, 3] >= buf_row_start))
+            scan_idxs = numpy.nonzero(scan_overlaps)[0]
+            if not scan_idxs.size:
+                for out_arr, out_fill in zip(output_arrays, output_fills):
+                    out_arr[tile_slice] = out_fill
+                continue
+
+            LOG.debug("Resampling %d scans for tile (%d:%d, %d:%d)", scan_idxs.size, row_start, row_end, col_start, col_end)
+            scan_mask = scan_overlaps[scan_idxs[0]:scan_idxs[-1] + 1]
+            first_row = scan_idxs[0] * rows_per_scan
+            last_row = (scan_idxs[-1] + 1) * rows_per_scan
+            # the shifted columns and rows are the only copy of swath data that needs to be made
+            tile_cols_array = cols_array[first_row:last_row] - cols_array.dtype.type(buf_col_start)
+            tile_rows_array = rows_array[first_row:last_row] - rows_array.dtype.type(buf_row_start)
+            tile_in = tuple(in_arr[first_row:last_row] for in_arr in input_arrays)
+            tile_out = tuple(numpy.empty((buf_row_end - buf_row_start, buf_col_end - buf_col_start), dtype=out_arr.dtype)
+                             for out_arr in output_arrays)
+            try:
+                _fornav.fornav_wrapper(tile_cols_array, tile_rows_array, tile_in, tile_out,
+                                       input_fill, output_fill, rows_per_scan,
+                                       weight_delta_max=weight_delta_max, scan_mask=scan_mask, **kwargs)
+            except RuntimeError as e:
+                if not str(e).startswith("EWA Resampling: No swath pixels found"):
+                    raise
+                for out_arr, out_fill in zip(output_arrays, output_fills):
+                    out_arr[tile_slice] = out_fill
+                continue
+
+            got_point = True
+            for idx, (out_arr, buf_arr) in enumerate(zip(output_arrays, tile_out)):
+                out_arr[tile_slice] = buf_arr[buf_slice]
+                valid_list[idx] += _count_valid(buf_arr[buf_slice], output_fills[idx])
+
+    if not got_point:
+        raise RuntimeError("EWA Resampling: No swath pixels found inside grid to be resampled")
+    return valid_list
+
+
+EWAFootprints = namedtuple("EWAFootprints", ["pixel_ptr", "cell_offsets", "cell_weights"])
+
+
+def compute_footprints(cols_array, rows_array, rows_per_scan, grid_cols, grid_rows,
+                       weight_count=10000, weight_min=0.01, weight_distance_max=1.0, weight_delta_max=10.0,
+                       scan_mask=None):
+    """Compute the grid cells and weights covered by the EWA footprint of every swath pixel.
+
+    The footprints form a CSR-style sparse matrix with one row per swath pixel. They can be passed to `fornav` as
+    `footprints` to resample products without recomputing the ellipse of every pixel. The weight parameters must be
+    the same as the ones used when resampling.
+
+    :returns: `EWAFootprints` (pixel_ptr, cell_offsets, cell_weights)
+    """
+    if scan_mask is None:
+        bounds = scan_bounds(cols_array, rows_array, rows_per_scan)
+        scan_mask = scan_grid_mask(bounds, grid_cols, grid_rows, weight_delta_max)
+    return EWAFootprints(*_fornav.compute_footprints_wrapper(
+        cols_array, rows_array, rows_per_scan, grid_cols, grid_rows,
+        weight_count=weight_count, weight_min=weight_min, weight_distance_max=weight_distance_max,
+        weight_delta_max=weight_delta_max, scan_mask=scan_mask))
+
+
+class FootprintCache(object):
+    """Store EWA footprints (see `compute_footprints`) on disk so they can be reused by later products and runs.
+
+    Footprints are stored in a directory per (swath_name, grid_name, D, d) key as numpy ``.npy`` files that are
+    memory mapped when loaded. A checksum of the column and row arrays and the other weight parameters are stored
+    with the footprints so stale entries (ex. a new pass with the same swath name or a different dynamic grid) are
+    recomputed instead of being used.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+
+    def _cache_path(self, swath_name, grid_name, weight_delta_max, weight_distance_max):
+        return os.path.join(self.cache_dir, "ewa_footprints_%s_%s_D%g_d%g" % (swath_name, grid_name, weight_delta_max,
+                                                                             weight_distance_max))
+
+    @staticmethod
+    def _info(cols_array, rows_array, rows_per_scan, grid_cols, grid_rows, weight_count, weight_min):
+        checksum = zlib.adler32(numpy.ascontiguousarray(cols_array).data)
+        checksum = zlib.adler32(numpy.ascontiguousarray(rows_array).data, checksum)
+        return {
+            "swath_shape": list(cols_array.shape),
+            "grid_shape": [grid_rows, grid_cols],
+            "rows_per_scan": rows_per_scan,
+            "weight_count": weight_count,
+            "weight_min": weight_min,
+            "checksum": checksum & 0xffffffff,
+        }
+
+    def load(self, cache_path, info):
+        """Load the footprints stored at `cache_path` if they were made from the same inputs as `info`."""
+        info_fn = os.path.join(cache_path, "info.json")
+        if not os.path.isfile(info_fn):
+            return None
+        try:
+            with open(info_fn, "r") as info_file:
+                cached_info = json.load(info_file)
+            if cached_info != info:
+                LOG.debug("Cached EWA footprints in '%s' are out of date", cache_path)
+                return None
+            return EWAFootprints(*(numpy.load(os.path.join(cache_path, name + ".npy"), mmap_mode="r")
+                                   for name in EWAFootprints._fields))
+        except (IOError, OSError, ValueError):
+            LOG.warning("Could not load cached EWA footprints from '%s'", cache_path)
+            LOG.debug("Footprint cache exception: ", exc_info=True)
+            return None
+
+    def save(self, cache_path, info, footprints):
+        """Save footprints to `cache_path`, replacing any previous footprints stored there."""
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        # write to a temporary directory first so other processes never see partial footprints
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp_footprints_")
+        try:
+            for name, arr in zip(EWAFootprints._fields, footprints):
+                numpy.save(os.path.join(tmp_path, name + ".npy"), arr)
+            with open(os.path.join(tmp_path, "info.json"), "w") as info_file:
+                json.dump(info, info_file)
+            if os.path.isdir(cache_path):
+                shutil.rmtree(cache_path)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            LOG.warning("Could not save EWA footprints to '%s'", cache_path)
+            LOG.debug("Footprint cache exception: ", exc_info=True)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def get(self, swath_name, grid_name, cols_array, rows_array, rows_per_scan, grid_cols, grid_rows,
+            weight_count=10000, weight_min=0.01, weight_distance_max=1.0, weight_delta_max=10.0, scan_mask=None):
+        """Get the footprints for the provided columns and rows, computing and caching them if needed."""
+        cache_path = self._cache_path(swath_name, grid_name, weight_delta_max, weight_distance_max)
+        info = self._info(cols_array, rows_array, rows_per_scan, grid_cols, grid_rows, weight_count, weight_min)
+        footprints = self.load(cache_path, info)
+        if footprints is not None:
+            LOG.debug("Using cached EWA footprints from '%s'", cache_path)
+            return footprints
+
+        LOG.debug("Computing EWA footprints for swath '%s' and grid '%s'", swath_name, grid_name)
+        footprints = compute_footprints(cols_array, rows_array, rows_per_scan, grid_cols, grid_rows,
+                                        weight_count=weight_count, weight_min=weight_min,
+                                        weight_distance_max=weight_distance_max, weight_delta_max=weight_delta_max,
+                                        scan_mask=scan_mask)
+        self.save(cache_path, info, footprints)
+        return footprints
+
+
+class EWAAccumulator(object):
+    """Resample a pass to a grid one granule at a time with EWA, keeping the partial results in files between runs.
+
+    Every product gets an accumulation grid and a weight grid (32-bit float flat binary files) in `accum_dir` and a
+    JSON file with the grid shape, maximum weight mode, the granules that have been added, and any other information
+    provided when adding granules. Adding a granule only does the EWA work for that granule's pixels. Grid images
+    can be written at any time (see `write`) and are the same as resampling all of the granules added so far at once.
+
+    Granules must be added by one process at a time.
+    """
+    def __init__(self, accum_dir, grid_name, grid_rows, grid_cols):
+        self.accum_dir = accum_dir
+        self.grid_name = grid_name
+        self.grid_rows = grid_rows
+        self.grid_cols = grid_cols
+
+    def _paths(self, product_name):
+        base_path = os.path.join(self.accum_dir, "ewa_accum_%s_%s" % (self.grid_name, product_name))
+        return base_path + "_accum.dat", base_path + "_weights.dat", base_path + ".json"
+
+    def load_info(self, product_name):
+        """Information stored for a product or None if nothing has been accumulated for it."""
+        info_fn = self._paths(product_name)[2]
+        if not os.path.isfile(info_fn):
+            return None
+        with open(info_fn, "r") as info_file:
+            return json.load(info_file)
+
+    def _save_info(self, product_name, info):
+        info_fn = self._paths(product_name)[2]
+        with open(info_fn + ".tmp", "w") as info_file:
+            json.dump(info, info_file)
+        os.rename(info_fn + ".tmp", info_fn)
+
+    def _grids(self, product_name, mode="r+"):
+        accum_fn, weights_fn, _ = self._paths(product_name)
+        shape = (self.grid_rows, self.grid_cols)
+        # new files are filled with zeros (no weight) by the OS
+        return (numpy.memmap(accum_fn, dtype=numpy.float32, mode=mode, shape=shape),
+                numpy.memmap(weights_fn, dtype=numpy.float32, mode=mode, shape=shape))
+
+    def add(self, granule_id, cols_array, rows_array, rows_per_scan, input_arrays, product_names,
+            input_fill=numpy.nan, maximum_weight_mode=False, weight_count=10000, weight_min=0.01,
+            weight_distance_max=1.0, weight_delta_max=10.0, num_threads=1, scan_mask=None, info=None):
+        """Add the EWA weighted values of one granule to the grids of each product.
+
+        Products that already have `granule_id` are skipped so running the same granule again is harmless.
+
+        :param info: dictionary (or one per product) of JSON serializable information to store with each product
+        :returns: list of product names that were updated
+        """
+        num_items = len(product_names)
+        if not isinstance(input_fill, (list, tuple)):
+            input_fill = [input_fill] * num_items
+        if not isinstance(maximum_weight_mode, (list, tuple)):
+            maximum_weight_mode = [maximum_weight_mode] * num_items
+        if not isinstance(info, (list, tuple)):
+            info = [info] * num_items
+        if not os.path.isdir(self.accum_dir):
+            os.makedirs(self.accum_dir)
+
+        indexes = []
+        product_infos = []
+        for idx, product_name in enumerate(product_names):
+            product_info = self.load_info(product_name)
+            if product_info is None:
+                product_info = {
+                    "grid_shape": [self.grid_rows, self.grid_cols],
+                    "maximum_weight_mode": bool(maximum_weight_mode[idx]),
+                    "granules": [],
+                }
+                self._grids(product_name, mode="w+")
+            elif product_info["grid_shape"] != [self.grid_rows, self.grid_cols]:
+                raise ValueError("Accumulated '%s' grid has a different shape than grid '%s'" % (product_name, self.grid_name))
+            elif product_info["maximum_weight_mode"] != bool(maximum_weight_mode[idx]):
+                raise ValueError("Accumulated '%s' grid used a different maximum weight mode" % (product_name,))
+            if granule_id in product_info["granules"]:
+                LOG.debug("Granule '%s' has already been added to '%s'", granule_id, product_name)
+                continue
+            product_info["granules"].append(granule_id)
+            product_info.update(info[idx] or {})
+            indexes.append(idx)
+            product_infos.append(product_info)
+        if not indexes:
+            return []
+
+        grids = [self._grids(product_names[idx]) for idx in indexes]
+        _fornav.fornav_accumulate_wrapper(cols_array, rows_array, tuple(input_arrays[idx] for idx in indexes),
+                                          tuple(g[0] for g in grids), tuple(g[1] for g in grids),
+                                          [input_fill[idx] for idx in indexes], rows_per_scan,
+                                          weight_count=weight_count, weight_min=weight_min,
+                                          weight_distance_max=weight_distance_max, weight_delta_max=weight_delta_max,
+                                          maximum_weight_mode=[maximum_weight_mode[idx] for idx in indexes],
+                                          num_threads=num_threads, scan_mask=scan_mask)
+        for accum_grid, weight_grid in grids:
+            accum_grid.flush()
+            weight_grid.flush()
+        # only mark granules as added once the grids have them
+        for idx, product_info in zip(indexes, product_infos):
+            self._save_info(product_names[idx], product_info)
+        return [product_names[idx] for idx in indexes]
+
+    def write(self, product_names, output_arrays, output_fill=numpy.nan, weight_min=0.01, weight_sum_min=-1.0):
+        """Write grid images of the granules accumulated so far for each product.
+
+        :returns: list of the number of valid grid cells written for each product
+        """
+        grids = [self._grids(product_name, mode="r") for product_name in product_names]
+        mwm = [self.load_info(product_name)["maximum_weight_mode"] for product_name in product_names]
+        if not isinstance(output_fill, (list, tuple)):
+            output_fill = [output_fill] * len(product_names)
+        return _fornav.write_grid_images_wrapper(tuple(g[0] for g in grids), tuple(g[1] for g in grids),
+                                                 tuple(output_arrays), output_fill, weight_min=weight_min,
+                                                 weight_sum_min=weight_sum_min, maximum_weight_mode=mwm)
+
+
 def fornav(cols_array, rows_array, rows_per_scan, input_arrays, input_dtype=None, input_fill=numpy.nan,
            output_arrays=None, output_fill=None, grid_cols=None, grid_rows=None,
            weight_count=10000, weight_min=0.01, weight_distance_max=1.0, weight_delta_max=10.0,
-           weight_sum_min=-1.0, maximum_weight_mode=False, use_group_size=False):
+           weight_sum_min=-1.0, maximum_weight_mode=False, use_group_size=False, num_threads=1, tile_size=None,
+           bounds=None, scan_mask=None, footprints=None):
+    """Remap swath data to a grid using elliptical weighted averaging (EWA).
+
+    Input arrays may have different data types (`input_dtype`), fill values (`input_fill` and `output_fill`), and
+    `maximum_weight_mode` settings by providing a list with one element per input array. The EWA footprint of each
+    swath pixel is only computed once for all of the input arrays.
+
+    Scans of the swath are independent of each other so they can be split between `num_threads` worker threads.
+    Each thread gets its own accumulation and weight grids for every channel which are combined before the final
+    grid image is written. This means memory usage for the intermediate grids grows linearly with the number of
+    threads. Using more than one thread requires the `_fornav` extension to be built with OpenMP, otherwise all scans
+    are processed on a single thread. With one thread the results are exactly the same as before threads were added.
+    With more than one thread the per-thread grids are summed in a different order than a single thread would add
+    the same values, so results can differ in the last bits of floating point precision.
+
+    If `tile_size` is specified the grid is resampled one tile at a time to bound memory usage (see `fornav_tiled`).
+
+    Scans that can not touch the grid are skipped. The per-scan bounds used to determine this can be provided as
+    `bounds` (see `scan_bounds`) if they have already been computed for these columns and rows. The resulting mask
+    (see `scan_grid_mask`) can be provided as `scan_mask` if the caller has already computed it for this grid.
+
+    If `footprints` (see `compute_footprints` and `FootprintCache`) are provided they are used instead of computing
+    the EWA footprint of every pixel. They must have been computed from these columns and rows with the same weight
+    parameters. `num_threads` and `tile_size` are ignored in this case.
+    """
     include_output = False
 
     if input_dtype is None:
@@ -131,14 +511,16 @@ def fornav(cols_array, rows_array, rows_per_scan, input_arrays, input_dtype=None
             raise ValueError("Must provide `input_dtype` when using input filenames")
         input_dtype = [ia.dtype for ia in input_arrays if hasattr(ia, "dtype")]
 
-    if isinstance(input_dtype, list):
-        if not all(in_dtype == input_dtype[0] for in_dtype in input_dtype):
-            raise ValueError("EWA remapping does not support multiple data types yet")
-        input_dtype = input_dtype[0]
-    if isinstance(input_fill, list):
-        if not all(in_fill == input_fill[0] or (numpy.isnan(in_fill) and numpy.isnan(input_fill[0])) for in_fill in input_fill):
-            raise ValueError("EWA remapping does not support multiple fill values yet")
-        input_fill = input_fill[0]
+    # data types, fills, and maximum weight mode can be different for each input array
+    num_items = len(input_arrays)
+    if not isinstance(input_dtype, (list, tuple)):
+        input_dtype = [input_dtype] * num_items
+    if not isinstance(input_fill, (list, tuple)):
+        input_fill = [input_fill] * num_items
+    if not isinstance(maximum_weight_mode, (list, tuple)):
+        maximum_weight_mode = [maximum_weight_mode] * num_items
+    if len(input_dtype) != num_items or len(input_fill) != num_items or len(maximum_weight_mode) != num_items:
+        raise ValueError("Must provide one data type, fill value, and maximum weight mode per input array")
 
     if output_arrays is None:
         include_output = True
@@ -154,28 +536,59 @@ def fornav(cols_array, rows_array, rows_per_scan, input_arrays, input_dtype=None
 
     if output_fill is None:
         output_fill = input_fill
-
-    if use_group_size:
-        if GROUP_SIZE is not None:
-            group_size = GROUP_SIZE
-        else:
-            group_size = None
-            # It seems like this could be a smart way of handling this is we were using multiprocessing, but
-            # a lot of testing is required to verify that assumption. The proper way to handle this or make it faster
-            # in general is to have parrallel operations inside fornav (OpenMP or OpenCL/GPU).
-            # group_size = calculate_group_size(cols_array.shape[1], cols_array.shape[0], grid_cols, grid_rows)
+    elif not isinstance(output_fill, (list, tuple)):
+        output_fill = [output_fill] * num_items
+
+    group_size = None
+    if use_group_size and GROUP_SIZE is not None:
+        group_size = GROUP_SIZE
+    # It seems like this could be a smart way of handling this is we were using multiprocessing, but
+    # a lot of testing is required to verify that assumption. Parallel operations are now done inside
+    # fornav (OpenMP) by splitting scans between threads (see `num_threads`).
+    # group_size = calculate_group_size(cols_array.shape[1], cols_array.shape[0], grid_cols, grid_rows)
     if group_size is None:
         group_size = len(input_arrays)
 
+    if rows_per_scan < 2 or cols_array.shape[0] % rows_per_scan != 0:
+        raise ValueError("EWA requires 2 or more rows_per_scan and must be a factor of the total number of input rows")
+    if footprints is not None:
+        LOG.debug("Using precomputed EWA footprints")
+    else:
+        if bounds is None:
+            bounds = scan_bounds(cols_array, rows_array, rows_per_scan)
+        if scan_mask is None:
+            scan_mask = scan_grid_mask(bounds, grid_cols, grid_rows, weight_delta_max)
+            LOG.debug("Skipping %d of %d scans that are outside the grid",
+                      scan_mask.size - numpy.count_nonzero(scan_mask), scan_mask.size)
+        if tile_size is not None:
+            LOG.debug("Using tiled EWA resampling with tile size %r", tile_size)
+
     valid_list = []
+    group_start = 0
     for in_arrays, out_arrays in group_iter(input_arrays, cols_array.shape[1], cols_array.shape[0], input_dtype,
                                             output_arrays, grid_cols, grid_rows, group_size):
         LOG.debug("Processing %d of %d input arrays", len(in_arrays), len(input_arrays))
-        tmp_valid_list = _fornav.fornav_wrapper(cols_array, rows_array, in_arrays, out_arrays,
-                                                input_fill, output_fill, rows_per_scan,
-                                                weight_count=weight_count, weight_min=weight_min, weight_distance_max=weight_distance_max,
-                                                weight_delta_max=weight_delta_max, weight_sum_min=weight_sum_min,
-                                                maximum_weight_mode=maximum_weight_mode)
+        group_slice = slice(group_start, group_start + len(in_arrays))
+        group_start += len(in_arrays)
+        if footprints is not None:
+            tmp_valid_list = _fornav.fornav_footprints_wrapper(footprints.pixel_ptr, footprints.cell_offsets,
+                                                               footprints.cell_weights, in_arrays, out_arrays,
+                                                               input_fill[group_slice], output_fill[group_slice],
+                                                               weight_min=weight_min, weight_sum_min=weight_sum_min,
+                                                               maximum_weight_mode=maximum_weight_mode[group_slice])
+        elif tile_size is not None:
+            tmp_valid_list = fornav_tiled(cols_array, rows_array, rows_per_scan, in_arrays, out_arrays,
+                                          input_fill[group_slice], output_fill[group_slice], tile_size, bounds=bounds,
+                                          weight_count=weight_count, weight_min=weight_min, weight_distance_max=weight_distance_max,
+                                          weight_delta_max=weight_delta_max, weight_sum_min=weight_sum_min,
+                                          maximum_weight_mode=maximum_weight_mode[group_slice], num_threads=num_threads)
+        else:
+            tmp_valid_list = _fornav.fornav_wrapper(cols_array, rows_array, in_arrays, out_arrays,
+                                                    input_fill[group_slice], output_fill[group_slice], rows_per_scan,
+                                                    weight_count=weight_count, weight_min=weight_min, weight_distance_max=weight_distance_max,
+                                                    weight_delta_max=weight_delta_max, weight_sum_min=weight_sum_min,
+                                                    maximum_weight_mode=maximum_weight_mode[group_slice], num_threads=num_threads,
+                                                    scan_mask=scan_mask)
 
         valid_list.extend(tmp_valid_list)
 
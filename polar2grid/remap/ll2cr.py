@@ -38,7 +38,12 @@
 """
 __docformat__ = "restructuredtext en"
 
+import os
+import json
+import shutil
+import hashlib
 import logging
+import tempfile
 import numpy
 
 import _ll2cr
@@ -71,13 +76,19 @@ def mask_helper(arr, fill):
         return arr == fill
 
 
-def ll2cr(lon_arr, lat_arr, grid_info, fill_in=numpy.nan, inplace=True):
+def ll2cr(lon_arr, lat_arr, grid_info, fill_in=numpy.nan, inplace=True,
+          rows_per_chunk=_ll2cr.DEFAULT_ROWS_PER_CHUNK, num_threads=1, geolocation_key=None):
     """Project longitude and latitude points to columns and rows in the specified grid in place
 
     :param lon_arr: Numpy array of longitude floats
     :param lat_arr: Numpy array of latitude floats
     :param grid_info: dictionary of grid information (see below)
     :param fill_in: Fill value for input longitude and latitude arrays and used for output
+    :param rows_per_chunk: Number of rows to project at a time
+    :param num_threads: Number of threads to split chunks of rows between
+    :param geolocation_key: Hashable key identifying the longitude and latitude data. Dynamic grid parameters for it
+                            are cached in the grid definition's `dynamic_extents` (if it has one) so projecting the
+                            same geolocation to the same grid again doesn't have to find the bounds of the data
     :returns: tuple(points_in_grid, cols_out, rows_out)
 
     The provided grid info must have the following parameters (optional grids mean dynamic):
@@ -95,6 +106,9 @@ def ll2cr(lon_arr, lat_arr, grid_info, fill_in=numpy.nan, inplace=True):
         1. Convert (lon, lat) points to (X, Y) points in the projection space
         2. If grid is missing some parameters (dynamic grid), then fill them in
         3. Convert (X, Y) points to (column, row) points in the grid space
+
+    32-bit and 64-bit float arrays are processed in place (ex. memory mapped ll2cr files), a chunk of rows at a
+    time. Any other arrays are copied to 64-bit floats first.
     """
     p = grid_info["proj4_definition"]
     cw = grid_info["cell_width"]
@@ -105,14 +119,14 @@ def ll2cr(lon_arr, lat_arr, grid_info, fill_in=numpy.nan, inplace=True):
     oy = grid_info.get("origin_y", None)
     is_static = None not in [w, h, ox, oy]
 
-    # C code requires 64-bit floats and to do in place it must be writeable, otherwise we need to make a copy
-    is_double = lon_arr.dtype == numpy.float64 and lon_arr.dtype == numpy.float64
+    # C code requires 32-bit or 64-bit floats and to do in place it must be writeable, otherwise we need to make a copy
+    is_float = lon_arr.dtype in (numpy.float32, numpy.float64) and lat_arr.dtype == lon_arr.dtype
     is_writeable = lon_arr.flags.writeable and lat_arr.flags.writeable
+    is_contiguous = lon_arr.flags.c_contiguous and lat_arr.flags.c_contiguous
     lon_orig = lon_arr
     lat_orig = lat_arr
     copy_result = False
-    # XXX: Check that automatic casting can't be done on the C side
-    if not is_double or not is_writeable:
+    if not is_float or not is_writeable or not is_contiguous:
         LOG.debug("Copying longitude and latitude arrays because inplace processing could not be done")
         copy_result = True
         lon_arr = lon_arr.astype(numpy.float64)
@@ -120,17 +134,27 @@ def ll2cr(lon_arr, lat_arr, grid_info, fill_in=numpy.nan, inplace=True):
 
     if is_static:
         LOG.debug("Running static version of ll2cr...")
-        points_in_grid = _ll2cr.ll2cr_static(lon_arr, lat_arr, fill_in, p, cw, ch, w, h, ox, oy)
+        points_in_grid = _ll2cr.ll2cr_static(lon_arr, lat_arr, fill_in, p, cw, ch, w, h, ox, oy,
+                                             rows_per_chunk=rows_per_chunk, num_threads=num_threads)
     else:
         LOG.debug("Running dynamic version of ll2cr...")
+        extents_cache = getattr(grid_info, "dynamic_extents", None) if geolocation_key is not None else None
+        crosses_antimeridian = None
+        if extents_cache is not None and geolocation_key in extents_cache:
+            LOG.debug("Using previously computed dynamic grid parameters for this geolocation")
+            ox, oy, w, h, crosses_antimeridian = extents_cache[geolocation_key]
         results = _ll2cr.ll2cr_dynamic(lon_arr, lat_arr, fill_in, p, cw, ch,
-                                       width=w, height=h, origin_x=ox, origin_y=oy)
-        points_in_grid, lon_arr, lat_arr, origin_x, origin_y, width, height = results
+                                       width=w, height=h, origin_x=ox, origin_y=oy,
+                                       crosses_antimeridian=crosses_antimeridian,
+                                       rows_per_chunk=rows_per_chunk, num_threads=num_threads)
+        points_in_grid, lon_arr, lat_arr, origin_x, origin_y, width, height, crosses_antimeridian = results
         # edit the grid info dictionary in place
         grid_info["origin_x"] = origin_x
         grid_info["origin_y"] = origin_y
         grid_info["width"] = width
         grid_info["height"] = height
+        if extents_cache is not None:
+            extents_cache[geolocation_key] = (origin_x, origin_y, width, height, crosses_antimeridian)
 
     if copy_result and inplace:
         LOG.debug("Copying result arrays back to provided inplace array")
@@ -140,6 +164,135 @@ def ll2cr(lon_arr, lat_arr, grid_info, fill_in=numpy.nan, inplace=True):
     return points_in_grid, lon_orig, lat_orig
 
 
+class LL2CRCache(object):
+    """Store ll2cr results on disk so projecting the same geolocation to the same grid is only done once.
+
+    Results are stored in a directory per key as numpy ``.npy`` files along with the number of points in the grid and
+    any dynamic grid parameters that were filled in. The key is a hash of the longitude and latitude data, the fill
+    value, and the grid parameters so the cache can be shared between runs, processes, and passes. When the cache is
+    larger than `max_size` bytes the least recently used entries are removed.
+    """
+    grid_keys = ("proj4_definition", "cell_width", "cell_height", "width", "height", "origin_x", "origin_y")
+
+    def __init__(self, cache_dir, max_size=None):
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+
+    def cache_key(self, lon_arr, lat_arr, grid_info, fill_in=numpy.nan):
+        """Hash identifying the longitude and latitude data being projected to a grid."""
+        h = hashlib.sha1()
+        for arr in (lon_arr, lat_arr):
+            h.update(("%r %s" % (arr.shape, arr.dtype.str)).encode())
+            for row_idx in range(0, arr.shape[0], _ll2cr.DEFAULT_ROWS_PER_CHUNK):
+                h.update(numpy.ascontiguousarray(arr[row_idx:row_idx + _ll2cr.DEFAULT_ROWS_PER_CHUNK]).data)
+        h.update(json.dumps([str(fill_in)] + [str(grid_info.get(k)) for k in self.grid_keys]).encode())
+        return h.hexdigest()
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, "ll2cr_" + key)
+
+    def load(self, key, lon_arr, lat_arr, grid_info):
+        """Copy cached results for `key` in to `lon_arr` and `lat_arr`, filling in `grid_info`.
+
+        :returns: points in grid or None if nothing is cached for `key`
+        """
+        cache_path = self._cache_path(key)
+        info_fn = os.path.join(cache_path, "info.json")
+        if not os.path.isfile(info_fn):
+            return None
+        try:
+            with open(info_fn, "r") as info_file:
+                info = json.load(info_file)
+            # load both arrays before touching the caller's arrays so a partially written or removed entry
+            # never leaves them half overwritten
+            cols_arr = numpy.load(os.path.join(cache_path, "cols.npy"), mmap_mode="r")
+            rows_arr = numpy.load(os.path.join(cache_path, "rows.npy"), mmap_mode="r")
+            if cols_arr.shape != lon_arr.shape or rows_arr.shape != lat_arr.shape:
+                raise ValueError("Cached ll2cr results have the wrong shape")
+            points_in_grid = info["points_in_grid"]
+            entry_grid_info = info["grid_info"]
+            # mark as recently used
+            os.utime(info_fn, None)
+        except (IOError, OSError, ValueError, KeyError):
+            LOG.warning("Could not load cached ll2cr results from '%s'", cache_path)
+            LOG.debug("ll2cr cache exception: ", exc_info=True)
+            return None
+        lon_arr[:] = cols_arr
+        lat_arr[:] = rows_arr
+        for k, v in entry_grid_info.items():
+            grid_info[k] = v
+        return points_in_grid
+
+    def save(self, key, cols_arr, rows_arr, grid_info, points_in_grid):
+        """Save ll2cr results for `key`, replacing anything previously stored for it."""
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        cache_path = self._cache_path(key)
+        # write to a temporary directory first so other processes never see partial results
+        tmp_path = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp_ll2cr_")
+        try:
+            numpy.save(os.path.join(tmp_path, "cols.npy"), cols_arr)
+            numpy.save(os.path.join(tmp_path, "rows.npy"), rows_arr)
+            info = {
+                "points_in_grid": int(points_in_grid),
+                "grid_info": dict((k, grid_info[k]) for k in ("width", "height", "origin_x", "origin_y")),
+            }
+            with open(os.path.join(tmp_path, "info.json"), "w") as info_file:
+                json.dump(info, info_file)
+            if os.path.isdir(cache_path):
+                shutil.rmtree(cache_path)
+            os.rename(tmp_path, cache_path)
+        except (IOError, OSError):
+            LOG.warning("Could not save ll2cr results to '%s'", cache_path)
+            LOG.debug("ll2cr cache exception: ", exc_info=True)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return
+        self.evict(keep=cache_path)
+
+    def evict(self, keep=None):
+        """Remove the least recently used entries until the cache is no larger than `max_size`."""
+        if self.max_size is None:
+            return
+        entries = []
+        total_size = 0
+        for entry_name in os.listdir(self.cache_dir):
+            entry_path = os.path.join(self.cache_dir, entry_name)
+            if not entry_name.startswith("ll2cr_") or entry_path == keep:
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry_path, fn)) for fn in os.listdir(entry_path))
+                last_used = os.path.getmtime(os.path.join(entry_path, "info.json"))
+            except OSError:
+                # being replaced or removed by another process
+                continue
+            entries.append((last_used, size, entry_path))
+            total_size += size
+        if keep is not None:
+            total_size += sum(os.path.getsize(os.path.join(keep, fn)) for fn in os.listdir(keep))
+
+        for last_used, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            LOG.debug("Removing least recently used ll2cr results '%s'", entry_path)
+            shutil.rmtree(entry_path, ignore_errors=True)
+            total_size -= size
+
+    def ll2cr(self, lon_arr, lat_arr, grid_info, fill_in=numpy.nan, **kwargs):
+        """Run `ll2cr` in place using cached results when available.
+
+        Takes the same arguments as `ll2cr`. Results are always written to the provided arrays.
+        """
+        key = self.cache_key(lon_arr, lat_arr, grid_info, fill_in=fill_in)
+        points_in_grid = self.load(key, lon_arr, lat_arr, grid_info)
+        if points_in_grid is not None:
+            LOG.debug("Using cached ll2cr results from '%s'", self._cache_path(key))
+            return points_in_grid, lon_arr, lat_arr
+
+        points_in_grid, lon_arr, lat_arr = ll2cr(lon_arr, lat_arr, grid_info, fill_in=fill_in, **kwargs)
+        self.save(key, lon_arr, lat_arr, grid_info, points_in_grid)
+        return points_in_grid, lon_arr, lat_arr
+
+
 def python_ll2cr(lon_arr, lat_arr, grid_info, fill_in=numpy.nan, fill_out=None, cols_out=None, rows_out=None):
     """Project longitude and latitude points to column rows in the specified grid.
 
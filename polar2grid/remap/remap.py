@@ -83,19 +83,27 @@ from itertools import izip
 import logging
 import numpy
 import os
+import zlib
 from collections import defaultdict
-from satpy import Scene
-from scipy.interpolate.interpnd import _ndim_coords_from_arrays
-from scipy.spatial import cKDTree
 
-from polar2grid.core.containers import GriddedProduct, GriddedScene, SwathScene
+from polar2grid.core.containers import GriddedProduct, GriddedScene, SwathScene, intermediate_arrays
+from polar2grid.core.metrics import metrics
+from polar2grid.core.time_utils import iso8601
 from polar2grid.grids import GridManager
-from polar2grid.remap import fornav
+from polar2grid.remap import fornav, _nearest
 from polar2grid.remap import ll2cr as ll2cr  # gridinator
+from polar2grid.remap.remap_matrix import RemapMatrix, geolocation_fingerprint, DEFAULT_TOLERANCE
 
 LOG = logging.getLogger(__name__)
 SWATH_USAGE = os.environ.get("P2G_SWATH_USAGE", 0)
 GRID_COVERAGE = os.environ.get("P2G_GRID_COVERAGE", 0.1)
+# number of grid rows to compute and gather at a time during nearest neighbor resampling
+NEAREST_BLOCK_ROWS = int(os.environ.get("P2G_NEAREST_BLOCK_ROWS", 1024))
+# number of threads to split chunks of swath rows between in ll2cr
+LL2CR_THREADS = int(os.environ.get("P2G_LL2CR_THREADS", 1))
+# directory to keep ll2cr results in between runs and its maximum size (megabytes)
+LL2CR_CACHE_DIR = os.environ.get("P2G_CACHE_DIR", None)
+LL2CR_CACHE_SIZE = float(os.environ.get("P2G_CACHE_SIZE", 10240))
 # resampling 'methods' that accept satpy Scenes instead of P2G scenes
 SATPY_RESAMPLERS = ["sensor"]
 
@@ -118,9 +126,13 @@ def init_worker():
 
 
 class Remapper(object):
-    def __init__(self, grid_configs=[],
+    def __init__(self, grid_configs=[], ll2cr_cache=None, ll2cr_cache_size=None, grid_manager=None,
                  overwrite_existing=False, keep_intermediate=False, exit_on_error=True, **kwargs):
-        self.grid_manager = GridManager(*grid_configs)
+        self.grid_manager = grid_manager if grid_manager is not None else GridManager(*grid_configs)
+        ll2cr_cache = ll2cr_cache or LL2CR_CACHE_DIR
+        ll2cr_cache_size = ll2cr_cache_size if ll2cr_cache_size is not None else LL2CR_CACHE_SIZE
+        # results of ll2cr saved on disk between runs
+        self.ll2cr_disk_cache = ll2cr.LL2CRCache(ll2cr_cache, int(ll2cr_cache_size * 1024 ** 2)) if ll2cr_cache else None
         self.overwrite_existing = overwrite_existing
         self.keep_intermediate = keep_intermediate
         self.exit_on_error = exit_on_error
@@ -129,7 +141,13 @@ class Remapper(object):
             "nearest": self._remap_scene_nearest,
             "sensor": self._remap_scene_sensor,
         }
+        # methods that can remap one group of products (sharing geolocation) at a time
+        self.iter_methods = {
+            "ewa": self._iter_remap_scene_ewa,
+            "nearest": self._iter_remap_scene_nearest,
+        }
         self.ll2cr_cache = {}
+        self.scan_bounds_cache = {}
 
     def highest_resolution_swath_definition(self, swath_scene_or_product):
         if isinstance(swath_scene_or_product, SwathScene):
@@ -141,7 +159,26 @@ class Remapper(object):
             swath_def = swath_scene_or_product["swath_definition"]
         return swath_def
 
+    def _merge_gridded_scenes(self, gridded_scenes):
+        gridded_scene = GriddedScene()
+        for group_scene in gridded_scenes:
+            gridded_scene.update(group_scene)
+        return gridded_scene
+
     def remap_scene(self, swath_scene, grid_name, **kwargs):
+        gridded_scenes = list(self.iter_remap_scene(swath_scene, grid_name, **kwargs))
+        if len(gridded_scenes) == 1:
+            return gridded_scenes[0]
+        return self._merge_gridded_scenes(gridded_scenes)
+
+    def iter_remap_scene(self, swath_scene, grid_name, **kwargs):
+        """Remap a scene to a grid, yielding products as soon as they are remapped.
+
+        Works the same as `remap_scene`, but a separate `GriddedScene` is yielded for every group of products that
+        share geolocation (and one for all products remapped with remap matrices) so they can be used, for example
+        written by a backend, while the rest of the scene is remapped. Methods that can't be split in to groups
+        ('sensor') yield one scene with everything.
+        """
         method = kwargs.pop("remap_method", "ewa")
         LOG.debug("Remap scene being run with method '%s'", method)
         if method not in self.methods:
@@ -158,6 +195,25 @@ class Remapper(object):
             grid_def = self.grid_manager.get_grid_definition(grid_name)
         func = self.methods[method]
 
+        if kwargs.get("accumulate_dir"):
+            if method != "ewa" or kwargs.get("remap_matrix") or not grid_def.is_static:
+                raise ValueError("Accumulating granules is only supported for EWA remapping to static grids")
+            LOG.info("Accumulating granules for grid '%s' in '%s'", grid_name, kwargs["accumulate_dir"])
+
+        matrix_scene = None
+        if kwargs.get("remap_matrix") and method in ("ewa", "nearest"):
+            matrix_scene, swath_scene, grid_def = self._remap_scene_matrix(swath_scene, grid_def, method, **kwargs)
+            if not swath_scene:
+                if not matrix_scene:
+                    raise RuntimeError("Remap matrices could not remap any of the data to grid '%s'" % (grid_name,))
+                yield matrix_scene
+                return
+            if matrix_scene:
+                yield matrix_scene
+                LOG.info("Remapping products that could not use a remap matrix:\n\t%s", "\n\t".join(sorted(swath_scene.keys())))
+        kwargs.pop("remap_matrix", None)
+        kwargs.pop("remap_matrix_tolerance", None)
+
         # FUTURE: Make this a keyword and add the logic to support it
         if kwargs.get("share_dynamic_grids", True) and method != "sensor":
             # Let's run ll2cr to fill in any parameters we need to and decide if the data fits in the grid
@@ -171,7 +227,11 @@ class Remapper(object):
                 LOG.error("Remapping error")
                 raise
 
-        return func(swath_scene, grid_def, **kwargs)
+        if method in self.iter_methods:
+            for group_scene in self.iter_methods[method](swath_scene, grid_def, **kwargs):
+                yield group_scene
+        else:
+            yield func(swath_scene, grid_def, **kwargs)
 
     def run_ll2cr(self, swath_definition, grid_definition, swath_usage=SWATH_USAGE):
         geo_id = swath_definition["swath_name"]
@@ -182,26 +242,26 @@ class Remapper(object):
 
         rows_fn = "ll2cr_rows_%s_%s.dat" % (grid_name, geo_id)
         cols_fn = "ll2cr_cols_%s_%s.dat" % (grid_name, geo_id)
-        # lon_arr = swath_definition.get_longitude_array()
-        # lat_arr = swath_definition.get_latitude_array()
-
-        if os.path.isfile(rows_fn):
-            if not self.overwrite_existing:
-                LOG.error("Intermediate remapping file already exists: %s" % (rows_fn,))
-                raise RuntimeError("Intermediate remapping file already exists: %s" % (rows_fn,))
-            else:
-                LOG.warning("Intermediate remapping file already exists, will overwrite: %s", rows_fn)
-        if os.path.isfile(cols_fn):
-            if not self.overwrite_existing:
-                LOG.error("Intermediate remapping file already exists: %s" % (cols_fn,))
-                raise RuntimeError("Intermediate remapping file already exists: %s" % (cols_fn,))
-            else:
-                LOG.warning("Intermediate remapping file already exists, will overwrite: %s", cols_fn)
+        swath_shape = (swath_definition["swath_rows"], swath_definition["swath_columns"])
+        rows_arr, rows_fn = intermediate_arrays.create(rows_fn, swath_shape, swath_definition["data_type"],
+                                                       overwrite_existing=self.overwrite_existing,
+                                                       description="Intermediate remapping file")
+        cols_arr, cols_fn = intermediate_arrays.create(cols_fn, swath_shape, swath_definition["data_type"],
+                                                       overwrite_existing=self.overwrite_existing,
+                                                       description="Intermediate remapping file")
         try:
-            rows_arr = swath_definition.copy_latitude_array(filename=rows_fn, read_only=False)
-            cols_arr = swath_definition.copy_longitude_array(filename=cols_fn, read_only=False)
-            points_in_grid, _, _ = ll2cr.ll2cr(cols_arr, rows_arr, grid_definition,
-                                               fill_in=swath_definition["fill_value"])
+            rows_arr[:] = swath_definition.get_latitude_array()
+            cols_arr[:] = swath_definition.get_longitude_array()
+            geolocation_key = None
+            if not grid_definition.is_static:
+                # sizing a dynamic grid is only done once for the same geolocation
+                geolocation_key = self._geolocation_key(cols_arr, rows_arr)
+            # projected in place, one chunk of rows at a time
+            ll2cr_func = self.ll2cr_disk_cache.ll2cr if self.ll2cr_disk_cache is not None else ll2cr.ll2cr
+            with metrics.stage("ll2cr", swath_name=geo_id, grid_name=grid_name):
+                points_in_grid, _, _ = ll2cr_func(cols_arr, rows_arr, grid_definition,
+                                                  fill_in=swath_definition["fill_value"], num_threads=LL2CR_THREADS,
+                                                  geolocation_key=geolocation_key)
             grid_str = str(grid_definition).replace("\n", "\n\t")
             LOG.debug("Grid information:\n\t%s", grid_str)
         except StandardError:
@@ -223,13 +283,84 @@ class Remapper(object):
         self.ll2cr_cache[(geo_id, grid_name)] = (cols_fn, rows_fn)
         return cols_fn, rows_fn
 
+    def _ll2cr_arrays(self, cols_fn, rows_fn, shape, dtype):
+        """Get the column and row arrays from `run_ll2cr` results which may be files or arrays kept in memory."""
+        return tuple(numpy.memmap(data, dtype=dtype, mode='r', shape=shape) if isinstance(data, (str, unicode))
+                     else data.reshape(shape) for data in (cols_fn, rows_fn))
+
+    def _gridded_filepaths(self, swath_scene, product_names, grid_name):
+        """Get the filenames to use for gridded products if their data has to be written to disk."""
+        # swath data kept in memory doesn't have a filename to name the gridded file after
+        product_filepaths = [swath_scene[pn]["swath_data"] if isinstance(swath_scene[pn]["swath_data"], (str, unicode))
+                             else pn + ".dat" for pn in product_names]
+        return self._add_prefix("grid_%s_" % (grid_name,), *product_filepaths)
+
+    def _create_gridded_arrays(self, filepaths, shape, dtypes):
+        """Create output arrays for gridded data, in memory if allowed or on disk as `filepaths`.
+
+        :returns: (list of arrays, list of what gridded products should store)
+        """
+        arrays = []
+        data_list = []
+        for fp, dtype in zip(filepaths, dtypes):
+            arr, data = intermediate_arrays.create(fp, shape, dtype, overwrite_existing=self.overwrite_existing,
+                                                   description="Intermediate remapping file")
+            arrays.append(arr)
+            data_list.append(data)
+        return arrays, data_list
+
+    def _accumulate_ewa(self, swath_scene, product_names, grid_def, cols_array, rows_array, rows_per_scan,
+                        output_arrays, accumulate_dir, output_fill=None, scan_mask=None, weight_delta_max=10.0,
+                        weight_distance_max=1.0, maximum_weight_mode=False, num_threads=1):
+        """Add the granule in `swath_scene` to the EWA grids kept in `accumulate_dir` and write what's there so far.
+
+        :returns: list of the number of valid grid cells written for each product
+        """
+        grid_name = grid_def["grid_name"]
+        accumulator = fornav.EWAAccumulator(accumulate_dir, grid_name, grid_def["height"], grid_def["width"])
+        granule_id = swath_scene[product_names[0]]["begin_time"].isoformat()
+        product_infos = []
+        for product_name in product_names:
+            # keep track of the time range of the granules that have been added
+            begin_time = swath_scene[product_name]["begin_time"].isoformat()
+            end_time = swath_scene[product_name]["end_time"].isoformat()
+            product_info = accumulator.load_info(product_name) or {"begin_time": begin_time, "end_time": end_time}
+            product_infos.append({"begin_time": min(product_info["begin_time"], begin_time),
+                                  "end_time": max(product_info["end_time"], end_time)})
+
+        LOG.debug("Accumulating granule '%s' for the following products:\n\t%s", granule_id,
+                  "\n\t".join(sorted(product_names)))
+        input_arrays = [swath_scene[pn].get_data_array() for pn in product_names]
+        input_fill = [swath_scene[pn]["fill_value"] for pn in product_names]
+        added = accumulator.add(granule_id, cols_array, rows_array, rows_per_scan, input_arrays, product_names,
+                                input_fill=input_fill, maximum_weight_mode=maximum_weight_mode,
+                                weight_delta_max=weight_delta_max, weight_distance_max=weight_distance_max,
+                                num_threads=num_threads, scan_mask=scan_mask, info=product_infos)
+        if len(added) != len(product_names):
+            LOG.info("Granule '%s' was already accumulated for some products, they will not be added again", granule_id)
+        return accumulator.write(product_names, output_arrays,
+                                 output_fill=input_fill if output_fill is None else output_fill)
+
+    def _set_accumulated_times(self, gridded_product, accumulate_dir, grid_name, product_name):
+        grid_def = gridded_product["grid_definition"]
+        accumulator = fornav.EWAAccumulator(accumulate_dir, grid_name, grid_def["height"], grid_def["width"])
+        product_info = accumulator.load_info(product_name)
+        gridded_product["begin_time"] = iso8601(product_info["begin_time"])
+        gridded_product["end_time"] = iso8601(product_info["end_time"])
+
+    def _geolocation_key(self, lon_arr, lat_arr):
+        """Key identifying longitude and latitude data by its contents."""
+        checksum = zlib.adler32(numpy.ascontiguousarray(lon_arr).data)
+        checksum = zlib.adler32(numpy.ascontiguousarray(lat_arr).data, checksum)
+        return lon_arr.shape, lon_arr.dtype.str, checksum & 0xffffffff
+
     def _add_prefix(self, prefix, *filepaths):
         return [os.path.join(os.path.dirname(x), prefix + os.path.basename(x)) for x in filepaths]
 
     def _safe_remove(self, *filepaths):
         if not self.keep_intermediate:
             for fp in filepaths:
-                if os.path.isfile(fp):
+                if isinstance(fp, (str, unicode)) and os.path.isfile(fp):
                     try:
                         LOG.debug("Removing intermediate file '%s'...", fp)
                         os.remove(fp)
@@ -242,25 +373,294 @@ class Remapper(object):
         for cols_fn, rows_fn in self.ll2cr_cache.values():
             self._safe_remove(rows_fn, cols_fn)
         self.ll2cr_cache = {}
+        self.scan_bounds_cache = {}
+
+    def get_scan_bounds(self, cols_array, rows_array, rows_per_scan, swath_definition, grid_definition):
+        """Get the per-scan column/row bounds of ll2cr output, only computing them once per swath and grid."""
+        key = (swath_definition["swath_name"], grid_definition["grid_name"], rows_per_scan)
+        if key not in self.scan_bounds_cache:
+            self.scan_bounds_cache[key] = fornav.scan_bounds(cols_array, rows_array, rows_per_scan)
+        return self.scan_bounds_cache[key]
+
+    def _ewa_parameters(self, swath_def, grid_def, **kwargs):
+        """Get the rows per scan and fornav 'D' parameter to use for a swath and grid."""
+        rows_per_scan = swath_def.get("rows_per_scan", 0)
+        if rows_per_scan < 2:
+            LOG.warning("Data has less than 2 rows per scan, this is not optimal for the EWA resampling algorithm. All rows will be used as one scan")
+            rows_per_scan = swath_def['swath_rows']
+        edge_res = swath_def.get("limb_resolution", None)
+        fornav_D = kwargs.get("fornav_D", None)
+        if fornav_D is None:
+            if edge_res is not None:
+                if grid_def.is_latlong:
+                    fornav_D = (edge_res / 2) / grid_def.cell_width_meters
+                else:
+                    fornav_D = (edge_res / 2) / grid_def["cell_width"]
+                LOG.debug("Fornav 'D' option dynamically set to %f", fornav_D)
+            else:
+                fornav_D = 10.0
+        return rows_per_scan, fornav_D
+
+    def _maximum_weight_modes(self, swath_scene, product_names, **kwargs):
+        """Get the EWA maximum weight mode for each product, category products always use maximum weight mode."""
+        mwm = []
+        for product_name in product_names:
+            is_cat = swath_scene[product_name].get('flag_meanings') is not None
+            if is_cat and not kwargs.get('maximum_weight_mode', False):
+                LOG.debug("Turning on maximum weight mode in EWA resampling for category product '%s'", product_name)
+            mwm.append(is_cat or kwargs.get('maximum_weight_mode', False))
+        return mwm
+
+    def _output_fills(self, swath_scene, product_names):
+        """Get the fill value to write to the gridded data of each product.
+
+        Floating point products use NaN like the rest of polar2grid, integer products keep their own fill value.
+        """
+        output_fill = []
+        for product_name in product_names:
+            swath_product = swath_scene[product_name]
+            if numpy.issubdtype(numpy.dtype(swath_product["data_type"]), numpy.floating):
+                output_fill.append(numpy.nan)
+            else:
+                output_fill.append(swath_product["fill_value"])
+        return output_fill
+
+    def _distance_upper_bound(self, swath_def, grid_def, **kwargs):
+        """Get the nearest neighbor search distance (in grid cells) to use for a swath and grid."""
+        if kwargs.get("distance_upper_bound", None) is not None:
+            return kwargs["distance_upper_bound"]
+        edge_res = swath_def.get("limb_resolution", None)
+        if edge_res is not None:
+            if grid_def.is_latlong:
+                distance_upper_bound = (edge_res / 2) / grid_def.cell_width_meters
+            else:
+                distance_upper_bound = (edge_res / 2) / grid_def["cell_width"]
+            LOG.debug("Distance upper bound dynamically set to %f", distance_upper_bound)
+        else:
+            distance_upper_bound = 3.0
+        return distance_upper_bound
+
+    def _swath_row_ranges(self, rows_array, good_mask, swath_columns, block_rows=NEAREST_BLOCK_ROWS):
+        """Get the minimum and maximum grid row of the valid pixels in each swath row.
+
+        Swath rows without any valid pixels have NaN for both.
+        """
+        rows_array = rows_array.reshape((-1, swath_columns))
+        good_mask = good_mask.reshape((-1, swath_columns))
+        row_min = numpy.empty((rows_array.shape[0],), dtype=numpy.float64)
+        row_max = numpy.empty((rows_array.shape[0],), dtype=numpy.float64)
+        for start in range(0, rows_array.shape[0], block_rows):
+            rows = slice(start, start + block_rows)
+            # fmin/fmax ignore NaNs
+            row_min[rows] = numpy.fmin.reduce(numpy.where(good_mask[rows], rows_array[rows], numpy.inf), axis=1)
+            row_max[rows] = numpy.fmax.reduce(numpy.where(good_mask[rows], rows_array[rows], -numpy.inf), axis=1)
+        row_min[numpy.isinf(row_min)] = numpy.nan
+        row_max[numpy.isinf(row_max)] = numpy.nan
+        return row_min, row_max
+
+    def _nearest_index(self, cols_array, rows_array, good_mask, grid_def, distance_upper_bound, index=None,
+                       block_rows=NEAREST_BLOCK_ROWS, swath_columns=None):
+        """Find the nearest valid swath pixel for every grid cell.
+
+        The index is computed `block_rows` grid rows at a time so only one block of search distances is in memory.
+        If `swath_columns` is provided each block only searches the swath rows with pixels that can be within
+        `distance_upper_bound` of it instead of the whole swath.
+
+        :param index: (rows, cols) int32 array to write the index to (ex. a memory mapped file)
+        :param swath_columns: number of columns in the swath the flattened arrays came from
+        :returns: index in to the flattened swath for each grid cell, -1 if there is no pixel within the distance
+        """
+        grid_shape = (grid_def["height"], grid_def["width"])
+        if index is None:
+            index = numpy.empty(grid_shape, dtype=numpy.int32)
+        if swath_columns is not None:
+            row_min, row_max = self._swath_row_ranges(rows_array, good_mask, swath_columns)
+            # same limits as `_nearest.nearest_index` uses to skip pixels
+            reach = numpy.ceil(distance_upper_bound) + 1
+        for row_start in range(0, grid_shape[0], block_rows):
+            row_end = min(row_start + block_rows, grid_shape[0])
+            block_index = index[row_start:row_end]
+            pixels = slice(None)
+            if swath_columns is not None:
+                swath_rows = numpy.nonzero((row_max > row_start - reach) & (row_min < row_end + reach))[0]
+                if not swath_rows.size:
+                    block_index[:] = -1
+                    continue
+                pixels = slice(swath_rows[0] * swath_columns, (swath_rows[-1] + 1) * swath_columns)
+            _nearest.nearest_index(cols_array[pixels], rows_array[pixels], good_mask[pixels], grid_shape[1],
+                                   grid_shape[0], distance_upper_bound, row_start=row_start, row_end=row_end,
+                                   out=block_index)
+            if pixels.start:
+                block_index[block_index >= 0] += pixels.start
+        return index
+
+    def _gather_nearest(self, image_array, index, output_array, fill_value, block_rows=NEAREST_BLOCK_ROWS):
+        """Fill `output_array` with the swath pixels in `index` one block of grid rows at a time.
+
+        :param image_array: flattened swath data
+        :param index: (rows, cols) index from `_nearest_index`
+        """
+        for row_start in range(0, index.shape[0], block_rows):
+            block_index = numpy.array(index[row_start:row_start + block_rows])
+            no_neighbor = block_index < 0
+            block_index[no_neighbor] = 0
+            output_block = image_array.take(block_index)
+            output_block[no_neighbor] = fill_value
+            output_array[row_start:row_start + block_rows] = output_block
+
+    def create_remap_matrix(self, swath_def, grid_name, method="ewa", **kwargs):
+        """Create a `RemapMatrix` mapping the pixels of a swath definition to a grid.
+
+        The matrix can be saved and used by `remap_scene` (`remap_matrix` keyword) for future swaths with the same
+        geolocation.
+        """
+        grid_def = self.grid_manager.get_grid_definition(grid_name)
+        cols_fn, rows_fn = self.run_ll2cr(swath_def, grid_def, swath_usage=kwargs.get("swath_usage", SWATH_USAGE))
+        try:
+            swath_shape = (swath_def["swath_rows"], swath_def["swath_columns"])
+            cols_array, rows_array = self._ll2cr_arrays(cols_fn, rows_fn, swath_shape, swath_def["data_type"])
+            fingerprint = geolocation_fingerprint(swath_def.get_longitude_array(), swath_def.get_latitude_array(),
+                                                  swath_def.get("fill_value", numpy.nan))
+            if method == "ewa":
+                rows_per_scan, fornav_D = self._ewa_parameters(swath_def, grid_def, **kwargs)
+                fornav_d = kwargs.get("fornav_d", 1.0)
+                LOG.info("Computing EWA footprints for swath '%s' and grid '%s'", swath_def["swath_name"], grid_name)
+                footprints = fornav.compute_footprints(cols_array, rows_array, rows_per_scan,
+                                                       grid_def["width"], grid_def["height"],
+                                                       weight_delta_max=fornav_D, weight_distance_max=fornav_d)
+                return RemapMatrix.from_footprints(grid_def, swath_shape, fingerprint, footprints,
+                                                   weight_delta_max=fornav_D, weight_distance_max=fornav_d)
+            elif method == "nearest":
+                distance_upper_bound = self._distance_upper_bound(swath_def, grid_def, **kwargs)
+                LOG.info("Computing nearest neighbors for swath '%s' and grid '%s'", swath_def["swath_name"], grid_name)
+                good_mask = ~mask_helper(cols_array.ravel(), swath_def["fill_value"])
+                index = self._nearest_index(cols_array.ravel(), rows_array.ravel(), good_mask, grid_def,
+                                            distance_upper_bound, swath_columns=swath_shape[1])
+                return RemapMatrix.from_nearest_index(grid_def, swath_shape, fingerprint, index,
+                                                      distance_upper_bound=distance_upper_bound)
+            raise ValueError("Remap matrices can only be made for 'ewa' or 'nearest' remapping")
+        finally:
+            self._clear_ll2cr_cache()
+
+    def _load_remap_matrix(self, matrix_fn, swath_def, grid_def, method, tolerance=DEFAULT_TOLERANCE, **kwargs):
+        """Load a remap matrix file if it can be used for this swath definition, None otherwise."""
+        if not os.path.isfile(matrix_fn):
+            LOG.debug("Remap matrix file '%s' does not exist", matrix_fn)
+            return None
+        fingerprint = geolocation_fingerprint(swath_def.get_longitude_array(), swath_def.get_latitude_array(),
+                                              swath_def.get("fill_value", numpy.nan))
+        try:
+            matrix = RemapMatrix.load(matrix_fn, fingerprint=fingerprint, tolerance=tolerance)
+        except (IOError, OSError, ValueError, KeyError):
+            LOG.warning("Could not load remap matrix file '%s'", matrix_fn)
+            LOG.debug("Remap matrix exception: ", exc_info=True)
+            return None
+        if matrix is None:
+            LOG.info("Remap matrix '%s' does not match swath '%s'", matrix_fn, swath_def["swath_name"])
+            return None
+        if grid_def.is_static and any(matrix.grid_definition[k] != grid_def[k] for k in grid_def.required_kwargs):
+            LOG.debug("Remap matrix was made for a different '%s' grid", grid_def["grid_name"])
+            return None
+
+        if method == "ewa":
+            _, fornav_D = self._ewa_parameters(swath_def, matrix.grid_definition, **kwargs)
+            parameters = dict(weight_delta_max=fornav_D, weight_distance_max=kwargs.get("fornav_d", 1.0))
+        else:
+            parameters = dict(distance_upper_bound=self._distance_upper_bound(swath_def, matrix.grid_definition, **kwargs))
+        swath_shape = (swath_def["swath_rows"], swath_def["swath_columns"])
+        if not matrix.matches(method, swath_shape, fingerprint, tolerance=tolerance, **parameters):
+            LOG.info("Remap matrix '%s' does not match swath '%s'", matrix_fn, swath_def["swath_name"])
+            return None
+        return matrix
+
+    def _remap_scene_matrix(self, swath_scene, grid_def, method, remap_matrix=None,
+                            remap_matrix_tolerance=DEFAULT_TOLERANCE, share_dynamic_grids=True, **kwargs):
+        """Remap products whose geolocation matches a previously saved remap matrix.
+
+        :param remap_matrix: matrix filename pattern with optional '{swath_name}' and '{grid_name}' keys
+        :returns: (gridded scene of remapped products, swath scene of products that still need to be remapped,
+                   grid definition to use for the remaining products)
+        """
+        gridded_scene = GriddedScene()
+        remaining_scene = SwathScene()
+        grid_name = grid_def["grid_name"]
+        grid_coverage = kwargs.get("grid_coverage", GRID_COVERAGE)
+
+        product_groups = defaultdict(list)
+        for product_name, swath_product in swath_scene.items():
+            product_groups[swath_product["swath_definition"]["swath_name"]].append(product_name)
 
-    def _remap_scene_ewa(self, swath_scene, grid_def, share_dynamic_grids=True, **kwargs):
+        shared_grid_def = grid_def
+        for geo_id, product_names in product_groups.items():
+            swath_def = swath_scene[product_names[0]]["swath_definition"]
+            matrix_fn = remap_matrix.format(swath_name=geo_id, grid_name=grid_name)
+            matrix = self._load_remap_matrix(matrix_fn, swath_def, shared_grid_def if share_dynamic_grids else grid_def,
+                                             method, tolerance=remap_matrix_tolerance, **kwargs)
+            if matrix is None:
+                for product_name in product_names:
+                    remaining_scene[product_name] = swath_scene[product_name]
+                continue
+            LOG.info("Using remap matrix '%s' for swath '%s'", matrix_fn, geo_id)
+            if share_dynamic_grids:
+                # the rest of the products should use the same grid as the matrix
+                shared_grid_def = matrix.grid_definition
+
+            output_filepaths = self._gridded_filepaths(swath_scene, product_names, grid_name)
+            output_arrays, output_filepaths = self._create_gridded_arrays(
+                output_filepaths, matrix.grid_shape, [swath_scene[pn]["data_type"] for pn in product_names])
+            output_fill = self._output_fills(swath_scene, product_names)
+
+            try:
+                input_arrays = [swath_scene[pn].get_data_array() for pn in product_names]
+                input_fill = [swath_scene[pn]["fill_value"] for pn in product_names]
+                valid_list = matrix.remap(input_arrays, output_arrays, input_fill, output_fill,
+                                          maximum_weight_mode=self._maximum_weight_modes(swath_scene, product_names, **kwargs))
+                del input_arrays, output_arrays
+            except StandardError:
+                LOG.debug("Remapping exception: ", exc_info=True)
+                LOG.error("Remapping error")
+                self._safe_remove(*output_filepaths)
+                if self.exit_on_error:
+                    raise
+                continue
+
+            for product_name, output_fn, fill_value, valid_points in zip(product_names, output_filepaths, output_fill,
+                                                                         valid_list):
+                gridded_product = GriddedProduct()
+                gridded_product.from_swath_product(swath_scene[product_name])
+                gridded_product["grid_definition"] = matrix.grid_definition
+                gridded_product["fill_value"] = fill_value
+                gridded_product["grid_data"] = output_fn
+                grid_covered_ratio = valid_points / float(matrix.grid_shape[0] * matrix.grid_shape[1])
+                if grid_covered_ratio <= grid_coverage:
+                    LOG.warning("Remap matrix only found %f%% of the grid covered (need %f%%) for %s",
+                                grid_covered_ratio * 100, grid_coverage * 100, product_name)
+                    continue
+                gridded_scene[product_name] = gridded_product
+
+        return gridded_scene, remaining_scene, shared_grid_def if share_dynamic_grids else grid_def
+
+    def _remap_scene_ewa(self, swath_scene, grid_def, **kwargs):
+        return self._merge_gridded_scenes(self._iter_remap_scene_ewa(swath_scene, grid_def, **kwargs))
+
+    def _iter_remap_scene_ewa(self, swath_scene, grid_def, share_dynamic_grids=True, **kwargs):
         # TODO: Make methods more flexible than just a function call
-        gridded_scene = GriddedScene()
+        remapped_any = False
         grid_name = grid_def["grid_name"]
 
         # Group products together that shared the same geolocation
+        # Category and non-category products are resampled together, each with their own maximum weight mode
         product_groups = defaultdict(list)
         for product_name, swath_product in swath_scene.items():
             swath_def = swath_product["swath_definition"]
-            is_cat = swath_product.get('flag_meanings') is not None
             geo_id = swath_def["swath_name"]
-            product_groups[(is_cat, geo_id)].append(product_name)
+            product_groups[geo_id].append(product_name)
 
         # keep a copy of the original grid definition
         # if a shared grid definition isn't used then
         # we start from the original
         orig_grid_def = grid_def
-        for (is_cat, geo_id), product_names in product_groups.items():
+        for geo_id, product_names in product_groups.items():
             try:
                 LOG.debug("Running ll2cr on the geolocation data for the following products:\n\t%s", "\n\t".join(sorted(product_names)))
                 swath_def = swath_scene[product_names[0]]["swath_definition"]
@@ -276,37 +676,16 @@ class Remapper(object):
 
             # Run fornav for all of the products at once
             LOG.debug("Running fornav for the following products:\n\t%s", "\n\t".join(sorted(product_names)))
-            # XXX: May have to do something smarter if there are float products and integer products together (is_category property on SwathProduct?)
-            product_filepaths = list(swath_scene.get_data_filepaths(product_names))
-            fornav_filepaths = self._add_prefix("grid_%s_" % (grid_name,), *product_filepaths)
-            for fp in fornav_filepaths:
-                if os.path.isfile(fp):
-                    if not self.overwrite_existing:
-                        LOG.error("Intermediate remapping file already exists: %s" % (fp,))
-                        raise RuntimeError("Intermediate remapping file already exists: %s" % (fp,))
-                    else:
-                        LOG.warning("Intermediate remapping file already exists, will overwrite: %s", fp)
-
-            rows_per_scan = swath_def.get("rows_per_scan", 0)
-            if rows_per_scan < 2:
-                LOG.warning("Data has less than 2 rows per scan, this is not optimal for the EWA resampling algorithm. All rows will be used as one scan")
-                rows_per_scan = swath_def['swath_rows']
-            edge_res = swath_def.get("limb_resolution", None)
-            fornav_D = kwargs.get("fornav_D", None)
-            if fornav_D is None:
-                if edge_res is not None:
-                    if grid_def.is_latlong:
-                        fornav_D = (edge_res / 2) / grid_def.cell_width_meters
-                    else:
-                        fornav_D = (edge_res / 2) / grid_def["cell_width"]
-                    LOG.debug("Fornav 'D' option dynamically set to %f", fornav_D)
-                else:
-                    fornav_D = 10.0
+            product_filepaths = [swath_scene[pn]["swath_data"] for pn in product_names]
+            fornav_filepaths = self._gridded_filepaths(swath_scene, product_names, grid_name)
+            # Each product can have its own fill value and data type
+            input_dtype = [swath_scene[pn]["data_type"] for pn in product_names]
+            fornav_arrays, fornav_filepaths = self._create_gridded_arrays(fornav_filepaths,
+                                                                          (grid_def["height"], grid_def["width"]),
+                                                                          input_dtype)
 
-            mwm = kwargs.get('maximum_weight_mode', False)
-            if is_cat and not mwm:
-                LOG.debug("Turning on maximum weight mode in EWA resampling for category products")
-                mwm = True
+            rows_per_scan, fornav_D = self._ewa_parameters(swath_def, grid_def, **kwargs)
+            mwm = self._maximum_weight_modes(swath_scene, product_names, **kwargs)
 
             try:
                 # fornav.ms2gt_fornav(
@@ -328,29 +707,60 @@ class Remapper(object):
                 #     maximum_weight_mode=kwargs.get("maximum_weight_mode", None),
                 #     start_scan=(0, 0),
                 # )
-                cols_array = numpy.memmap(cols_fn, dtype=numpy.float32, mode='r', shape=(swath_def["swath_rows"], swath_def["swath_columns"]))
-                rows_array = numpy.memmap(rows_fn, dtype=numpy.float32, mode='r', shape=(swath_def["swath_rows"], swath_def["swath_columns"]))
-                # Assumed that all share the same fill value and data type
-                input_dtype = [swath_scene[pn]["data_type"] for pn in product_names]
+                cols_array, rows_array = self._ll2cr_arrays(cols_fn, rows_fn,
+                                                            (swath_def["swath_rows"], swath_def["swath_columns"]),
+                                                            numpy.float32)
                 input_fill = [swath_scene[pn]["fill_value"] for pn in product_names]
-                LOG.debug("Running fornav with D={} and d={}".format(fornav_D, kwargs.get('fornav_d', 1.0)))
-                valid_list = fornav.fornav(cols_array,
-                                           rows_array,
-                                           rows_per_scan,
-                                           product_filepaths,
-                                           input_dtype=input_dtype,
-                                           input_fill=input_fill,
-                                           output_arrays=fornav_filepaths,
-                                           grid_cols=grid_def["width"],
-                                           grid_rows=grid_def["height"],
-                                           weight_delta_max=fornav_D,
-                                           weight_distance_max=kwargs.get("fornav_d", 1.0),
-                                           maximum_weight_mode=mwm,
-                                           use_group_size=True
-                                           )
+                output_fill = self._output_fills(swath_scene, product_names)
+                bounds = self.get_scan_bounds(cols_array, rows_array, rows_per_scan, swath_def, grid_def)
+                scan_mask = fornav.scan_grid_mask(bounds, grid_def["width"], grid_def["height"], fornav_D)
+                culled_scans = scan_mask.size - numpy.count_nonzero(scan_mask)
+                LOG.info("Skipping %d of %d scans that do not overlap grid %s", culled_scans, scan_mask.size, grid_name)
+                with metrics.stage("fornav", swath_name=geo_id, grid_name=grid_name,
+                                   product_names=product_names):
+                    if kwargs.get("accumulate_dir"):
+                        valid_list = self._accumulate_ewa(swath_scene, product_names, grid_def, cols_array, rows_array,
+                                                          rows_per_scan, fornav_arrays, kwargs["accumulate_dir"],
+                                                          output_fill=output_fill, scan_mask=scan_mask,
+                                                          weight_delta_max=fornav_D,
+                                                          weight_distance_max=kwargs.get("fornav_d", 1.0),
+                                                          maximum_weight_mode=mwm,
+                                                          num_threads=kwargs.get("fornav_threads", 1))
+                    else:
+                        footprints = None
+                        if kwargs.get("fornav_footprint_cache"):
+                            footprint_cache = fornav.FootprintCache(kwargs["fornav_footprint_cache"])
+                            footprints = footprint_cache.get(swath_def["swath_name"], grid_name, cols_array, rows_array,
+                                                             rows_per_scan, grid_def["width"], grid_def["height"],
+                                                             weight_delta_max=fornav_D,
+                                                             weight_distance_max=kwargs.get("fornav_d", 1.0),
+                                                             scan_mask=scan_mask)
+                        LOG.debug("Running fornav with D={} and d={}".format(fornav_D, kwargs.get('fornav_d', 1.0)))
+                        valid_list = fornav.fornav(cols_array,
+                                                   rows_array,
+                                                   rows_per_scan,
+                                                   product_filepaths,
+                                                   input_dtype=input_dtype,
+                                                   input_fill=input_fill,
+                                                   output_fill=output_fill,
+                                                   output_arrays=fornav_arrays,
+                                                   grid_cols=grid_def["width"],
+                                                   grid_rows=grid_def["height"],
+                                                   weight_delta_max=fornav_D,
+                                                   weight_distance_max=kwargs.get("fornav_d", 1.0),
+                                                   maximum_weight_mode=mwm,
+                                                   use_group_size=True,
+                                                   num_threads=kwargs.get("fornav_threads", 1),
+                                                   tile_size=kwargs.get("fornav_tile_size", None),
+                                                   bounds=bounds,
+                                                   scan_mask=scan_mask,
+                                                   footprints=footprints,
+                                                   )
+                del fornav_arrays
             except StandardError:
                 LOG.debug("Remapping exception: ", exc_info=True)
                 LOG.error("Remapping error")
+                del fornav_arrays
                 self._safe_remove(*fornav_filepaths)
                 if self.exit_on_error:
                     self._clear_ll2cr_cache()
@@ -358,13 +768,18 @@ class Remapper(object):
                 continue
 
             # Give the gridded product ownership of the remapped data
-            for product_name, fornav_fp, valid_points in zip(product_names, fornav_filepaths, valid_list):
+            group_scene = GriddedScene()
+            for product_name, fornav_fp, fill_value, valid_points in zip(product_names, fornav_filepaths, output_fill,
+                                                                         valid_list):
                 swath_product = swath_scene[product_name]
                 gridded_product = GriddedProduct()
                 gridded_product.from_swath_product(swath_product)
                 gridded_product["grid_definition"] = grid_def
-                gridded_product["fill_value"] = numpy.nan
+                gridded_product["fill_value"] = fill_value
                 gridded_product["grid_data"] = fornav_fp
+                if kwargs.get("accumulate_dir"):
+                    # the product covers every granule accumulated so far
+                    self._set_accumulated_times(gridded_product, kwargs["accumulate_dir"], grid_name, product_name)
 
                 grid_coverage = kwargs.get("grid_coverage", GRID_COVERAGE)
                 grid_covered_ratio = valid_points / float(grid_def["width"] * grid_def["height"])
@@ -374,19 +789,25 @@ class Remapper(object):
                     LOG.warning(msg)
                     continue
                 LOG.debug("EWA resampling found %f%% of the grid covered for %s" % (grid_covered_ratio * 100, product_name))
-                gridded_scene[product_name] = gridded_product
+                group_scene[product_name] = gridded_product
+
+            if group_scene:
+                remapped_any = True
+                yield group_scene
 
         self._clear_ll2cr_cache()
 
-        if not gridded_scene:
+        if not remapped_any:
             self._safe_remove(*fornav_filepaths)
             raise RuntimeError("EWA resampling could not remap any of the data to grid '%s'" % (grid_name,))
 
-        return gridded_scene
+    def _remap_scene_nearest(self, swath_scene, grid_def, **kwargs):
+        return self._merge_gridded_scenes(self._iter_remap_scene_nearest(swath_scene, grid_def, **kwargs))
 
-    def _remap_scene_nearest(self, swath_scene, grid_def, share_dynamic_grids=True, share_remap_mask=True, **kwargs):
+    def _iter_remap_scene_nearest(self, swath_scene, grid_def, share_dynamic_grids=True, share_remap_mask=True,
+                                  **kwargs):
         # TODO: Make methods more flexible than just a function call
-        gridded_scene = GriddedScene()
+        remapped_any = False
         grid_name = grid_def["grid_name"]
 
         # Group products together that shared the same geolocation
@@ -417,59 +838,52 @@ class Remapper(object):
                 continue
 
             LOG.debug("Running nearest neighbor for the following products:\n\t%s", "\n\t".join(product_names))
-            edge_res = swath_def.get("limb_resolution", None)
             if kwargs.get("distance_upper_bound", None) is None:
-                if edge_res is not None:
-                    if grid_def.is_latlong:
-                        distance_upper_bound = (edge_res / 2) / grid_def.cell_width_meters
-                    else:
-                        distance_upper_bound = (edge_res / 2) / grid_def["cell_width"]
-                    LOG.debug("Distance upper bound dynamically set to %f", distance_upper_bound)
-                else:
-                    distance_upper_bound = 3.0
-                kwargs["distance_upper_bound"] = distance_upper_bound
+                kwargs["distance_upper_bound"] = self._distance_upper_bound(swath_def, grid_def, **kwargs)
 
+            # the index is shared by every product in the group, keep it on disk unless arrays can be kept in memory
+            index_fn = "nearest_index_%s_%s.dat" % (grid_name, geo_id)
+            # what the index was created as, an existing file that can't be overwritten is never removed
+            index_data = None
             try:
-                grid_x, grid_y = numpy.mgrid[:grid_def["height"], :grid_def["width"]]
                 # we need flattened versions of these
                 shape = (swath_def["swath_rows"] * swath_def["swath_columns"],)
-                cols_array = numpy.memmap(cols_fn, shape=shape, dtype=swath_def["data_type"])
-                rows_array = numpy.memmap(rows_fn, shape=shape, dtype=swath_def["data_type"])
+                cols_array, rows_array = self._ll2cr_arrays(cols_fn, rows_fn, shape, swath_def["data_type"])
                 good_mask = ~mask_helper(cols_array, swath_def["fill_value"])
                 if share_remap_mask:
                     for product_name in product_names:
-                        LOG.debug("Combining data masks before building KDTree for nearest neighbor: %s", product_name)
+                        LOG.debug("Combining data masks before nearest neighbor search: %s", product_name)
                         good_mask &= ~swath_scene[product_name].get_data_mask().ravel()
-                x = _ndim_coords_from_arrays((cols_array[good_mask], rows_array[good_mask]))
-                xi = _ndim_coords_from_arrays((grid_y, grid_x))
-                dist, i = cKDTree(x).query(xi, distance_upper_bound=kwargs["distance_upper_bound"])
+                index, index_data = intermediate_arrays.create(index_fn, (grid_def["height"], grid_def["width"]),
+                                                               numpy.int32, overwrite_existing=self.overwrite_existing,
+                                                               description="Intermediate remapping file")
+                with metrics.stage("nearest_index", swath_name=geo_id, grid_name=grid_name):
+                    self._nearest_index(cols_array, rows_array, good_mask, grid_def, kwargs["distance_upper_bound"],
+                                        index=index, swath_columns=swath_def["swath_columns"])
             except StandardError:
                 LOG.debug("Remapping exception: ", exc_info=True)
                 LOG.error("Remapping error")
+                self._safe_remove(index_data)
                 if self.exit_on_error:
                     self._clear_ll2cr_cache()
                     raise
                 continue
 
-            product_filepaths = swath_scene.get_data_filepaths(product_names)
-            output_filepaths = self._add_prefix("grid_%s_" % (grid_name,), *product_filepaths)
+            output_filepaths = self._gridded_filepaths(swath_scene, product_names, grid_name)
 
             # Prepare the products
             fill_value = numpy.nan
+            group_scene = GriddedScene()
             for product_name, output_fn in izip(product_names, output_filepaths):
                 LOG.debug("Running nearest neighbor on '%s' with search distance %f", product_name, kwargs["distance_upper_bound"])
-                if os.path.isfile(output_fn):
-                    if not self.overwrite_existing:
-                        LOG.error("Intermediate remapping file already exists: %s" % (output_fn,))
-                        raise RuntimeError("Intermediate remapping file already exists: %s" % (output_fn,))
-                    else:
-                        LOG.warning("Intermediate remapping file already exists, will overwrite: %s", output_fn)
-
+                output_array, output_fn = intermediate_arrays.create(output_fn, index.shape,
+                                                                     swath_scene[product_name]["data_type"],
+                                                                     overwrite_existing=self.overwrite_existing,
+                                                                     description="Intermediate remapping file")
                 try:
                     image_array = swath_scene[product_name].get_data_array().ravel()
-                    values = numpy.append(image_array[good_mask], image_array.dtype.type(fill_value))
-                    output_array = values[i]
-                    output_array.tofile(output_fn)
+                    self._gather_nearest(image_array, index, output_array, fill_value)
+                    del output_array
 
                     # Give the gridded product ownership of the remapped data
                     swath_product = swath_scene[product_name]
@@ -489,30 +903,36 @@ class Remapper(object):
                         continue
                     LOG.debug("Nearest neighbor resampling found %f%% of the grid covered for %s" % (grid_covered_ratio * 100, product_name))
 
-                    gridded_scene[product_name] = gridded_product
-
-                    # hopefully force garbage collection
-                    del output_array
+                    group_scene[product_name] = gridded_product
                 except StandardError:
                     LOG.debug("Remapping exception: ", exc_info=True)
                     LOG.error("Remapping error")
                     self._safe_remove(output_fn)
                     if self.exit_on_error:
+                        del index
+                        self._safe_remove(index_data)
                         self._clear_ll2cr_cache()
                         raise
                     continue
 
                 LOG.debug("Done running nearest neighbor on '%s'", product_name)
 
+            del index
+            self._safe_remove(index_data)
+
+            if group_scene:
+                remapped_any = True
+                yield group_scene
+
         # Remove ll2cr files now that we are done with them
         self._clear_ll2cr_cache()
 
-        if not gridded_scene:
+        if not remapped_any:
             raise RuntimeError("Nearest neighbor resampling could not remap any of the data to grid '%s'" % (grid_name,))
 
-        return gridded_scene
-
     def _remap_scene_sensor(self, swath_scene, grid_def, **kwargs):
+        # SatPy is only needed for SatPy scenes so it isn't imported when other methods are used
+        from satpy import Scene
         if not isinstance(swath_scene, Scene):
             raise ValueError("'sensor' resampling only supports SatPy scenes")
 
@@ -537,6 +957,12 @@ def add_remap_argument_groups(parser):
     group = parser.add_argument_group(title="Remapping Initialization")
     group.add_argument('--grid-configs', dest='grid_configs', nargs="+", default=tuple(),
                        help="Specify additional grid configuration files ('grids.conf' for built-ins)")
+    group.add_argument('--ll2cr-cache', dest='ll2cr_cache', default=None,
+                       help="Directory to store ll2cr results in so they can be reused by later runs "
+                            "(default $P2G_CACHE_DIR if set)")
+    group.add_argument('--ll2cr-cache-size', dest='ll2cr_cache_size', default=None, type=float,
+                       help="Maximum size of the ll2cr cache in megabytes, least recently used results are removed "
+                            "first (default %g or $P2G_CACHE_SIZE)" % (LL2CR_CACHE_SIZE,))
     group = parser.add_argument_group(title="Remapping")
     group.add_argument('-g', '--grids', dest='forced_grids', nargs="+", default=SUPPRESS,
                        help="Force remapping to only some grids, defaults to 'wgs84_fit', use 'all' for determination")
@@ -552,6 +978,21 @@ def add_remap_argument_groups(parser):
                        help="Specify the -d option for fornav")
     group.add_argument('--maximum-weight-mode', dest="maximum_weight_mode", default=SUPPRESS, action="store_true",
                        help="Use maximum weight mode in fornav (-m)")
+    group.add_argument('--fornav-threads', dest="fornav_threads", default=SUPPRESS, type=int,
+                       help="Number of threads to split swath scans between in fornav (default 1)")
+    group.add_argument('--fornav-tile-size', dest="fornav_tile_size", default=SUPPRESS, type=int,
+                       help="Resample the grid in square tiles of this many pixels to limit memory usage in fornav")
+    group.add_argument('--fornav-footprint-cache', dest="fornav_footprint_cache", default=SUPPRESS,
+                       help="Directory to store EWA pixel footprints in so they can be reused by later products and runs")
+    group.add_argument('--accumulate', dest="accumulate_dir", default=SUPPRESS,
+                       help="Add each run's granules to EWA grids kept in this directory and write the pass "
+                            "accumulated so far (static grids only, use a new directory for each pass)")
+    group.add_argument('--remap-matrix', dest="remap_matrix", default=SUPPRESS,
+                       help="Reuse remap matrix files from 'p2g_remap_matrix.sh' when the geolocation matches "
+                            "(filename pattern, may include '{swath_name}' and '{grid_name}')")
+    group.add_argument('--remap-matrix-tolerance', dest="remap_matrix_tolerance", default=SUPPRESS, type=float,
+                       help="Maximum longitude/latitude difference in degrees for a remap matrix to be used "
+                            "(default %g)" % (DEFAULT_TOLERANCE,))
     group.add_argument("--distance-upper-bound", dest="distance_upper_bound", type=float, default=SUPPRESS,
                        help="Nearest neighbor search distance upper bound in units of grid cell")
     group.add_argument("--no-share-mask", dest="share_remap_mask", action="store_false",
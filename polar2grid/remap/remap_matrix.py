@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Save and reuse the mapping of swath pixels to grid cells.
+
+Direct broadcast stations see nearly the same geometry on repeat passes. Instead of running ll2cr and computing the
+EWA footprints or nearest neighbor search for every pass, the mapping from swath pixels to grid cells can be saved
+as a sparse "remap matrix" with `p2g_remap_matrix.sh` and reused by the `Remapper` with the ``--remap-matrix``
+option. A subsample of the swath's longitude and latitude is stored with the matrix so it is only used when the
+geolocation matches within a tolerance (in degrees). Otherwise the normal remapping is done.
+
+Matrix files are compressed numpy ``.npz`` files containing:
+
+    - info: JSON string of the remapping method, grid definition, and parameters used
+    - fingerprint: (2, rows, cols) subsample of longitude and latitude (fill values as NaN)
+    - pixel_ptr, cell_offsets, cell_weights: EWA footprints (see `polar2grid.remap.fornav.compute_footprints`)
+    - index: for nearest neighbor, swath pixel index for each grid cell (-1 for cells without a neighbor)
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import json
+import logging
+import numpy
+import os
+
+from polar2grid.core.containers import GridDefinition
+from polar2grid.remap import _fornav
+from polar2grid.remap.fornav import EWAFootprints
+
+LOG = logging.getLogger(__name__)
+
+MATRIX_VERSION = 1
+DEFAULT_TOLERANCE = 1e-3
+FINGERPRINT_STRIDE = 16
+
+
+def geolocation_fingerprint(lon_arr, lat_arr, fill_value=numpy.nan, stride=FINGERPRINT_STRIDE):
+    """Subsample longitude and latitude arrays to compare the geolocation of two swaths.
+
+    :returns: (2, rows, cols) float64 array of longitude and latitude with fill values replaced by NaN
+    """
+    fingerprint = numpy.array([lon_arr[::stride, ::stride], lat_arr[::stride, ::stride]], dtype=numpy.float64)
+    if not numpy.isnan(fill_value):
+        fingerprint[fingerprint == fill_value] = numpy.nan
+    return fingerprint
+
+
+def fingerprint_matches(fingerprint, other, tolerance=DEFAULT_TOLERANCE):
+    """Check if two geolocation fingerprints are the same within `tolerance` degrees."""
+    if fingerprint.shape != other.shape:
+        return False
+    invalid = numpy.isnan(fingerprint)
+    if not numpy.array_equal(invalid, numpy.isnan(other)):
+        return False
+    valid = ~invalid
+    # longitude differences wrap around the antimeridian
+    lon_diff = numpy.abs((fingerprint[0][valid[0]] - other[0][valid[0]] + 180.0) % 360.0 - 180.0)
+    lat_diff = numpy.abs(fingerprint[1][valid[1]] - other[1][valid[1]])
+    return not (numpy.any(lon_diff > tolerance) or numpy.any(lat_diff > tolerance))
+
+
+class RemapMatrix(object):
+    """Mapping of every swath pixel to the grid cells it contributes to for one swath and grid.
+
+    :param method: 'ewa' or 'nearest'
+    :param grid_definition: `GridDefinition` the matrix was created for (dynamic grid parameters filled in)
+    :param swath_shape: (rows, cols) of the swath
+    :param fingerprint: geolocation fingerprint (see `geolocation_fingerprint`)
+    :param arrays: dictionary of the arrays making up the matrix
+    :param parameters: dictionary of the remapping parameters used to create the matrix
+    """
+    def __init__(self, method, grid_definition, swath_shape, fingerprint, arrays, parameters=None):
+        if method not in ("ewa", "nearest"):
+            raise ValueError("Remap matrices can only be made for 'ewa' or 'nearest' remapping")
+        self.method = method
+        self.grid_definition = grid_definition
+        self.swath_shape = tuple(swath_shape)
+        self.fingerprint = fingerprint
+        self.arrays = arrays
+        self.parameters = parameters or {}
+
+    @property
+    def grid_shape(self):
+        return self.grid_definition["height"], self.grid_definition["width"]
+
+    @classmethod
+    def from_footprints(cls, grid_definition, swath_shape, fingerprint, footprints, **parameters):
+        return cls("ewa", grid_definition, swath_shape, fingerprint, footprints._asdict(), parameters)
+
+    @classmethod
+    def from_nearest_index(cls, grid_definition, swath_shape, fingerprint, index, **parameters):
+        index = numpy.asarray(index, dtype=numpy.int32)
+        return cls("nearest", grid_definition, swath_shape, fingerprint, {"index": index}, parameters)
+
+    @classmethod
+    def load(cls, filename, fingerprint=None, tolerance=DEFAULT_TOLERANCE):
+        """Load a matrix file.
+
+        :param fingerprint: only load the matrix if it was made for this geolocation fingerprint
+        :returns: `RemapMatrix` or None if `fingerprint` does not match the matrix's fingerprint
+        """
+        npz = numpy.load(filename)
+        try:
+            info = json.loads(str(npz["info"]))
+            if info.get("version") != MATRIX_VERSION:
+                raise ValueError("Unsupported remap matrix version: %r" % (info.get("version"),))
+            matrix_fingerprint = npz["fingerprint"]
+            # don't decompress the matrix arrays if they can't be used
+            if fingerprint is not None and not fingerprint_matches(matrix_fingerprint, fingerprint, tolerance):
+                LOG.debug("Remap matrix geolocation does not match the swath's geolocation")
+                return None
+            arrays = dict((k, npz[k]) for k in npz.files if k not in ("info", "fingerprint"))
+            return cls(info["method"], GridDefinition(**info["grid_definition"]), info["swath_shape"],
+                       matrix_fingerprint, arrays, info["parameters"])
+        finally:
+            npz.close()
+
+    def save(self, filename):
+        info = {
+            "version": MATRIX_VERSION,
+            "method": self.method,
+            "grid_definition": dict(self.grid_definition),
+            "swath_shape": list(self.swath_shape),
+            "parameters": self.parameters,
+        }
+        LOG.info("Saving remap matrix to '%s'", filename)
+        with open(filename, "wb") as matrix_file:
+            numpy.savez_compressed(matrix_file, info=numpy.array(json.dumps(info)), fingerprint=self.fingerprint,
+                                   **self.arrays)
+
+    def matches(self, method, swath_shape, fingerprint, tolerance=DEFAULT_TOLERANCE, **parameters):
+        """Check if this matrix can be used to remap a swath.
+
+        :param parameters: remapping parameters (ex. weight_delta_max) that must be the same as when the matrix was made
+        """
+        if method != self.method:
+            LOG.debug("Remap matrix was made for '%s' remapping not '%s'", self.method, method)
+            return False
+        if tuple(swath_shape) != self.swath_shape:
+            LOG.debug("Remap matrix was made for a swath of shape %r not %r", self.swath_shape, tuple(swath_shape))
+            return False
+        for key, value in parameters.items():
+            if key not in self.parameters or not numpy.isclose(self.parameters[key], value):
+                LOG.debug("Remap matrix was made with %s=%r not %r", key, self.parameters.get(key), value)
+                return False
+        if not fingerprint_matches(self.fingerprint, fingerprint, tolerance):
+            LOG.debug("Remap matrix geolocation does not match the swath's geolocation")
+            return False
+        return True
+
+    def remap(self, input_arrays, output_arrays, input_fill, output_fill, maximum_weight_mode=False):
+        """Remap swath arrays to the grid using the stored matrix.
+
+        :param input_fill: fill value for all input arrays or a list with one fill value per input array
+        :param output_fill: fill value for all output arrays or a list with one fill value per output array
+        :param maximum_weight_mode: EWA maximum weight mode for all arrays or a list with one per input array
+        :returns: list of the number of valid grid pixels for each output array
+        """
+        input_arrays = tuple(input_arrays)
+        output_arrays = tuple(output_arrays)
+        if self.method == "ewa":
+            footprints = EWAFootprints(**self.arrays)
+            return _fornav.fornav_footprints_wrapper(footprints.pixel_ptr, footprints.cell_offsets,
+                                                     footprints.cell_weights, input_arrays, output_arrays,
+                                                     input_fill, output_fill,
+                                                     weight_min=self.parameters.get("weight_min", 0.01),
+                                                     maximum_weight_mode=maximum_weight_mode)
+
+        index = self.arrays["index"].reshape(self.grid_shape)
+        no_neighbor = index < 0
+        input_fills = input_fill if isinstance(input_fill, (list, tuple)) else [input_fill] * len(input_arrays)
+        output_fills = output_fill if isinstance(output_fill, (list, tuple)) else [output_fill] * len(input_arrays)
+        valid_list = []
+        for input_array, output_array, in_fill, out_fill in zip(input_arrays, output_arrays, input_fills, output_fills):
+            output_array[:] = input_array.ravel().take(numpy.where(no_neighbor, 0, index))
+            invalid_mask = no_neighbor | (numpy.isnan(output_array) if numpy.isnan(in_fill) else output_array == in_fill)
+            output_array[invalid_mask] = out_fill
+            valid_list.append(output_array.size - numpy.count_nonzero(invalid_mask))
+        return valid_list
+
+
+def main():
+    from polar2grid.core.script_utils import create_basic_parser, create_exc_handler, setup_logging
+    from polar2grid.core.containers import SwathScene
+    from polar2grid.remap import Remapper, add_remap_argument_groups
+    parser = create_basic_parser(description="Save the swath to grid mapping of a SwathScene's geolocation so it "
+                                             "can be reused by future passes with '--remap-matrix'")
+    subgroup_titles = add_remap_argument_groups(parser)
+    parser.add_argument("--scene", required=True,
+                        help="JSON SwathScene filename whose geolocation should be used")
+    parser.add_argument('-o', dest="output_filename", default="remap_matrix_{swath_name}_{grid_name}.npz",
+                        help="Output filename pattern for matrix files (default 'remap_matrix_{swath_name}_{grid_name}.npz')")
+    global_keywords = ("keep_intermediate", "overwrite_existing", "exit_on_error")
+    args = parser.parse_args(subgroup_titles=subgroup_titles, global_keywords=global_keywords)
+
+    levels = [logging.ERROR, logging.WARN, logging.INFO, logging.DEBUG]
+    setup_logging(console_level=levels[min(3, args.verbosity)], log_filename=args.log_fn)
+    sys.excepthook = create_exc_handler(LOG.name)
+    LOG.debug("Starting script with arguments: %s", " ".join(sys.argv))
+
+    scene = SwathScene.load(args.scene)
+    remapper = Remapper(**args.subgroup_args["Remapping Initialization"])
+    remap_kwargs = args.subgroup_args["Remapping"]
+    method = remap_kwargs.pop("remap_method", "ewa")
+    # every product sharing a swath definition shares the matrix
+    swath_defs = dict((p["swath_definition"]["swath_name"], p["swath_definition"]) for p in scene.values())
+    for grid_name in remap_kwargs.pop("forced_grids", ["wgs84_fit"]):
+        for swath_name, swath_def in swath_defs.items():
+            fn = args.output_filename.format(swath_name=swath_name, grid_name=grid_name)
+            if os.path.isfile(fn) and not args.overwrite_existing:
+                LOG.error("Remap matrix file '%s' already exists, will not overwrite." % (fn,))
+                raise RuntimeError("Remap matrix file '%s' already exists, will not overwrite." % (fn,))
+            matrix = remapper.create_remap_matrix(swath_def, grid_name, method=method, **remap_kwargs)
+            matrix.save(fn)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
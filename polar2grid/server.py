@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Long running Polar2Grid server that runs glue jobs without starting a new python process for each one.
+
+Every ``polar2grid.sh`` call has to import satpy, GDAL, h5py, etc., find the frontends and backends from their
+entry points, and read the grid, rescaling, and compositor configuration files before it can do any work. The
+server does the imports and entry point lookups once and then forks a pool of worker processes. Each worker keeps
+the `GridManager`, `CompositorManager`, compositor, and backend (and its `Rescaler`) objects it creates for a job
+and reuses them for later jobs with the same configuration.
+
+Start the server with ``p2g_server.sh serve`` and submit jobs with the same arguments you would give
+``polar2grid.sh``::
+
+    p2g_server.sh serve --socket /tmp/p2g.sock --workers 4 &
+    p2g_server.sh submit --socket /tmp/p2g.sock -- viirs_sdr gtiff -f /data/pass1/
+
+Jobs are sent over a local Unix socket as a JSON line with the glue arguments and the directory to run them in.
+The server replies, once the job is done, with a JSON line containing the same status value `polar2grid.glue.main`
+would have returned. ``submit`` exits with that status so scripts can check it like they would for
+``polar2grid.sh``.
+
+Jobs already run in the server's worker processes so the ``--grid-workers`` option is not allowed in server jobs.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import json
+import logging
+import os
+import signal
+import socket
+import SocketServer
+
+from polar2grid import glue
+from polar2grid.core.containers import intermediate_arrays
+from polar2grid.core.script_utils import reset_logging
+
+LOG = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = os.environ.get("P2G_SERVER_SOCKET", "/tmp/polar2grid.sock")
+
+# objects kept between jobs in each worker process (see `polar2grid.glue.main`)
+_worker_cache = {}
+# process wide settings a job may change that should be put back before the next job
+_worker_defaults = {}
+
+
+def warm_up(cache):
+    """Do the slow work that every job needs before the worker processes are forked so they share it."""
+    frontends = glue._cached(cache, "frontends", glue.available_frontends)
+    backends = glue._cached(cache, "backends", glue.available_backends)
+    # importing the frontend and backend modules imports satpy, GDAL, h5py, etc.
+    for name in frontends:
+        try:
+            glue.get_frontend_class(frontends, name)
+            glue.get_frontend_argument_func(frontends, name)
+        except StandardError:
+            LOG.debug("Could not load frontend '%s', jobs using it will fail", name, exc_info=True)
+    for name in backends:
+        try:
+            glue.get_backend_class(backends, name)
+            glue.get_backend_argument_func(backends, name)
+        except StandardError:
+            LOG.debug("Could not load backend '%s', jobs using it will fail", name, exc_info=True)
+
+
+def _init_worker():
+    # the server handles Ctrl+C, workers are terminated by it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # each job sets up its own logging
+    reset_logging()
+    _worker_defaults["memory_budget"] = intermediate_arrays.memory_budget
+    _worker_defaults["shared_memory"] = intermediate_arrays.shared_memory
+
+
+def run_job(job):
+    """Run one glue job in a worker process.
+
+    :param job: dictionary with the glue arguments (`argv`) and the directory to run them in (`cwd`)
+    :returns: glue status value
+    """
+    orig_cwd = os.getcwd()
+    orig_excepthook = sys.excepthook
+    intermediate_arrays.memory_budget = _worker_defaults.get("memory_budget", intermediate_arrays.memory_budget)
+    intermediate_arrays.shared_memory = _worker_defaults.get("shared_memory", intermediate_arrays.shared_memory)
+    try:
+        os.chdir(job.get("cwd", orig_cwd))
+        return glue.main(job["argv"], cache=_worker_cache)
+    except SystemExit as e:
+        # argument parsing errors, --help, etc.
+        return e.code if isinstance(e.code, int) else glue.STATUS_UNKNOWN_FAIL
+    except BaseException:
+        # same as an uncaught exception in polar2grid.sh
+        logging.getLogger("polar2grid.glue").error("Unexpected error. See log file for details.")
+        logging.getLogger("traceback").error("Unexpected error exception: ", exc_info=True)
+        return glue.STATUS_UNKNOWN_FAIL
+    finally:
+        # workers are terminated when the server stops so their atexit hooks never run
+        intermediate_arrays.remove_shared()
+        reset_logging()
+        sys.excepthook = orig_excepthook
+        os.chdir(orig_cwd)
+
+
+class JobHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+        try:
+            job = json.loads(self.rfile.readline())
+            if not isinstance(job.get("argv"), list):
+                raise ValueError("Job is missing its list of arguments ('argv')")
+            if any(arg.startswith("--grid-workers") for arg in job["argv"]):
+                # job workers are daemonic processes which can't start their own worker processes
+                raise ValueError("'--grid-workers' is not supported in server jobs, use more server '--workers'")
+        except ValueError as e:
+            LOG.error("Invalid job request: %s", e)
+            self.wfile.write(json.dumps({"status": glue.STATUS_UNKNOWN_FAIL, "error": str(e)}) + "\n")
+            return
+
+        LOG.info("Running job in '%s': %s", job.get("cwd"), " ".join(job["argv"]))
+        status = self.server.pool.apply(run_job, (job,))
+        LOG.info("Job finished with status %d: %s", status, " ".join(job["argv"]))
+        self.wfile.write(json.dumps({"status": status}) + "\n")
+
+
+class P2GServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    """Accept glue jobs on a Unix socket and run them on a pool of worker processes.
+
+    Each connection is handled by its own thread so up to `num_workers` jobs run at the same time and the rest wait
+    for a free worker.
+    """
+    daemon_threads = True
+
+    def __init__(self, socket_path, num_workers=1):
+        from multiprocessing import Pool
+        if os.path.exists(socket_path):
+            # a server that is still running would answer
+            try:
+                socket.socket(socket.AF_UNIX, socket.SOCK_STREAM).connect(socket_path)
+            except socket.error:
+                LOG.debug("Removing stale server socket '%s'", socket_path)
+                os.remove(socket_path)
+            else:
+                raise RuntimeError("A server is already running on socket '%s'" % (socket_path,))
+
+        LOG.info("Loading frontends and backends...")
+        warm_up(_worker_cache)
+        self.pool = Pool(num_workers, initializer=_init_worker)
+        SocketServer.UnixStreamServer.__init__(self, socket_path, JobHandler)
+        self.socket_path = socket_path
+
+    def server_close(self):
+        SocketServer.UnixStreamServer.server_close(self)
+        self.pool.terminate()
+        self.pool.join()
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+
+def submit(argv, socket_path=DEFAULT_SOCKET, cwd=None):
+    """Run a glue job on a running server and wait for it to finish.
+
+    :param argv: `polar2grid.glue.main` arguments
+    :param cwd: directory to run the job in (default current directory)
+    :returns: glue status value
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(socket_path)
+    try:
+        sock_file = sock.makefile("rw")
+        sock_file.write(json.dumps({"argv": list(argv), "cwd": cwd or os.getcwd()}) + "\n")
+        sock_file.flush()
+        reply = sock_file.readline()
+    finally:
+        sock.close()
+    if not reply:
+        raise RuntimeError("Server closed the connection before the job finished")
+    return json.loads(reply)["status"]
+
+
+def main(argv=sys.argv[1:]):
+    from polar2grid.core.script_utils import create_basic_parser, create_exc_handler, setup_logging
+    parser = create_basic_parser(description="Run Polar2Grid glue jobs in a long running server")
+    parser.add_argument("command", choices=["serve", "submit"],
+                        help="'serve' to start the server, 'submit' to run a job on a running server")
+    parser.add_argument("--socket", dest="socket_path", default=DEFAULT_SOCKET,
+                        help="Unix socket the server listens on (default '%s' or $P2G_SERVER_SOCKET)" % (DEFAULT_SOCKET,))
+    parser.add_argument("--workers", dest="num_workers", type=int, default=1,
+                        help="Number of jobs to run at the same time (default 1)")
+    parser.add_argument("job_args", nargs="*",
+                        help="Arguments for 'polar2grid.sh' when submitting a job (put '--' before them)")
+    args = parser.parse_args(argv)
+
+    if args.command == "submit":
+        try:
+            return submit(args.job_args, socket_path=args.socket_path)
+        except socket.error as e:
+            print("ERROR: Could not connect to server on '%s': %s" % (args.socket_path, e))
+            return glue.STATUS_UNKNOWN_FAIL
+
+    levels = [logging.ERROR, logging.WARN, logging.INFO, logging.DEBUG]
+    setup_logging(console_level=levels[min(3, args.verbosity)], log_filename=args.log_fn)
+    sys.excepthook = create_exc_handler(LOG.name)
+    server = P2GServer(args.socket_path, num_workers=args.num_workers)
+    # stop cleanly when killed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    LOG.info("Listening for jobs on '%s' with %d workers", args.socket_path, args.num_workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        LOG.info("Stopping server")
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Benchmark local histogram equalization against the original tile by tile version.
+
+No input data is needed. DNB-like radiances are generated for the requested image shape and both
+`local_histogram_equalization` and `_local_histogram_equalization_loop` are run with the tile radii used by the
+VIIRS DNB scaling. The results include the speed up and the largest difference between the two versions::
+
+    python -m polar2grid.tests.benchmark_histogram -o histogram_benchmark.json
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import json
+import logging
+import time
+from collections import OrderedDict
+
+import numpy
+
+from polar2grid.core import histogram
+
+LOG = logging.getLogger(__name__)
+
+# 2 VIIRS DNB granules
+DEFAULT_SHAPE = (1536, 4064)
+# radii used by polar2grid.viirs.prescale and the default
+DEFAULT_RADII = [100, 300, 400]
+
+
+def create_synthetic_radiances(shape, dtype=numpy.float32):
+    """Create smoothly varying log-normal DNB-like radiances with a missing band of scan lines."""
+    rng = numpy.random.RandomState(0)
+    rows, cols = numpy.mgrid[:shape[0], :shape[1]]
+    data = numpy.exp(rng.normal(-20.0, 0.5, shape) + 4.0 * numpy.sin(rows / 300.0) * numpy.cos(cols / 500.0))
+    valid_mask = numpy.ones(shape, dtype=numpy.bool_)
+    valid_mask[shape[0] // 3:shape[0] // 3 + 16] = False
+    data[~valid_mask] = numpy.nan
+    return data.astype(dtype), valid_mask
+
+
+def time_function(func, repeat=3):
+    """Time `func` `repeat` times.
+
+    :returns: list of times in seconds and the result of the last run
+    """
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.time()
+        result = func()
+        times.append(time.time() - start)
+    return times, result
+
+
+def benchmark_radius(data, valid_mask, local_radius_px, repeat=3):
+    """Time both versions of local histogram equalization for one tile radius."""
+    def _run(func):
+        return time_function(lambda: func(data, valid_mask, valid_data_mask=valid_mask,
+                                          local_radius_px=local_radius_px), repeat)
+
+    # the tile weights are cached after the first call, calculate them first so neither version is charged for them
+    histogram._get_tile_weights(int(local_radius_px * 2.0 + 1.0))
+    loop_times, expected = _run(histogram._local_histogram_equalization_loop)
+    vector_times, result = _run(histogram.local_histogram_equalization)
+    return OrderedDict([
+        ("name", "local_histogram_equalization/%dx%d/%d" % (data.shape + (local_radius_px,))),
+        ("local_radius_px", local_radius_px),
+        ("loop_best", min(loop_times)),
+        ("vectorized_best", min(vector_times)),
+        ("speed_up", min(loop_times) / min(vector_times)),
+        ("max_difference", float(numpy.nanmax(numpy.abs(result[valid_mask] - expected[valid_mask])))),
+        ("loop_times", loop_times),
+        ("vectorized_times", vector_times),
+    ])
+
+
+def main(argv=sys.argv[1:]):
+    from polar2grid.core.script_utils import create_basic_parser, create_exc_handler, setup_logging
+    parser = create_basic_parser(description="Benchmark local histogram equalization against the original "
+                                             "tile by tile version")
+    parser.add_argument("-o", dest="output_filename", default="histogram_benchmark.json",
+                        help="JSON file to save results to (default 'histogram_benchmark.json')")
+    parser.add_argument("--shape", nargs=2, type=int, default=DEFAULT_SHAPE,
+                        help="Rows and columns of the synthetic image (default %d %d)" % DEFAULT_SHAPE)
+    parser.add_argument("--radii", nargs="+", type=int, default=DEFAULT_RADII,
+                        help="Tile radii in pixels to run (default %s)" % (DEFAULT_RADII,))
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of times to run each version, the best time is used (default 3)")
+    args = parser.parse_args(argv)
+
+    levels = [logging.ERROR, logging.WARN, logging.INFO, logging.DEBUG]
+    setup_logging(console_level=levels[min(3, args.verbosity)], log_filename=args.log_fn)
+    sys.excepthook = create_exc_handler(LOG.name)
+
+    data, valid_mask = create_synthetic_radiances(tuple(args.shape))
+    results = []
+    for local_radius_px in args.radii:
+        LOG.info("Running local histogram equalization with a tile radius of %d", local_radius_px)
+        results.append(benchmark_radius(data, valid_mask, local_radius_px, args.repeat))
+
+    print("%-50s %10s %10s %8s %12s" % ("benchmark", "loop", "vectorized", "speed up", "max diff"))
+    for result in results:
+        print("%-50s %9.3fs %9.3fs %8.1f %12.3g" % (result["name"], result["loop_best"], result["vectorized_best"],
+                                                    result["speed_up"], result["max_difference"]))
+
+    with open(args.output_filename, "w") as output_file:
+        json.dump(OrderedDict([("shape", list(data.shape)), ("results", results)]), output_file, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,433 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Benchmark the remapping hot paths with synthetic swaths.
+
+No input data is needed. Swaths shaped like VIIRS, MODIS, and AVHRR granules are generated from the instrument's scan
+geometry: pixels are spread across the swath by scan angle for the satellite's altitude and each scan's detectors
+spread along track proportionally to their distance from the satellite, so pixel footprints grow toward the edge of
+the swath and neighboring scans overlap (the "bow-tie" effect) the same way real data does.
+
+For every instrument this times:
+
+- ``ll2cr`` to a static grid and to a dynamic grid
+- ``fornav`` (EWA) with several numbers of channels
+- nearest neighbor remapping (``Remapper._remap_scene_nearest``) to every grid in ``grids.conf`` that the swath fits
+
+Results are saved as JSON and can be compared to the results from another commit::
+
+    python -m polar2grid.tests.benchmark_remap -o before.json
+    git checkout my_branch
+    python -m polar2grid.tests.benchmark_remap -o after.json --compare before.json
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+import numpy
+
+from polar2grid.core.containers import SwathDefinition, SwathProduct, SwathScene
+from polar2grid.grids import GridManager
+from polar2grid.remap import ll2cr, fornav
+from polar2grid.remap.remap import Remapper
+
+LOG = logging.getLogger(__name__)
+
+EARTH_RADIUS = 6371000.0
+
+# Scan geometry of a typical granule for each instrument
+INSTRUMENTS = OrderedDict([
+    ("viirs_m", {
+        "rows_per_scan": 16,
+        "swath_columns": 3200,
+        "num_scans": 48,
+        "altitude": 833000.0,
+        "max_scan_angle": 56.28,
+        "nadir_resolution": 742.0,
+    }),
+    ("viirs_i", {
+        "rows_per_scan": 32,
+        "swath_columns": 6400,
+        "num_scans": 48,
+        "altitude": 833000.0,
+        "max_scan_angle": 56.28,
+        "nadir_resolution": 371.0,
+    }),
+    ("modis", {
+        "rows_per_scan": 10,
+        "swath_columns": 1354,
+        "num_scans": 203,
+        "altitude": 705000.0,
+        "max_scan_angle": 55.0,
+        "nadir_resolution": 1000.0,
+    }),
+    ("avhrr", {
+        "rows_per_scan": 1,
+        "swath_columns": 2048,
+        "num_scans": 1200,
+        "altitude": 833000.0,
+        "max_scan_angle": 55.37,
+        "nadir_resolution": 1100.0,
+    }),
+])
+
+DEFAULT_STATIC_GRID = "211e"
+DEFAULT_DYNAMIC_GRID = "wgs84_fit"
+DEFAULT_FORNAV_GRID = "lcc_fit"
+DEFAULT_CHANNELS = [1, 4, 16]
+
+
+def _destination(lat, lon, bearing, distance):
+    """Point reached by traveling `distance` meters from `lat`/`lon` along `bearing` (all angles in radians)."""
+    delta = distance / EARTH_RADIUS
+    lat2 = numpy.arcsin(numpy.sin(lat) * numpy.cos(delta) + numpy.cos(lat) * numpy.sin(delta) * numpy.cos(bearing))
+    lon2 = lon + numpy.arctan2(numpy.sin(bearing) * numpy.sin(delta) * numpy.cos(lat),
+                               numpy.cos(delta) - numpy.sin(lat) * numpy.sin(lat2))
+    return lat2, lon2
+
+
+def _bearing(lat1, lon1, lat2, lon2):
+    dlon = lon2 - lon1
+    return numpy.arctan2(numpy.sin(dlon) * numpy.cos(lat2),
+                         numpy.cos(lat1) * numpy.sin(lat2) - numpy.sin(lat1) * numpy.cos(lat2) * numpy.cos(dlon))
+
+
+def create_synthetic_swath(instrument, center_lon=-95.0, center_lat=37.0, heading=-12.0, num_scans=None,
+                           dtype=numpy.float32):
+    """Create longitude and latitude arrays for a granule of `instrument` (see `INSTRUMENTS`).
+
+    :param center_lon: longitude of the center of the granule's ground track
+    :param center_lat: latitude of the center of the granule's ground track
+    :param heading: direction of the satellite's ground track in degrees clockwise from north
+    :param num_scans: number of scans in the granule (default typical for the instrument)
+    :returns: (longitude array, latitude array, rows per scan)
+    """
+    params = INSTRUMENTS[instrument]
+    rows_per_scan = params["rows_per_scan"]
+    num_scans = num_scans or params["num_scans"]
+    altitude = params["altitude"]
+    orbit_radius = EARTH_RADIUS + altitude
+
+    # earth central angle between nadir and each column's pixel for evenly spaced scan angles
+    scan_angle = numpy.radians(numpy.linspace(-params["max_scan_angle"], params["max_scan_angle"],
+                                              params["swath_columns"]))
+    central_angle = numpy.arcsin(orbit_radius / EARTH_RADIUS * numpy.sin(scan_angle)) - scan_angle
+    cross_track = EARTH_RADIUS * central_angle
+    # footprints grow along track with the distance from the satellite (bow-tie)
+    slant_range = numpy.sqrt(EARTH_RADIUS ** 2 + orbit_radius ** 2 -
+                             2 * EARTH_RADIUS * orbit_radius * numpy.cos(central_angle))
+    detector_offset = numpy.arange(rows_per_scan) - (rows_per_scan - 1) / 2.0
+    along_scan = detector_offset[:, None] * params["nadir_resolution"] * (slant_range / altitude)[None, :]
+
+    # center of each scan on the ground track and the direction of the track there
+    scan_spacing = rows_per_scan * params["nadir_resolution"]
+    track_distance = (numpy.arange(num_scans) - (num_scans - 1) / 2.0) * scan_spacing
+    lat0, lon0, heading = numpy.radians(center_lat), numpy.radians(center_lon), numpy.radians(heading)
+    track_lat, track_lon = _destination(lat0, lon0, heading, track_distance)
+    next_lat, next_lon = _destination(lat0, lon0, heading, track_distance + 1.0)
+    track_heading = _bearing(track_lat, track_lon, next_lat, next_lon)[:, None, None]
+
+    lat, lon = _destination(track_lat[:, None, None], track_lon[:, None, None], track_heading, along_scan[None])
+    lat, lon = _destination(lat, lon, track_heading + numpy.pi / 2.0, cross_track[None, None, :])
+    shape = (num_scans * rows_per_scan, params["swath_columns"])
+    lon = (numpy.degrees(lon) + 180.0) % 360.0 - 180.0
+    return lon.reshape(shape).astype(dtype), numpy.degrees(lat).reshape(shape).astype(dtype), rows_per_scan
+
+
+def create_synthetic_data(shape, num_channels=1, dtype=numpy.float32):
+    """Create smoothly varying image data with a few missing (NaN) pixels for each channel."""
+    rows, cols = numpy.mgrid[:shape[0], :shape[1]].astype(dtype)
+    data = []
+    for idx in range(num_channels):
+        arr = numpy.sin(rows / (37.0 + idx)) * numpy.cos(cols / (53.0 + idx)) * 100.0 + 200.0
+        arr[shape[0] // 3:shape[0] // 3 + 4, shape[1] // 2:shape[1] // 2 + 40] = numpy.nan
+        data.append(arr.astype(dtype))
+    return data
+
+
+def create_synthetic_scene(instrument, num_channels=1, **kwargs):
+    """Create a `SwathScene` for a synthetic `instrument` granule (see `create_synthetic_swath`)."""
+    lon, lat, rows_per_scan = create_synthetic_swath(instrument, **kwargs)
+    swath_def = SwathDefinition(swath_name=instrument + "_geo", longitude=lon, latitude=lat,
+                                data_type=lon.dtype, swath_rows=lon.shape[0], swath_columns=lon.shape[1],
+                                rows_per_scan=rows_per_scan, fill_value=numpy.nan)
+    begin_time = datetime(2026, 1, 1, 18, 0, 0)
+    scene = SwathScene()
+    for idx, data in enumerate(create_synthetic_data(lon.shape, num_channels)):
+        product_name = "%s_channel_%d" % (instrument, idx + 1)
+        scene[product_name] = SwathProduct(
+            product_name=product_name, satellite="synthetic", instrument=instrument,
+            begin_time=begin_time, end_time=begin_time + timedelta(minutes=1), data_type=data.dtype,
+            swath_data=data, swath_definition=swath_def, swath_rows=data.shape[0], swath_columns=data.shape[1],
+            rows_per_scan=rows_per_scan, fill_value=numpy.nan,
+        )
+    return scene
+
+
+def time_function(func, repeat=3, setup=None):
+    """Time `func` `repeat` times.
+
+    :param setup: function called before each run (not timed) whose result is passed to `func` as arguments
+    :returns: list of times in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.time()
+        func(*args)
+        times.append(time.time() - start)
+    return times
+
+
+def _result(name, times, **info):
+    result = OrderedDict([("name", name)])
+    result.update(info)
+    if times:
+        result["best"] = min(times)
+        result["median"] = sorted(times)[len(times) // 2]
+    result["times"] = times
+    return result
+
+
+def benchmark_ll2cr(instrument, grid_manager, grid_name, repeat=3, num_threads=1):
+    lon, lat, rows_per_scan = create_synthetic_swath(instrument)
+    grid_def = grid_manager.get_grid_definition(grid_name)
+    kind = "static" if grid_def.is_static else "dynamic"
+
+    def _setup():
+        # ll2cr works in place and fills in dynamic grid parameters
+        return lon.copy(), lat.copy(), grid_def.copy()
+
+    def _run(cols, rows, grid_info):
+        ll2cr.ll2cr(cols, rows, grid_info, num_threads=num_threads)
+
+    times = time_function(_run, repeat, setup=_setup)
+    return _result("ll2cr_%s/%s/%s" % (kind, instrument, grid_name), times, benchmark="ll2cr_" + kind,
+                   instrument=instrument, grid_name=grid_name, pixels=lon.size, num_threads=num_threads)
+
+
+def benchmark_fornav(instrument, grid_manager, grid_name, channel_counts, repeat=3, num_threads=1):
+    lon, lat, rows_per_scan = create_synthetic_swath(instrument)
+    if rows_per_scan < 2:
+        # same as `Remapper._ewa_parameters`, EWA uses all rows as one scan
+        rows_per_scan = lon.shape[0]
+    grid_def = grid_manager.get_grid_definition(grid_name)
+    cols, rows = lon.copy(), lat.copy()
+    ll2cr.ll2cr(cols, rows, grid_def)
+    all_data = create_synthetic_data(lon.shape, max(channel_counts))
+    results = []
+    for num_channels in channel_counts:
+        data = all_data[:num_channels]
+
+        def _run():
+            fornav.fornav(cols, rows, rows_per_scan, data, grid_cols=grid_def["width"],
+                          grid_rows=grid_def["height"], num_threads=num_threads)
+
+        times = time_function(_run, repeat)
+        results.append(_result("fornav/%s/%s/%d" % (instrument, grid_name, num_channels), times,
+                               benchmark="fornav", instrument=instrument, grid_name=grid_name,
+                               num_channels=num_channels, pixels=lon.size,
+                               grid_shape=[grid_def["height"], grid_def["width"]], num_threads=num_threads))
+    return results
+
+
+def benchmark_nearest(instrument, grid_manager, grid_names, repeat=3, max_grid_cells=None):
+    scene = create_synthetic_scene(instrument)
+    swath_def = scene.values()[0]["swath_definition"]
+    remapper = Remapper(grid_manager=grid_manager)
+    results = []
+    for grid_name in grid_names:
+        name = "nearest/%s/%s" % (instrument, grid_name)
+        grid_def = grid_manager.get_grid_definition(grid_name)
+        try:
+            # also decides if the data fits in the grid and sizes dynamic grids
+            remapper.run_ll2cr(swath_def, grid_def)
+        except RuntimeError as e:
+            results.append(_result(name, [], benchmark="nearest", instrument=instrument, grid_name=grid_name,
+                                   skipped=str(e)))
+            continue
+        grid_cells = grid_def["width"] * grid_def["height"]
+        if max_grid_cells and grid_cells > max_grid_cells:
+            remapper._clear_ll2cr_cache()
+            results.append(_result(name, [], benchmark="nearest", instrument=instrument, grid_name=grid_name,
+                                   skipped="Grid has more than %d cells" % (max_grid_cells,)))
+            continue
+
+        def _setup():
+            # remapping removes the ll2cr results when it is done
+            remapper.run_ll2cr(swath_def, grid_def)
+            return ()
+
+        def _run():
+            gridded_scene = remapper._remap_scene_nearest(scene, grid_def)
+            remapper._safe_remove(*[p["grid_data"] for p in gridded_scene.values()])
+
+        try:
+            times = time_function(_run, repeat, setup=_setup)
+        except RuntimeError as e:
+            remapper._clear_ll2cr_cache()
+            results.append(_result(name, [], benchmark="nearest", instrument=instrument, grid_name=grid_name,
+                                   skipped=str(e)))
+            continue
+        results.append(_result(name, times, benchmark="nearest", instrument=instrument, grid_name=grid_name,
+                               pixels=swath_def["swath_rows"] * swath_def["swath_columns"],
+                               grid_shape=[grid_def["height"], grid_def["width"]]))
+    return results
+
+
+def _run_info():
+    info = OrderedDict([
+        ("date", datetime.utcnow().isoformat()),
+        ("hostname", platform.node()),
+        ("python", platform.python_version()),
+        ("numpy", numpy.__version__),
+    ])
+    try:
+        import multiprocessing
+        info["cpu_count"] = multiprocessing.cpu_count()
+    except NotImplementedError:
+        pass
+    try:
+        info["commit"] = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.STDOUT,
+                                                 cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        info["commit"] = None
+    return info
+
+
+def compare_results(old_results, new_results, threshold=0.1):
+    """Compare the best times of benchmarks that are in both result lists.
+
+    :returns: list of (name, old best, new best, new / old) and the names of benchmarks slower by more than `threshold`
+    """
+    old_best = dict((r["name"], r["best"]) for r in old_results if "best" in r)
+    comparison = []
+    regressions = []
+    for result in new_results:
+        if "best" not in result or result["name"] not in old_best:
+            continue
+        ratio = result["best"] / old_best[result["name"]] if old_best[result["name"]] else float("inf")
+        comparison.append((result["name"], old_best[result["name"]], result["best"], ratio))
+        if ratio > 1.0 + threshold:
+            regressions.append(result["name"])
+    return comparison, regressions
+
+
+def main(argv=sys.argv[1:]):
+    from polar2grid.core.script_utils import create_basic_parser, create_exc_handler, setup_logging
+    parser = create_basic_parser(description="Benchmark ll2cr, fornav, and nearest neighbor remapping with "
+                                             "synthetic swaths")
+    parser.add_argument("-o", dest="output_filename", default="remap_benchmark.json",
+                        help="JSON file to save results to (default 'remap_benchmark.json')")
+    parser.add_argument("--instruments", nargs="+", default=list(INSTRUMENTS.keys()), choices=INSTRUMENTS.keys(),
+                        help="Instruments to create synthetic swaths for (default all)")
+    parser.add_argument("--benchmarks", nargs="+", default=["ll2cr", "fornav", "nearest"],
+                        choices=["ll2cr", "fornav", "nearest"], help="Benchmarks to run (default all)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Number of times to run each benchmark, the best time is used to compare (default 3)")
+    parser.add_argument("--grid-configs", dest="grid_configs", nargs="*", default=tuple(),
+                        help="Grid configuration files to use instead of the default 'grids.conf'")
+    parser.add_argument("--static-grid", default=DEFAULT_STATIC_GRID,
+                        help="Static grid for ll2cr (default '%s')" % (DEFAULT_STATIC_GRID,))
+    parser.add_argument("--dynamic-grid", default=DEFAULT_DYNAMIC_GRID,
+                        help="Dynamic grid for ll2cr (default '%s')" % (DEFAULT_DYNAMIC_GRID,))
+    parser.add_argument("--fornav-grid", default=DEFAULT_FORNAV_GRID,
+                        help="Grid for fornav (default '%s')" % (DEFAULT_FORNAV_GRID,))
+    parser.add_argument("--channels", nargs="+", type=int, default=DEFAULT_CHANNELS,
+                        help="Numbers of channels to run fornav with (default %s)" % (DEFAULT_CHANNELS,))
+    parser.add_argument("--threads", type=int, default=1,
+                        help="Number of threads for ll2cr and fornav (default 1)")
+    parser.add_argument("--grids", nargs="+", default=None,
+                        help="Grids to run nearest neighbor remapping to (default every configured grid)")
+    parser.add_argument("--max-grid-cells", type=int, default=50000000,
+                        help="Skip nearest neighbor remapping to grids with more cells than this (default 50000000)")
+    parser.add_argument("--compare", dest="compare_filename",
+                        help="Compare results to a previous results file and exit with 1 if anything got slower")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Fraction a benchmark has to be slower than the compared result to fail (default 0.1)")
+    args = parser.parse_args(argv)
+
+    levels = [logging.ERROR, logging.WARN, logging.INFO, logging.DEBUG]
+    setup_logging(console_level=levels[min(3, args.verbosity)], log_filename=args.log_fn)
+    sys.excepthook = create_exc_handler(LOG.name)
+
+    grid_manager = GridManager(*args.grid_configs)
+    grid_names = args.grids or sorted(grid_manager.grid_information.keys())
+    # the remapper writes intermediate files to the current directory
+    orig_cwd = os.getcwd()
+    output_filename = os.path.abspath(args.output_filename)
+    work_dir = tempfile.mkdtemp(prefix="p2g_benchmark_")
+    results = []
+    try:
+        os.chdir(work_dir)
+        for instrument in args.instruments:
+            if "ll2cr" in args.benchmarks:
+                for grid_name in (args.static_grid, args.dynamic_grid):
+                    LOG.info("Running ll2cr for %s to grid %s", instrument, grid_name)
+                    results.append(benchmark_ll2cr(instrument, grid_manager, grid_name, args.repeat, args.threads))
+            if "fornav" in args.benchmarks:
+                LOG.info("Running fornav for %s to grid %s", instrument, args.fornav_grid)
+                results.extend(benchmark_fornav(instrument, grid_manager, args.fornav_grid, args.channels,
+                                                args.repeat, args.threads))
+            if "nearest" in args.benchmarks:
+                LOG.info("Running nearest neighbor for %s to %d grids", instrument, len(grid_names))
+                results.extend(benchmark_nearest(instrument, grid_manager, grid_names, args.repeat,
+                                                 args.max_grid_cells))
+    finally:
+        os.chdir(orig_cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    for result in results:
+        if "best" in result:
+            print("%-50s %10.3fs" % (result["name"], result["best"]))
+        else:
+            LOG.debug("Skipped %s: %s", result["name"], result["skipped"])
+
+    with open(output_filename, "w") as output_file:
+        json.dump(OrderedDict([("info", _run_info()), ("results", results)]), output_file, indent=2)
+
+    if args.compare_filename:
+        with open(args.compare_filename, "r") as compare_file:
+            old_results = json.load(compare_file)["results"]
+        comparison, regressions = compare_results(old_results, results, args.threshold)
+        print("\n%-50s %10s %10s %8s" % ("benchmark", "before", "after", "ratio"))
+        for name, old_best, new_best, ratio in comparison:
+            print("%-50s %9.3fs %9.3fs %8.2f%s" % (name, old_best, new_best, ratio,
+                                                 " *" if name in regressions else ""))
+        if regressions:
+            LOG.error("%d benchmarks are more than %d%% slower", len(regressions), args.threshold * 100)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
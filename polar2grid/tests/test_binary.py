@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Test the binary backend.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import logging
+
+import numpy
+import pytest
+
+from polar2grid import binary
+from polar2grid.core.dtype import clip_to_data_type
+from polar2grid.tests.test_core.test_rescale import create_test_product, create_test_data
+
+LOG = logging.getLogger(__name__)
+
+
+class TestBinaryBackend(object):
+    @pytest.mark.parametrize("shape", [(101, 60), (3, 101, 60)])
+    def test_rescaled_output(self, tmpdir, shape):
+        """Rescaled output written straight to the file is the same as rescaling the whole grid in memory."""
+        backend = binary.Backend()
+        data = create_test_data(-0.1, 1.2, shape=shape)
+        product = create_test_product(data)
+        output_filename = str(tmpdir.join("test_product.dat"))
+        result = backend.create_output_from_product(product, output_pattern=output_filename,
+                                                    data_type=numpy.uint8, inc_by_one=True, fill_value=255)
+        assert result == output_filename
+
+        expected = backend.rescaler.rescale_product(product, numpy.uint8, inc_by_one=True, fill_value=255)
+        expected = clip_to_data_type(expected, numpy.uint8)
+        expected[numpy.isnan(data)] = 255
+        output = numpy.fromfile(output_filename, dtype=numpy.uint8).reshape(shape)
+        # every band has fill pixels
+        fill_mask = numpy.isnan(data)
+        assert all(numpy.count_nonzero(band_mask) for band_mask in fill_mask.reshape((-1,) + shape[-2:]))
+        assert (output[fill_mask] == 255).all()
+        numpy.testing.assert_array_equal(output, expected)
+
+    def test_float_output(self, tmpdir):
+        backend = binary.Backend()
+        data = create_test_data(-0.1, 1.2)
+        product = create_test_product(data)
+        output_filename = str(tmpdir.join("test_product.dat"))
+        backend.create_output_from_product(product, output_pattern=output_filename,
+                                           data_type=numpy.float64, fill_value=-999.0)
+
+        expected = data.astype(numpy.float64)
+        expected[numpy.isnan(data)] = -999.0
+        numpy.testing.assert_array_equal(numpy.fromfile(output_filename, dtype=numpy.float64).reshape(data.shape),
+                                         expected)
+
+
+def main():
+    import os
+    return pytest.main([os.path.dirname(os.path.realpath(__file__))])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
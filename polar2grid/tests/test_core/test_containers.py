@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Test the intermediate array store.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import os
+import gc
+import sys
+import subprocess
+
+import pytest
+
+from polar2grid.core.containers import IntermediateArrays
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, "-c", "pass"])
+    proc.wait()
+    return proc.pid
+
+
+class TestIntermediateArrays(object):
+    def test_memory_released(self, tmpdir):
+        arrays = IntermediateArrays(memory_budget=800)
+        arr, data = arrays.create(str(tmpdir.join("a.dat")), (10, 10), "f4")
+        assert data is arr
+        arr2, data2 = arrays.create(str(tmpdir.join("b.dat")), (10, 10), "f4")
+        assert data2 is arr2
+        arr3, data3 = arrays.create(str(tmpdir.join("c.dat")), (10, 10), "f4")
+        assert isinstance(data3, str)
+        # arrays can be garbage collected while the budget is locked
+        with arrays._lock:
+            del arr, data
+            gc.collect()
+        arr4, data4 = arrays.create(str(tmpdir.join("d.dat")), (10, 10), "f4")
+        assert data4 is arr4
+        assert arrays.memory_used == 800
+
+
+class TestSharedIntermediateArrays(object):
+    def test_remove_shared(self, tmpdir):
+        arrays = IntermediateArrays(memory_budget=1024, shared_memory=True, shared_memory_dir=str(tmpdir))
+        arr, data = arrays.create("test.dat", (10, 10), "f4")
+        assert os.path.dirname(data) == arrays.shared_dir
+        del arr
+        arrays.remove_shared()
+        assert not os.path.exists(arrays.shared_dir)
+
+    def test_stale_directories_removed(self, tmpdir):
+        stale_dir = tmpdir.mkdir("polar2grid_%d" % (_dead_pid(),))
+        stale_dir.join("test.dat").write("stale")
+        live_dir = tmpdir.mkdir("polar2grid_%d" % (os.getppid(),))
+        other_dir = tmpdir.mkdir("other_files")
+        arrays = IntermediateArrays(memory_budget=1024, shared_memory=True, shared_memory_dir=str(tmpdir))
+        arrays.create("test.dat", (10, 10), "f4")
+        assert not stale_dir.check()
+        assert live_dir.check()
+        assert other_dir.check()
+        arrays.remove_shared()
+
+
+def main():
+    return pytest.main([os.path.dirname(os.path.realpath(__file__))])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Test the histogram equalization functions.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import logging
+import numpy
+import pytest
+
+from polar2grid.core import histogram
+
+LOG = logging.getLogger(__name__)
+
+
+def create_test_radiances(shape=(70, 95), dtype=numpy.float64, seed=42):
+    """Create DNB-like radiances (log-normal with some zero and negative pixels) and their valid mask."""
+    rng = numpy.random.RandomState(seed)
+    data = numpy.exp(rng.normal(-20.0, 2.0, shape))
+    rows, cols = numpy.mgrid[:shape[0], :shape[1]]
+    data *= 1.0 + numpy.sin(rows / 7.0) * numpy.cos(cols / 11.0)
+    data[rng.uniform(size=shape) < 0.02] = 0.0
+    data[rng.uniform(size=shape) < 0.02] *= -1.0
+    valid_mask = rng.uniform(size=shape) > 0.05
+    data[~valid_mask] = numpy.nan
+    return data.astype(dtype), valid_mask
+
+
+def _equalize_both(data, valid_mask, mask_to_equalize=None, **kwargs):
+    mask_to_equalize = valid_mask if mask_to_equalize is None else mask_to_equalize
+    expected = histogram._local_histogram_equalization_loop(data, mask_to_equalize, valid_data_mask=valid_mask,
+                                                            **kwargs)
+    result = histogram.local_histogram_equalization(data, mask_to_equalize, valid_data_mask=valid_mask, **kwargs)
+    return result[mask_to_equalize], expected[mask_to_equalize]
+
+
+class TestLocalHistogramEqualization(object):
+    # tile sizes 11 and 25, neither divides the test data's shape evenly
+    @pytest.mark.parametrize("local_radius_px", [5, 12])
+    @pytest.mark.parametrize("do_log_scale,log_offset", [(True, 0.00001), (False, None)])
+    @pytest.mark.parametrize("std_mult_cutoff", [3.0, None])
+    def test_matches_loop(self, local_radius_px, do_log_scale, log_offset, std_mult_cutoff):
+        data, valid_mask = create_test_radiances()
+        if not do_log_scale:
+            data = numpy.abs(data) * 1e9
+        result, expected = _equalize_both(data, valid_mask, local_radius_px=local_radius_px,
+                                          do_log_scale=do_log_scale, log_offset=log_offset,
+                                          std_mult_cutoff=std_mult_cutoff)
+        numpy.testing.assert_allclose(result, expected, rtol=1e-6, atol=1e-9)
+
+    def test_matches_loop_no_limits(self):
+        data, valid_mask = create_test_radiances()
+        result, expected = _equalize_both(data, valid_mask, local_radius_px=5, clip_limit=None, slope_limit=None,
+                                          do_zerotoone_normalization=False)
+        numpy.testing.assert_allclose(result, expected, rtol=1e-6, atol=1e-9)
+
+    def test_missing_tiles(self):
+        """Test tiles with no valid data and tiles with only negative data."""
+        data, valid_mask = create_test_radiances()
+        valid_mask[:11, :30] = False
+        data[30:44, 40:60] = -1.0
+        mask_to_equalize = valid_mask.copy()
+        mask_to_equalize[50:, :] = False
+        result, expected = _equalize_both(data, valid_mask, mask_to_equalize=mask_to_equalize, local_radius_px=5)
+        assert numpy.array_equal(numpy.isnan(result), numpy.isnan(expected))
+        numpy.testing.assert_allclose(result[~numpy.isnan(result)], expected[~numpy.isnan(expected)],
+                                      rtol=1e-6, atol=1e-9)
+
+    def test_matches_loop_float32(self):
+        """Test float32 data where values on the float32 rounding of a bin edge may be binned differently."""
+        data, valid_mask = create_test_radiances(dtype=numpy.float32)
+        result, expected = _equalize_both(data, valid_mask, local_radius_px=12)
+        assert result.dtype == numpy.float32
+        numpy.testing.assert_allclose(result, expected, atol=0.01)
+
+
+class TestCumulativeDistFunctions(object):
+    @pytest.mark.parametrize("clip_limit,slope_limit", [(60.0, 3.0), (None, 3.0), (60.0, None), (2.0, 0.5)])
+    def test_matches_helper(self, clip_limit, slope_limit):
+        rng = numpy.random.RandomState(0)
+        number_of_bins = 100
+        datasets = [rng.normal(size=size) ** 3 for size in (50, 1000, 20000)]
+        histograms = numpy.array([numpy.histogram(d, number_of_bins)[0] for d in datasets])
+        counts = numpy.array([d.size for d in datasets])
+        cdfs = histogram._cumulative_dist_functions(histograms, counts, number_of_bins, clip_limit=clip_limit,
+                                                    slope_limit=slope_limit)
+        for d, cdf in zip(datasets, cdfs):
+            expected = histogram._histogram_equalization_helper(d, number_of_bins, clip_limit=clip_limit,
+                                                                slope_limit=slope_limit)[0]
+            numpy.testing.assert_array_equal(cdf, expected)
+
+
+def _row_mask(mask, rows_per_chunk=16):
+    return histogram.RowMask(mask.shape, lambda rows: mask[rows].copy(), rows_per_chunk=rows_per_chunk)
+
+
+class TestChunkedEqualization(object):
+    @pytest.mark.parametrize("rows_per_chunk", [7, 32, 1000])
+    def test_histogram_equalization_chunks(self, rows_per_chunk):
+        data, valid_mask = create_test_radiances()
+        mask_to_equalize = valid_mask.copy()
+        mask_to_equalize[:, :20] = False
+        expected = histogram.histogram_equalization(data, mask_to_equalize, valid_data_mask=valid_mask,
+                                                    clip_limit=60.0, slope_limit=3.0)
+        result = histogram.histogram_equalization(data, _row_mask(mask_to_equalize),
+                                                  valid_data_mask=_row_mask(valid_mask), clip_limit=60.0,
+                                                  slope_limit=3.0, rows_per_chunk=rows_per_chunk)
+        numpy.testing.assert_allclose(result[mask_to_equalize], expected[mask_to_equalize], rtol=1e-6, atol=1e-9)
+
+    def test_memmap(self, tmpdir):
+        data, valid_mask = create_test_radiances(dtype=numpy.float32)
+        data_file = numpy.memmap(str(tmpdir.join("data.dat")), dtype=data.dtype, mode="w+", shape=data.shape)
+        data_file[:] = data
+        out = numpy.memmap(str(tmpdir.join("out.dat")), dtype=data.dtype, mode="w+", shape=data.shape)
+        expected = histogram.histogram_equalization(data, valid_mask)
+        histogram.histogram_equalization(data_file, _row_mask(valid_mask), out=out, rows_per_chunk=10)
+        out.flush()
+        result = numpy.fromfile(str(tmpdir.join("out.dat")), dtype=data.dtype).reshape(data.shape)
+        numpy.testing.assert_allclose(result[valid_mask], expected[valid_mask], rtol=1e-5, atol=1e-6)
+
+    def test_local_row_masks(self):
+        data, valid_mask = create_test_radiances()
+        expected = histogram.local_histogram_equalization(data, valid_mask, valid_data_mask=valid_mask,
+                                                          local_radius_px=5)
+        result = histogram.local_histogram_equalization(data, _row_mask(valid_mask),
+                                                        valid_data_mask=_row_mask(valid_mask), local_radius_px=5)
+        numpy.testing.assert_array_equal(result, expected)
+
+    def test_row_mask(self):
+        mask = numpy.zeros((50, 10), dtype=numpy.bool_)
+        row_mask = _row_mask(mask)
+        assert not row_mask.any()
+        mask[45, 3] = True
+        assert row_mask.any()
+        numpy.testing.assert_array_equal(row_mask[40:50], mask[40:50])
+        with pytest.raises(TypeError):
+            row_mask[mask]
+
+
+def _limit_cdf_slope_loop(cdf, pixel_height_limit):
+    """Bin by bin slope limiting that `limit_cdf_slope` replaced."""
+    cdf = cdf.copy()
+    cumulative_excess_height = 0
+    for pixel_index in range(1, cdf.size):
+        current_pixel_count = cdf[pixel_index]
+        diff_from_acceptable = (current_pixel_count - cdf[pixel_index - 1] -
+                                pixel_height_limit - cumulative_excess_height)
+        cumulative_excess_height += max(diff_from_acceptable, 0)
+        cdf[pixel_index] = current_pixel_count - cumulative_excess_height
+    return cdf
+
+
+class TestLimitCdfSlope(object):
+    @pytest.mark.parametrize("pixel_height_limit", [0, 3, 20, 1000])
+    def test_matches_loop(self, pixel_height_limit):
+        rng = numpy.random.RandomState(1)
+        cdf = rng.poisson(10.0, 1000).cumsum()
+        orig_cdf = cdf.copy()
+        result = histogram.limit_cdf_slope(cdf, pixel_height_limit)
+        numpy.testing.assert_array_equal(result, _limit_cdf_slope_loop(cdf, pixel_height_limit))
+        numpy.testing.assert_array_equal(cdf, orig_cdf)
+
+    def test_multiple_cdfs(self):
+        rng = numpy.random.RandomState(2)
+        cdfs = rng.poisson(10.0, (4, 100)).cumsum(axis=1)
+        limits = numpy.array([0, 5, 10, 15])
+        result = histogram.limit_cdf_slope(cdfs, limits[:, None])
+        for cdf, limit, limited_cdf in zip(cdfs, limits, result):
+            numpy.testing.assert_array_equal(limited_cdf, _limit_cdf_slope_loop(cdf, limit))
+
+    def test_slope_limited(self):
+        cdf = numpy.array([5, 6, 20, 21, 40])
+        numpy.testing.assert_array_equal(histogram.limit_cdf_slope(cdf, 4), [5, 6, 10, 11, 15])
+
+
+class TestHistogramEqualizationHelper(object):
+    def test_clip_limit_never_raises_bins(self):
+        """Bins between the clip limit and the clip height shouldn't be raised to the clip height."""
+        data = numpy.repeat(numpy.arange(10, dtype=numpy.float64), numpy.arange(1, 11) * 100)
+        # 5500 values in 10 bins at a clip limit of 1.0 clips at 550 pixels
+        cdf = histogram._histogram_equalization_helper(data, 10, clip_limit=1.0)[0]
+        expected = numpy.array([100, 200, 300, 400, 500, 550, 550, 550, 550, 550]).cumsum()
+        numpy.testing.assert_array_equal(cdf, 9 * expected / expected[-1])
+
+
+def main():
+    import os
+    return pytest.main([os.path.dirname(os.path.realpath(__file__))])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Test rescaling gridded products.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import logging
+from datetime import datetime
+
+import numpy
+import pytest
+
+from polar2grid.core import rescale
+from polar2grid.core.containers import GridDefinition, GriddedProduct
+from polar2grid.core.dtype import clip_to_data_type
+
+LOG = logging.getLogger(__name__)
+
+
+def create_test_product(data):
+    grid_def = GridDefinition(grid_name="test_grid", proj4_definition="+proj=latlong +datum=WGS84 +ellps=WGS84",
+                              height=data.shape[-2], width=data.shape[-1], cell_height=-0.1, cell_width=0.1,
+                              origin_x=-100.0, origin_y=40.0)
+    return GriddedProduct(product_name="test_product", satellite="test_sat", instrument="test_inst",
+                          begin_time=datetime(2026, 1, 1), end_time=datetime(2026, 1, 1, 0, 1),
+                          data_type=data.dtype, grid_data=data, grid_definition=grid_def, fill_value=numpy.nan)
+
+
+def create_test_data(low, high, shape=(101, 60)):
+    data = numpy.linspace(low, high, shape[0] * shape[1]).reshape(shape).astype(numpy.float32)
+    data[..., 10:20, 5:15] = numpy.nan
+    return data
+
+
+def _options(method, **kwargs):
+    options = {"method": method, "inc_by_one": False, "min_out": 0.0, "max_out": 255.0, "fill_out": 0}
+    options.update(kwargs)
+    return options
+
+
+class TestRescaleProductToDataType(object):
+    @pytest.mark.parametrize("data_range,options,inc_by_one", [
+        ((-0.1, 1.2), _options("linear"), False),
+        ((-0.1, 1.2), _options("linear", min_in=0.0, max_in=1.0), True),
+        ((-0.1, 1.2), _options("sqrt"), False),
+        ((150.0, 340.0), _options("linear_brightness_temperature"), False),
+        ((-120.0, 60.0), _options("linear_brightness_temperature", units="celsius"), False),
+        ((-120.0, 60.0), _options("linear_brightness_temperature", units="celsius", max_in=310.0), False),
+        ((150.0, 340.0), _options("brightness_temperature", threshold=242.0, min_in=163.0, max_in=330.0), False),
+        ((-0.1, 1.2), _options("lookup", min_in=0.0, max_in=1.0), False),
+        ((-1.2, 1.2), _options("ndvi"), False),
+        ((-0.1, 1.2), _options("linear", min_in=0.0, max_in=1.0, mask_clip="both"), False),
+    ])
+    def test_blocks_match_rescale_product(self, data_range, options, inc_by_one):
+        rescaler = rescale.Rescaler(rescale.DEFAULT_RCONFIG)
+        options["inc_by_one"] = inc_by_one
+        if inc_by_one:
+            options["max_out"] -= 1
+        product = create_test_product(create_test_data(*data_range))
+        expected = rescaler.rescale_product(product, numpy.uint8, fill_value=0, rescale_options=options.copy())
+        expected = clip_to_data_type(expected, numpy.uint8)
+        result = rescaler.rescale_product_to_data_type(product, numpy.uint8, fill_value=0,
+                                                       rescale_options=options.copy(), block_rows=7)
+        assert result.dtype == numpy.uint8
+        numpy.testing.assert_array_equal(result, expected)
+
+    def test_out_array(self):
+        rescaler = rescale.Rescaler(rescale.DEFAULT_RCONFIG)
+        product = create_test_product(create_test_data(0.0, 1.0))
+        out = numpy.zeros(product.shape, dtype=numpy.uint16)
+        result = rescaler.rescale_product_to_data_type(product, numpy.uint16, fill_value=0,
+                                                       rescale_options=_options("linear", max_out=65535.0), out=out)
+        assert result is out
+        assert out.max() == 65535
+
+    @pytest.mark.parametrize("blockwise", [True, False])
+    def test_output_fill(self, blockwise):
+        rescaler = rescale.Rescaler(rescale.DEFAULT_RCONFIG)
+        if not blockwise:
+            rescaler.blockwise_methods = set()
+        data = create_test_data(0.0, 1.0)
+        product = create_test_product(data)
+        result = rescaler.rescale_product_to_data_type(product, numpy.uint8, fill_value=0, block_rows=7,
+                                                       rescale_options=_options("linear", max_out=253.0,
+                                                                                inc_by_one=True),
+                                                       output_fill=255)
+        numpy.testing.assert_array_equal(result == 255, numpy.isnan(data))
+        assert result[~numpy.isnan(data)].min() == 1
+
+    def test_whole_grid_methods(self):
+        """Methods that aren't known to work a block at a time are done on the whole grid."""
+        rescaler = rescale.Rescaler(rescale.DEFAULT_RCONFIG)
+        rescaler.blockwise_methods = rescaler.blockwise_methods - {"sqrt"}
+        product = create_test_product(create_test_data(0.0, 1.0))
+        expected = clip_to_data_type(rescaler.rescale_product(product, numpy.uint8, fill_value=0,
+                                                              rescale_options=_options("sqrt")), numpy.uint8)
+        result = rescaler.rescale_product_to_data_type(product, numpy.uint8, fill_value=0,
+                                                       rescale_options=_options("sqrt"))
+        assert result.dtype == numpy.uint8
+        numpy.testing.assert_array_equal(result, expected)
+
+
+class TestRescaleProductOut(object):
+    @pytest.mark.parametrize("options", [
+        _options("linear"),
+        _options("linear", min_in=0.0, max_in=1.0),
+        _options("sqrt"),
+    ])
+    def test_blocks_match_in_memory(self, options):
+        rescaler = rescale.Rescaler(rescale.DEFAULT_RCONFIG)
+        product = create_test_product(create_test_data(-0.1, 1.2))
+        expected = rescaler.rescale_product(product, numpy.uint8, fill_value=0, rescale_options=options.copy())
+        out = numpy.empty(product.shape, dtype=numpy.float32)
+        result = rescaler.rescale_product(product, numpy.uint8, fill_value=0, rescale_options=options.copy(),
+                                          out=out, block_rows=7)
+        assert result is out
+        numpy.testing.assert_array_equal(out, expected)
+
+    def test_memmap(self, tmpdir):
+        rescaler = rescale.Rescaler(rescale.DEFAULT_RCONFIG)
+        product = create_test_product(create_test_data(-0.1, 1.2))
+        expected = rescaler.rescale_product(product, numpy.uint8, fill_value=0, rescale_options=_options("linear"))
+        out = numpy.memmap(str(tmpdir.join("rescaled.dat")), dtype=numpy.float32, mode="w+", shape=product.shape)
+        rescaler.rescale_product(product, numpy.uint8, fill_value=0, rescale_options=_options("linear"), out=out,
+                                 block_rows=16)
+        numpy.testing.assert_array_equal(out, expected)
+
+    @pytest.mark.parametrize("use_out", [False, True])
+    def test_rgb_bands(self, use_out):
+        """Each band of an RGB product is rescaled like a separate product."""
+        rescaler = rescale.Rescaler(rescale.DEFAULT_RCONFIG)
+        bands = [create_test_data(-0.1, 1.2), create_test_data(0.2, 0.5), create_test_data(0.0, 2.0)]
+        product = create_test_product(numpy.array(bands))
+        expected = numpy.array([rescaler.rescale_product(create_test_product(band), numpy.uint8, fill_value=0,
+                                                         rescale_options=_options("linear")) for band in bands])
+        out = numpy.empty(product.get_data_array().shape, dtype=numpy.float32) if use_out else None
+        result = rescaler.rescale_product(product, numpy.uint8, fill_value=0, rescale_options=_options("linear"),
+                                          out=out, block_rows=7)
+        assert result.shape == (3,) + bands[0].shape
+        numpy.testing.assert_array_equal(result, expected)
+
+    def test_whole_grid_methods(self):
+        rescaler = rescale.Rescaler(rescale.DEFAULT_RCONFIG)
+        rescaler.blockwise_methods = rescaler.blockwise_methods - {"sqrt"}
+        product = create_test_product(create_test_data(0.0, 1.0))
+        expected = rescaler.rescale_product(product, numpy.uint8, fill_value=0, rescale_options=_options("sqrt"))
+        out = numpy.empty(product.shape, dtype=numpy.float32)
+        rescaler.rescale_product(product, numpy.uint8, fill_value=0, rescale_options=_options("sqrt"), out=out)
+        numpy.testing.assert_array_equal(out, expected)
+
+
+def main():
+    import os
+    return pytest.main([os.path.dirname(os.path.realpath(__file__))])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -39,8 +39,12 @@
 """
 __docformat__ = "restructuredtext en"
 
+from datetime import datetime, timedelta
+
 import numpy
 
+from polar2grid.core.containers import SwathDefinition, SwathProduct, SwathScene
+
 
 def create_test_longitude(start, stop, shape, twist_factor=0.0, dtype=numpy.float32):
     if start > stop:
@@ -62,3 +66,28 @@ def create_test_latitude(start, stop, shape, twist_factor=0.0, dtype=numpy.float
     lat_array = numpy.repeat(lat_col, shape[1], axis=1)
     lat_array += twist_array
     return lat_array
+
+
+def create_test_scene(shape=(64, 128), rows_per_scan=16):
+    """Create a `SwathScene` with a floating point product (NaN fill) and an integer product (-1 fill) that share
+    geolocation.
+    """
+    lon_arr = create_test_longitude(-95.0, -93.0, shape, twist_factor=0.001)
+    lat_arr = create_test_latitude(15.0, 17.0, shape, twist_factor=-0.001)
+    swath_def = SwathDefinition(swath_name="test_geo", longitude=lon_arr, latitude=lat_arr, data_type=lon_arr.dtype,
+                                swath_rows=shape[0], swath_columns=shape[1], rows_per_scan=rows_per_scan,
+                                fill_value=numpy.nan)
+    float_data = numpy.sin(numpy.arange(lon_arr.size, dtype=numpy.float32) / 37.0).reshape(shape)
+    float_data[5:9, 20:30] = numpy.nan
+    int_data = (numpy.arange(lon_arr.size) % 100).astype(numpy.int8).reshape(shape)
+    int_data[5:9, 20:30] = -1
+    begin_time = datetime(2015, 1, 1, 18, 0, 0)
+    scene = SwathScene()
+    for product_name, data, fill_value in (("test_float", float_data, numpy.nan), ("test_int", int_data, -1)):
+        scene[product_name] = SwathProduct(
+            product_name=product_name, satellite="test", instrument="test",
+            begin_time=begin_time, end_time=begin_time + timedelta(minutes=1), data_type=data.dtype,
+            swath_data=data, swath_definition=swath_def, swath_rows=shape[0], swath_columns=shape[1],
+            rows_per_scan=rows_per_scan, fill_value=fill_value,
+        )
+    return scene
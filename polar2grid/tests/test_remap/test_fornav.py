@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Test the EWA resampling (fornav) extension module.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import logging
+import numpy
+import pytest
+
+from polar2grid.remap import ll2cr, fornav, _fornav
+from polar2grid.tests.test_remap import create_test_longitude, create_test_latitude, create_test_scene
+
+LOG = logging.getLogger(__name__)
+
+
+dynamic_wgs84 = {
+    "grid_name": "test_wgs84_fit",
+    "origin_x": None,
+    "origin_y": None,
+    "width": None,
+    "height": None,
+    "cell_width": 0.05,
+    "cell_height": -0.05,
+    "proj4_definition": "+proj=latlong +datum=WGS84 +ellps=WGS84 +no_defs",
+}
+
+
+def create_test_swath(shape=(160, 400), num_products=3):
+    """Create column and row arrays for a dynamic grid and a few products to go with them."""
+    lon_arr = create_test_longitude(-95.0, -75.0, shape, twist_factor=0.01, dtype=numpy.float64)
+    lat_arr = create_test_latitude(15.0, 30.0, shape, twist_factor=-0.001, dtype=numpy.float64)
+    grid_info = dynamic_wgs84.copy()
+    ll2cr.ll2cr(lon_arr, lat_arr, grid_info)
+    data = [numpy.sin(numpy.arange(lon_arr.size, dtype=numpy.float32) / (37.0 + idx)).reshape(shape)
+            for idx in range(num_products)]
+    data[0][5:9, 20:30] = numpy.nan
+    return lon_arr.astype(numpy.float32), lat_arr.astype(numpy.float32), data, grid_info
+
+
+def assert_grids_equal(a, b, **kwargs):
+    assert numpy.array_equal(numpy.isnan(a), numpy.isnan(b)), "fill values are in different places"
+    numpy.testing.assert_allclose(a[~numpy.isnan(a)], b[~numpy.isnan(b)], **kwargs)
+
+
+class TestFornavThreads(object):
+    def _run(self, num_threads, maximum_weight_mode=False):
+        cols, rows, data, grid_info = create_test_swath()
+        return fornav.fornav(cols, rows, 16, data, grid_cols=grid_info["width"], grid_rows=grid_info["height"],
+                             maximum_weight_mode=maximum_weight_mode, num_threads=num_threads)
+
+    def test_one_thread_unchanged(self):
+        """One thread gives exactly the same grids as the extension's default single threaded path."""
+        cols, rows, data, grid_info = create_test_swath()
+        grid_shape = (grid_info["height"], grid_info["width"])
+        baseline_out = tuple(numpy.empty(grid_shape, dtype=numpy.float32) for _ in data)
+        baseline_valid = _fornav.fornav_wrapper(cols, rows, tuple(data), baseline_out, numpy.nan, numpy.nan, 16)
+        valid, out = self._run(1)
+        assert list(valid) == list(baseline_valid)
+        for baseline_arr, arr in zip(baseline_out, out):
+            numpy.testing.assert_array_equal(arr, baseline_arr)
+
+    def test_threads_match_serial(self):
+        # each thread accumulates its scans in its own grids which are summed at the end, floating point addition
+        # isn't associative so the order the per-thread grids are added in can change the last bits of the result
+        serial_valid, serial_out = self._run(1)
+        for num_threads in (2, 3, 16):
+            valid, out = self._run(num_threads)
+            assert valid == serial_valid
+            for serial_arr, arr in zip(serial_out, out):
+                assert_grids_equal(serial_arr, arr, rtol=1e-5, atol=1e-6)
+
+    def test_threads_match_serial_mwm(self):
+        serial_valid, serial_out = self._run(1, maximum_weight_mode=True)
+        valid, out = self._run(4, maximum_weight_mode=True)
+        assert valid == serial_valid
+        for serial_arr, arr in zip(serial_out, out):
+            assert_grids_equal(serial_arr, arr, rtol=0)
+
+
+class TestFornavTiled(object):
+    def _run(self, tile_size, maximum_weight_mode=False):
+        cols, rows, data, grid_info = create_test_swath()
+        return fornav.fornav(cols, rows, 16, data, grid_cols=grid_info["width"], grid_rows=grid_info["height"],
+                             maximum_weight_mode=maximum_weight_mode, tile_size=tile_size)
+
+    def test_tiles_match_full_grid(self):
+        full_valid, full_out = self._run(None)
+        for tile_size in (50, (37, 91), 10000):
+            valid, out = self._run(tile_size)
+            assert valid == full_valid
+            for full_arr, arr in zip(full_out, out):
+                assert_grids_equal(full_arr, arr, rtol=1e-5, atol=1e-6)
+
+    def test_tiles_match_full_grid_mwm(self):
+        full_valid, full_out = self._run(None, maximum_weight_mode=True)
+        valid, out = self._run(64, maximum_weight_mode=True)
+        assert valid == full_valid
+        for full_arr, arr in zip(full_out, out):
+            assert_grids_equal(full_arr, arr, rtol=0)
+
+
+class TestFornavScanCulling(object):
+    def test_regional_grid(self):
+        cols, rows, data, grid_info = create_test_swath()
+        # small grid in the middle of the swath
+        cols -= 150
+        rows -= 100
+        grid_shape = (60, 80)
+        bounds = fornav.scan_bounds(cols, rows, 16)
+        scan_mask = fornav.scan_grid_mask(bounds, grid_shape[1], grid_shape[0], 10.0)
+        assert 0 < numpy.count_nonzero(scan_mask) < scan_mask.size, "some scans should be skipped"
+
+        valid, out = fornav.fornav(cols, rows, 16, data, grid_cols=grid_shape[1], grid_rows=grid_shape[0],
+                                   bounds=bounds)
+        all_out = tuple(numpy.empty(grid_shape, dtype=numpy.float32) for _ in data)
+        all_valid = _fornav.fornav_wrapper(cols, rows, tuple(data), all_out, numpy.nan, numpy.nan, 16)
+        assert valid == all_valid
+        for all_arr, arr in zip(all_out, out):
+            assert_grids_equal(all_arr, arr, rtol=0)
+
+
+class TestFornavMixedTypes(object):
+    def test_mixed_dtypes_match_separate_passes(self):
+        cols, rows, data, grid_info = create_test_swath()
+        float_data = data[0]
+        cat_data = (numpy.arange(float_data.size).reshape(float_data.shape) % 5).astype(numpy.int8)
+        cat_data[:16] = -1
+        grid_kwargs = dict(grid_cols=grid_info["width"], grid_rows=grid_info["height"])
+
+        valid, out = fornav.fornav(cols, rows, 16, (float_data, cat_data),
+                                   input_fill=[numpy.nan, -1], maximum_weight_mode=[False, True],
+                                   output_fill=[numpy.nan, -1], **grid_kwargs)
+        assert out[0].dtype == numpy.float32
+        assert out[1].dtype == numpy.int8
+
+        float_valid, float_out = fornav.fornav(cols, rows, 16, (float_data,), input_fill=numpy.nan, **grid_kwargs)
+        cat_valid, cat_out = fornav.fornav(cols, rows, 16, (cat_data,), input_fill=-1, output_fill=-1,
+                                           maximum_weight_mode=True, **grid_kwargs)
+        assert list(valid) == [float_valid[0], cat_valid[0]]
+        assert_grids_equal(float_out[0], out[0], rtol=0)
+        numpy.testing.assert_array_equal(cat_out[0], out[1])
+
+    def test_remapper_fill_values(self, tmpdir, monkeypatch):
+        """Gridded products from a mixed type group say what fill value was written to their data."""
+        from polar2grid.remap import Remapper
+        monkeypatch.chdir(tmpdir)
+        scene = create_test_scene()
+        gridded_scene = Remapper(overwrite_existing=True).remap_scene(scene, "wgs84_fit", remap_method="ewa")
+
+        float_product = gridded_scene["test_float"]
+        assert numpy.isnan(float_product["fill_value"])
+        float_data = float_product.get_data_array()
+        assert float_data.dtype == numpy.float32
+        assert numpy.count_nonzero(numpy.isnan(float_data))
+        int_product = gridded_scene["test_int"]
+        assert int_product["fill_value"] == -1
+        int_data = int_product.get_data_array()
+        assert int_data.dtype == numpy.int8
+        assert numpy.count_nonzero(int_data == -1)
+        # both products cover the same grid cells
+        numpy.testing.assert_array_equal(int_product.get_data_mask(), float_product.get_data_mask())
+
+
+class TestFornavFootprints(object):
+    def test_footprints_match_fornav(self):
+        cols, rows, data, grid_info = create_test_swath()
+        grid_kwargs = dict(grid_cols=grid_info["width"], grid_rows=grid_info["height"])
+        footprints = fornav.compute_footprints(cols, rows, 16, grid_info["width"], grid_info["height"])
+        for mwm in (False, True):
+            valid, out = fornav.fornav(cols, rows, 16, data, maximum_weight_mode=mwm, **grid_kwargs)
+            fp_valid, fp_out = fornav.fornav(cols, rows, 16, data, maximum_weight_mode=mwm, footprints=footprints,
+                                             **grid_kwargs)
+            assert list(valid) == list(fp_valid)
+            for arr, fp_arr in zip(out, fp_out):
+                assert_grids_equal(arr, fp_arr, rtol=0)
+
+    def test_cache(self, tmpdir):
+        cols, rows, data, grid_info = create_test_swath()
+        cache = fornav.FootprintCache(str(tmpdir))
+        footprints = cache.get("test_swath", "test_grid", cols, rows, 16, grid_info["width"], grid_info["height"])
+        cached = cache.get("test_swath", "test_grid", cols, rows, 16, grid_info["width"], grid_info["height"])
+        assert isinstance(cached.cell_weights, numpy.memmap)
+        for arr, cached_arr in zip(footprints, cached):
+            numpy.testing.assert_array_equal(arr, cached_arr)
+
+        # different navigation with the same swath name must not use the old footprints
+        new_footprints = cache.get("test_swath", "test_grid", cols + 5, rows, 16, grid_info["width"], grid_info["height"])
+        assert not isinstance(new_footprints.cell_weights, numpy.memmap)
+        assert not numpy.array_equal(new_footprints.cell_offsets[:100], footprints.cell_offsets[:100])
+
+
+class TestFornavAccumulate(object):
+    def test_granules_match_fornav(self, tmpdir):
+        cols, rows, data, grid_info = create_test_swath()
+        product_names = ["p%d" % (idx,) for idx in range(len(data))]
+        valid, out = fornav.fornav(cols, rows, 16, data, grid_cols=grid_info["width"], grid_rows=grid_info["height"])
+
+        accumulator = fornav.EWAAccumulator(str(tmpdir), "test_grid", grid_info["height"], grid_info["width"])
+        # two granules of 5 scans each
+        for granule_id, granule_rows in (("g1", slice(0, 80)), ("g2", slice(80, 160))):
+            added = accumulator.add(granule_id, cols[granule_rows], rows[granule_rows], 16,
+                                    [arr[granule_rows] for arr in data], product_names)
+            assert added == product_names
+        # the same granule is never added twice
+        assert accumulator.add("g2", cols[80:], rows[80:], 16, [arr[80:] for arr in data], product_names) == []
+        assert accumulator.load_info("p0")["granules"] == ["g1", "g2"]
+
+        acc_out = [numpy.empty_like(arr) for arr in out]
+        acc_valid = accumulator.write(product_names, acc_out)
+        assert list(acc_valid) == list(valid)
+        for arr, acc_arr in zip(out, acc_out):
+            assert_grids_equal(arr, acc_arr, rtol=1e-5, atol=1e-6)
+
+    def test_integer_products(self, tmpdir):
+        """Integer products are written with their integer fill value like fornav does."""
+        cols, rows, data, grid_info = create_test_swath(num_products=1)
+        int_data = [(numpy.nan_to_num(data[0]) * 100).astype(numpy.int8)]
+        int_data[0][5:9, 20:30] = -128
+        valid, out = fornav.fornav(cols, rows, 16, int_data, input_fill=-128, grid_cols=grid_info["width"],
+                                   grid_rows=grid_info["height"])
+
+        accumulator = fornav.EWAAccumulator(str(tmpdir), "test_grid", grid_info["height"], grid_info["width"])
+        accumulator.add("g1", cols, rows, 16, int_data, ["p0"], input_fill=[-128])
+        acc_out = [numpy.empty_like(out[0])]
+        acc_valid = accumulator.write(["p0"], acc_out, output_fill=[-128])
+        assert list(acc_valid) == list(valid)
+        numpy.testing.assert_array_equal(acc_out[0], out[0])
+
+
+def main():
+    import os
+    return pytest.main([os.path.dirname(os.path.realpath(__file__))])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -129,6 +129,99 @@ class TestLL2CRDynamic(object):
         assert lat_arr[-1, 0] == 0, "ll2cr returned the wrong result for a dynamic latlong grid over the dateline"
         assert numpy.all(numpy.diff(lon_arr[0]) >= 0), "ll2cr didn't return monotonic columns over the dateline"
 
+    @pytest.mark.parametrize("dtype", [numpy.float32, numpy.float64])
+    def test_cached_extents(self, dtype):
+        from polar2grid.core.containers import GridDefinition
+        lon_arr = create_test_longitude(165.0, -165.0, (50, 100), twist_factor=0.6).astype(dtype)
+        lat_arr = create_test_latitude(15.0, 30.0, (50, 100), twist_factor=-0.1).astype(dtype)
+        grid_def = GridDefinition(**dynamic_wgs84)
+        first_grid = grid_def.copy()
+        points1, cols1, rows1 = ll2cr.ll2cr(lon_arr.copy(), lat_arr.copy(), first_grid, geolocation_key="test")
+        assert first_grid.dynamic_extents is grid_def.dynamic_extents
+        assert "test" in grid_def.dynamic_extents
+        assert grid_def["width"] is None, "copies of the grid definition should not be modified"
+
+        second_grid = grid_def.copy()
+        points2, cols2, rows2 = ll2cr.ll2cr(lon_arr.copy(), lat_arr.copy(), second_grid, geolocation_key="test")
+        assert points1 == points2
+        assert dict(first_grid) == dict(second_grid)
+        numpy.testing.assert_array_equal(cols1, cols2)
+        numpy.testing.assert_array_equal(rows1, rows2)
+
+
+class TestLL2CRCache(object):
+    def test_cache_matches_ll2cr(self, tmpdir):
+        lon_arr = create_test_longitude(165.0, -165.0, (50, 100), twist_factor=0.6)
+        lat_arr = create_test_latitude(15.0, 30.0, (50, 100), twist_factor=-0.1)
+        cache = ll2cr.LL2CRCache(str(tmpdir))
+        grid_info = dynamic_wgs84.copy()
+        points, cols, rows = ll2cr.ll2cr(lon_arr.copy(), lat_arr.copy(), grid_info)
+        for _ in range(2):
+            cached_grid_info = dynamic_wgs84.copy()
+            cached_points, cached_cols, cached_rows = cache.ll2cr(lon_arr.copy(), lat_arr.copy(), cached_grid_info)
+            assert points == cached_points
+            assert grid_info == cached_grid_info
+            numpy.testing.assert_array_equal(cols, cached_cols)
+            numpy.testing.assert_array_equal(rows, cached_rows)
+        assert len(tmpdir.listdir()) == 1
+
+    def test_eviction(self, tmpdir):
+        lon_arr = create_test_longitude(-95.0, -75.0, (50, 100))
+        lat_arr = create_test_latitude(18.0, 40.0, (50, 100))
+        # room for one set of results
+        cache = ll2cr.LL2CRCache(str(tmpdir), max_size=lon_arr.nbytes * 3)
+        cache.ll2cr(lon_arr.copy(), lat_arr.copy(), static_lcc.copy())
+        cache.ll2cr(lon_arr + 1.0, lat_arr.copy(), static_lcc.copy())
+        entries = tmpdir.listdir()
+        assert len(entries) == 1
+        assert entries[0].basename == "ll2cr_" + cache.cache_key(lon_arr + 1.0, lat_arr, static_lcc)
+
+    def test_partial_entry(self, tmpdir):
+        """A cache entry missing one of its arrays is recomputed without touching the input arrays first."""
+        lon_arr = create_test_longitude(-95.0, -75.0, (50, 100))
+        lat_arr = create_test_latitude(18.0, 40.0, (50, 100))
+        points, cols, rows = ll2cr.ll2cr(lon_arr.copy(), lat_arr.copy(), static_lcc.copy())
+        cache = ll2cr.LL2CRCache(str(tmpdir))
+        cache.ll2cr(lon_arr.copy(), lat_arr.copy(), static_lcc.copy())
+        entry = tmpdir.listdir()[0]
+        entry.join("rows.npy").remove()
+
+        cached_lon, cached_lat = lon_arr.copy(), lat_arr.copy()
+        assert cache.load(cache.cache_key(lon_arr, lat_arr, static_lcc), cached_lon, cached_lat,
+                          static_lcc.copy()) is None
+        numpy.testing.assert_array_equal(cached_lon, lon_arr)
+        numpy.testing.assert_array_equal(cached_lat, lat_arr)
+
+        cached_points, cached_cols, cached_rows = cache.ll2cr(cached_lon, cached_lat, static_lcc.copy())
+        assert cached_points == points
+        numpy.testing.assert_array_equal(cached_cols, cols)
+        numpy.testing.assert_array_equal(cached_rows, rows)
+
+
+class TestLL2CRChunks(object):
+    @pytest.mark.parametrize("grid_info", [static_lcc, dynamic_wgs84])
+    def test_float32_chunks(self, grid_info):
+        lon_arr = create_test_longitude(165.0, -165.0, (50, 100), twist_factor=0.6)
+        lat_arr = create_test_latitude(15.0, 30.0, (50, 100), twist_factor=-0.1)
+        lon_arr[5, 10:20] = numpy.nan
+        lat_arr[5, 10:20] = numpy.nan
+        lon64 = lon_arr.astype(numpy.float64)
+        lat64 = lat_arr.astype(numpy.float64)
+        grid64 = grid_info.copy()
+        points64, _, _ = ll2cr.ll2cr(lon64, lat64, grid64)
+
+        lon32 = lon_arr.astype(numpy.float32)
+        lat32 = lat_arr.astype(numpy.float32)
+        grid32 = grid_info.copy()
+        points32, lon_res, lat_res = ll2cr.ll2cr(lon32, lat32, grid32, rows_per_chunk=7, num_threads=3)
+        assert lon_res is lon32 and lat_res is lat32
+        assert lon_res.dtype == numpy.float32
+        assert points32 == points64
+        assert grid32 == grid64
+        # same as projecting the whole array as 64-bit floats
+        numpy.testing.assert_array_equal(lon_res, lon64.astype(numpy.float32))
+        numpy.testing.assert_array_equal(lat_res, lat64.astype(numpy.float32))
+
 
 def main():
     import os
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Test the nearest neighbor resampling extension module.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+import logging
+import numpy
+import pytest
+
+from polar2grid.remap import _nearest
+from polar2grid.tests.test_remap.test_fornav import create_test_swath
+
+LOG = logging.getLogger(__name__)
+
+
+def kdtree_nearest_index(cols, rows, good_mask, grid_cols, grid_rows, distance_upper_bound):
+    """Nearest neighbor the way it was done before, a KDTree query of every grid cell."""
+    from scipy.spatial import cKDTree
+    grid_y, grid_x = numpy.mgrid[:grid_rows, :grid_cols]
+    tree = cKDTree(numpy.column_stack((cols[good_mask], rows[good_mask])))
+    _, i = tree.query(numpy.dstack((grid_x, grid_y)), distance_upper_bound=distance_upper_bound)
+    return numpy.append(numpy.nonzero(good_mask)[0], -1)[i]
+
+
+class TestNearestIndex(object):
+    @pytest.mark.parametrize("scale,distance_upper_bound", [(1.0, 1.2), (3.0, 3.5), (0.5, 0.7)])
+    def test_matches_kdtree(self, scale, distance_upper_bound):
+        cols, rows, data, grid_info = create_test_swath()
+        cols = (cols * scale).ravel()
+        rows = (rows * scale).ravel()
+        grid_cols = int(grid_info["width"] * scale)
+        grid_rows = int(grid_info["height"] * scale)
+        good_mask = ~numpy.isnan(cols)
+        good_mask[::7] = False
+        index = _nearest.nearest_index(cols, rows, good_mask, grid_cols, grid_rows, distance_upper_bound)
+        expected = kdtree_nearest_index(cols, rows, good_mask, grid_cols, grid_rows, distance_upper_bound)
+        numpy.testing.assert_array_equal(index, expected)
+
+    def test_no_hole_fill(self):
+        cols = numpy.array([0.2, 2.6, 2.4, 5.0, -3.0, numpy.nan], dtype=numpy.float32)
+        rows = numpy.array([0.1, 1.0, 1.0, 0.0, 0.0, 0.0], dtype=numpy.float32)
+        good_mask = numpy.ones(cols.shape, dtype=numpy.bool_)
+        index = _nearest.nearest_index(cols, rows, good_mask, 4, 2, 2.0, fill_holes=False)
+        numpy.testing.assert_array_equal(index, [[0, -1, -1, -1], [-1, -1, 2, 1]])
+
+    def test_row_blocks(self):
+        cols, rows, data, grid_info = create_test_swath()
+        cols = (cols * 2.0).ravel()
+        rows = (rows * 2.0).ravel()
+        grid_cols = grid_info["width"] * 2
+        grid_rows = grid_info["height"] * 2
+        good_mask = ~numpy.isnan(cols)
+        expected = _nearest.nearest_index(cols, rows, good_mask, grid_cols, grid_rows, 2.5)
+        index = numpy.empty((grid_rows, grid_cols), dtype=numpy.int32)
+        for row_start in range(0, grid_rows, 7):
+            row_end = min(row_start + 7, grid_rows)
+            _nearest.nearest_index(cols, rows, good_mask, grid_cols, grid_rows, 2.5,
+                                   row_start=row_start, row_end=row_end, out=index[row_start:row_end])
+        numpy.testing.assert_array_equal(index, expected)
+        with pytest.raises(ValueError):
+            _nearest.nearest_index(cols, rows, good_mask, grid_cols, grid_rows, 2.5, row_start=5, row_end=5)
+
+
+class TestRemapperNearestIndex(object):
+    @pytest.mark.parametrize("block_rows", [7, 50, 1024])
+    def test_swath_row_limits(self, block_rows):
+        """Only searching the swath rows that can reach a block gives the same index as searching the whole swath."""
+        from polar2grid.remap import Remapper
+        cols, rows, data, grid_info = create_test_swath()
+        swath_columns = cols.shape[1]
+        # the last swath rows are off the grid and some are all fill
+        rows[-20:] += 1000.0
+        cols[40:45] = numpy.nan
+        rows[40:45] = numpy.nan
+        cols = cols.ravel()
+        rows = rows.ravel()
+        good_mask = ~numpy.isnan(cols)
+        good_mask[::7] = False
+        remapper = Remapper()
+        expected = _nearest.nearest_index(cols, rows, good_mask, grid_info["width"], grid_info["height"], 2.5)
+        index = remapper._nearest_index(cols, rows, good_mask, grid_info, 2.5, block_rows=block_rows,
+                                        swath_columns=swath_columns)
+        numpy.testing.assert_array_equal(index, expected)
+
+
+def main():
+    import os
+    return pytest.main([os.path.dirname(os.path.realpath(__file__))])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
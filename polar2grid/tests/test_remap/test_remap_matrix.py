@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Test saving and reusing remap matrices.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+import logging
+import numpy
+import pytest
+
+from polar2grid.core.containers import GridDefinition
+from polar2grid.remap import fornav
+from polar2grid.remap.remap_matrix import RemapMatrix, geolocation_fingerprint, fingerprint_matches
+from polar2grid.tests.test_remap import create_test_scene
+from polar2grid.tests.test_remap.test_fornav import create_test_swath, assert_grids_equal
+
+LOG = logging.getLogger(__name__)
+
+
+def _grid_definition(grid_info):
+    return GridDefinition(grid_name="test_grid", proj4_definition=grid_info["proj4_definition"],
+                          width=grid_info["width"], height=grid_info["height"],
+                          cell_width=grid_info["cell_width"], cell_height=grid_info["cell_height"],
+                          origin_x=grid_info["origin_x"], origin_y=grid_info["origin_y"])
+
+
+class TestFingerprint(object):
+    def test_tolerance(self):
+        lon = numpy.linspace(-100., -80., 400 * 160).reshape((160, 400))
+        lat = numpy.linspace(20., 40., 400 * 160).reshape((160, 400))
+        fp = geolocation_fingerprint(lon, lat)
+        assert fingerprint_matches(fp, geolocation_fingerprint(lon + 0.0005, lat), tolerance=0.001)
+        assert not fingerprint_matches(fp, geolocation_fingerprint(lon + 0.005, lat), tolerance=0.001)
+        assert not fingerprint_matches(fp, geolocation_fingerprint(lon[:-16], lat[:-16]))
+
+    def test_antimeridian_and_fill(self):
+        lon = numpy.linspace(179.9, 180.0, 64 * 64).reshape((64, 64))
+        lat = numpy.zeros((64, 64))
+        lon[0, 0] = -999.
+        fp = geolocation_fingerprint(lon, lat, fill_value=-999.)
+        wrapped = lon.copy()
+        wrapped[1:] -= 360.
+        assert fingerprint_matches(fp, geolocation_fingerprint(wrapped, lat, fill_value=-999.))
+        lon[0, 0] = 180.
+        assert not fingerprint_matches(fp, geolocation_fingerprint(lon, lat, fill_value=-999.))
+
+
+class TestRemapMatrix(object):
+    def test_ewa_round_trip(self, tmpdir):
+        cols, rows, data, grid_info = create_test_swath()
+        fp = geolocation_fingerprint(cols, rows)
+        footprints = fornav.compute_footprints(cols, rows, 16, grid_info["width"], grid_info["height"])
+        matrix = RemapMatrix.from_footprints(_grid_definition(grid_info), cols.shape, fp, footprints,
+                                             weight_delta_max=10.0, weight_distance_max=1.0)
+        fn = str(tmpdir.join("matrix.npz"))
+        matrix.save(fn)
+        assert RemapMatrix.load(fn, fingerprint=geolocation_fingerprint(cols + 0.5, rows)) is None
+        matrix = RemapMatrix.load(fn, fingerprint=fp)
+        assert matrix.grid_definition["width"] == grid_info["width"]
+        assert matrix.matches("ewa", cols.shape, fp, weight_delta_max=10.0, weight_distance_max=1.0)
+        assert not matrix.matches("ewa", cols.shape, fp, weight_delta_max=5.0, weight_distance_max=1.0)
+        assert not matrix.matches("nearest", cols.shape, fp)
+
+        valid, out = fornav.fornav(cols, rows, 16, data, grid_cols=grid_info["width"], grid_rows=grid_info["height"])
+        matrix_out = [numpy.empty_like(arr) for arr in out]
+        matrix_valid = matrix.remap(data, matrix_out, numpy.nan, numpy.nan)
+        assert list(valid) == list(matrix_valid)
+        for arr, matrix_arr in zip(out, matrix_out):
+            assert_grids_equal(arr, matrix_arr, rtol=0)
+
+    def test_nearest(self):
+        swath = numpy.arange(12, dtype=numpy.float32).reshape((3, 4))
+        swath[0, 1] = -1.
+        index = numpy.array([[0, 1, -1], [5, 11, -1]])
+        grid_def = GridDefinition(grid_name="test_grid", proj4_definition="+proj=latlong", width=3, height=2,
+                                  cell_width=1., cell_height=-1., origin_x=0., origin_y=0.)
+        matrix = RemapMatrix.from_nearest_index(grid_def, swath.shape, numpy.zeros((2, 1, 1)), index.ravel())
+        out = numpy.empty((2, 3), dtype=numpy.float32)
+        valid = matrix.remap([swath], [out], -1., numpy.nan)
+        assert valid == [3]
+        numpy.testing.assert_array_equal(out, [[0., numpy.nan, numpy.nan], [5., 11., numpy.nan]])
+
+        int_out = numpy.empty((2, 3), dtype=numpy.int8)
+        valid = matrix.remap([swath.astype(numpy.int8)], [int_out], -1, -1)
+        assert valid == [3]
+        numpy.testing.assert_array_equal(int_out, [[0, -1, -1], [5, 11, -1]])
+
+
+class TestRemapperMatrix(object):
+    @pytest.mark.parametrize("method", ["ewa", "nearest"])
+    def test_fill_values(self, tmpdir, monkeypatch, method):
+        """Gridded products say what fill value was written to their data."""
+        from polar2grid.remap import Remapper
+        monkeypatch.chdir(tmpdir)
+        scene = create_test_scene()
+        remapper = Remapper(overwrite_existing=True)
+        matrix_fn = str(tmpdir.join("matrix.npz"))
+        remapper.create_remap_matrix(scene["test_float"]["swath_definition"], "wgs84_fit", method).save(matrix_fn)
+        gridded_scene = remapper.remap_scene(scene, "wgs84_fit", remap_method=method, remap_matrix=matrix_fn)
+
+        float_product = gridded_scene["test_float"]
+        assert numpy.isnan(float_product["fill_value"])
+        assert numpy.count_nonzero(numpy.isnan(float_product.get_data_array()))
+        int_product = gridded_scene["test_int"]
+        assert int_product["fill_value"] == -1
+        int_data = int_product.get_data_array()
+        assert int_data.dtype == numpy.int8
+        assert numpy.count_nonzero(int_data == -1)
+
+
+def main():
+    import os
+    return pytest.main([os.path.dirname(os.path.realpath(__file__))])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
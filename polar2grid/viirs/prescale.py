@@ -46,7 +46,9 @@ __docformat__ = "restructuredtext en"
 
 import logging
 import numpy
-from polar2grid.core.histogram import local_histogram_equalization, histogram_equalization
+from functools import partial
+from polar2grid.core.histogram import local_histogram_equalization, histogram_equalization, RowMask, row_chunks, \
+    DEFAULT_ROWS_PER_CHUNK
 
 # from mpl_toolkits.basemap import maskoceans
 
@@ -89,11 +91,7 @@ def _make_day_night_masks(image, solarZenithAngle, fillValue,
     night_mask = (solarZenithAngle > highAngleCutoff) & good_mask
     day_mask   = (solarZenithAngle <= lowAngleCutoff) & good_mask
     mixed_mask = [ ]
-    steps = range(lowAngleCutoff, highAngleCutoff+1, stepsDegrees)
-    if steps[-1] >= highAngleCutoff:
-        steps[-1] = highAngleCutoff
-    steps = zip(steps, steps[1:])
-    for i, j in steps:
+    for i, j in _terminator_steps(highAngleCutoff, lowAngleCutoff, stepsDegrees):
         LOG.debug("Processing step %d to %d" % (i, j))
         tmp = (solarZenithAngle > i) & (solarZenithAngle <= j) & good_mask
         if tmp.any():
@@ -105,6 +103,67 @@ def _make_day_night_masks(image, solarZenithAngle, fillValue,
     return day_mask, mixed_mask, night_mask, good_mask
 
 
+def _terminator_steps(highAngleCutoff, lowAngleCutoff, stepsDegrees):
+    """Get the (low, high] solar zenith angle ranges of each mixed mask.
+    """
+    steps = range(lowAngleCutoff, highAngleCutoff+1, stepsDegrees)
+    if steps[-1] >= highAngleCutoff:
+        steps[-1] = highAngleCutoff
+    return zip(steps, steps[1:])
+
+
+def _make_chunked_day_night_masks(image, solarZenithAngle, fillValue,
+                                   highAngleCutoff=DEFAULT_HIGH_ANGLE, lowAngleCutoff=DEFAULT_LOW_ANGLE,
+                                   stepsDegrees=None, rows_per_chunk=DEFAULT_ROWS_PER_CHUNK):
+    """Same as `_make_day_night_masks` but the masks are `RowMask` objects.
+
+    The masks are calculated from `image` and `solarZenithAngle` (usually memory mapped files)
+    `rows_per_chunk` rows at a time when they are used so the masks for the whole swath
+    are never in memory.
+    """
+    highAngleCutoff = DEFAULT_HIGH_ANGLE if highAngleCutoff is None else highAngleCutoff
+    lowAngleCutoff  = DEFAULT_LOW_ANGLE  if lowAngleCutoff  is None else lowAngleCutoff
+    stepsDegrees = highAngleCutoff - lowAngleCutoff if stepsDegrees is None else stepsDegrees
+
+    def _good_rows(rows):
+        return ~(mask_helper(image[rows], fillValue) | mask_helper(solarZenithAngle[rows], fillValue))
+
+    def _angle_mask(low_angle, high_angle):
+        # low_angle < solarZenithAngle <= high_angle, None for no limit
+        def _mask_rows(rows):
+            mask = _good_rows(rows)
+            if low_angle is not None:
+                mask &= solarZenithAngle[rows] > low_angle
+            if high_angle is not None:
+                mask &= solarZenithAngle[rows] <= high_angle
+            return mask
+        return RowMask(image.shape, _mask_rows, rows_per_chunk=rows_per_chunk)
+
+    good_mask  = RowMask(image.shape, _good_rows, rows_per_chunk=rows_per_chunk)
+    night_mask = _angle_mask(highAngleCutoff, None)
+    day_mask   = _angle_mask(None, lowAngleCutoff)
+    mixed_mask = [ ]
+    for i, j in _terminator_steps(highAngleCutoff, lowAngleCutoff, stepsDegrees):
+        LOG.debug("Processing step %d to %d" % (i, j))
+        tmp = _angle_mask(i, j)
+        if tmp.any():
+            LOG.debug("Adding step %d to %d" % (i, j))
+            mixed_mask.append(tmp)
+
+    return day_mask, mixed_mask, night_mask, good_mask
+
+
+def _fill_invalid(out, good_mask, fillValue, rows_per_chunk=None):
+    """Set any data that's not in the good areas to fill, `rows_per_chunk` rows at a time if provided.
+    """
+    if rows_per_chunk is None:
+        out[~good_mask] = fillValue
+        return
+    for rows in row_chunks(out.shape[0], rows_per_chunk):
+        out_rows = out[rows]
+        out_rows[~good_mask[rows]] = fillValue
+
+
 def _calculate_average_moon_illumination (moonIlluminatonFraction,
                                           lunarZenithAngle,
                                           goodDataMask,
@@ -154,7 +213,8 @@ def _calculate_average_moon_illumination (moonIlluminatonFraction,
 
 
 def adaptive_dnb_scale(img, fillValue=-999.0, solarZenithAngle=None, lunarZenithAngle=None,
-                       moonIllumFraction=None, highAngleCutoff=None, lowAngleCutoff=None, waterMask=None, out=None):
+                       moonIllumFraction=None, highAngleCutoff=None, lowAngleCutoff=None, waterMask=None, out=None,
+                       rows_per_chunk=None):
     """This scaling method uses histogram equalization to flatten the image
     levels across the day and night regions.
 
@@ -167,6 +227,10 @@ def adaptive_dnb_scale(img, fillValue=-999.0, solarZenithAngle=None, lunarZenith
     The night region will be equalized using settings determined by the amount
     of moonlight in the scene (as determined by the moonIllumFraction and the lunarZenithAngle).
 
+    If `rows_per_chunk` is provided the masks and the equalization are done that many rows
+    at a time (a few rows of tiles at a time for local equalization) so `img`, `solarZenithAngle`,
+    and `out` can be memory mapped files larger than the available memory.
+
     FIXME: The below shouldn't need to be true
     If `out` is provided it must be a writable copy of the original DNB data.
     """
@@ -178,11 +242,13 @@ def adaptive_dnb_scale(img, fillValue=-999.0, solarZenithAngle=None, lunarZenith
 
     # build the day and night area masks
     LOG.debug("Generating day, night, and mixed region masks...")
+    make_masks = _make_day_night_masks if rows_per_chunk is None else \
+        partial(_make_chunked_day_night_masks, rows_per_chunk=rows_per_chunk)
     day_mask, mixed_mask, night_mask, good_mask = \
-        _make_day_night_masks(img, solarZenithAngle,
-                              fillValue,
-                              highAngleCutoff=highAngleCutoff,
-                              lowAngleCutoff=lowAngleCutoff)
+        make_masks(img, solarZenithAngle,
+                   fillValue,
+                   highAngleCutoff=highAngleCutoff,
+                   lowAngleCutoff=lowAngleCutoff)
     has_multi_times = (mixed_mask is not None) and (len(mixed_mask) > 0)
     night_water = None # a mask of water at night
 
@@ -191,7 +257,7 @@ def adaptive_dnb_scale(img, fillValue=-999.0, solarZenithAngle=None, lunarZenith
         if has_multi_times:
             local_histogram_equalization(img, day_mask, valid_data_mask=good_mask, local_radius_px=400, out=out)
         else:
-            histogram_equalization(img, day_mask, out=out)
+            histogram_equalization(img, day_mask, out=out, rows_per_chunk=rows_per_chunk)
 
     if mixed_mask is not None and len(mixed_mask) > 0:
         LOG.debug("  scaling DNB in twilight mask")
@@ -224,20 +290,20 @@ def adaptive_dnb_scale(img, fillValue=-999.0, solarZenithAngle=None, lunarZenith
         #     else :
         #         local_histogram_equalization(img, tmp_night_mask, valid_data_mask=good_mask, local_radius_px=50, out=out)
 
-        histogram_equalization(img, night_mask, out=out)
+        histogram_equalization(img, night_mask, out=out, rows_per_chunk=rows_per_chunk)
 
     # if night_water is not None and (numpy.any(night_water)):
     #     log.debug ("  scaling DNB in night water mask")
     #     local_histogram_equalization(img, night_water, valid_data_mask=good_mask, local_radius_px=500, out=out)
 
     # set any data that's not in the good areas to fill
-    out[~good_mask] = fillValue
+    _fill_invalid(out, good_mask, fillValue, rows_per_chunk=rows_per_chunk)
 
     return out
 
 
 def dnb_scale(img, fillValue=-999.0, solarZenithAngle=None,
-              highAngleCutoff=None, lowAngleCutoff=None, out=None):
+              highAngleCutoff=None, lowAngleCutoff=None, out=None, rows_per_chunk=None):
     """
     This scaling method uses histogram equalization to flatten the image
     levels across the day and night regions.
@@ -247,34 +313,40 @@ def dnb_scale(img, fillValue=-999.0, solarZenithAngle=None,
     points between the regions. If data points do not have a corresponding
     solarZenithAngle, they will be considered to be invalid data and set to
     fill values.
+
+    If `rows_per_chunk` is provided the masks and the equalization are done that many rows
+    at a time so `img`, `solarZenithAngle`, and `out` can be memory mapped files larger than
+    the available memory.
     """
     if out is None:
         out = numpy.zeros_like(img)
 
     # build the day and night area masks
     LOG.debug("Generating day, night, and mixed region masks...")
+    make_masks = _make_day_night_masks if rows_per_chunk is None else \
+        partial(_make_chunked_day_night_masks, rows_per_chunk=rows_per_chunk)
     day_mask, mixed_mask, night_mask, good_mask = \
-                                       _make_day_night_masks(img, solarZenithAngle,
-                                                             fillValue,
-                                                             highAngleCutoff=highAngleCutoff,
-                                                             lowAngleCutoff=lowAngleCutoff)
+                                       make_masks(img, solarZenithAngle,
+                                                  fillValue,
+                                                  highAngleCutoff=highAngleCutoff,
+                                                  lowAngleCutoff=lowAngleCutoff)
     # has_multi_times = (mixed_mask is not None) and (len(mixed_mask) > 0)
 
     if day_mask is not None and day_mask.any():
         LOG.debug("  scaling DNB in day mask")
-        histogram_equalization(img, day_mask, out=out)
+        histogram_equalization(img, day_mask, out=out, rows_per_chunk=rows_per_chunk)
 
     if mixed_mask is not None and (len(mixed_mask) > 0):
         LOG.debug("  scaling DNB in twilight mask")
         for mask in mixed_mask:
-            histogram_equalization(img, mask, out=out)
+            histogram_equalization(img, mask, out=out, rows_per_chunk=rows_per_chunk)
 
     if night_mask is not None and night_mask.any():
         LOG.debug("  scaling DNB in night mask")
-        histogram_equalization(img, night_mask, out=out)
+        histogram_equalization(img, night_mask, out=out, rows_per_chunk=rows_per_chunk)
 
     # set any data that's not in the good areas to fill
-    out[~good_mask] = fillValue
+    _fill_invalid(out, good_mask, fillValue, rows_per_chunk=rows_per_chunk)
     
     return out
 
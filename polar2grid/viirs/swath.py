@@ -853,7 +853,9 @@ class Frontend(roles.FrontendRole):
 
         try:
             output_data = dnb_product.copy_array(filename=filename, read_only=False)
-            dnb_scale(dnb_data, solarZenithAngle=sza_data, fillValue=fill, out=output_data)
+            # equalize a few rows at a time so multi-orbit swaths don't have to fit in memory
+            dnb_scale(dnb_data, solarZenithAngle=sza_data, fillValue=fill, out=output_data,
+                      rows_per_chunk=histogram.DEFAULT_ROWS_PER_CHUNK)
 
             one_swath = self.create_secondary_swath_object(product_name, swath_definition, filename,
                                                            dnb_product["data_type"], products_created)
@@ -894,7 +896,8 @@ class Frontend(roles.FrontendRole):
         try:
             output_data = dnb_product.copy_array(filename=filename, read_only=False)
             adaptive_dnb_scale(dnb_data, solarZenithAngle=sza_data, lunarZenithAngle=lza_data,
-                               moonIllumFraction=moon_illum_fraction, fillValue=fill, out=output_data)
+                               moonIllumFraction=moon_illum_fraction, fillValue=fill, out=output_data,
+                               rows_per_chunk=histogram.DEFAULT_ROWS_PER_CHUNK)
 
             one_swath = self.create_secondary_swath_object(product_name, swath_definition, filename,
                                                            dnb_product["data_type"], products_created)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# encoding: utf-8
+#     This program is free software: you can redistribute it and/or modify
+#     it under the terms of the GNU General Public License as published by
+#     the Free Software Foundation, either version 3 of the License, or
+#     (at your option) any later version.
+#
+#     This program is distributed in the hope that it will be useful,
+#     but WITHOUT ANY WARRANTY; without even the implied warranty of
+#     MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#     GNU General Public License for more details.
+#
+#     You should have received a copy of the GNU General Public License
+#     along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+"""Test the VIIRS DNB prescaling functions.
+
+:license:      GNU GPLv3
+
+"""
+__docformat__ = "restructuredtext en"
+
+import sys
+
+import numpy
+import pytest
+
+from polar2grid.viirs import prescale
+
+FILL = -999.0
+
+
+def create_test_dnb(shape=(300, 200)):
+    """Create DNB radiances and solar zenith angles going from day, through twilight, to night."""
+    rand = numpy.random.RandomState(42)
+    img = rand.lognormal(-18.0, 2.0, size=shape)
+    sza = numpy.repeat(numpy.linspace(60.0, 120.0, shape[0])[:, None], shape[1], axis=1)
+    sza += rand.uniform(-0.5, 0.5, size=shape)
+    img[50:60, 10:30] = FILL
+    sza[200:205, 150:] = FILL
+    return img, sza
+
+
+class TestDNBScaling(object):
+    @pytest.mark.parametrize("rows_per_chunk", [7, 64, 1024])
+    @pytest.mark.parametrize("scale_func", [prescale.dnb_scale, prescale.adaptive_dnb_scale])
+    def test_chunked_matches_in_memory(self, scale_func, rows_per_chunk):
+        img, sza = create_test_dnb()
+        expected = scale_func(img, fillValue=FILL, solarZenithAngle=sza, out=numpy.zeros_like(img))
+        result = scale_func(img, fillValue=FILL, solarZenithAngle=sza, out=numpy.zeros_like(img),
+                            rows_per_chunk=rows_per_chunk)
+        # the day, twilight, and night regions all have data
+        assert numpy.count_nonzero(sza <= prescale.DEFAULT_LOW_ANGLE)
+        assert numpy.count_nonzero(sza > prescale.DEFAULT_HIGH_ANGLE)
+        numpy.testing.assert_array_equal(result == FILL, expected == FILL)
+        numpy.testing.assert_allclose(result, expected, rtol=1e-6, atol=1e-6)
+
+    def test_chunked_masks(self):
+        img, sza = create_test_dnb()
+        expected = prescale._make_day_night_masks(img, sza, FILL, stepsDegrees=4)
+        result = prescale._make_chunked_day_night_masks(img, sza, FILL, stepsDegrees=4, rows_per_chunk=7)
+        day_mask, mixed_mask, night_mask, good_mask = result
+        assert len(mixed_mask) == len(expected[1])
+        for mask, expected_mask in zip([day_mask, night_mask, good_mask] + mixed_mask,
+                                       [expected[0], expected[2], expected[3]] + expected[1]):
+            numpy.testing.assert_array_equal(mask[0:img.shape[0]], expected_mask)
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__]))
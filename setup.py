@@ -44,9 +44,18 @@ from setuptools import setup, find_packages, Command
 from distutils.extension import Extension
 import numpy
 
+# OpenMP is used for multi-threaded EWA resampling, without it fornav will always run on a single thread
+if os.getenv("USE_OPENMP", "True") == "True":
+    openmp_args = ["-fopenmp"]
+else:
+    print("OpenMP will not be used. Remove environment variable 'USE_OPENMP' to use it")
+    openmp_args = []
+
 extensions = [
     Extension("polar2grid.remap._ll2cr", sources=["polar2grid/remap/_ll2cr.pyx"], extra_compile_args=["-O3", "-Wno-unused-function"]),
-    Extension("polar2grid.remap._fornav", sources=["polar2grid/remap/_fornav.pyx", "polar2grid/remap/_fornav_templates.cpp"], language="c++", extra_compile_args=["-O3", "-Wno-unused-function"])
+    Extension("polar2grid.remap._nearest", sources=["polar2grid/remap/_nearest.pyx"], extra_compile_args=["-O3", "-Wno-unused-function"]),
+    Extension("polar2grid.remap._fornav", sources=["polar2grid/remap/_fornav.pyx", "polar2grid/remap/_fornav_templates.cpp"], language="c++",
+              extra_compile_args=["-O3", "-Wno-unused-function"] + openmp_args, extra_link_args=openmp_args)
 ]
 
 try:
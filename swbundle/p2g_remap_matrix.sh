@@ -0,0 +1,33 @@
+#!/usr/bin/env bash
+### Save the swath to grid mapping of a SwathScene so it can be reused
+### by future passes with the same geolocation (--remap-matrix).
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+# This file is part of the polar2grid software package. Polar2grid takes
+# satellite observation data, remaps it, and writes it to a file format for
+# input into another program.
+# Documentation: http://www.ssec.wisc.edu/software/polar2grid/
+
+if [ -z "$POLAR2GRID_HOME" ]; then 
+  export POLAR2GRID_HOME="$( cd -P "$( dirname "${BASH_SOURCE[0]}" )" && cd .. && pwd )"
+fi
+
+# Setup necessary environments
+source $POLAR2GRID_HOME/bin/env.sh
+
+# Call the script
+${P2G_SHELLB3_DIR}/bin/python -m polar2grid.remap.remap_matrix "$@"
+
+